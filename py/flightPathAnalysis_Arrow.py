@@ -0,0 +1,362 @@
+### Arrow IPC (Feather v2) export of the results used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# The R package and the Shiny app had to parse the gdb and excel outputs again before showing them. The results are
+# also written as uncompressed Arrow IPC files (Feather v2) that R memory-maps without conversion:
+#   arrow::read_feather(path, as_data_frame = FALSE, mmap = TRUE)   or   arrow::open_dataset(folder, format = "arrow")
+# Text columns are dictionary encoded (factors in R) and every record batch shares the same dictionaries. Needs pyarrow.
+#
+# Schema (schema metadata: "schema" = table name, "version" = schemaVersion, "crs" = "EPSG:3005", "unit_no" and
+# "unit_no_id" = the uwr field names of the run):
+# points (points.arrow, maskedPoints.arrow) - one row per flight point, uwr and buffer, before / after terrain masking
+#   X, Y                 float64                       BC albers coordinates (m)
+#   FlightName           dictionary<int32, utf8>
+#   DateTime             timestamp[ms, UTC]
+#   Elevation, DEMElev   float32                       gps elevation and DEM elevation (m)
+#   AGL                  int16                         height above ground (m)
+#   TimeInterval         float64                       seconds the point stands for
+#   TotalTime            float64                       seconds of the flight
+#   HeightRange          dictionary<int8, utf8>
+#   BUFF_DIST            float64                       buffer distance of the point (0 = in uwr)
+#   unit_no, unit_no_id  dictionary<int32, utf8>       uwr of the point
+#   IncursionSeverity    dictionary<int8, utf8>
+# segments (segments.arrow) - one row per flight segment (two consecutive points)
+#   FlightName           dictionary<int32, utf8>
+#   StartTime            timestamp[ms, UTC]
+#   Duration             float64                       seconds
+#   AGL                  float64                       mean AGL of the two points, null without DEM value
+#   X0, Y0, X1, Y1       float64                       BC albers coordinates of the segment ends
+# statistics (pointStats.arrow, maskedPointStats.arrow) - like the stats tables of pointStatistics()
+#   FlightName, HeightRange, unit_no, unit_no_id, IncursionSeverity   dictionary<int32, utf8>
+#   BUFF_DIST, TotalTime, SUM_TimeInterval                            float64
+#   FREQUENCY                                                         int64
+# season.json lists the files of the season folder with their schema and row count.
+# Class: ArrowPointWriter - point writer (see flightPathAnalysis_Output.openPointWriter()) for .arrow files
+# Class: ArrowSegmentWriter - segments of FlightLines, a chunk of flights at a time, to an Arrow file
+# Function: writeSegments - segments of FlightLines to an Arrow file
+# Function: writeStatistics - statistics of a PointTable to an Arrow file
+# Function: exportFeatureClass, exportStatisticsTable - gdb outputs to Arrow files
+# Function: exportSeason - Arrow files of the outputs of a run (stage of flightPathAnalysis_uwr.runAnalysis())
+
+import datetime
+import os
+import numpy as np
+
+import flightPathAnalysis_Pipeline
+
+schemaVersion = "1"
+
+#rows per record batch of the files
+batchRows = 1048576
+
+#columns of the statistics schema, in order
+statisticsColumns = ["FlightName", "HeightRange", "BUFF_DIST", "unit_no", "unit_no_id", "TotalTime", "IncursionSeverity", "FREQUENCY",
+                     "SUM_TimeInterval"]
+
+
+def schemaMetadata(name, unit_no, unit_no_id):
+    return {"schema": name, "version": schemaVersion, "crs": "EPSG:3005", "unit_no": unit_no, "unit_no_id": unit_no_id}
+
+def pointSchema(unit_no="unit_no", unit_no_id="unit_no_id"):
+    import pyarrow as pa
+
+    text32 = pa.dictionary(pa.int32(), pa.string())
+    text8 = pa.dictionary(pa.int8(), pa.string())
+    return pa.schema([("X", pa.float64()), ("Y", pa.float64()), ("FlightName", text32), ("DateTime", pa.timestamp("ms", tz="UTC")),
+                      ("Elevation", pa.float32()), ("DEMElev", pa.float32()), ("AGL", pa.int16()), ("TimeInterval", pa.float64()),
+                      ("TotalTime", pa.float64()), ("HeightRange", text8), ("BUFF_DIST", pa.float64()), ("unit_no", text32),
+                      ("unit_no_id", text32), ("IncursionSeverity", text8)],
+                     metadata=schemaMetadata("points", unit_no, unit_no_id))
+
+def uniqueCodes(values):
+    #(unique values, code of each value in them). Dictionaries must not repeat values to become R factors
+    unique, codes = np.unique(np.array([str(v) for v in values] or [""], dtype=object), return_inverse=True)
+    return unique.tolist(), codes.reshape(-1).astype("int32")
+
+def dictionaryColumn(codes, values, indexType="int32"):
+    import pyarrow as pa
+
+    return pa.DictionaryArray.from_arrays(pa.array(np.asarray(codes, dtype=indexType)), pa.array(values, type=pa.string()))
+
+def writeTable(table, path):
+    """
+    Purpose: Writes a pyarrow table to an uncompressed Arrow IPC file (memory-mappable) in record batches of batchRows.
+    The file is written to a temporary file first and then moved, so readers never see half a file.
+    """
+    import pyarrow as pa
+
+    tempPath = path + ".tmp"
+    with pa.OSFile(tempPath, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=batchRows)
+    os.replace(tempPath, path)
+    return table.num_rows
+
+
+class ArrowPointWriter:
+    """
+    Purpose:
+    Writes the PointTable chunks of a streaming run into one Arrow IPC file with the points schema. The chunks are
+    spilled to <path>.part as they come with integer codes, and close() writes the final file with one dictionary per
+    text column, shared by every record batch (the IPC file format can't change dictionaries between batches).
+
+    Inputs:
+    path: Full path of the .arrow (or .feather) file. Replaced if it exists
+    unit_no, unit_no_id, IncursionSeverity: see flightPathAnalysis_Output.GeodatabasePointWriter
+    """
+
+    def __init__(self, path, unit_no, unit_no_id, IncursionSeverity):
+        import pyarrow as pa
+
+        self.pa = pa
+        self.path = path
+        self.unit_no = unit_no
+        self.unit_no_id = unit_no_id
+        self.IncursionSeverity = IncursionSeverity
+        self.count = 0
+        self.flightNames = []
+        self.dictionaries = None
+        self.partSchema = pa.schema([("X", pa.float64()), ("Y", pa.float64()), ("flight", pa.int32()), ("DateTime", pa.timestamp("ms", tz="UTC")),
+                                     ("Elevation", pa.float32()), ("DEMElev", pa.float32()), ("AGL", pa.int16()), ("TimeInterval", pa.float64()),
+                                     ("TotalTime", pa.float64()), ("heightRange", pa.int8()), ("severity", pa.int8()), ("uwr", pa.int32())])
+        self.partPath = path + ".part"
+        self.partSink = pa.OSFile(self.partPath, "wb")
+        self.partWriter = pa.ipc.new_stream(self.partSink, self.partSchema)
+
+    def __call__(self, table):
+        pa = self.pa
+        dictionaries = (table.uwrKeys, table.severities, table.heightRanges)
+        if self.dictionaries is None:
+            self.dictionaries = dictionaries
+        elif dictionaries != self.dictionaries:
+            raise ValueError("point tables have different uwr, severity or height range dictionaries")
+        p = table.points
+        flight = p["flight"].astype("int32") + len(self.flightNames)
+        self.flightNames += table.flightNames
+        columns = [p["x"], p["y"], flight, p["time"].astype("datetime64[ms]").astype("int64"), p["elevation"], p["demElev"], p["agl"],
+                   table.flightTimeInterval[p["flight"]] if len(p) else np.zeros(0), table.flightTotalTime[p["flight"]] if len(p) else np.zeros(0),
+                   p["heightRange"], p["severity"], p["uwr"]]
+        arrays = [pa.array(np.ascontiguousarray(c)).cast(f.type) if f.name != "DateTime" else pa.array(c, type=pa.int64()).cast(f.type)
+                  for c, f in zip(columns, self.partSchema)]
+        self.partWriter.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.partSchema))
+        self.count += len(p)
+
+    def close(self):
+        pa = self.pa
+        starttime = datetime.datetime.now()
+        self.partWriter.close()
+        self.partSink.close()
+        uwrKeys, severities, heightRanges = self.dictionaries or ([], [], [])
+        flightNames, flightCodes = uniqueCodes(self.flightNames)
+        unitNo, unitNoCodes = uniqueCodes([k[0] for k in uwrKeys])
+        unitNoId, unitNoIdCodes = uniqueCodes([k[1] for k in uwrKeys])
+        buffDist = np.array([s[0] for s in severities] or [0], dtype="float64")
+        labels = [str(s[1]) for s in severities] or [""]
+        heightRanges = [str(h) for h in heightRanges] or [""]
+
+        schema = pointSchema(self.unit_no, self.unit_no_id)
+        tempPath = self.path + ".tmp"
+        with pa.memory_map(self.partPath) as source, pa.OSFile(tempPath, "wb") as sink:
+            with pa.ipc.new_file(sink, schema) as writer:
+                for batch in pa.ipc.open_stream(source):
+                    flight = batch.column("flight").to_numpy()
+                    uwr = batch.column("uwr").to_numpy()
+                    severity = batch.column("severity").to_numpy()
+                    writer.write_batch(pa.RecordBatch.from_arrays([
+                        batch.column("X"), batch.column("Y"), dictionaryColumn(flightCodes[flight], flightNames), batch.column("DateTime"),
+                        batch.column("Elevation"), batch.column("DEMElev"), batch.column("AGL"), batch.column("TimeInterval"),
+                        batch.column("TotalTime"), dictionaryColumn(batch.column("heightRange").to_numpy(), heightRanges, "int8"),
+                        pa.array(buffDist[severity]), dictionaryColumn(unitNoCodes[uwr], unitNo), dictionaryColumn(unitNoIdCodes[uwr], unitNoId),
+                        dictionaryColumn(severity, labels, "int8")], schema=schema))
+        os.replace(tempPath, self.path)
+        os.remove(self.partPath)
+        print("Wrote", self.count, "points to", self.path, ":", datetime.datetime.now() - starttime)
+        return [self.path]
+
+
+class ArrowSegmentWriter:
+    """
+    Purpose:
+    Writes the segments of FlightLines given a chunk of flights at a time into one Arrow IPC file with the segments schema.
+    Like ArrowPointWriter, the chunks are spilled to <path>.part with integer flight codes and close() writes the final
+    file with one FlightName dictionary.
+
+    Inputs:
+    path: Full path of the .arrow file. Replaced if it exists
+    """
+
+    def __init__(self, path):
+        import pyarrow as pa
+
+        self.pa = pa
+        self.path = path
+        self.count = 0
+        self.flightNames = []
+        self.partSchema = pa.schema([("flight", pa.int32()), ("StartTime", pa.timestamp("ms", tz="UTC")), ("Duration", pa.float64()),
+                                     ("AGL", pa.float64()), ("X0", pa.float64()), ("Y0", pa.float64()), ("X1", pa.float64()), ("Y1", pa.float64())])
+        self.partPath = path + ".part"
+        self.partSink = pa.OSFile(self.partPath, "wb")
+        self.partWriter = pa.ipc.new_stream(self.partSink, self.partSchema)
+
+    def __call__(self, lines):
+        #lines: FlightLines of flightPathAnalysis_FlightLines.buildFlightLines(). AGL is null if lines.agl is not set
+        pa = self.pa
+        starts = lines.segmentStarts()
+        attributes = lines.segmentAttributes(starts)
+        agl = attributes["AGL"]
+        flight = attributes["flight"].astype("int32") + len(self.flightNames)
+        self.flightNames += list(lines.names)
+        self.partWriter.write_batch(pa.RecordBatch.from_arrays([
+            pa.array(flight), pa.array(attributes["StartTime"].astype("datetime64[ms]").astype("int64"), type=pa.int64()).cast(pa.timestamp("ms", tz="UTC")),
+            pa.array(attributes["Duration"]), pa.array(agl, mask=np.isnan(agl)),
+            pa.array(lines.x[starts]), pa.array(lines.y[starts]), pa.array(lines.x[starts + 1]), pa.array(lines.y[starts + 1])], schema=self.partSchema))
+        self.count += len(starts)
+
+    def close(self):
+        #writes the segments file. Returns the number of segments
+        pa = self.pa
+        self.partWriter.close()
+        self.partSink.close()
+        flightNames, flightCodes = uniqueCodes(self.flightNames)
+        schema = pa.schema([("FlightName", pa.dictionary(pa.int32(), pa.string()))] + list(self.partSchema)[1:],
+                           metadata=schemaMetadata("segments", "", ""))
+        tempPath = self.path + ".tmp"
+        with pa.memory_map(self.partPath) as source, pa.OSFile(tempPath, "wb") as sink:
+            with pa.ipc.new_file(sink, schema) as writer:
+                for batch in pa.ipc.open_stream(source):
+                    flight = batch.column("flight").to_numpy()
+                    writer.write_batch(pa.RecordBatch.from_arrays([dictionaryColumn(flightCodes[flight], flightNames)] + batch.columns[1:], schema=schema))
+        os.replace(tempPath, self.path)
+        os.remove(self.partPath)
+        return self.count
+
+
+def writeSegments(lines, path):
+    """
+    (FlightLines, string) -> int
+
+    Inputs:
+    lines: FlightLines of flightPathAnalysis_FlightLines.buildFlightLines(). AGL is null if lines.agl is not set
+    path: Full path of the .arrow file
+
+    Output: segments Arrow file. Returns the number of segments
+
+    Purpose: Writes one row per flight segment with the segments schema
+    """
+    writer = ArrowSegmentWriter(path)
+    writer(lines)
+    return writer.close()
+
+def statisticsTable(columns, unit_no, unit_no_id):
+    #pyarrow table of the statistics schema from a dictionary of columns (text columns as arrays of str)
+    import pyarrow as pa
+
+    arrays = {}
+    for name in statisticsColumns:
+        values = columns[name]
+        if name in ("BUFF_DIST", "TotalTime", "SUM_TimeInterval"):
+            arrays[name] = pa.array(np.asarray(values, dtype="float64"))
+        elif name == "FREQUENCY":
+            arrays[name] = pa.array(np.asarray(values, dtype="int64"))
+        else:
+            unique, codes = uniqueCodes(values)
+            arrays[name] = dictionaryColumn(codes[:len(values)], unique)
+    return pa.table(arrays).replace_schema_metadata(schemaMetadata("statistics", unit_no, unit_no_id))
+
+def writeStatistics(table, path, unit_no="unit_no", unit_no_id="unit_no_id"):
+    """
+    (PointTable, string, optional: string, string) -> int
+
+    Purpose: Writes the sum of TimeInterval for each flight, height range, buffer and uwr of a PointTable, like
+    pointStatistics(), to an Arrow file with the statistics schema. Returns the number of rows
+    """
+    stats = table.statistics()
+    flight = stats["flight"]
+    columns = {"FlightName": [table.flightNames[i] for i in flight],
+               "HeightRange": [table.heightRanges[i] for i in stats["heightRange"]],
+               "BUFF_DIST": [table.severities[i][0] for i in stats["severity"]],
+               "unit_no": [table.uwrKeys[i][0] for i in stats["uwr"]],
+               "unit_no_id": [table.uwrKeys[i][1] for i in stats["uwr"]],
+               "TotalTime": table.flightTotalTime[flight] if len(flight) else np.zeros(0),
+               "IncursionSeverity": [table.severities[i][1] for i in stats["severity"]],
+               "FREQUENCY": stats["FREQUENCY"], "SUM_TimeInterval": stats["SUM_TimeInterval"]}
+    return writeTable(statisticsTable(columns, unit_no, unit_no_id), path)
+
+def exportFeatureClass(featureClass, path, unit_no, unit_no_id):
+    """
+    (string, string, string, string) -> int
+
+    Inputs:
+    featureClass: Full path to point feature class of getFlightLinePoints() or LOS_Analysis()
+    path: Full path of the .arrow file
+    unit_no, unit_no_id: uwr fields of the feature class
+
+    Output: points Arrow file. Returns the number of points
+
+    Purpose: Reads the point feature class into numpy with one cursor and writes it with the points schema
+    """
+    import arcpy
+    import pyarrow as pa
+
+    fields = ["SHAPE@X", "SHAPE@Y", "FlightName", "DateTime", "Elevation", "DEMElev", "AGL", "TimeInterval", "TotalTime", "HeightRange",
+              "BUFF_DIST", unit_no, unit_no_id, "IncursionSeverity"]
+    data = arcpy.da.FeatureClassToNumPyArray(featureClass, fields, null_value={"DEMElev": np.nan, "AGL": 0, "TimeInterval": np.nan, "TotalTime": np.nan})
+    schema = pointSchema(unit_no, unit_no_id)
+    arrays = []
+    for field, name in zip(schema, fields):
+        values = data[name]
+        if pa.types.is_dictionary(field.type):
+            unique, codes = uniqueCodes(values)
+            arrays.append(dictionaryColumn(codes[:len(values)], unique, "int8" if field.type.index_type == pa.int8() else "int32"))
+        elif pa.types.is_timestamp(field.type):
+            arrays.append(pa.array(values.astype("datetime64[ms]").astype("int64"), type=pa.int64()).cast(field.type))
+        else:
+            arrays.append(pa.array(values.astype(field.type.to_pandas_dtype())))
+    return writeTable(pa.Table.from_arrays(arrays, schema=schema), path)
+
+def exportStatisticsTable(statsTable, path, unit_no, unit_no_id):
+    """
+    (string, string, string, string) -> int
+
+    Purpose: Writes a gdb stats table of pointStatistics() to an Arrow file with the statistics schema
+    """
+    import arcpy
+
+    fields = ["FlightName", "HeightRange", "BUFF_DIST", unit_no, unit_no_id, "TotalTime", "IncursionSeverity", "FREQUENCY", "SUM_TimeInterval"]
+    data = arcpy.da.TableToNumPyArray(statsTable, fields, null_value={"TotalTime": np.nan})
+    return writeTable(statisticsTable({name: data[field] for name, field in zip(statisticsColumns, fields)}, unit_no, unit_no_id), path)
+
+def exportSeason(arrowFolder, allFlightPoints, maskedFlightPoints, allPointsStats, maskedPointsStats, unit_no, unit_no_id):
+    """
+    (string, string, string, string, string, string, string) -> None
+
+    Inputs:
+    arrowFolder: Folder for the Arrow files. Made if it doesn't exist
+    allFlightPoints: Full path to feature class of flight points before terrain masking
+    maskedFlightPoints: Full path to feature class of flight points after terrain masking
+    allPointsStats, maskedPointsStats: Full path to gdb stats tables of the points before / after terrain masking
+    unit_no, unit_no_id: uwr fields
+
+    Output: points.arrow, maskedPoints.arrow, pointStats.arrow, maskedPointStats.arrow and season.json in arrowFolder.
+    segments.arrow is written by getFlightLinePoints() when it is given the arrowFolder
+
+    Purpose: Publishes the outputs of a run for the R package and the Shiny app
+    """
+    starttime = datetime.datetime.now()
+    if not os.path.exists(arrowFolder):
+        os.makedirs(arrowFolder)
+    files = {"points.arrow": ("points", exportFeatureClass(allFlightPoints, os.path.join(arrowFolder, "points.arrow"), unit_no, unit_no_id)),
+             "maskedPoints.arrow": ("points", exportFeatureClass(maskedFlightPoints, os.path.join(arrowFolder, "maskedPoints.arrow"), unit_no, unit_no_id)),
+             "pointStats.arrow": ("statistics", exportStatisticsTable(allPointsStats, os.path.join(arrowFolder, "pointStats.arrow"), unit_no, unit_no_id)),
+             "maskedPointStats.arrow": ("statistics", exportStatisticsTable(maskedPointsStats, os.path.join(arrowFolder, "maskedPointStats.arrow"), unit_no, unit_no_id))}
+    writeSeasonIndex(arrowFolder, files)
+    print("Runtime to export the season to Arrow files in", arrowFolder, ":", datetime.datetime.now() - starttime)
+
+def writeSeasonIndex(arrowFolder, files):
+    #season.json: file name -> schema and row count. Keeps the entries of files written by other stages (eg. segments.arrow)
+    indexPath = os.path.join(arrowFolder, "season.json")
+    index = flightPathAnalysis_Pipeline.readJSON(indexPath, {})
+    index["version"] = schemaVersion
+    index.setdefault("files", {})
+    for name, (schema, rows) in files.items():
+        index["files"][name] = {"schema": schema, "rows": rows}
+    flightPathAnalysis_Pipeline.writeJSON(index, indexPath)
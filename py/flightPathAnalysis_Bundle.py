@@ -0,0 +1,277 @@
+### prebuilt analysis bundle used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# Everything the array based analysis derives from the buffered uwr layer and the DEM (the zone rings and their bounding
+# boxes, the DEM window, the zone label raster and its edge index, the minElevViewshed polygons or the horizon tables and
+# the uwr id lists) is built once and packed into one versioned file. Workers (the analysis service, the watch folder,
+# streaming compute processes) open the file with a memory map instead of reading the layers with arcpy and remaking the
+# zone grid: opening takes milliseconds, only the pages that are used are read, and the processes that open the same
+# file share its pages in the OS file cache.
+#
+# File layout:
+#   8 bytes     magic "UWRBNDL" + \0
+#   8 bytes     length of the header (little endian uint64)
+#   header      json: bundleVersion, build time, fingerprints of the inputs, DEM grid, uwr ids, zone windows and
+#               {array name: [offset, dtype, shape]}
+#   arrays      raw little endian arrays from the first 64 byte boundary after the header, each starting on a 64 byte
+#               boundary. The offsets of the header are from the start of the arrays
+# The lazy viewsheds stay in their own cache folder (flightPathAnalysis_LazyViewshed) since they grow as flights come in.
+# Function: packBundle - writes the bundle file of layers already in memory
+# Function: buildBundle - reads the layers with arcpy and writes the bundle file
+# Function: bundleIsCurrent - checks the fingerprints of the bundle against the inputs on disk
+# Function: openBundle - AnalysisBundle of a bundle file. The arrays are read-only memory maps
+# Class: AnalysisBundle - dem, zones, grid, mask and horizons of a bundle
+
+import datetime
+import json
+import os
+import struct
+import numpy as np
+
+import flightPathAnalysis_Geometry
+import flightPathAnalysis_Horizon
+import flightPathAnalysis_Masking
+import flightPathAnalysis_Pipeline
+
+#version of the file layout and of the arrays in it. Files of another version have to be rebuilt
+bundleVersion = "1"
+bundleMagic = b"UWRBNDL\0"
+bundleAlignment = 64
+
+#array attributes of the packed objects
+polygonArrays = ["polygonOffsets", "ringOffsets", "xs", "ys", "bbox"]
+gridArrays = ["labels", "setOffsets", "setZones", "zoneRowStart", "zoneRowCount", "zoneRowBase", "rowEdges", "rowOffsets", "edgeX2", "edgeY2"]
+
+
+def alignedSize(size):
+    #size rounded up to the next bundleAlignment boundary
+    return -(-size // bundleAlignment) * bundleAlignment
+
+def writeBundle(bundlePath, header, arrays):
+    """
+    (string, dictionary, dictionary) -> None
+
+    Purpose: Writes the header and the arrays {name: array} to a bundle file. The file is written to a temporary file first
+    and then moved, so a worker never opens a half written bundle.
+    """
+    header = dict(header, arrays={})
+    arrays = {name: np.ascontiguousarray(array, dtype=np.asarray(array).dtype.newbyteorder("<")) for name, array in arrays.items()}
+    #offsets from the start of the arrays, the first 64 byte boundary after the header
+    offset = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = [offset, array.dtype.str, list(array.shape)]
+        offset += alignedSize(array.nbytes)
+    headerBytes = json.dumps(header, sort_keys=True).encode()
+    dataStart = alignedSize(16 + len(headerBytes))
+
+    folder = os.path.dirname(os.path.abspath(bundlePath))
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    tempPath = bundlePath + ".tmp"
+    with open(tempPath, "wb") as f:
+        f.write(bundleMagic + struct.pack("<Q", len(headerBytes)) + headerBytes)
+        for name, array in arrays.items():
+            f.seek(dataStart + header["arrays"][name][0])
+            f.write(array.tobytes())
+        f.truncate(dataStart + offset)
+    os.replace(tempPath, bundlePath)
+
+def readBundleHeader(bundlePath):
+    """
+    (string) -> dictionary
+
+    Purpose: Header of a bundle file, without mapping its arrays. "dataStart" is added to it.
+    Raises ValueError if the file isn't a bundle of this version
+    """
+    with open(bundlePath, "rb") as f:
+        start = f.read(16)
+        if len(start) < 16 or start[:8] != bundleMagic:
+            raise ValueError(bundlePath + " is not an analysis bundle")
+        headerLength = struct.unpack("<Q", start[8:])[0]
+        header = json.loads(f.read(headerLength).decode())
+    if header.get("bundleVersion") != bundleVersion:
+        raise ValueError(bundlePath + " is a version " + str(header.get("bundleVersion")) + " bundle, rebuild it with version " + bundleVersion)
+    header["dataStart"] = alignedSize(16 + headerLength)
+    return header
+
+def packBundle(bundlePath, dem, zones, grid=None, mask=None, horizons=None, inputs=None):
+    """
+    (string, DEMGrid, UWRZones, optional: ZoneGrid, MinElevMask, dictionary, dictionary) -> None
+
+    Inputs:
+    bundlePath: Full path to the bundle file
+    dem: DEMGrid covering the uwr zones
+    zones: UWRZones of the buffered uwr
+    grid: ZoneGrid of dem and zones. Made if not given
+    mask: Optional MinElevMask of the minElevViewshed layer (see flightPathAnalysis_Masking)
+    horizons: Optional {unique uwr id: HorizonTable} (see flightPathAnalysis_Horizon)
+    inputs: Fingerprints of the inputs the layers were read from, checked by bundleIsCurrent()
+
+    Purpose: Packs layers already in memory into a bundle file
+    """
+    if grid is None:
+        grid = flightPathAnalysis_Geometry.ZoneGrid(dem, zones)
+    header = {
+        "bundleVersion": bundleVersion,
+        "built": str(datetime.datetime.now()),
+        "inputs": inputs or {},
+        "dem": [float(dem.xMin), float(dem.yMax), float(dem.cellSize)],
+        "zones": {"unitNo": zones.unitNo, "unitNoId": zones.unitNoId, "uwrKeys": zones.uwrKeys},
+        "windows": [list(window) if window is not None else None for window in grid.windows],
+    }
+    arrays = {"dem": dem.array, "zones_buffDist": zones.buffDist, "zones_zoneUWR": zones.zoneUWR}
+    arrays.update({"zones_" + name: getattr(zones, name) for name in polygonArrays})
+    arrays.update({"grid_" + name: getattr(grid, name) for name in gridArrays})
+    if mask is not None:
+        header["mask"] = {"uwrIDs": mask.uwrIDs}
+        arrays["mask_gridcode"] = mask.gridcode
+        arrays.update({"mask_" + name: getattr(mask, name) for name in polygonArrays})
+    if horizons is not None:
+        header["horizons"] = sorted(horizons)
+        for n, uwr in enumerate(header["horizons"]):
+            h = horizons[uwr]
+            arrays["horizon%d_observers" % n] = np.stack([h.observerX, h.observerY, h.observerZ])
+            arrays["horizon%d_slopes" % n] = h.slopes
+            arrays["horizon%d_edges" % n] = h.edges
+    writeBundle(bundlePath, header, arrays)
+
+def bundleInputs(DEM, uwrBuffered, unit_no, unit_no_id, minElevViewshed=None, horizonPath=None):
+    #fingerprints of the inputs of a bundle. See flightPathAnalysis_Pipeline.fingerprintDataset()
+    inputs = {"DEM": flightPathAnalysis_Pipeline.fingerprintDataset(DEM),
+              "uwrBuffered": flightPathAnalysis_Pipeline.fingerprintDataset(uwrBuffered),
+              "fields": [unit_no, unit_no_id]}
+    if minElevViewshed is not None:
+        inputs["minElevViewshed"] = flightPathAnalysis_Pipeline.fingerprintDataset(minElevViewshed)
+    if horizonPath is not None:
+        inputs["horizonPath"] = flightPathAnalysis_Pipeline.fingerprintPath(horizonPath)
+    return inputs
+
+def buildBundle(bundlePath, DEM, uwrBuffered, unit_no, unit_no_id, minElevViewshed=None, uwr_unique_Field=None, horizonPath=None):
+    """
+    (string, string, string, string, string, optional: string, string, string) -> None
+
+    Inputs:
+    bundlePath: Full path to the bundle file
+    DEM: Full path to raster DEM
+    uwrBuffered: Full path to feature class of buffered uwr. output of flightPathAnalysis_Functions.createUWRBuffer()
+    unit_no: field for unit number (eg. u-2-002)
+    unit_no_id: field for unit number id (eg. TO 32)
+    minElevViewshed: Optional min Elevation viewshed layer made by makeViewshed(). Its polygons are packed for the terrain masking
+    uwr_unique_Field: field for unique uwr id that combines unit_no and unit_no_id. Needed with minElevViewshed
+    horizonPath: Optional npz file of horizon tables made by flightPathAnalysis_Horizon.buildHorizons()
+
+    Output: bundle file (see the top of the module)
+
+    Purpose: Reads the buffered uwr, the DEM window under them and the masking layers, makes the zone label raster and packs
+    them into a bundle file for the workers
+    """
+    starttime = datetime.datetime.now()
+    inputs = bundleInputs(DEM, uwrBuffered, unit_no, unit_no_id, minElevViewshed, horizonPath)
+    zones = flightPathAnalysis_Geometry.loadUWRZones(uwrBuffered, unit_no, unit_no_id)
+    dem = flightPathAnalysis_Geometry.loadDEM(DEM, zones.extent)
+    mask = None
+    if minElevViewshed is not None:
+        mask = flightPathAnalysis_Masking.loadMinElevMask(minElevViewshed, uwr_unique_Field)
+    horizons = None
+    if horizonPath is not None:
+        horizons = flightPathAnalysis_Horizon.loadHorizons(horizonPath)
+    packBundle(bundlePath, dem, zones, mask=mask, horizons=horizons, inputs=inputs)
+    print("bundle of", len(zones.uwrKeys), "uwr written to", bundlePath, "(" + str(round(os.path.getsize(bundlePath)/1e6, 1)) + " MB)")
+    print("Runtime to build the analysis bundle: ", datetime.datetime.now() - starttime)
+
+def bundleIsCurrent(bundlePath, DEM, uwrBuffered, unit_no, unit_no_id, minElevViewshed=None, horizonPath=None):
+    """
+    (string, string, string, string, string, optional: string, string) -> boolean
+
+    Purpose: True if the bundle file exists, is of this version and was built from the inputs as they are now.
+    minElevViewshed and horizonPath are only checked when given
+    """
+    if not os.path.exists(bundlePath):
+        return False
+    try:
+        built = readBundleHeader(bundlePath)["inputs"]
+    except ValueError as e:
+        print(e)
+        return False
+    inputs = bundleInputs(DEM, uwrBuffered, unit_no, unit_no_id, minElevViewshed, horizonPath)
+    return all(built.get(key) == value for key, value in inputs.items())
+
+
+def restoreObject(cls, attributes):
+    #object of cls made from attributes already built, without running __init__ (which would remake them)
+    obj = cls.__new__(cls)
+    obj.__dict__.update(attributes)
+    return obj
+
+class AnalysisBundle:
+    """
+    Purpose:
+    Layers of a bundle file. The arrays are read-only views of one memory map of the file:
+    dem (DEMGrid), zones (UWRZones), grid (ZoneGrid), mask (MinElevMask or None), horizons ({unique uwr id: HorizonTable} or None)
+
+    Inputs:
+    bundlePath: Full path to the bundle file
+    """
+
+    def __init__(self, bundlePath):
+        self.path = bundlePath
+        self.header = readBundleHeader(bundlePath)
+        data = np.memmap(bundlePath, dtype="uint8", mode="r")
+        arrays = {}
+        for name, (offset, dtype, shape) in self.header["arrays"].items():
+            dtype = np.dtype(dtype)
+            start = self.header["dataStart"] + offset
+            arrays[name] = data[start:start + int(np.prod(shape, dtype="int64"))*dtype.itemsize].view(dtype).reshape(shape)
+
+        xMin, yMax, cellSize = self.header["dem"]
+        self.dem = flightPathAnalysis_Geometry.DEMGrid(arrays["dem"], xMin, yMax, cellSize)
+        zoneHeader = self.header["zones"]
+        zoneAttributes = {name: arrays["zones_" + name] for name in polygonArrays}
+        zoneAttributes.update(unitNo=zoneHeader["unitNo"], unitNoId=zoneHeader["unitNoId"], uwrKeys=[tuple(key) for key in zoneHeader["uwrKeys"]],
+                              buffDist=arrays["zones_buffDist"], zoneUWR=arrays["zones_zoneUWR"])
+        self.zones = restoreObject(flightPathAnalysis_Geometry.UWRZones, zoneAttributes)
+        gridAttributes = {name: arrays["grid_" + name] for name in gridArrays}
+        gridAttributes.update(dem=self.dem, zones=self.zones, edgeX1=self.zones.xs, edgeY1=self.zones.ys,
+                              windows=[tuple(window) if window is not None else None for window in self.header["windows"]])
+        self.grid = restoreObject(flightPathAnalysis_Geometry.ZoneGrid, gridAttributes)
+
+        self.mask = None
+        if "mask" in self.header:
+            maskAttributes = {name: arrays["mask_" + name] for name in polygonArrays}
+            maskAttributes.update(uwrIDs=self.header["mask"]["uwrIDs"], gridcode=arrays["mask_gridcode"], uwrPolygons={})
+            for i, uwr in enumerate(maskAttributes["uwrIDs"]):
+                maskAttributes["uwrPolygons"].setdefault(uwr, []).append(i)
+            self.mask = restoreObject(flightPathAnalysis_Masking.MinElevMask, maskAttributes)
+
+        self.horizons = None
+        if "horizons" in self.header:
+            self.horizons = {}
+            for n, uwr in enumerate(self.header["horizons"]):
+                observers = arrays["horizon%d_observers" % n]
+                self.horizons[uwr] = flightPathAnalysis_Horizon.HorizonTable(uwr, observers[0], observers[1], observers[2], arrays["horizon%d_slopes" % n],
+                                                                             arrays["horizon%d_edges" % n])
+
+def openBundle(bundlePath):
+    """
+    (string) -> AnalysisBundle
+
+    Purpose: Opens a bundle file made by buildBundle() or packBundle(). Nothing is copied: the arrays are read from the file
+    by the OS as they are used, and shared with the other processes that opened the same file
+    """
+    return AnalysisBundle(bundlePath)
+
+
+def main():
+    #raster DEM input
+    DEM = r"W:\srm\sry\Local\projlib\StewBase\Mountain_Goat\FlightLine_UWR_Analysis\test_May15\Input.gdb\bc_elevation_25m_bcalb_Clip2"
+    #feature class of buffered uwr. output of flightPathAnalysis_Functions.createUWRBuffer()
+    uwrBuffered = r"W:\srm\sry\Local\projlib\StewBase\Mountain_Goat\FlightLine_UWR_Analysis\testAllSkeena\testInputAll.gdb\tuwra_u6002_BufferFinal"
+    #agl viewshed feature class
+    minElevViewshed = r"W:\srm\sry\Local\projlib\StewBase\Mountain_Goat\FlightLine_UWR_Analysis\20200915\Output_20200915.gdb\minElevViewshed20200515"
+    #bundle file for the workers
+    bundlePath = r"W:\srm\sry\Local\projlib\StewBase\Mountain_Goat\FlightLine_UWR_Analysis\20200915\analysisBundle.uwrb"
+
+    if not bundleIsCurrent(bundlePath, DEM, uwrBuffered, "TUWR_TAG", "UNIT_NO", minElevViewshed):
+        buildBundle(bundlePath, DEM, uwrBuffered, "TUWR_TAG", "UNIT_NO", minElevViewshed, "uwr_unique_id")
+
+if __name__ == "__main__":
+    main()
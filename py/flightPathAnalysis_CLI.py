@@ -0,0 +1,231 @@
+### command line entry point used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# Runs are described by json config files (see flightPathAnalysis_Config) instead of editing main(). arcpy and the
+# analysis modules are only imported by the commands that need them, so the light commands (init, check, status) start
+# without loading arcpy. --timing prints the startup time (loading this module to the start of the command) and the
+# command time.
+#
+# Usage:
+#   python flightPathAnalysis_CLI.py init <config.json>               write a config with every key and its default
+#   python flightPathAnalysis_CLI.py check <config.json>              check the config and the inputs on disk
+#   python flightPathAnalysis_CLI.py status <config.json>             state of each checkpointed stage
+#   python flightPathAnalysis_CLI.py run <config.json> [--force stage ...]
+#   python flightPathAnalysis_CLI.py stats <config.json>              remake the stats tables of the point outputs
+#   python flightPathAnalysis_CLI.py bundle <config.json> [--force]    build the analysis bundle if it is out of date
+#   python flightPathAnalysis_CLI.py serve <config.json> [--port 8765]
+#   python flightPathAnalysis_CLI.py watch <config.json>
+#   python flightPathAnalysis_CLI.py shard-worker <shardFolder>
+# Function: main - parses the arguments and runs the command. Returns the exit code
+# update: Oct. 19, 2026 - added the bundle command. serve and watch open the layers from the analysis bundle of the config
+# when it is set (see flightPathAnalysis_Bundle)
+# update: Oct. 19, 2026 - serve and watch only open the analysis bundle when it is current (same inputs and masking layer
+# as the bundle command packs), otherwise the layers are read
+
+import time
+startTime = time.perf_counter()
+
+import argparse
+import os
+import sys
+
+import flightPathAnalysis_Config
+
+
+def commandInit(args):
+    if os.path.exists(args.config) and not args.overwrite:
+        print(args.config, "already exists. Use --overwrite to replace it")
+        return 1
+    flightPathAnalysis_Config.writeConfigTemplate(args.config)
+    print("Config template written to", args.config, ". Fill in the required paths (null)")
+    return 0
+
+def commandCheck(args):
+    config = flightPathAnalysis_Config.loadConfig(args.config)
+    problems = flightPathAnalysis_Config.checkConfig(config, checkPaths=not args.noPaths)
+    for problem in problems:
+        print("problem:", problem)
+    if problems:
+        return 1
+    print(args.config, "is ok")
+    return 0
+
+def commandStatus(args):
+    import flightPathAnalysis_Pipeline
+
+    config = flightPathAnalysis_Config.loadConfig(args.config)
+    #checkpointFolder is generalFolder\checkpoints when only generalFolder is set (see flightPathAnalysis_Config.loadConfig())
+    if config["checkpointFolder"] is None:
+        print("problem: no checkpointFolder or generalFolder in", args.config)
+        return 1
+    manifest = flightPathAnalysis_Pipeline.readJSON(os.path.join(config["checkpointFolder"], "manifest.json"), {})
+    if not manifest:
+        print("no stage has run yet with checkpoints in", config["checkpointFolder"])
+    for name, record in manifest.items():
+        print(name.ljust(20), record.get("status", "").ljust(8), record.get("start", ""), record.get("end", record.get("error", "")))
+    return 0
+
+def commandRun(args):
+    config = loadCheckedConfig(args.config)
+    if config is None:
+        return 1
+    import flightPathAnalysis_uwr
+
+    flightPathAnalysis_uwr.runAnalysis(config, args.force)
+    return 0
+
+def commandStats(args):
+    config = loadCheckedConfig(args.config)
+    if config is None:
+        return 1
+    import flightPathAnalysis_uwr
+
+    flightPathAnalysis_uwr.pointStatistics(os.path.join(config["outputGDB"], config["allFlightPoint"]), os.path.join(config["outputGDB"], config["allPointsStats_Name"]),
+                                           os.path.join(config["generalFolder"], config["allPointsStats_Name"]) + ".xlsx", config["unit_no"], config["unit_no_id"])
+    flightPathAnalysis_uwr.pointStatistics(os.path.join(config["LOS_uwrFlightPointsGDB"], config["LOS_uwrFlightPoints"]),
+                                           os.path.join(config["outputGDB"], config["finalPointsStats_Name"]),
+                                           os.path.join(config["generalFolder"], config["finalPointsStats_Name"]) + ".xlsx", config["unit_no"], config["unit_no_id"])
+    return 0
+
+def commandBundle(args):
+    config = loadCheckedConfig(args.config)
+    if config is None:
+        return 1
+    if config["analysisBundle"] is None:
+        print("problem: no analysisBundle in", args.config)
+        return 1
+    import flightPathAnalysis_Bundle
+
+    minElevViewshed = bundleMaskingLayer(config)
+    if not args.force and flightPathAnalysis_Bundle.bundleIsCurrent(config["analysisBundle"], config["DEM"], config["uwrBuffered"], config["unit_no"],
+                                                                    config["unit_no_id"], minElevViewshed):
+        print(config["analysisBundle"], "is up to date")
+        return 0
+    flightPathAnalysis_Bundle.buildBundle(config["analysisBundle"], config["DEM"], config["uwrBuffered"], config["unit_no"], config["unit_no_id"],
+                                          minElevViewshed, config["uwr_unique_Field"])
+    return 0
+
+def bundleMaskingLayer(config):
+    #masking layer packed in the analysis bundle. The lazy viewsheds stay in their cache folder, so none is packed with them
+    return None if config["lazyViewshed"] else config["minElevViewshed"]
+
+def analysisService(config):
+    import flightPathAnalysis_Bundle
+    import flightPathAnalysis_Service
+
+    bundlePath = config["analysisBundle"]
+    if bundlePath is not None and not flightPathAnalysis_Bundle.bundleIsCurrent(bundlePath, config["DEM"], config["uwrBuffered"], config["unit_no"],
+                                                                                config["unit_no_id"], bundleMaskingLayer(config)):
+        print("analysis bundle", bundlePath, "does not exist or is out of date, the layers are read instead. Build it with the bundle command")
+        bundlePath = None
+    return flightPathAnalysis_Service.AnalysisService(config["DEM"], config["uwrBuffered"], config["minElevViewshed"], config["unit_no"], config["unit_no_id"],
+                                                      config["uwr_unique_Field"], config["IncursionSeverity"],
+                                                      lazyViewshedFolder=os.path.join(config["generalFolder"], "lazyViewshed") if config["lazyViewshed"] else None,
+                                                      viewshedPyramid=config["viewshedPyramid"], bundlePath=bundlePath)
+
+def commandServe(args):
+    config = loadCheckedConfig(args.config)
+    if config is None:
+        return 1
+    import flightPathAnalysis_Service
+
+    flightPathAnalysis_Service.serve(analysisService(config), port=args.port)
+    return 0
+
+def commandWatch(args):
+    config = loadCheckedConfig(args.config)
+    if config is None:
+        return 1
+    import flightPathAnalysis_Watch
+
+    watcher = flightPathAnalysis_Watch.FolderWatcher(config["gpxFolder"], analysisService(config), config["outputGDB"], config["allFlightPoint"],
+                                                     config["LOS_uwrFlightPoints"], config["allPointsStats_Name"], config["finalPointsStats_Name"],
+                                                     os.path.join(config["generalFolder"], "watchState.json"),
+                                                     allPointsStats_Excel=os.path.join(config["generalFolder"], config["allPointsStats_Name"]) + ".xlsx",
+                                                     finalPointsStats_Excel=os.path.join(config["generalFolder"], config["finalPointsStats_Name"]) + ".xlsx",
+                                                     LOS_uwrFlightPointsGDB=config["LOS_uwrFlightPointsGDB"])
+    watcher.watch()
+    return 0
+
+def commandShardWorker(args):
+    import flightPathAnalysis_Sharding
+
+    flightPathAnalysis_Sharding.runShardWorker(args.shardFolder)
+    return 0
+
+def loadCheckedConfig(configPath):
+    #config of a file, or None after printing its problems
+    config = flightPathAnalysis_Config.loadConfig(configPath)
+    problems = flightPathAnalysis_Config.checkConfig(config, checkPaths=False)
+    for problem in problems:
+        print("problem:", problem)
+    return None if problems else config
+
+def argumentParser():
+    parser = argparse.ArgumentParser(prog="flightPathAnalysis_CLI", description="Flight path analysis on ungulate winter ranges")
+    parser.add_argument("--timing", action="store_true", help="print the startup and command times")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("init", help="write a config template")
+    command.add_argument("config")
+    command.add_argument("--overwrite", action="store_true")
+    command.set_defaults(func=commandInit)
+
+    command = commands.add_parser("check", help="check a config and its inputs")
+    command.add_argument("config")
+    command.add_argument("--noPaths", action="store_true", help="don't check the inputs on disk")
+    command.set_defaults(func=commandCheck)
+
+    command = commands.add_parser("status", help="state of the checkpointed stages")
+    command.add_argument("config")
+    command.set_defaults(func=commandStatus)
+
+    command = commands.add_parser("run", help="run the analysis, resuming from the first stale stage")
+    command.add_argument("config")
+    command.add_argument("--force", nargs="*", default=None, help="stages to run even if up to date")
+    command.set_defaults(func=commandRun)
+
+    command = commands.add_parser("stats", help="remake the stats tables of the point outputs")
+    command.add_argument("config")
+    command.set_defaults(func=commandStats)
+
+    command = commands.add_parser("bundle", help="build the analysis bundle (see flightPathAnalysis_Bundle)")
+    command.add_argument("config")
+    command.add_argument("--force", action="store_true", help="rebuild even if up to date")
+    command.set_defaults(func=commandBundle)
+
+    command = commands.add_parser("serve", help="start the analysis service (see flightPathAnalysis_Service)")
+    command.add_argument("config")
+    command.add_argument("--port", type=int, default=8765)
+    command.set_defaults(func=commandServe)
+
+    command = commands.add_parser("watch", help="watch gpxFolder for new flights (see flightPathAnalysis_Watch)")
+    command.add_argument("config")
+    command.set_defaults(func=commandWatch)
+
+    command = commands.add_parser("shard-worker", help="work on the shards of a sharded run (see flightPathAnalysis_Sharding)")
+    command.add_argument("shardFolder")
+    command.set_defaults(func=commandShardWorker)
+    return parser
+
+def main(argv=None):
+    """
+    (optional: list) -> int
+
+    Inputs:
+    argv: Arguments without the program name. sys.argv[1:] if not given
+
+    Output: exit code
+
+    Purpose: Parses the arguments and runs the command
+    """
+    args = argumentParser().parse_args(argv)
+    if args.timing:
+        print("startup time:", round(time.perf_counter() - startTime, 3), "s")
+    commandStart = time.perf_counter()
+    code = args.func(args)
+    if args.timing:
+        print("command time:", round(time.perf_counter() - commandStart, 3), "s")
+    return code
+
+if __name__ == "__main__":
+    sys.exit(main())
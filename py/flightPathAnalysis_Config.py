@@ -0,0 +1,180 @@
+### run configuration files used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# A run of flightPathAnalysis_uwr is described by a json file instead of editing main(). The keys are the variable names
+# of flightPathAnalysis_uwr.main(). Keys left out take the defaults below, keys starting with "_" are comments, and paths
+# that aren't absolute are relative to the folder of the config file. Only the standard library is imported so the
+# light commands of flightPathAnalysis_CLI start fast.
+#
+# Example:
+#   {"gpxFolder": "gpx", "DEM": "Input.gdb/bc_elevation_25m_bcalb", "origUWRGDB": "Input.gdb", "origUWRName": "tuwra",
+#    "outputGDB": "Output.gdb", "uwrBuffered": "Input.gdb/tuwra_BufferFinal", "generalFolder": ".",
+#    "viewshed": "Output.gdb/viewshed", "minElevViewshed": "Output.gdb/minElevViewshed"}
+# Function: defaultConfig - config with the defaults and None for the required paths
+# Function: loadConfig - config of a json file, merged with the defaults
+# Function: checkConfig - list of the problems of a config, without opening any dataset
+# Function: writeConfigTemplate - json file with every key, its default and its description
+# update: Oct. 19, 2026 - added analysisBundle (see flightPathAnalysis_Bundle)
+
+import json
+import os
+
+
+#(key, default, description). The required paths have no default (None)
+configSettings = [
+    ("gpxFolder", None, "folder with the flight logs input (gpx, kml, igc or csv), or a tar, tar.gz or zip archive of them"),
+    ("DEM", None, "raster DEM input"),
+    ("origUWRGDB", None, "gdb containing original ungulate winter range layer"),
+    ("origUWRName", None, "name of original ungulate winter range layer"),
+    ("unit_no", "TUWR_TAG", "unit number field eg. u-2-002"),
+    ("unit_no_id", "UNIT_NO", "unit number id field eg. TO 60"),
+    ("uwr_unique_Field", "uwr_unique_id", "uwr unique id field - field that combines uwr number and uwr unit number"),
+    ("bufferDistList", [500, 1000, 1500], "list of buffer distances (in meters)"),
+    ("outputGDB", None, "GDB to put all the output feature classes"),
+    ("uwrBuffered", None, "feature class of buffered uwr. output of flightPathAnalysis_Functions.createUWRBuffer()"),
+    ("IncursionSeverity", {0: "In UWR", 500: "High", 1000: "Moderate", 1500: "Low"}, "buffer distance and incursion severity category"),
+    ("generalFolder", None, "folder to put excel/text files for error handling documents or stats"),
+    ("viewshed", None, "viewshed feature class"),
+    ("minElevViewshed", None, "agl viewshed feature class"),
+    ("ViewshedPointCount", "ViewshedPointCount", "count of points in direct viewshed excel file"),
+    ("outputFlightLineName", "FlightLine", "name of feature class for the output flight line"),
+    ("flightLineSegments", False, "make the flight lines one feature per segment with its start time, duration and AGL"),
+    ("allFlightPoint", "allFlightPoint", "name of feature class for the output flight points (before terrain masking)"),
+    ("maxRange", 1500, "max buffer range. See IncursionSeverity"),
+    ("allPointsStats_Name", "PointsGeneralStat_Stats", "stats for the output flight points (before terrain masking)"),
+    ("LOS_uwrFlightPoints", "FlightPoint_TerrainMasked", "name of feature class for the output final flight points (after terrain masking)"),
+    ("LOS_uwrFlightPointsGDB", None, "gdb for the output final flight points (after terrain masking). outputGDB if not given"),
+    ("finalPointsStats_Name", "PointsGeneralStat_TerrainMasked_Stats", "stats for final ouput flight points (after terrain masking)"),
+    ("streaming", False, "read, classify and write the flight points in chunks (see flightPathAnalysis_Streaming)"),
+    ("shardCount", 0, "number of spatial shards of uwr (0 = not sharded)"),
+    ("shardProcesses", 2, "number of local worker processes in sharded mode"),
+    ("sweepScenarios", [], "threshold sets to compare (see flightPathAnalysis_Sweep). Empty list = no sweep"),
+    ("sweepMaxDistance", 3000, "distance from the uwr the flights are measured to for the sweep"),
+    ("lazyViewshed", False, "terrain mask with lazy viewsheds (see flightPathAnalysis_LazyViewshed)"),
+    ("viewshedPyramid", False, "compute the lazy viewsheds coarse to fine on a DEM pyramid (see flightPathAnalysis_Pyramid). Needs numba"),
+    ("viewshedCacheMB", 2048, "viewshed cache size limit in MB (null = no cache)"),
+    ("outOfCoreBudgetMB", 0, "out-of-core mode memory budget in MB (0 = off)"),
+    ("arrowFolder", None, "folder for the Arrow IPC files of the results for R and the Shiny app (null = not written)"),
+    ("resultsStoreFolder", None, "results store of all seasons the run is added to (null = not used). Needs arrowFolder"),
+    ("resultsSeason", None, "season label of the run in the results store (null = winter season of the flight dates)"),
+    ("analysisBundle", None, "prebuilt analysis bundle file of the uwr zones, DEM window, zone grid and minElevViewshed for fast worker start-up (null = not used)"),
+    ("checkpointFolder", None, "folder to keep the checkpoints of each stage. generalFolder\\checkpoints if not given"),
+]
+
+#keys of the paths resolved against the folder of the config file
+pathKeys = ["gpxFolder", "DEM", "origUWRGDB", "outputGDB", "uwrBuffered", "generalFolder", "viewshed", "minElevViewshed",
+            "LOS_uwrFlightPointsGDB", "arrowFolder", "resultsStoreFolder", "analysisBundle", "checkpointFolder"]
+
+#keys that have no default and must be in the config file
+requiredKeys = [key for key, default, description in configSettings if default is None and key not in ("LOS_uwrFlightPointsGDB", "arrowFolder", "resultsStoreFolder", "resultsSeason", "analysisBundle", "checkpointFolder")]
+
+
+def defaultConfig():
+    """
+    () -> dictionary
+
+    Purpose: Config with the defaults of every key. The required paths are None
+    """
+    return json.loads(json.dumps({key: default for key, default, description in configSettings}), object_hook=severityKeys)
+
+def severityKeys(obj):
+    #json keys are strings. The IncursionSeverity dictionaries are keyed by buffer distance
+    if "IncursionSeverity" in obj and isinstance(obj["IncursionSeverity"], dict):
+        obj["IncursionSeverity"] = {int(float(k)) if float(k).is_integer() else float(k): v for k, v in obj["IncursionSeverity"].items()}
+    return obj
+
+def loadConfig(configPath):
+    """
+    (string) -> dictionary
+
+    Inputs:
+    configPath: Full path to json config file
+
+    Output: config with every key of configSettings, and configPath
+
+    Purpose: Reads a config file, fills the keys left out with the defaults and resolves the relative paths
+    """
+    with open(configPath) as f:
+        values = json.load(f, object_hook=severityKeys)
+    config = defaultConfig()
+    config["unknownKeys"] = sorted(key for key in values if not key.startswith("_") and key not in config)
+    config.update({key: value for key, value in values.items() if not key.startswith("_")})
+
+    folder = os.path.dirname(os.path.abspath(configPath))
+    for key in pathKeys:
+        if isinstance(config.get(key), str) and not os.path.isabs(config[key]) and not config[key].startswith("\\\\"):
+            config[key] = os.path.normpath(os.path.join(folder, config[key]))
+    if config["LOS_uwrFlightPointsGDB"] is None:
+        config["LOS_uwrFlightPointsGDB"] = config["outputGDB"]
+    if config["checkpointFolder"] is None and config["generalFolder"] is not None:
+        config["checkpointFolder"] = os.path.join(config["generalFolder"], "checkpoints")
+    config["configPath"] = os.path.abspath(configPath)
+    return config
+
+def gdbFolder(path):
+    #the .gdb folder of a gdb dataset path, or the path itself
+    parts = os.path.normpath(path).split(os.sep)
+    for i, part in enumerate(parts):
+        if part.lower().endswith(".gdb"):
+            return os.sep.join(parts[:i + 1])
+    return path
+
+def checkConfig(config, checkPaths=True):
+    """
+    (dictionary, optional: boolean) -> list
+
+    Inputs:
+    config: config of loadConfig()
+    checkPaths: Check that the input files and folders exist (gdb datasets are checked at the .gdb folder)
+
+    Output: List of problems. Empty if the config is fine
+
+    Purpose: Checks a config before a run: required keys, buffer distances against IncursionSeverity and maxRange, and
+    the inputs on disk. No dataset is opened.
+    """
+    problems = ["unknown key " + key for key in config.get("unknownKeys", [])]
+    problems += ["missing required key " + key for key in requiredKeys if config.get(key) is None]
+
+    bufferDistList = config["bufferDistList"]
+    severity = config["IncursionSeverity"]
+    if sorted(bufferDistList) != sorted(set(bufferDistList)) or any(d <= 0 for d in bufferDistList):
+        problems.append("bufferDistList must be distinct distances greater than 0: " + str(bufferDistList))
+    if 0 not in severity:
+        problems.append("IncursionSeverity has no category for 0 (in uwr)")
+    missing = sorted(set(bufferDistList) - set(severity))
+    if missing:
+        problems.append("buffer distances without an IncursionSeverity category: " + str(missing))
+    extra = sorted(set(severity) - set(bufferDistList) - {0})
+    if extra:
+        problems.append("IncursionSeverity categories without a buffer distance: " + str(extra))
+    if bufferDistList and config["maxRange"] != max(bufferDistList):
+        problems.append("maxRange " + str(config["maxRange"]) + " is not the biggest buffer distance " + str(max(bufferDistList)))
+    for scenario in config["sweepScenarios"]:
+        if "name" not in scenario or "IncursionSeverity" not in scenario:
+            problems.append("sweep scenario needs a name and an IncursionSeverity: " + str(scenario))
+        elif max(scenario["IncursionSeverity"]) > config["sweepMaxDistance"]:
+            problems.append("sweep scenario " + scenario["name"] + " goes past sweepMaxDistance")
+    if config["resultsStoreFolder"] is not None and config["arrowFolder"] is None:
+        problems.append("resultsStoreFolder needs arrowFolder")
+    if config["viewshedPyramid"] and not config["lazyViewshed"]:
+        problems.append("viewshedPyramid needs lazyViewshed")
+
+    if checkPaths:
+        for key in ["gpxFolder", "DEM", "origUWRGDB"]:
+            if config.get(key) is not None and not os.path.exists(gdbFolder(config[key])):
+                problems.append(key + " does not exist: " + config[key])
+        for key in ["outputGDB", "generalFolder"]:
+            if config.get(key) is not None and not os.path.exists(os.path.dirname(gdbFolder(config[key])) or "."):
+                problems.append("folder of " + key + " does not exist: " + config[key])
+    return problems
+
+def writeConfigTemplate(configPath):
+    """
+    (string) -> None
+
+    Purpose: Writes a config file with every key and its default. The required paths are null and the description of
+    each key is under "_help"
+    """
+    values = {"_help": {key: description for key, default, description in configSettings}}
+    values.update({key: default for key, default, description in configSettings})
+    with open(configPath, "w") as f:
+        json.dump(values, f, indent=2)
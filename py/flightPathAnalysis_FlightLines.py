@@ -0,0 +1,225 @@
+### flight lines built from point arrays used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# getFlightLinePoints() made a feature class per flight with PointsToLine_management, merged them and projected the
+# merged lines. The lines are now built from the track coordinate arrays the way polylines are kept in CSR form: the
+# points of all flights in one projected x, y array and an offsets array where flight i is points
+# offsets[i]:offsets[i+1]. The WKB of every line is made with numpy and all lines are written already projected
+# (BC albers) with one insert cursor.
+# Lines can also be split into one feature per segment (two consecutive points) with the segment start time, duration
+# and AGL (mean of the AGL of its two points, needs a DEM).
+# Class: FlightLines - CSR flight lines and their WKB
+# Function: buildFlightLines - FlightLines of a list of tracks (flightPathAnalysis_Tracks.readGPX())
+# Function: writeFlightLines - writes FlightLines into a gdb feature class in one pass
+# Function: getFlightLines - flight line feature class of a gpx folder or archive
+# update: Oct. 19, 2026 - the AGL of the points is sampled one DEM tile at a time instead of reading one DEM window over all
+# the flights
+# update: Oct. 19, 2026 - writeFlightLines can append to the feature class, so the lines are written a chunk of flights at a time
+
+import datetime
+import os
+import numpy as np
+
+import flightPathAnalysis_Geometry
+import flightPathAnalysis_Tracks
+
+
+class FlightLines:
+    """
+    Purpose: Flight lines of a season as flat arrays.
+
+    Inputs:
+    x, y: BC albers coordinates of the points of all flights, flight after flight
+    offsets: int64 array of len(names) + 1. The points of flight i are offsets[i]:offsets[i+1]
+    names: List of flight names
+    time: datetime64[ms] array of the time of each point
+    elevation: float array of the gps elevation of each point
+    agl: Optional float array of the AGL of each point (nan where the DEM has no value). See sampleAGL()
+    """
+
+    def __init__(self, x, y, offsets, names, time, elevation, agl=None):
+        self.x = x
+        self.y = y
+        self.offsets = offsets
+        self.names = list(names)
+        self.time = time
+        self.elevation = elevation
+        self.agl = agl
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def extent(self):
+        return (float(self.x.min()), float(self.y.min()), float(self.x.max()), float(self.y.max()))
+
+    def sampleAGL(self, dem):
+        #AGL of the points like getFlightLinePoints(): gps elevation - DEM, 0 if lower than the DEM. dem is a DEMGrid, or the
+        #path of a raster DEM read one tile at a time (flightPathAnalysis_Geometry.sampleDEM())
+        if isinstance(dem, str):
+            demElev = flightPathAnalysis_Geometry.sampleDEM(dem, self.x, self.y)
+        else:
+            demElev = dem.sample(self.x, self.y)
+        self.agl = np.maximum(self.elevation - demElev, 0)
+
+    def pointFlight(self):
+        #flight index of each point
+        return np.repeat(np.arange(len(self.names)), np.diff(self.offsets))
+
+    def segmentStarts(self):
+        #index of the first point of each segment: every point except the last point of each flight
+        return np.delete(np.arange(len(self.x)), self.offsets[1:] - 1)
+
+    def lineWKB(self):
+        """
+        Purpose: Little endian WKB linestring of each flight. All lines are packed into one buffer with numpy, the
+        only loop over flights cuts the buffer.
+        """
+        counts = np.diff(self.offsets)
+        sizes = 9 + 16*counts
+        ends = np.cumsum(sizes)
+        starts = ends - sizes
+        headers = np.zeros(len(counts), dtype=[("byteOrder", "u1"), ("type", "<u4"), ("count", "<u4")])
+        headers["byteOrder"] = 1
+        headers["type"] = 2
+        headers["count"] = counts
+        isHeader = np.zeros(int(ends[-1]) if len(ends) else 0, dtype=bool)
+        isHeader[(starts[:, None] + np.arange(9)).reshape(-1)] = True
+        packed = np.empty(len(isHeader), dtype="u1")
+        packed[isHeader] = np.frombuffer(headers.tobytes(), dtype="u1")
+        packed[~isHeader] = np.frombuffer(np.column_stack([self.x, self.y]).astype("<f8").tobytes(), dtype="u1")
+        data = packed.tobytes()
+        return [data[s:e] for s, e in zip(starts.tolist(), ends.tolist())]
+
+    def segmentWKB(self, starts=None):
+        #little endian WKB linestring of each segment (2 points, 41 bytes)
+        if starts is None:
+            starts = self.segmentStarts()
+        segments = np.zeros(len(starts), dtype=[("byteOrder", "u1"), ("type", "<u4"), ("count", "<u4"),
+                                                 ("x0", "<f8"), ("y0", "<f8"), ("x1", "<f8"), ("y1", "<f8")])
+        segments["byteOrder"] = 1
+        segments["type"] = 2
+        segments["count"] = 2
+        segments["x0"] = self.x[starts]
+        segments["y0"] = self.y[starts]
+        segments["x1"] = self.x[starts + 1]
+        segments["y1"] = self.y[starts + 1]
+        data = segments.tobytes()
+        size = segments.dtype.itemsize
+        return [data[i*size:(i+1)*size] for i in range(len(starts))]
+
+    def segmentAttributes(self, starts=None):
+        """
+        Purpose: Flight index, start time, duration (seconds) and AGL (mean of the two points, nan without AGL) of each
+        segment.
+        """
+        if starts is None:
+            starts = self.segmentStarts()
+        duration = (self.time[starts + 1] - self.time[starts]).astype("timedelta64[ms]").astype("float64")/1000
+        agl = (self.agl[starts] + self.agl[starts + 1])/2 if self.agl is not None else np.full(len(starts), np.nan)
+        return {"flight": self.pointFlight()[starts], "StartTime": self.time[starts], "Duration": duration, "AGL": agl}
+
+
+def buildFlightLines(tracks, dem=None):
+    """
+    (list, optional: DEMGrid) -> FlightLines, list
+
+    Inputs:
+    tracks: List of flight tracks. See flightPathAnalysis_Tracks.readGPX()
+    dem: Optional DEMGrid covering the tracks, to get the AGL of the points (for the segment AGL)
+
+    Output: FlightLines of the tracks with 2 points or more, and the names of the other tracks (like getFlightLinePoints(),
+    no line is made for them)
+
+    Purpose: Concatenates the track coordinates, projects them in one call and makes the offsets of each flight.
+    """
+    problemFlights = [track["name"] for track in tracks if len(track["lon"]) < 2]
+    tracks = [track for track in tracks if len(track["lon"]) >= 2]
+    offsets = np.zeros(len(tracks) + 1, dtype="int64")
+    offsets[1:] = np.cumsum([len(track["lon"]) for track in tracks])
+    if not tracks:
+        empty = np.zeros(0)
+        return FlightLines(empty, empty, offsets, [], np.zeros(0, dtype="datetime64[ms]"), empty), problemFlights
+
+    x, y = flightPathAnalysis_Geometry.projectToBCAlbers(np.concatenate([track["lon"] for track in tracks]),
+                                                        np.concatenate([track["lat"] for track in tracks]))
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    lines = FlightLines(x, y, offsets, [track["name"] for track in tracks], np.concatenate([track["time"] for track in tracks]),
+                        np.concatenate([track["ele"] for track in tracks]))
+    if dem is not None:
+        lines.sampleAGL(dem)
+    return lines, problemFlights
+
+def writeFlightLines(lines, outputGDB, name, segments=False, totalTime=None, append=False):
+    """
+    (FlightLines, string, string, optional: boolean, list, boolean) -> None
+
+    Inputs:
+    lines: FlightLines to write
+    outputGDB: Full path to GDB for the feature class
+    name: Name of the feature class. It is replaced if it exists
+    segments: Write one feature per segment with StartTime, Duration and AGL instead of one feature per flight
+    totalTime: Optional total time (seconds) of each flight, as in the flight points
+    append: Add the lines to the feature class written by an earlier call (same segments setting) instead of replacing it
+
+    Output: polyline feature class in BC albers with FlightName, StartTime and TotalTime (per flight) or FlightName,
+    StartTime, Duration and AGL (per segment)
+
+    Purpose: Writes all the flight lines with one insert cursor. The geometry goes in as WKB, already projected.
+    """
+    import arcpy
+
+    starttime = datetime.datetime.now()
+    arcpy.env.overwriteOutput = True
+    path = os.path.join(outputGDB, name)
+    if not append:
+        arcpy.CreateFeatureclass_management(outputGDB, name, "POLYLINE", spatial_reference=arcpy.SpatialReference(3005))
+    names = np.array(lines.names or [""], dtype=object)
+
+    if segments:
+        starts = lines.segmentStarts()
+        attributes = lines.segmentAttributes(starts)
+        if not append:
+            arcpy.AddFields_management(path, [["FlightName", "TEXT"], ["StartTime", "DATE"], ["Duration", "DOUBLE"], ["AGL", "DOUBLE"]])
+        rows = zip(lines.segmentWKB(starts), names[attributes["flight"]].tolist(), attributes["StartTime"].astype(object).tolist(),
+                   attributes["Duration"].tolist(), [None if np.isnan(v) else v for v in attributes["AGL"].tolist()])
+        fields = ["SHAPE@WKB", "FlightName", "StartTime", "Duration", "AGL"]
+    else:
+        if not append:
+            arcpy.AddFields_management(path, [["FlightName", "TEXT"], ["StartTime", "DATE"], ["TotalTime", "DOUBLE"]])
+        rows = zip(lines.lineWKB(), lines.names, lines.time[lines.offsets[:-1]].astype(object).tolist(),
+                   totalTime if totalTime is not None else [None]*len(lines))
+        fields = ["SHAPE@WKB", "FlightName", "StartTime", "TotalTime"]
+
+    count = 0
+    with arcpy.da.InsertCursor(path, fields) as cursor:
+        for row in rows:
+            cursor.insertRow(row)
+            count += 1
+    del cursor
+    print("Runtime to write", count, "flight line" + (" segments" if segments else "s"), "to", path, ":", datetime.datetime.now() - starttime)
+
+def getFlightLines(gpxFolder, outputGDB, finalFlightLineName, DEM=None, segments=False):
+    """
+    (string, string, string, optional: string, boolean) -> list
+
+    Inputs:
+    gpxFolder: Full path to folder with the gpx files input, or a gpx file or a tar/zip archive of them
+    outputGDB: Full path to GDB to put the flight lines
+    finalFlightLineName: Name of output feature class for all flight lines
+    DEM: Full path to raster DEM. Only needed for the AGL of the segments
+    segments: One feature per segment instead of one per flight (see writeFlightLines())
+
+    Output: flight line feature class. Returns the names of the flights with 0 or 1 points
+
+    Purpose: Flight lines of getFlightLinePoints() without a geoprocessing call per flight
+    """
+    starttime = datetime.datetime.now()
+    tracks = list(flightPathAnalysis_Tracks.readFlights(gpxFolder))
+    lines, problemFlights = buildFlightLines(tracks)
+    if segments and DEM is not None and len(lines):
+        lines.sampleAGL(DEM)
+    totalTime = [flightPathAnalysis_Tracks.flightTimeInterval(track)[1] for track in tracks if len(track["lon"]) >= 2]
+    print("Runtime to build", len(lines), "flight lines:", datetime.datetime.now() - starttime)
+    writeFlightLines(lines, outputGDB, finalFlightLineName, segments, totalTime)
+    return problemFlights
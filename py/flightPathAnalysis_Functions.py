@@ -16,6 +16,23 @@
 # from the ground before objects can be seen from the observation points. In LOS_Analysis(), the flight points are compared to the direct viewshed and minElevViewshed.
 # If the AGL of the flight points are higher than the elevation in the minElevViewshed, they are not terrain masked.
 # update: Dec. 14, 2020 - instead of merging after all viewsheds are made, it will add newly created viewsheds to the viewshed layer as they are made
+# update: Oct. 19, 2026 - LOS_Analysis() takes an optional UnitCheckpoint to resume at the per uwr level. makeViewshed() skips uwr that
+# are already in both viewshed layers and only appends to the layer that is missing the uwr (eg. after a crash between the two appends)
+# update: Oct. 19, 2026 - unique uwr id and uwr selection queries are made by uwrUniqueID(), splitUWRUniqueID() and uwrSelectionQuery()
+# instead of being rebuilt in each function
+# update: Oct. 19, 2026 - LOS_Analysis() takes an optional viewshed cache size. Cached viewsheds are keyed by the DEM window, the uwr
+# geometry, the observer settings and maxRange, and stale ones are made again (see flightPathAnalysis_ViewshedCache)
+# update: Oct. 19, 2026 - LOS_Analysis() merges the not masked points without the join fields instead of deleting them after the merge
+# update: Oct. 19, 2026 - makeViewshed() writes the new viewsheds to the viewshed layers in batches with BufferedFeatureWriter
+# update: Oct. 19, 2026 - makeViewshed() works through clusters of neighbouring uwr and reads one DEM window per cluster
+# (see flightPathAnalysis_Scheduler)
+# update: Oct. 19, 2026 - pandas is imported by LOS_Analysis() where it writes the ViewshedPointCount excel file instead of at
+# module level
+# update: Oct. 19, 2026 - replaceNonAlphaNum(), convert_timedelta(), uwrUniqueID(), splitUWRUniqueID() and uwrSelectionQuery() moved to
+# flightPathAnalysis_Names (no arcpy) and are imported from there. convert_timedelta() is only imported so the old
+# flightPathAnalysis_Functions.convert_timedelta() calls still work
+# update: Oct. 19, 2026 - the viewsheds of a cluster of uwr are made by makeClusterViewsheds(). makeViewshed() deletes the DEM window
+# of each cluster after its uwr, also when one fails
 
 import arcpy
 import datetime
@@ -23,27 +40,15 @@ import time
 import os
 from math import sqrt
 import tempfile
-import pandas as pd
 import subprocess
 
+import flightPathAnalysis_Names
+import flightPathAnalysis_Scheduler
+from flightPathAnalysis_Names import replaceNonAlphaNum, uwrUniqueID, splitUWRUniqueID, uwrSelectionQuery
+
+#not used here. Kept so scripts calling flightPathAnalysis_Functions.convert_timedelta() still work
+convert_timedelta = flightPathAnalysis_Names.convert_timedelta
 
-def replaceNonAlphaNum(myText, newXter):
-    '''
-    Purpose:  to check for non-alpha numeric xters
-    replace them with user defined new character
-    '''
-    # go thru each xter. Check to see if it's alphanumeric.
-    # If not, then replace it with the new character (newXter)
-    for x in range(0, len(myText)):
-        if not myText[x].isalnum():
-            myText = myText.replace(myText[x], newXter)
-    return myText
-
-def convert_timedelta(duration):
-    #convert timedelta to seconds (type: float)
-    seconds = duration.total_seconds()
-    seconds = seconds % 60
-    return seconds
 
 def appendMergeFeatures(featuresList, finalPath):
     """
@@ -98,6 +103,59 @@ def appendMergeFeatures(featuresList, finalPath):
         arcpy.Append_management(featuresList, finalPath)
         print('appended all features to the final layer', finalPath)
 
+class BufferedFeatureWriter:
+    """
+    Purpose:
+    Batches appendMergeFeatures() calls on the same final feature class. Feature classes given to add() wait in a list and
+    are merged or appended to the final feature class all at once (one Append, one schema lock) when maxFeatureClasses
+    are waiting or maxSeconds have passed since the oldest one was added, and on flush(). The gdb path and
+    arcpy.Exists() of the final feature class are only looked up on the first write.
+    Use it in a with statement so the waiting feature classes are written when the work stops on an error too.
+
+    Input:
+    finalPath: Full path of final feature class
+    maxFeatureClasses: Most feature classes waiting before they are written
+    maxSeconds: Longest time in seconds a feature class waits before it is written
+
+    Note: the feature classes must still exist when they are written (eg. in a temp gdb that outlives the writer)
+    """
+
+    def __init__(self, finalPath, maxFeatureClasses=50, maxSeconds=600):
+        self.finalPath = finalPath
+        self.maxFeatureClasses = maxFeatureClasses
+        self.maxSeconds = maxSeconds
+        self.pending = []
+        self.oldest = None
+        self.exists = None
+
+    def add(self, features):
+        if not self.pending:
+            self.oldest = time.monotonic()
+        self.pending.append(features)
+        if len(self.pending) >= self.maxFeatureClasses or time.monotonic() - self.oldest >= self.maxSeconds:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        starttime = datetime.datetime.now()
+        if self.exists is None:
+            self.exists = arcpy.Exists(self.finalPath)
+        if self.exists:
+            arcpy.Append_management(self.pending, self.finalPath)
+        else:
+            appendMergeFeatures(self.pending, self.finalPath)
+            self.exists = True
+        print("wrote", len(self.pending), "feature classes to", self.finalPath, ":", datetime.datetime.now() - starttime)
+        self.pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.flush()
+        return False
+
 ## functions to create uwr buffer
 
 def rawBuffer(origFCLoc, origFCName, bufferDistanceInput, bufferNumber, outputGDB, unit_no_Field, unit_no_id_Field, uwr_unique_Field):
@@ -133,7 +191,7 @@ def rawBuffer(origFCLoc, origFCName, bufferDistanceInput, bufferNumber, outputGD
     arcpy.AddField_management(os.path.join(outputGDB, rawBuffer), uwr_unique_Field, "TEXT")
     with arcpy.da.UpdateCursor(os.path.join(outputGDB, rawBuffer), [uwr_unique_Field, unit_no_Field, unit_no_id_Field]) as cursor:
         for row in cursor:
-            row[0] = str(row[1]) + "__" + str(row[2])
+            row[0] = uwrUniqueID(row[1], row[2])
             cursor.updateRow(row)
     del cursor
 
@@ -252,7 +310,7 @@ def createUWRBuffer(origUWRGDB, origUWRName, outputGDB, unit_no_Field, unit_no_i
     uwrSet = set()
     with arcpy.da.SearchCursor(origUWRPath, [unit_no_Field, unit_no_id_Field] ) as cursor:
         for row in cursor:
-            uwrSet.add(str(row[0]) + "__" + str(row[1]))
+            uwrSet.add(uwrUniqueID(row[0], row[1]))
     del cursor
 
     print(uwrSet)
@@ -290,13 +348,12 @@ def createUWRBuffer(origUWRGDB, origUWRName, outputGDB, unit_no_Field, unit_no_i
             # populate unique uwr id
             with arcpy.da.UpdateCursor(tempOrigFCCopy, [unit_no_Field, unit_no_id_Field, tempUniqueUWRField] ) as cursor:
                 for row in cursor:
-                    row[2] = str(row[0]) + "__" + str(row[1])
+                    row[2] = uwrUniqueID(row[0], row[1])
                     cursor.updateRow(row)
             del(cursor)
             
             # make query with UWRRequireSet
-            uwrList_string = "','".join(UWRRequireSet)
-            query = tempUniqueUWRField + " in ('" + uwrList_string + "')" 
+            query = uwrSelectionQuery(tempUniqueUWRField, UWRRequireSet)
             print(query)
 
             UnbufferedFL = "UnbufferedUWR"
@@ -363,7 +420,7 @@ def createUWRBuffer(origUWRGDB, origUWRName, outputGDB, unit_no_Field, unit_no_i
         with arcpy.da.UpdateCursor(os.path.join(outputGDB, UWROnly), ["BUFF_DIST", uwr_unique_Field, unit_no_Field, unit_no_id_Field]) as cursor:
             for row in cursor:
                 row[0] = 0
-                row[1] = str(row[2]) + "__" + str(row[3])
+                row[1] = uwrUniqueID(row[2], row[3])
                 cursor.updateRow(row)
         del cursor
         arcpy.Delete_management(origUWRPathMemory)
@@ -388,35 +445,14 @@ def createUWRBuffer(origUWRGDB, origUWRName, outputGDB, unit_no_Field, unit_no_i
 
 
 ##just use this function to create viewshed
-def makeViewshed(uwrList, uwr_bufferFC, buffDistance, unit_no_Field, unit_no_id_Field, uwr_unique_Field, tempGDBPath, DEM, viewshed, minElevViewshed):
+def makeClusterViewsheds(uwrList, windowDEM, tempGDBPath, buffDistance, unit_no_Field, unit_no_id_Field, uwr_unique_Field, viewshedWriter, minElevViewshedWriter, viewshedDone, minElevViewshedDone):
     """
-    (list, string, integer, string, string, string, optional: string) -> None
-    uwrList: List of uwr to make viewsheds for each uwr
-    uwr_bufferFC: Feature class of uwr with buffers
-    buffDistance: Maximum buffer distance
-    unit_no_Field: field for unit number (eg. u-2-002)
-    unit_no_id_Field: field for unit number id (eg. TO 32)
-    uwr_unique_Field: field made in the buffered_uwr layer and viewshed layer that is a combo of unit_no and unit_no_id
-    tempGDBPath: Gdb to store intermediate files
-    DEM: Raster DEM
-    viewshed: Existing viewshed layer or path to a new viewshed layer
-    minElevViewshed: Existing min Elevation viewshed layer or path to a new layer. This contains the minimum elevation required for current ground level areas not visible to be visible
-
-    Purpose: For each uwr in the list of uwr, create a viewshed layer and another viewshed layer 
-    with minimum height required for objects in currently non visible areas to be visible.
-    If the viewshed feature class exists, the new viewsheds created will be appended to them.
-
-    Note: requires 3D and spatial analyst extension to be turned on
+    (list, string, integer, string, string, string, string, BufferedFeatureWriter, BufferedFeatureWriter, set, set) -> None
 
+    Purpose: The viewsheds of makeViewshed() for the uwr of one cluster, with the DEM clips made from the DEM window of
+    the cluster. The feature layers made by makeViewshed() must exist. The new viewsheds are added to the writers of the
+    layers that don't have the uwr yet (viewshedDone, minElevViewshedDone).
     """
-    
-    arcpy.env.workspace = tempGDBPath
-    arcpy.env.overwriteOutput = True
-
-    UWR_noBuffer = "UWR_noBuffer"
-    UWRVertices = "UWRVertices"
-    UWR_Buffer = "UWR_Buffer"
-
     #name of feature layers
     UWR_noBuffer_FL = "UWR_noBuffer_FL"
     UWRVertices_FL = "UWRVertices_FL"
@@ -425,34 +461,6 @@ def makeViewshed(uwrList, uwr_bufferFC, buffDistance, unit_no_Field, unit_no_id_
     polygonViewshed_FL = "polygonViewshed_FL"
     polygon_aglViewshed_FL = "polygon_aglViewshed_FL"
 
-    starttime = datetime.datetime.now()
-    #make feature class with relevant UWR - 0m buffer
-    uwrSet_str = "','".join(uwrList)
-
-    arcpy.FeatureClassToFeatureClass_conversion(uwr_bufferFC, tempGDBPath, UWR_noBuffer, uwr_unique_Field + r" in ('" + uwrSet_str + r"') and BUFF_DIST = 0")
-
-    ##subprocess.run(["cscript", r""])
-
-    arcpy.MakeFeatureLayer_management(UWR_noBuffer, UWR_noBuffer_FL)
-
-    #generalize uwr - 0m buffer
-    arcpy.Generalize_edit(UWR_noBuffer)
-
-    #convert uwr polygons to vertices
-    arcpy.FeatureVerticesToPoints_management(UWR_noBuffer, UWRVertices)
-    
-    # get DEM of vertices
-    arcpy.sa.ExtractMultiValuesToPoints(UWRVertices, [[DEM, "DEMElev"]])
-    arcpy.MakeFeatureLayer_management(UWRVertices, UWRVertices_FL)
-
-    #make feature class with relevant UWR buffered. includes all buffer distances
-    arcpy.FeatureClassToFeatureClass_conversion(uwr_bufferFC, tempGDBPath, UWR_Buffer, uwr_unique_Field + " in ('" + uwrSet_str + "')") #  and BUFF_DIST = " + str(buffDistance)
-    arcpy.MakeFeatureLayer_management(UWR_Buffer, UWR_Buffer_FL)
-    print("Runtime to make feature layer of uwr - buffer: ", datetime.datetime.now() - starttime)
-
-    # uwrViewshedList = []
-    # agl_uwrViewshedList = []
-
     for uwr in uwrList:
         uwrstarttime = datetime.datetime.now()
         name_uwr = replaceNonAlphaNum(uwr, "_")
@@ -471,8 +479,7 @@ def makeViewshed(uwrList, uwr_bufferFC, buffDistance, unit_no_Field, unit_no_id_
         UWRBuffer_DEMPoints = "UWRBuffer_DEMPoints" + name_uwr
         UWR_ViewshedObsPoints = "UWR_ViewshedObsPoints" + name_uwr
 
-        uwr_no = uwr[:uwr.find("__")]
-        uwr_no_id = uwr[uwr.find("__")+2:]
+        uwr_no, uwr_no_id = splitUWRUniqueID(uwr)
 
         ##check to find the right query depending on if uwr fields are integer or text
         with arcpy.da.SearchCursor(UWR_Buffer_FL, [unit_no_Field, unit_no_id_Field]) as cursor:
@@ -504,7 +511,7 @@ def makeViewshed(uwrList, uwr_bufferFC, buffDistance, unit_no_Field, unit_no_id_
         del cursor
 
         #clip DEM to uwr + biggest buffer size
-        arcpy.Clip_management(DEM, UWR_Buffer_Extent, BufferUWR_DEMClip, in_template_dataset= UWR_Buffer_FL, clipping_geometry='ClippingGeometry', maintain_clipping_extent='NO_MAINTAIN_EXTENT')
+        arcpy.Clip_management(windowDEM, UWR_Buffer_Extent, BufferUWR_DEMClip, in_template_dataset= UWR_Buffer_FL, clipping_geometry='ClippingGeometry', maintain_clipping_extent='NO_MAINTAIN_EXTENT')
 
         #get extent of original uwr to clip raster and get uwr raster area
         arcpy.SelectLayerByAttribute_management(UWR_Buffer_FL, "NEW_SELECTION", uwrQuery + " and (BUFF_DIST = 0)")
@@ -517,7 +524,7 @@ def makeViewshed(uwrList, uwr_bufferFC, buffDistance, unit_no_Field, unit_no_id_
         del cursor
 
         #clip dem to buffer - 0m
-        arcpy.Clip_management(DEM, UWR_Buffer_Extent, UWR_DEMClip, in_template_dataset= UWR_Buffer_FL, clipping_geometry='ClippingGeometry', maintain_clipping_extent='NO_MAINTAIN_EXTENT')
+        arcpy.Clip_management(windowDEM, UWR_Buffer_Extent, UWR_DEMClip, in_template_dataset= UWR_Buffer_FL, clipping_geometry='ClippingGeometry', maintain_clipping_extent='NO_MAINTAIN_EXTENT')
 
         #convert raster to points
         arcpy.RasterToPoint_conversion(UWR_DEMClip, UWR_DEMPoints) #uwr DEM
@@ -594,9 +601,119 @@ def makeViewshed(uwrList, uwr_bufferFC, buffDistance, unit_no_Field, unit_no_id_
         arcpy.Delete_management(polygonViewshed_FL)
         arcpy.Delete_management(UWR_DEMPoints_FL)
 
-        # append or merge recently made viewsheds together
-        appendMergeFeatures([os.path.join(tempGDBPath, totalViewshed_dis)], viewshed)
-        appendMergeFeatures([os.path.join(tempGDBPath, dissolved_aglViewshed)], minElevViewshed)
+        # append or merge recently made viewsheds together, in batches
+        if uwr not in viewshedDone:
+            viewshedWriter.add(os.path.join(tempGDBPath, totalViewshed_dis))
+        if uwr not in minElevViewshedDone:
+            minElevViewshedWriter.add(os.path.join(tempGDBPath, dissolved_aglViewshed))
+
+def makeViewshed(uwrList, uwr_bufferFC, buffDistance, unit_no_Field, unit_no_id_Field, uwr_unique_Field, tempGDBPath, DEM, viewshed, minElevViewshed):
+    """
+    (list, string, integer, string, string, string, optional: string) -> None
+    uwrList: List of uwr to make viewsheds for each uwr
+    uwr_bufferFC: Feature class of uwr with buffers
+    buffDistance: Maximum buffer distance
+    unit_no_Field: field for unit number (eg. u-2-002)
+    unit_no_id_Field: field for unit number id (eg. TO 32)
+    uwr_unique_Field: field made in the buffered_uwr layer and viewshed layer that is a combo of unit_no and unit_no_id
+    tempGDBPath: Gdb to store intermediate files
+    DEM: Raster DEM
+    viewshed: Existing viewshed layer or path to a new viewshed layer
+    minElevViewshed: Existing min Elevation viewshed layer or path to a new layer. This contains the minimum elevation required for current ground level areas not visible to be visible
+
+    Purpose: For each uwr in the list of uwr, create a viewshed layer and another viewshed layer 
+    with minimum height required for objects in currently non visible areas to be visible.
+    If the viewshed feature class exists, the new viewsheds created will be appended to them (in batches, see
+    BufferedFeatureWriter).
+
+    Note: requires 3D and spatial analyst extension to be turned on
+
+    """
+    
+    arcpy.env.workspace = tempGDBPath
+    arcpy.env.overwriteOutput = True
+
+    UWR_noBuffer = "UWR_noBuffer"
+    UWRVertices = "UWRVertices"
+    UWR_Buffer = "UWR_Buffer"
+
+    #name of feature layers
+    UWR_noBuffer_FL = "UWR_noBuffer_FL"
+    UWRVertices_FL = "UWRVertices_FL"
+    UWR_Buffer_FL = "UWR_Buffer_FL"
+
+    starttime = datetime.datetime.now()
+
+    #uwr already in the viewshed layers. viewshed and minElevViewshed are appended one after the other for each uwr, so
+    #a crash in between leaves the uwr in only one of them. Only the missing layer gets the uwr appended.
+    viewshedDone = set()
+    if arcpy.Exists(viewshed):
+        viewshedDone = {row[0] for row in arcpy.da.SearchCursor(viewshed, [uwr_unique_Field])}
+    minElevViewshedDone = set()
+    if arcpy.Exists(minElevViewshed):
+        minElevViewshedDone = {row[0] for row in arcpy.da.SearchCursor(minElevViewshed, [uwr_unique_Field])}
+    uwrList = [uwr for uwr in uwrList if uwr not in viewshedDone or uwr not in minElevViewshedDone]
+    if len(uwrList) == 0:
+        print('all uwr already have viewsheds')
+        return
+
+    #make feature class with relevant UWR - 0m buffer
+    uwrQueryAll = uwrSelectionQuery(uwr_unique_Field, uwrList)
+
+    arcpy.FeatureClassToFeatureClass_conversion(uwr_bufferFC, tempGDBPath, UWR_noBuffer, uwrQueryAll + " and BUFF_DIST = 0")
+
+    ##subprocess.run(["cscript", r""])
+
+    arcpy.MakeFeatureLayer_management(UWR_noBuffer, UWR_noBuffer_FL)
+
+    #generalize uwr - 0m buffer
+    arcpy.Generalize_edit(UWR_noBuffer)
+
+    #convert uwr polygons to vertices
+    arcpy.FeatureVerticesToPoints_management(UWR_noBuffer, UWRVertices)
+    
+    # get DEM of vertices
+    arcpy.sa.ExtractMultiValuesToPoints(UWRVertices, [[DEM, "DEMElev"]])
+    arcpy.MakeFeatureLayer_management(UWRVertices, UWRVertices_FL)
+
+    #make feature class with relevant UWR buffered. includes all buffer distances
+    arcpy.FeatureClassToFeatureClass_conversion(uwr_bufferFC, tempGDBPath, UWR_Buffer, uwrQueryAll) #  and BUFF_DIST = " + str(buffDistance)
+    arcpy.MakeFeatureLayer_management(UWR_Buffer, UWR_Buffer_FL)
+    print("Runtime to make feature layer of uwr - buffer: ", datetime.datetime.now() - starttime)
+
+    # uwrViewshedList = []
+    # agl_uwrViewshedList = []
+
+    #uwr grouped in clusters of neighbours whose DEM windows overlap (see flightPathAnalysis_Scheduler). The DEM is read once
+    #per cluster window and the clips of each uwr are made from that window instead of the full DEM
+    bufferExtents = {}
+    with arcpy.da.SearchCursor(UWR_Buffer, [uwr_unique_Field, 'SHAPE@'], "BUFF_DIST = " + str(buffDistance)) as cursor:
+        for row in cursor:
+            if row[0] not in bufferExtents:
+                bufferExtents[row[0]] = (row[1].extent.XMin, row[1].extent.YMin, row[1].extent.XMax, row[1].extent.YMax)
+    del cursor
+    uwrList = sorted(uwrList)
+    cellSize = arcpy.Raster(DEM).meanCellWidth
+    clusters = flightPathAnalysis_Scheduler.clusterUWR(uwrList, [bufferExtents.get(uwr) for uwr in uwrList], cellSize)
+    separateCells, clusterCells = flightPathAnalysis_Scheduler.readSavings([bufferExtents.get(uwr) for uwr in uwrList], clusters, cellSize)
+    print(len(uwrList), "uwr in", len(clusters), "DEM windows:", clusterCells, "DEM cells read instead of", separateCells)
+
+    #the viewsheds of each uwr are kept in tempGDBPath and written to the viewshed layers in batches. The batches waiting
+    #are written if a uwr fails too
+    with BufferedFeatureWriter(viewshed) as viewshedWriter, BufferedFeatureWriter(minElevViewshed) as minElevViewshedWriter:
+        for clusterNumber, (window, clusterUWRList) in enumerate(clusters):
+            #DEM window of the cluster, read once and deleted after its uwr, also when one of them fails
+            if window is None:
+                windowDEM = DEM
+            else:
+                windowDEM = "clusterDEM_" + str(clusterNumber)
+                arcpy.Clip_management(DEM, " ".join(str(v) for v in window), windowDEM, maintain_clipping_extent='NO_MAINTAIN_EXTENT')
+            try:
+                makeClusterViewsheds(clusterUWRList, windowDEM, tempGDBPath, buffDistance, unit_no_Field, unit_no_id_Field, uwr_unique_Field,
+                                     viewshedWriter, minElevViewshedWriter, viewshedDone, minElevViewshedDone)
+            finally:
+                if window is not None:
+                    arcpy.Delete_management(windowDEM)
 
     # delete the feature layers or else there will be locking issues or the temp directory can't be removed
     arcpy.Delete_management(UWR_noBuffer_FL)
@@ -605,7 +722,7 @@ def makeViewshed(uwrList, uwr_bufferFC, buffDistance, unit_no_Field, unit_no_id_
 
 
 ##just use this function to create viewshed and skyline AND conduct the analysis
-def LOS_Analysis(uwrBuffered, maxRange, DEM, viewshed, minElevViewshed, unit_no_Field, unit_no_id_Field, uwr_unique_Field, allFlightPoints, LOS_uwrFlightPointsGDB, LOS_uwrFlightPoints, generalFolder, ViewshedPointCount):
+def LOS_Analysis(uwrBuffered, maxRange, DEM, viewshed, minElevViewshed, unit_no_Field, unit_no_id_Field, uwr_unique_Field, allFlightPoints, LOS_uwrFlightPointsGDB, LOS_uwrFlightPoints, generalFolder, ViewshedPointCount, checkpoint=None, viewshedCacheMB=None):
     """
     (string, integer, string, string, string, string, string, string, string, string, string) -> None
     
@@ -624,10 +741,16 @@ def LOS_Analysis(uwrBuffered, maxRange, DEM, viewshed, minElevViewshed, unit_no_
     generalFolder: Folder path to store excel/text files
     ViewshedPointCount: Excel file with count of points.
         -'points found in viewshed': number of pts found in the direct viewshed
+    checkpoint: Optional flightPathAnalysis_Pipeline.UnitCheckpoint. If given, the points that are not masked for each uwr
+        are kept in a gdb next to the checkpoint file instead of the temp gdb, and uwr already done are skipped on a rerun
+    viewshedCacheMB: Optional size limit in MB of the viewshed cache (flightPathAnalysis_ViewshedCache, index kept in
+        generalFolder). If given, viewsheds whose DEM window, uwr geometry or maxRange changed are made again, and the least
+        recently used viewsheds of uwr without flight points are deleted from the layers when they go over the limit
 
     Output: feature class of flight points that have been terrain masked by line of sight
 
-    Note 1 : If an uwr's viewshed has already been made in the viewshed layer, no viewshed will be made for it
+    Note 1 : If an uwr's viewshed has already been made in the viewshed layer, no viewshed will be made for it (unless it is
+    stale in the viewshed cache)
 
     Note 2: Requires user to have permission to use 3D analyst and spatial analyst extensions
     """
@@ -640,6 +763,15 @@ def LOS_Analysis(uwrBuffered, maxRange, DEM, viewshed, minElevViewshed, unit_no_
         print(tempGDBPath)
         arcpy.CreateFileGDB_management (temp_location, tempgdbName)
 
+        #gdb for the not masked points of each uwr. Kept between runs when there is a checkpoint
+        if checkpoint is not None:
+            notMaskedGDBFolder = os.path.dirname(checkpoint.path)
+            notMaskedGDBPath = os.path.join(notMaskedGDBFolder, "LOS_notMasked.gdb")
+            if not arcpy.Exists(notMaskedGDBPath):
+                arcpy.CreateFileGDB_management(notMaskedGDBFolder, "LOS_notMasked.gdb")
+        else:
+            notMaskedGDBPath = tempGDBPath
+
         arcpy.env.workspace = tempGDBPath
         arcpy.env.overwriteOutput = True
 
@@ -670,7 +802,7 @@ def LOS_Analysis(uwrBuffered, maxRange, DEM, viewshed, minElevViewshed, unit_no_
             uwrSet = set()
             with arcpy.da.SearchCursor(allFlightPoints, [unit_no_Field, unit_no_id_Field] ) as cursor:
                 for row in cursor:
-                    uwrSet.add(str(row[0]) + "__" + str(row[1]))
+                    uwrSet.add(uwrUniqueID(row[0], row[1]))
             del cursor
 
             #uwrSet = {"M-204", "M-216", "M-268", "M-314", "M-338"} #####################test. delete after , "M-337", "M-250"
@@ -678,13 +810,24 @@ def LOS_Analysis(uwrBuffered, maxRange, DEM, viewshed, minElevViewshed, unit_no_
 
             print("Runtime to get unique uwr: ", datetime.datetime.now() - starttime)
 
-            #get list of uwr that have viewsheds created
+            #viewshed cache: stale viewsheds are deleted from the layers so they are made again below
+            if viewshedCacheMB is not None:
+                import flightPathAnalysis_ViewshedCache
+                viewshedCache = flightPathAnalysis_ViewshedCache.ViewshedCache(os.path.join(generalFolder, "viewshedCache.json"), viewshedCacheMB*1024*1024)
+                cacheKeys = flightPathAnalysis_ViewshedCache.uwrCacheKeys(viewshedCache, uwrBuffered, DEM, unit_no_Field, unit_no_id_Field, uwr_unique_Field, maxRange, uwrSet)
+                flightPathAnalysis_ViewshedCache.refreshViewshedLayers(viewshedCache, cacheKeys, uwrSet, viewshed, minElevViewshed, uwr_unique_Field)
+
+            #get list of uwr that have viewsheds created. A uwr needs to be in both viewshed layers
             viewshedUWRSet = set()
-            if arcpy.Exists(viewshed): #if viewshed exists
+            if arcpy.Exists(viewshed) and arcpy.Exists(minElevViewshed): #if viewshed exists
                 with arcpy.da.SearchCursor(viewshed, [uwr_unique_Field]) as cursor:
                     for row in cursor:
                         viewshedUWRSet.add(row[0])
                 del cursor
+                with arcpy.da.SearchCursor(minElevViewshed, [uwr_unique_Field]) as cursor:
+                    minElevUWRSet = {row[0] for row in cursor}
+                del cursor
+                viewshedUWRSet = viewshedUWRSet & minElevUWRSet
                 print(viewshedUWRSet)
 
                 #get list of uwr that do not have viewsheds created
@@ -700,6 +843,8 @@ def LOS_Analysis(uwrBuffered, maxRange, DEM, viewshed, minElevViewshed, unit_no_
                 makeViewshed(UWRRequireViewshedSet, uwrBuffered, maxRange, unit_no_Field, unit_no_id_Field, uwr_unique_Field, tempGDBPath, DEM, viewshed, minElevViewshed)
             else:
                 print('no need to make viewsheds')
+            if viewshedCacheMB is not None:
+                flightPathAnalysis_ViewshedCache.recordViewshedLayers(viewshedCache, cacheKeys, UWRRequireViewshedSet, uwrSet, viewshed, minElevViewshed, uwr_unique_Field)
 
             finalPointsSet = set()
 
@@ -720,14 +865,16 @@ def LOS_Analysis(uwrBuffered, maxRange, DEM, viewshed, minElevViewshed, unit_no_
                 nameUWR = replaceNonAlphaNum(uwr, "_")
                 points_aglViewshed = "points_aglViewshed" + nameUWR
                 uwr_notmasked = "notMasked" + nameUWR
+                if checkpoint is not None and checkpoint.isDone(uwr) and arcpy.Exists(os.path.join(notMaskedGDBPath, uwr_notmasked)):
+                    print("LOS flight points already found for uwr", uwr)
+                    uwr_notmasked_List.append(os.path.join(notMaskedGDBPath, uwr_notmasked))
+                    continue
                 print("finding LOS flight points for uwr ", uwr)
-                LOS_uwrFlightPoints_FL = "LOS_uwrFlightPoints_FL"
                 uwrPointsstarttime = datetime.datetime.now()
                 uwrFlightPointsSet = set()
                 NotLOSSet = set()
 
-                uwr_no = uwr[:uwr.find("__")]
-                uwr_no_id = uwr[uwr.find("__")+2:]
+                uwr_no, uwr_no_id = splitUWRUniqueID(uwr)
 
                 ##check to find the right query depending on if uwr fields are integer or text
                 with arcpy.da.SearchCursor(minElevViewshed_FL, [unit_no_Field, unit_no_id_Field]) as cursor:
@@ -769,43 +916,51 @@ def LOS_Analysis(uwrBuffered, maxRange, DEM, viewshed, minElevViewshed, unit_no_
                 else:
                     terrainMaskedPoints = ','.join(points_aglViewshedNumberSet)
                     finalSQL = "OBJECTID NOT IN (" + terrainMaskedPoints + ")"
-                arcpy.FeatureClassToFeatureClass_conversion(points_aglViewshed, tempGDBPath, uwr_notmasked, finalSQL)
+                arcpy.FeatureClassToFeatureClass_conversion(points_aglViewshed, notMaskedGDBPath, uwr_notmasked, finalSQL)
 
                 #put into a list of all the feature classes of points that are terrain masked
-                uwr_notmasked_List.append(os.path.join(tempGDBPath, uwr_notmasked))
+                uwr_notmasked_List.append(os.path.join(notMaskedGDBPath, uwr_notmasked))
+                if checkpoint is not None:
+                    checkpoint.markDone(uwr)
                 
                 print("Runtime to find points not in LOS for ", uwr, ":", datetime.datetime.now() - uwrPointsstarttime)
 
             arcpy.env.workspace = LOS_uwrFlightPointsGDB
             arcpy.env.overwriteOutput = True
 
-            #create final feature class of all points that aren't terrain masked
-            arcpy.Merge_management(uwr_notmasked_List, os.path.join(LOS_uwrFlightPointsGDB, LOS_uwrFlightPoints))
-            print("merged all non terrain masked points together")
-
-            #get count of points that are in direct viewshed
-            arcpy.MakeFeatureLayer_management(LOS_uwrFlightPoints, LOS_uwrFlightPoints_FL)
-            arcpy.SelectLayerByAttribute_management(LOS_uwrFlightPoints_FL, "NEW_SELECTION", "gridcode is NULL")
-            
-            result = arcpy.GetCount_management(LOS_uwrFlightPoints_FL)
-            uwrFlightSelectedCount = int(result[0])
+            #get count of points that are in direct viewshed, from the points of each uwr before they are merged
+            uwrFlightSelectedCount = 0
+            for uwr_notmasked in uwr_notmasked_List:
+                with arcpy.da.SearchCursor(uwr_notmasked, ["OID@"], "gridcode is NULL") as cursor:
+                    for row in cursor:
+                        uwrFlightSelectedCount += 1
+                del cursor
             viewshedPointCount[uwr] = uwrFlightSelectedCount
 
-            #getting count found in direct viewshed into excel
+            #create final feature class of all points that aren't terrain masked. The join fields are left out of the
+            #field mapping so the merged feature class doesn't have to be rewritten to delete them
+            fieldmappings = arcpy.FieldMappings()
+            for uwr_notmasked in uwr_notmasked_List:
+                fieldmappings.addTable(uwr_notmasked)
+            for field in ["Join_Count_1", "TARGET_FID_1", "gridcode", "TUWR_TAG_1", "UNIT_NO_1", "uwr_unique_id"]:
+                fieldIndex = fieldmappings.findFieldMapIndex(field)
+                if fieldIndex != -1:
+                    fieldmappings.removeFieldMap(fieldIndex)
+            arcpy.Merge_management(uwr_notmasked_List, os.path.join(LOS_uwrFlightPointsGDB, LOS_uwrFlightPoints), fieldmappings)
+            print("merged all non terrain masked points together")
+
+            #getting count found in direct viewshed into excel. pandas is only loaded here
+            import pandas as pd
             dfViewshed = pd.DataFrame.from_dict(viewshedPointCount, orient = 'index')
             dfViewshed.columns = ['points found in viewshed']
             ViewshedPointCountPath = os.path.join(generalFolder, ViewshedPointCount) + ".xlsx"
             dfViewshed.to_excel(ViewshedPointCountPath)
 
             #delete feature layers
-            arcpy.Delete_management(LOS_uwrFlightPoints_FL)
             arcpy.Delete_management(uwrFlightPoints_FL)
             arcpy.Delete_management(viewshed_FL)
             arcpy.Delete_management(minElevViewshed_FL)
 
-            #delete unwanted fields
-            arcpy.DeleteField_management(LOS_uwrFlightPoints, ["Join_Count_1", "TARGET_FID_1", "gridcode", "TUWR_TAG_1", "UNIT_NO_1", "uwr_unique_id"])
-
             if arcpy.CheckExtension("3D") == "Available":
                 arcpy.CheckInExtension("3D")
             if arcpy.CheckExtension("Spatial") == "Available":
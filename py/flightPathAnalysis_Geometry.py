@@ -0,0 +1,871 @@
+### array based geometry used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# numpy versions of the steps getFlightLinePoints() runs with arcpy tools, so they can run on chunks of points in worker
+# threads or processes:
+# Function: projectToBCAlbers - WGS 84 longitude/latitude to BC Albers (EPSG:3005)
+# Class: DEMGrid - DEM window held in memory. loadDEM() reads it with arcpy
+# Class: TiledDEM - DEM read in tiles, only around the areas that are used (eg. the uwr windows instead of one window
+# over all the uwr)
+# Function: loadZonesDEM - DEM window over the uwr zones, or the tiles around them when the window is over maxDEMWindowMB
+# Class: PolygonSet - polygons as flat arrays with a point in polygon join
+# Class: UWRZones - rings of the buffered uwr layer. loadUWRZones() reads them with arcpy
+# Class: ZoneGrid - zone label raster on the DEM grid. Each cell has the set of uwr zones covering it, and cells crossed by
+# a zone boundary are flagged so only their points get the exact point in polygon check
+# Function: classifyTracks - DEM sampling, AGL, < 500m filter, height range and uwr zone join for a list of tracks.
+# Returns a flightPathAnalysis_PointTable.PointTable. With a ZoneGrid the steps run fused on one cell lookup per point
+# Function: classifyPoints - the same steps on points already projected
+# Function: classifyMembership - classifyPoints() with each point stored once and its uwr zones as members
+# (flightPathAnalysis_PointTable.PointMembership), so memory grows with the points and not the points times the zones
+# arcpy is only imported by the functions that read the gdb, the rest only needs numpy.
+
+import numpy as np
+
+import flightPathAnalysis_Kernels
+import flightPathAnalysis_Names
+import flightPathAnalysis_PointTable
+import flightPathAnalysis_Tracks
+
+try:
+    import pyproj
+except ImportError:
+    pyproj = None
+
+#BC Albers (EPSG:3005) on the GRS 1980 ellipsoid
+ALBERS = {"lat0": 45.0, "lon0": -126.0, "lat1": 50.0, "lat2": 58.5, "falseEasting": 1000000.0, "falseNorthing": 0.0,
+          "a": 6378137.0, "f": 1/298.257222101}
+
+#AGL cutoff and height range split used in getFlightLinePoints()
+maxAGL = 500
+heightRangeSplit = 400
+heightRangeLabels = ("0 to 400m", "400 to 500m")
+
+#largest DEM window (MB of float32 cells) read in one array over all the uwr. Past it the DEM is read in tiles
+maxDEMWindowMB = 1024
+
+
+def albersQ(sinPhi, e):
+    return (1 - e*e) * (sinPhi/(1 - e*e*sinPhi*sinPhi) - (1/(2*e)) * np.log((1 - e*sinPhi)/(1 + e*sinPhi)))
+
+def projectToBCAlbers(lon, lat):
+    """
+    (array, array) -> array, array
+
+    Purpose:
+    Projects WGS 84 longitude/latitude to BC Albers (EPSG:3005). Uses pyproj if it is installed, otherwise the
+    Albers equal area conic formulas (Snyder 1987). The datum shift between WGS 84 and NAD 83 (~1m in BC) is ignored
+    by the formulas, which is below the 25m DEM cell size.
+    """
+    lon = np.asarray(lon, dtype="float64")
+    lat = np.asarray(lat, dtype="float64")
+    if pyproj is not None:
+        transformer = pyproj.Transformer.from_crs(4326, 3005, always_xy=True)
+        return transformer.transform(lon, lat)
+
+    a = ALBERS["a"]
+    f = ALBERS["f"]
+    e = np.sqrt(2*f - f*f)
+    phi0, phi1, phi2 = np.radians([ALBERS["lat0"], ALBERS["lat1"], ALBERS["lat2"]])
+    m1 = np.cos(phi1)/np.sqrt(1 - (e*np.sin(phi1))**2)
+    m2 = np.cos(phi2)/np.sqrt(1 - (e*np.sin(phi2))**2)
+    q0 = albersQ(np.sin(phi0), e)
+    q1 = albersQ(np.sin(phi1), e)
+    q2 = albersQ(np.sin(phi2), e)
+    n = (m1*m1 - m2*m2)/(q2 - q1)
+    C = m1*m1 + n*q1
+    rho0 = a*np.sqrt(C - n*q0)/n
+
+    q = albersQ(np.sin(np.radians(lat)), e)
+    rho = a*np.sqrt(C - n*q)/n
+    theta = n*np.radians(lon - ALBERS["lon0"])
+    x = ALBERS["falseEasting"] + rho*np.sin(theta)
+    y = ALBERS["falseNorthing"] + rho0 - rho*np.cos(theta)
+    return x, y
+
+
+class DEMGrid:
+    """
+    Purpose: DEM window in memory. Row 0 is the top (yMax) of the window, like arcpy.RasterToNumPyArray.
+
+    Inputs:
+    array: 2d float array of elevations. NoData cells are nan
+    xMin: x of the left edge of the window
+    yMax: y of the top edge of the window
+    cellSize: size of the cells in metres
+    """
+
+    def __init__(self, array, xMin, yMax, cellSize):
+        self.array = array
+        self.xMin = xMin
+        self.yMax = yMax
+        self.cellSize = cellSize
+
+    @property
+    def extent(self):
+        nrows, ncols = self.array.shape
+        return (self.xMin, self.yMax - nrows*self.cellSize, self.xMin + ncols*self.cellSize, self.yMax)
+
+    def cellIndex(self, x, y):
+        #row and column of the cells containing the points. -1 for points outside the window
+        nrows, ncols = self.array.shape
+        col = np.floor((np.asarray(x) - self.xMin)/self.cellSize).astype("int64")
+        row = np.floor((self.yMax - np.asarray(y))/self.cellSize).astype("int64")
+        outside = (col < 0) | (col >= ncols) | (row < 0) | (row >= nrows)
+        col[outside] = -1
+        row[outside] = -1
+        return row, col
+
+    def sample(self, x, y, bilinear=False):
+        """
+        Purpose: DEM value of the cell containing each point, like ExtractMultiValuesToPoints without interpolation.
+        nan for points outside the window or on NoData cells. bilinear=True interpolates between the 4 nearest cell
+        centers instead (flightPathAnalysis_Kernels.bilinearSample())
+        """
+        if bilinear:
+            return flightPathAnalysis_Kernels.bilinearSample(self.array, self.xMin, self.yMax, self.cellSize, x, y)
+        row, col = self.cellIndex(x, y)
+        values = np.full(len(row), np.nan)
+        inside = row >= 0
+        values[inside] = self.array[row[inside], col[inside]]
+        return values
+
+def loadDEM(DEM, extent=None):
+    """
+    (string, optional: tuple) -> DEMGrid
+
+    Inputs:
+    DEM: Full path to raster DEM
+    extent: Optional (xMin, yMin, xMax, yMax) window to read in the DEM coordinates. The whole raster is read if not given
+
+    Purpose: Reads the DEM (or a window of it) into memory with arcpy.RasterToNumPyArray
+    """
+    import arcpy
+
+    raster = arcpy.Raster(DEM)
+    cellSize = raster.meanCellWidth
+    rasterExtent = raster.extent
+    if extent is None:
+        extent = (rasterExtent.XMin, rasterExtent.YMin, rasterExtent.XMax, rasterExtent.YMax)
+
+    #snap the window to the DEM cells
+    xMin = max(rasterExtent.XMin, rasterExtent.XMin + np.floor((extent[0] - rasterExtent.XMin)/cellSize)*cellSize)
+    yMin = max(rasterExtent.YMin, rasterExtent.YMin + np.floor((extent[1] - rasterExtent.YMin)/cellSize)*cellSize)
+    xMax = min(rasterExtent.XMax, rasterExtent.XMin + np.ceil((extent[2] - rasterExtent.XMin)/cellSize)*cellSize)
+    yMax = min(rasterExtent.YMax, rasterExtent.YMin + np.ceil((extent[3] - rasterExtent.YMin)/cellSize)*cellSize)
+    ncols = int(round((xMax - xMin)/cellSize))
+    nrows = int(round((yMax - yMin)/cellSize))
+
+    array = arcpy.RasterToNumPyArray(raster, arcpy.Point(xMin, yMin), ncols, nrows, nodata_to_value=np.nan).astype("float32")
+    return DEMGrid(array, xMin, yMax, cellSize)
+
+class TiledDEM:
+    """
+    Purpose: DEM read in square tiles aligned on the DEM cells. Only the tiles of the extents given to loadExtent() are
+    read, so uwr spread over a large area only hold the DEM around them in memory instead of one window over all of them.
+    Has the sample() of DEMGrid. Tiles are never read by sample(): points on tiles that are not loaded get nan.
+
+    Inputs:
+    DEM: Full path to raster DEM
+    tileCells: Number of cells on a side of a tile
+    """
+
+    def __init__(self, DEM, tileCells=1024):
+        import arcpy
+
+        raster = arcpy.Raster(DEM)
+        self.DEM = DEM
+        self.cellSize = raster.meanCellWidth
+        self.xMin = raster.extent.XMin
+        self.yMax = raster.extent.YMax
+        self.tileCells = tileCells
+        #number of tile rows and columns over the DEM
+        tileSize = tileCells*self.cellSize
+        self.tileRows = int(np.ceil((raster.extent.YMax - raster.extent.YMin)/tileSize))
+        self.tileCols = int(np.ceil((raster.extent.XMax - raster.extent.XMin)/tileSize))
+        #(tile row, tile column) -> DEMGrid of the tile
+        self.tiles = {}
+
+    @property
+    def extent(self):
+        #extent of the loaded tiles
+        extents = np.array([tile.extent for tile in self.tiles.values()]).reshape(-1, 4)
+        return (extents[:, 0].min(), extents[:, 1].min(), extents[:, 2].max(), extents[:, 3].max())
+
+    @property
+    def nbytes(self):
+        return sum(tile.array.nbytes for tile in self.tiles.values())
+
+    def cellIndex(self, x, y):
+        #row and column of the cells containing the points in the whole DEM
+        col = np.floor((np.asarray(x) - self.xMin)/self.cellSize).astype("int64")
+        row = np.floor((self.yMax - np.asarray(y))/self.cellSize).astype("int64")
+        return row, col
+
+    def tileKeys(self, extent):
+        #tiles of the DEM covering an extent (xMin, yMin, xMax, yMax)
+        tileSize = self.tileCells*self.cellSize
+        firstCol = max(0, int(np.floor((extent[0] - self.xMin)/tileSize)))
+        lastCol = min(self.tileCols - 1, int(np.floor((extent[2] - self.xMin)/tileSize)))
+        firstRow = max(0, int(np.floor((self.yMax - extent[3])/tileSize)))
+        lastRow = min(self.tileRows - 1, int(np.floor((self.yMax - extent[1])/tileSize)))
+        return [(tileRow, tileCol) for tileRow in range(firstRow, lastRow + 1) for tileCol in range(firstCol, lastCol + 1)]
+
+    def loadTile(self, tileRow, tileCol):
+        #reads a tile if it is not loaded yet. Tiles off the DEM are skipped
+        if (tileRow, tileCol) in self.tiles or not (0 <= tileRow < self.tileRows and 0 <= tileCol < self.tileCols):
+            return
+        #one cell more on each side for the bilinear interpolation across the tile edges. Half a cell inside that so
+        #loadDEM() snaps to the cell edges
+        tileSize = self.tileCells*self.cellSize
+        xMin = self.xMin + tileCol*tileSize - self.cellSize
+        yMax = self.yMax - tileRow*tileSize + self.cellSize
+        size = tileSize + 2*self.cellSize
+        half = self.cellSize/2
+        self.tiles[(tileRow, tileCol)] = loadDEM(self.DEM, (xMin + half, yMax - size + half, xMin + size - half, yMax - half))
+
+    def loadExtent(self, extent):
+        #reads the tiles of an extent that are not loaded yet
+        for tileRow, tileCol in self.tileKeys(extent):
+            self.loadTile(tileRow, tileCol)
+
+    def unload(self):
+        #drops the loaded tiles
+        self.tiles = {}
+
+    def sample(self, x, y, bilinear=False):
+        """
+        Purpose: DEM value of the cell containing each point, like DEMGrid.sample(). nan for points on tiles that are not
+        loaded or on NoData cells. bilinear=True interpolates between the 4 nearest cell centers, the tiles overlap by a cell
+        for it
+        """
+        row, col = self.cellIndex(x, y)
+        values = np.full(len(row), np.nan)
+        tileRow = row//self.tileCells
+        tileCol = col//self.tileCells
+        for key in set(zip(tileRow.tolist(), tileCol.tolist())):
+            tile = self.tiles.get(key)
+            if tile is None:
+                continue
+            inTile = np.flatnonzero((tileRow == key[0]) & (tileCol == key[1]))
+            if bilinear:
+                values[inTile] = tile.sample(np.asarray(x)[inTile], np.asarray(y)[inTile], bilinear=True)
+                continue
+            #cell of the tile from the cell of the whole DEM, so points on the tile edges are not lost to rounding
+            tileRows = row[inTile] - int(round((self.yMax - tile.yMax)/self.cellSize))
+            tileCols = col[inTile] - int(round((tile.xMin - self.xMin)/self.cellSize))
+            inside = (tileRows >= 0) & (tileRows < tile.array.shape[0]) & (tileCols >= 0) & (tileCols < tile.array.shape[1])
+            values[inTile[inside]] = tile.array[tileRows[inside], tileCols[inside]]
+        return values
+
+def sampleDEM(DEM, x, y, tileCells=1024):
+    """
+    (string, array, array, optional: int) -> array
+
+    Purpose: DEM value of the cell containing each point, like DEMGrid.sample(), read one tile at a time (TiledDEM). Each
+    tile with points is read once and dropped before the next one, so memory stays at one tile however far apart the
+    points are.
+    """
+    dem = TiledDEM(DEM, tileCells)
+    row, col = dem.cellIndex(x, y)
+    values = np.full(len(row), np.nan)
+    if len(row) == 0:
+        return values
+    keys, inverse = np.unique(np.stack([row//tileCells, col//tileCells], axis=1), axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    order = np.argsort(inverse, kind="stable")
+    starts = np.searchsorted(inverse[order], np.arange(len(keys) + 1))
+    for i, (tileRow, tileCol) in enumerate(keys.tolist()):
+        inTile = order[starts[i]:starts[i+1]]
+        dem.loadTile(tileRow, tileCol)
+        values[inTile] = dem.sample(np.asarray(x)[inTile], np.asarray(y)[inTile])
+        dem.unload()
+    return values
+
+def loadDEMTiles(DEM, extents, tileCells=1024):
+    """
+    (string, list, optional: int) -> TiledDEM
+
+    Purpose: TiledDEM with the tiles of each extent (xMin, yMin, xMax, yMax) loaded, eg. the bounding boxes of the uwr zones
+    """
+    dem = TiledDEM(DEM, tileCells)
+    for extent in extents:
+        #zones without a polygon have an infinite bounding box
+        if np.all(np.isfinite(extent)):
+            dem.loadExtent(extent)
+    return dem
+
+def demWindowMB(DEM, extent):
+    #MB of the float32 DEM window over an extent (xMin, yMin, xMax, yMax)
+    import arcpy
+
+    cellSize = arcpy.Raster(DEM).meanCellWidth
+    xMin, yMin, xMax, yMax = extent
+    return (xMax - xMin)/cellSize*(yMax - yMin)/cellSize*4/(1024*1024)
+
+def loadZonesDEM(DEM, zones, maxWindowMB=maxDEMWindowMB):
+    """
+    (string, UWRZones, optional: float) -> DEMGrid or TiledDEM
+
+    Purpose: DEM window over all the uwr zones (loadDEM()), or only the DEM tiles around each zone (loadDEMTiles()) when the
+    window would take more than maxWindowMB. Enough to sample the points in the zones, but a TiledDEM has no array (no ZoneGrid)
+    """
+    windowMB = demWindowMB(DEM, zones.extent)
+    if windowMB <= maxWindowMB:
+        return loadDEM(DEM, zones.extent)
+    dem = loadDEMTiles(DEM, zones.bbox)
+    print("DEM window over all the uwr would take", round(windowMB), "MB, read", round(dem.nbytes/(1024*1024)), "MB of tiles around the uwr zones instead")
+    return dem
+
+
+class PolygonSet:
+    """
+    Purpose:
+    Polygons as flat arrays. Ring vertices of all polygons are stored one after the other:
+    polygon i has rings ringOffsets[polygonOffsets[i]:polygonOffsets[i+1]] and ring j has vertices xs[ringOffsets[j]:ringOffsets[j+1]].
+
+    Inputs:
+    rings: List of lists of rings for each polygon. A ring is a (n, 2) array of x, y. Holes are rings too (even-odd rule).
+    """
+
+    def __init__(self, rings):
+        polygonOffsets = [0]
+        ringOffsets = [0]
+        xs = []
+        ys = []
+        bbox = []
+        for polygonRings in rings:
+            polygonX = []
+            polygonY = []
+            for ring in polygonRings:
+                ring = np.asarray(ring, dtype="float64")
+                xs.append(ring[:, 0])
+                ys.append(ring[:, 1])
+                ringOffsets.append(ringOffsets[-1] + len(ring))
+                polygonX.append(ring[:, 0])
+                polygonY.append(ring[:, 1])
+            polygonOffsets.append(polygonOffsets[-1] + len(polygonRings))
+            if polygonX:
+                polygonX = np.concatenate(polygonX)
+                polygonY = np.concatenate(polygonY)
+                bbox.append((polygonX.min(), polygonY.min(), polygonX.max(), polygonY.max()))
+            else:
+                bbox.append((np.inf, np.inf, -np.inf, -np.inf))
+
+        self.polygonOffsets = np.array(polygonOffsets, dtype="int64")
+        self.ringOffsets = np.array(ringOffsets, dtype="int64")
+        self.xs = np.concatenate(xs) if xs else np.zeros(0)
+        self.ys = np.concatenate(ys) if ys else np.zeros(0)
+        self.bbox = np.array(bbox, dtype="float64").reshape(-1, 4)
+
+    def __len__(self):
+        return len(self.bbox)
+
+    @property
+    def extent(self):
+        return (self.bbox[:, 0].min(), self.bbox[:, 1].min(), self.bbox[:, 2].max(), self.bbox[:, 3].max())
+
+    def polygonRings(self, i):
+        for j in range(self.polygonOffsets[i], self.polygonOffsets[i+1]):
+            start, end = self.ringOffsets[j], self.ringOffsets[j+1]
+            yield self.xs[start:end], self.ys[start:end]
+
+    def contains(self, i, x, y):
+        """
+        Purpose: Boolean array of the points inside polygon i (even-odd rule over all the rings of the polygon)
+        """
+        inside = np.zeros(len(x), dtype=bool)
+        for ringX, ringY in self.polygonRings(i):
+            inside ^= pointsInRing(x, y, ringX, ringY)
+        return inside
+
+    def distance(self, i, x, y):
+        """
+        Purpose: Distance of the points to polygon i. 0 for points inside the polygon
+        """
+        distance = np.full(len(x), np.inf)
+        for ringX, ringY in self.polygonRings(i):
+            distance = np.minimum(distance, distanceToRing(x, y, ringX, ringY))
+        distance[self.contains(i, x, y)] = 0
+        return distance
+
+    def join(self, x, y, polygons=None):
+        """
+        (array, array, optional: array) -> array, array
+
+        Purpose:
+        Finds every polygon each point falls in, like SpatialJoin_analysis with JOIN_ONE_TO_MANY and KEEP_COMMON.
+        Returns the index of the point and the index of the polygon for each match, sorted by point.
+        polygons: Optional indexes of the polygons to check. All polygons if not given
+        """
+        x = np.asarray(x, dtype="float64")
+        y = np.asarray(y, dtype="float64")
+        pointIndex = []
+        polygonIndex = []
+        for i in (range(len(self)) if polygons is None else polygons):
+            xMin, yMin, xMax, yMax = self.bbox[i]
+            candidates = np.nonzero((x >= xMin) & (x <= xMax) & (y >= yMin) & (y <= yMax))[0]
+            if len(candidates) == 0:
+                continue
+            hits = candidates[self.contains(i, x[candidates], y[candidates])]
+            pointIndex.append(hits)
+            polygonIndex.append(np.full(len(hits), i, dtype="int64"))
+        if not pointIndex:
+            return np.zeros(0, dtype="int64"), np.zeros(0, dtype="int64")
+        pointIndex = np.concatenate(pointIndex)
+        polygonIndex = np.concatenate(polygonIndex)
+        order = np.argsort(pointIndex, kind="stable")
+        return pointIndex[order], polygonIndex[order]
+
+
+class UWRZones(PolygonSet):
+    """
+    Purpose:
+    Polygons of the buffered uwr layer (output of createUWRBuffer). Each zone is one feature of the layer,
+    ie. one uwr and one buffer distance. zoneUWR is the integer code of the uwr of each zone in uwrKeys [(unit_no, unit_no_id)].
+
+    Inputs:
+    unitNo: List of unit numbers of the zones (eg. u-2-002)
+    unitNoId: List of unit number ids of the zones (eg. TO 32)
+    buffDist: Buffer distance of the zones (0 = in uwr)
+    rings: List of lists of rings for each zone. See PolygonSet
+    """
+
+    def __init__(self, unitNo, unitNoId, buffDist, rings):
+        PolygonSet.__init__(self, rings)
+        self.unitNo = list(unitNo)
+        self.unitNoId = list(unitNoId)
+        self.buffDist = np.asarray(buffDist, dtype="float64")
+
+        #integer code of the uwr of each zone
+        self.uwrKeys = []
+        uwrCodes = {}
+        zoneUWR = []
+        for key in zip(self.unitNo, self.unitNoId):
+            if key not in uwrCodes:
+                uwrCodes[key] = len(self.uwrKeys)
+                self.uwrKeys.append(key)
+            zoneUWR.append(uwrCodes[key])
+        self.zoneUWR = np.array(zoneUWR, dtype="int32")
+
+    def uwrID(self, i):
+        #unique uwr id as made in rawBuffer()
+        return flightPathAnalysis_Names.uwrUniqueID(self.unitNo[i], self.unitNoId[i])
+
+    def subset(self, uwrCodes):
+        #UWRZones with only the zones of some uwr (codes of this set). The subset has its own uwr codes, see uwrKeys
+        indexes = np.nonzero(np.isin(self.zoneUWR, uwrCodes))[0]
+        return UWRZones([self.unitNo[i] for i in indexes], [self.unitNoId[i] for i in indexes], self.buffDist[indexes],
+                        [[np.column_stack(ring) for ring in self.polygonRings(i)] for i in indexes])
+
+class ZoneGrid:
+    """
+    Purpose:
+    Zone label raster on the cells of a DEMGrid. labels[row, col] is the id of the set of zones of the cell:
+    - 0: no zone
+    - k > 0: every point of the cell is in all the zones of set k and in no other zone
+    - -k: the cell is crossed by the boundary of a zone of set k. Its points are checked exactly against the zones of the set
+    Zones of set k are setZones[setOffsets[k]:setOffsets[k+1]]. Most points fall in cells away from the boundaries,
+    so the zone join becomes a raster lookup.
+    The exact check uses the edges of each zone bucketed by DEM row: a point only crosses the edges of its row, so the
+    even-odd test costs a few edges per point instead of all the edges of the zone. It gives the same answer as
+    PolygonSet.contains().
+
+    Inputs:
+    dem: DEMGrid the labels are made on. Points are classified with the same cell lookup as the DEM sampling
+    zones: UWRZones of the buffered uwr
+    """
+
+    def __init__(self, dem, zones):
+        self.dem = dem
+        self.zones = zones
+        self.buildEdgeIndex()
+
+        nrows, ncols = dem.array.shape
+        labels = np.zeros((nrows, ncols), dtype="int32")
+        sets = [()] #zones of each set, sorted
+        setIds = {(): 0}
+        for i in range(len(zones)):
+            if self.zoneRowCount[i] == 0:
+                continue
+            rowStart, rowEnd, colStart, colEnd = self.windows[i]
+            boundary = self.boundaryCells(i)
+            covered = self.insideCells(i) | boundary
+            if not covered.any():
+                continue
+
+            #add zone i to the set of each covered cell. Only a few distinct sets are touched, so map old set -> new set
+            local = labels[rowStart:rowEnd, colStart:colEnd]
+            oldIds = np.abs(local[covered])
+            oldBoundary = local[covered] < 0
+            newIds = np.empty(len(oldIds), dtype="int32")
+            for oldId in np.unique(oldIds):
+                newSet = tuple(sorted(sets[oldId] + (i,)))
+                if newSet not in setIds:
+                    setIds[newSet] = len(sets)
+                    sets.append(newSet)
+                newIds[oldIds == oldId] = setIds[newSet]
+            local[covered] = np.where(oldBoundary | boundary[covered], -newIds, newIds)
+
+        self.labels = labels
+        self.setOffsets = np.zeros(len(sets) + 1, dtype="int64")
+        self.setOffsets[1:] = np.cumsum([len(z) for z in sets])
+        self.setZones = np.array([zone for z in sets for zone in z], dtype="int64")
+
+    def buildEdgeIndex(self):
+        """
+        Purpose:
+        Window of DEM cells under each zone and the edges of each zone bucketed by the DEM rows they span.
+        The edges of row r of zone i are rowEdges[rowOffsets[k]:rowOffsets[k+1]] with k = zoneRowBase[i] + r - zoneRowStart[i]
+        """
+        dem = self.dem
+        zones = self.zones
+        nrows, ncols = dem.array.shape
+        self.windows = []
+        self.zoneRowStart = np.zeros(len(zones), dtype="int64")
+        self.zoneRowCount = np.zeros(len(zones), dtype="int64")
+        x1 = zones.xs
+        y1 = zones.ys
+        #next vertex of each vertex in its ring
+        nextVertex = np.arange(1, len(x1) + 1)
+        nextVertex[zones.ringOffsets[1:] - 1] = zones.ringOffsets[:-1]
+        self.edgeX1, self.edgeY1 = x1, y1
+        self.edgeX2, self.edgeY2 = x1[nextVertex], y1[nextVertex]
+
+        rowKeys = []
+        rowEdges = []
+        rowBase = 0
+        for i in range(len(zones)):
+            xMin, yMin, xMax, yMax = zones.bbox[i]
+            colStart = max(int(np.floor((xMin - dem.xMin)/dem.cellSize)), 0)
+            colEnd = min(int(np.floor((xMax - dem.xMin)/dem.cellSize)) + 1, ncols)
+            rowStart = max(int(np.floor((dem.yMax - yMax)/dem.cellSize)), 0)
+            rowEnd = min(int(np.floor((dem.yMax - yMin)/dem.cellSize)) + 1, nrows)
+            if colStart >= colEnd or rowStart >= rowEnd:
+                self.windows.append(None)
+                continue
+            self.windows.append((rowStart, rowEnd, colStart, colEnd))
+            self.zoneRowStart[i] = rowStart
+            self.zoneRowCount[i] = rowEnd - rowStart
+
+            edges = np.arange(zones.ringOffsets[zones.polygonOffsets[i]], zones.ringOffsets[zones.polygonOffsets[i+1]])
+            top = np.maximum(self.edgeY1[edges], self.edgeY2[edges])
+            bottom = np.minimum(self.edgeY1[edges], self.edgeY2[edges])
+            firstRow = np.clip(np.floor((dem.yMax - top)/dem.cellSize).astype("int64"), rowStart, rowEnd - 1)
+            lastRow = np.clip(np.floor((dem.yMax - bottom)/dem.cellSize).astype("int64"), rowStart, rowEnd - 1)
+            spans = lastRow - firstRow + 1
+            edgeRepeat = np.repeat(np.arange(len(edges)), spans)
+            rows = np.repeat(firstRow, spans) + np.arange(len(edgeRepeat)) - np.repeat(np.cumsum(spans) - spans, spans)
+            rowKeys.append(rows - rowStart + rowBase)
+            rowEdges.append(edges[edgeRepeat])
+            rowBase += rowEnd - rowStart
+
+        self.zoneRowBase = np.zeros(len(zones), dtype="int64")
+        self.zoneRowBase[1:] = np.cumsum(self.zoneRowCount)[:-1]
+        rowKeys = np.concatenate(rowKeys) if rowKeys else np.zeros(0, dtype="int64")
+        rowEdges = np.concatenate(rowEdges) if rowEdges else np.zeros(0, dtype="int64")
+        order = np.argsort(rowKeys, kind="stable")
+        self.rowEdges = rowEdges[order]
+        self.rowOffsets = np.zeros(int(self.zoneRowCount.sum()) + 1, dtype="int64")
+        self.rowOffsets[1:] = np.cumsum(np.bincount(rowKeys, minlength=int(self.zoneRowCount.sum())))
+
+    def crossings(self, key, x, y):
+        """
+        Purpose: Even-odd test of points against the edges of the row buckets key (one bucket per point)
+        """
+        counts = self.rowOffsets[key + 1] - self.rowOffsets[key]
+        pointIndex = np.repeat(np.arange(len(key)), counts)
+        edge = self.rowEdges[np.repeat(self.rowOffsets[key], counts) + np.arange(len(pointIndex)) - np.repeat(np.cumsum(counts) - counts, counts)]
+        px = x[pointIndex]
+        py = y[pointIndex]
+        ex1, ey1, ex2, ey2 = self.edgeX1[edge], self.edgeY1[edge], self.edgeX2[edge], self.edgeY2[edge]
+        straddle = (ey1 > py) != (ey2 > py)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            xCross = ex1 + (py - ey1) * (ex2 - ex1) / (ey2 - ey1)
+        crossing = straddle & (px < xCross)
+        return np.bincount(pointIndex, weights=crossing, minlength=len(key)).astype("int64") % 2 == 1
+
+    def containsPoints(self, zoneIndex, x, y, row):
+        #exact point in zone test for points in DEM row `row` of the window of their zone
+        return self.crossings(self.zoneRowBase[zoneIndex] + row - self.zoneRowStart[zoneIndex], x, y)
+
+    def insideCells(self, i):
+        #boolean array of the cells of the window of zone i whose center is in the zone
+        dem = self.dem
+        rowStart, rowEnd, colStart, colEnd = self.windows[i]
+        cols, rows = np.meshgrid(np.arange(colStart, colEnd), np.arange(rowStart, rowEnd))
+        centerX = dem.xMin + (cols.reshape(-1) + 0.5)*dem.cellSize
+        centerY = dem.yMax - (rows.reshape(-1) + 0.5)*dem.cellSize
+        return self.containsPoints(np.full(len(centerX), i), centerX, centerY, rows.reshape(-1)).reshape(rows.shape)
+
+    def boundaryCells(self, i):
+        """
+        Purpose: Boolean array of the cells of the window of zone i crossed by an edge of the zone. The edges are sampled
+        every half cell and the cells hit are grown by one cell, so cells an edge only clips at a corner are included too.
+        """
+        dem = self.dem
+        rowStart, rowEnd, colStart, colEnd = self.windows[i]
+        boundary = np.zeros((rowEnd - rowStart + 2, colEnd - colStart + 2), dtype=bool)
+        edges = np.arange(self.zones.ringOffsets[self.zones.polygonOffsets[i]], self.zones.ringOffsets[self.zones.polygonOffsets[i+1]])
+        x1, y1, x2, y2 = self.edgeX1[edges], self.edgeY1[edges], self.edgeX2[edges], self.edgeY2[edges]
+        steps = np.maximum(np.ceil(np.hypot(x2 - x1, y2 - y1)/(dem.cellSize/2)).astype("int64"), 1)
+        edge = np.repeat(np.arange(len(x1)), steps)
+        t = (np.arange(len(edge)) - np.repeat(np.cumsum(steps) - steps, steps))/steps[edge]
+        x = x1[edge] + t*(x2[edge] - x1[edge])
+        y = y1[edge] + t*(y2[edge] - y1[edge])
+        col = np.floor((x - dem.xMin)/dem.cellSize).astype("int64") - colStart + 1
+        row = np.floor((dem.yMax - y)/dem.cellSize).astype("int64") - rowStart + 1
+        inWindow = (col >= 0) & (col < boundary.shape[1]) & (row >= 0) & (row < boundary.shape[0])
+        boundary[row[inWindow], col[inWindow]] = True
+        grown = boundary.copy()
+        grown[1:, :] |= boundary[:-1, :]
+        grown[:-1, :] |= boundary[1:, :]
+        grown[:, 1:] |= grown[:, :-1].copy()
+        grown[:, :-1] |= grown[:, 1:].copy()
+        return grown[1:-1, 1:-1]
+
+    def classify(self, x, y, elevation):
+        """
+        (array, array, array) -> array, array, array, array
+
+        Purpose:
+        Fused DEM sampling, AGL, < 500m filter and zone join. The cell of each point is found once and gives both
+        its DEM value and its zone label. Points above 500m AGL or outside every zone are dropped before the join.
+        Returns the point index, zone index, DEM elevation and AGL of each match, sorted by point like PolygonSet.join()
+        """
+        dem = self.dem
+        nrows, ncols = dem.array.shape
+        col = ((x - dem.xMin)/dem.cellSize).astype("int64")
+        row = ((dem.yMax - y)/dem.cellSize).astype("int64")
+        inside = (x >= dem.xMin) & (col < ncols) & (y <= dem.yMax) & (row < nrows)
+        cell = np.where(inside, row*ncols + col, 0)
+        demElev = dem.array.reshape(-1)[cell]
+        label = np.where(inside, self.labels.reshape(-1)[cell], 0)
+        agl = np.rint(np.maximum(elevation - demElev, 0))
+        candidates = np.nonzero((label != 0) & (agl < maxAGL))[0] #nan AGL (no DEM value) is dropped too
+
+        #one row per candidate point and zone of its set
+        setId = np.abs(label[candidates])
+        counts = self.setOffsets[setId + 1] - self.setOffsets[setId]
+        pointIndex = np.repeat(candidates, counts)
+        zoneIndex = self.setZones[np.repeat(self.setOffsets[setId], counts) + np.arange(len(pointIndex)) - np.repeat(np.cumsum(counts) - counts, counts)]
+
+        #exact check of the points of boundary cells
+        check = np.nonzero(label[pointIndex] < 0)[0]
+        if len(check):
+            checkPoints = pointIndex[check]
+            keep = np.ones(len(pointIndex), dtype=bool)
+            keep[check] = self.containsPoints(zoneIndex[check], x[checkPoints], y[checkPoints], row[checkPoints])
+            pointIndex = pointIndex[keep]
+            zoneIndex = zoneIndex[keep]
+        return pointIndex, zoneIndex, demElev[pointIndex], agl[pointIndex]
+
+def pointsInRing(x, y, ringX, ringY, blockSize=4000000):
+    """
+    Purpose: Crossing number test of points against one ring. Compiled with numba when it is installed, in numpy blocks
+    so that points x edges stays under blockSize otherwise (see flightPathAnalysis_Kernels)
+    """
+    return flightPathAnalysis_Kernels.pointsInRing(x, y, ringX, ringY, blockSize)
+
+def distanceToRing(x, y, ringX, ringY, blockSize=4000000):
+    """
+    Purpose: Shortest distance of points to the edges of one ring. The edges are done in blocks like pointsInRing()
+    """
+    distance = np.full(len(x), np.inf)
+    if len(x) == 0 or len(ringX) < 2:
+        return distance
+    x1 = ringX
+    y1 = ringY
+    x2 = np.roll(ringX, -1)
+    y2 = np.roll(ringY, -1)
+    edgesPerBlock = max(1, blockSize // len(x))
+    px = x[:, None]
+    py = y[:, None]
+    for start in range(0, len(x1), edgesPerBlock):
+        end = start + edgesPerBlock
+        ex1, ey1 = x1[start:end], y1[start:end]
+        dx, dy = x2[start:end] - ex1, y2[start:end] - ey1
+        lengthSq = dx*dx + dy*dy
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.clip(((px - ex1) * dx + (py - ey1) * dy) / lengthSq, 0, 1)
+        t = np.where(lengthSq > 0, t, 0)
+        cx = ex1 + t * dx - px
+        cy = ey1 + t * dy - py
+        distance = np.minimum(distance, np.sqrt(cx*cx + cy*cy).min(axis=1))
+    return distance
+
+def polygonToRings(polygon):
+    """
+    Purpose: List of (n, 2) arrays of the rings of an arcpy polygon geometry
+    """
+    rings = []
+    for part in polygon:
+        ring = []
+        for pnt in part:
+            if pnt is None: #None separates the rings of a part
+                if len(ring) > 2:
+                    rings.append(np.array(ring))
+                ring = []
+            else:
+                ring.append((pnt.X, pnt.Y))
+        if len(ring) > 2:
+            rings.append(np.array(ring))
+    return rings
+
+def loadUWRZones(uwrBuffered, unit_no, unit_no_id, query=None):
+    """
+    (string, string, string, optional: string) -> UWRZones
+
+    Inputs:
+    uwrBuffered: Full path to feature class of buffered uwr. output of flightPathAnalysis_Functions.createUWRBuffer()
+    unit_no: field for unit number (eg. u-2-002)
+    unit_no_id: field for unit number id (eg. TO 32)
+    query: Optional where clause to read only some of the uwr
+
+    Purpose: Reads the rings of the buffered uwr into a UWRZones. Coordinates are in the layer's projection (BC Albers)
+    """
+    import arcpy
+
+    unitNo = []
+    unitNoId = []
+    buffDist = []
+    rings = []
+    with arcpy.da.SearchCursor(uwrBuffered, ["SHAPE@", "BUFF_DIST", unit_no, unit_no_id], query) as cursor:
+        for row in cursor:
+            rings.append(polygonToRings(row[0]))
+            buffDist.append(row[1])
+            unitNo.append(row[2])
+            unitNoId.append(row[3])
+    del cursor
+    return UWRZones(unitNo, unitNoId, buffDist, rings)
+
+
+def classifyTracks(tracks, dem, zones, IncursionSeverity, grid=None, membership=False):
+    """
+    (list, DEMGrid, UWRZones, dictionary, optional: ZoneGrid, boolean) -> PointTable, list
+
+    Inputs:
+    tracks: List of flight tracks. See flightPathAnalysis_Tracks.readGPX()
+    dem: DEMGrid covering the uwr zones (or TiledDEM around them)
+    zones: UWRZones of the buffered uwr
+    IncursionSeverity: Dictionary of buffer distance and incursion severity category ie. {500: "High", 1000: "Moderate}
+    grid: Optional ZoneGrid of the dem and zones. Runs the fused kernel (ZoneGrid.classify()) with the same results
+    membership: Return a PointMembership (see classifyMembership()) instead of a PointTable
+
+    Output:
+    - PointTable of the flight points in uwr zones below 500m. A point is repeated for every uwr zone it is in,
+    like the point feature class of getFlightLinePoints(). With membership, a PointMembership of the same points
+    - list of names of the flights with 0 or 1 points
+
+    Purpose: Runs DEM extraction, AGL, the < 500m filter, the height range and the uwr zone join of getFlightLinePoints()
+    in one go on arrays.
+    """
+    severities = flightPathAnalysis_PointTable.severityTable(IncursionSeverity)
+
+    names = []
+    timeIntervals = []
+    totalTimes = []
+    parts = {"lon": [], "lat": [], "ele": [], "time": [], "flight": []}
+    problemFlights = []
+    for track in tracks:
+        timeInterval, totalFlightTime = flightPathAnalysis_Tracks.flightTimeInterval(track)
+        if timeInterval is None:
+            problemFlights.append(track["name"])
+            continue
+        parts["lon"].append(track["lon"])
+        parts["lat"].append(track["lat"])
+        parts["ele"].append(track["ele"])
+        parts["time"].append(track["time"])
+        parts["flight"].append(np.full(len(track["lon"]), len(names), dtype="int32"))
+        names.append(track["name"])
+        timeIntervals.append(timeInterval)
+        totalTimes.append(totalFlightTime)
+
+    if not names:
+        table = flightPathAnalysis_PointTable.PointTable(np.zeros(0, dtype=flightPathAnalysis_PointTable.pointDtype), [], [], [],
+                                                         zones.uwrKeys, severities, heightRangeLabels)
+        return (table.membership() if membership else table), problemFlights
+
+    x, y = projectToBCAlbers(np.concatenate(parts["lon"]), np.concatenate(parts["lat"]))
+    pointArgs = (x, y, np.concatenate(parts["ele"]), np.concatenate(parts["time"]), np.concatenate(parts["flight"]), dem, zones, severities, grid)
+    if membership:
+        points, offsets, memberUWR, memberSeverity = classifyMembership(*pointArgs)
+        table = flightPathAnalysis_PointTable.PointMembership(points, offsets, memberUWR, memberSeverity, names, timeIntervals, totalTimes,
+                                                              zones.uwrKeys, severities, heightRangeLabels)
+    else:
+        table = flightPathAnalysis_PointTable.PointTable(classifyPoints(*pointArgs), names, timeIntervals, totalTimes, zones.uwrKeys,
+                                                         severities, heightRangeLabels)
+    return table, problemFlights
+
+def zoneMatches(x, y, elevation, dem, zones, grid=None):
+    #point index, zone index, DEM elevation and AGL of each point and uwr zone it is in below 500m AGL, sorted by point
+    if grid is not None:
+        return grid.classify(x, y, elevation)
+    #zone join first. points outside every zone are dropped by KEEP_COMMON anyway, so the DEM is only read for the others
+    pointIndex, zoneIndex = zones.join(x, y)
+    uniquePoints, inverse = np.unique(pointIndex, return_inverse=True)
+    uniqueDEM = dem.sample(x[uniquePoints], y[uniquePoints])
+    uniqueAGL = np.rint(np.maximum(elevation[uniquePoints] - uniqueDEM, 0))
+
+    keep = (uniqueAGL < maxAGL)[inverse] #nan AGL (no DEM value) is dropped too
+    return pointIndex[keep], zoneIndex[keep], uniqueDEM[inverse[keep]], uniqueAGL[inverse[keep]]
+
+def severityCodes(severities, buffDist):
+    #code in severities (sorted by buffer distance) of each buffer distance. A buffer distance that is not a key of
+    # IncursionSeverity is an error, like the IncursionSeverity[BUFF_DIST] lookup of getFlightLinePoints()
+    severityBuffDist = np.array([s[0] for s in severities])
+    codes = np.searchsorted(severityBuffDist, buffDist)
+    found = codes < len(severityBuffDist)
+    found[found] = severityBuffDist[codes[found]] == buffDist[found]
+    if not found.all():
+        raise ValueError("buffer distance " + str(buffDist[~found][0]) + " of the uwr zones is not in IncursionSeverity")
+    return codes
+
+def classifyPoints(x, y, elevation, time, flight, dem, zones, severities, grid=None):
+    """
+    (array, array, array, array, array, DEMGrid, UWRZones, list, optional: ZoneGrid) -> array
+
+    Purpose: The steps of classifyTracks() on points already projected to BC Albers. flight is the flight code of each
+    point and severities the list of flightPathAnalysis_PointTable.severityTable(). Returns the points with
+    flightPathAnalysis_PointTable.pointDtype, one row per uwr zone of each point.
+    """
+    pointIndex, zoneIndex, demElev, agl = zoneMatches(x, y, elevation, dem, zones, grid)
+
+    points = np.zeros(len(pointIndex), dtype=flightPathAnalysis_PointTable.pointDtype)
+    points["x"] = x[pointIndex]
+    points["y"] = y[pointIndex]
+    points["time"] = time[pointIndex]
+    points["elevation"] = elevation[pointIndex]
+    points["demElev"] = demElev
+    points["agl"] = agl
+    points["heightRange"] = agl > heightRangeSplit
+    points["severity"] = severityCodes(severities, zones.buffDist[zoneIndex])
+    points["flight"] = flight[pointIndex]
+    points["uwr"] = zones.zoneUWR[zoneIndex]
+    return points
+
+def classifyMembership(x, y, elevation, time, flight, dem, zones, severities, grid=None):
+    """
+    (array, array, array, array, array, DEMGrid, UWRZones, list, optional: ZoneGrid) -> array, array, array, array
+
+    Purpose: The steps of classifyPoints() with each point kept once. Returns the points with
+    flightPathAnalysis_PointTable.uniquePointDtype, the CSR offsets of their members, and the uwr and severity code of
+    each member (see flightPathAnalysis_PointTable.PointMembership). The matches of zoneMatches() are sorted by point,
+    so the members of a point are already together.
+    """
+    pointIndex, zoneIndex, demElev, agl = zoneMatches(x, y, elevation, dem, zones, grid)
+
+    first = np.ones(len(pointIndex), dtype=bool)
+    first[1:] = pointIndex[1:] != pointIndex[:-1]
+    starts = np.flatnonzero(first)
+    unique = pointIndex[starts]
+
+    points = np.zeros(len(unique), dtype=flightPathAnalysis_PointTable.uniquePointDtype)
+    points["x"] = x[unique]
+    points["y"] = y[unique]
+    points["time"] = time[unique]
+    points["elevation"] = elevation[unique]
+    points["demElev"] = demElev[starts]
+    points["agl"] = agl[starts]
+    points["heightRange"] = agl[starts] > heightRangeSplit
+    points["flight"] = flight[unique]
+    offsets = np.append(starts, len(pointIndex)).astype("int64")
+    return points, offsets, zones.zoneUWR[zoneIndex], severityCodes(severities, zones.buffDist[zoneIndex])
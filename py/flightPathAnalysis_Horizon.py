@@ -0,0 +1,372 @@
+### horizon tables for terrain masking used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# Alternative to the polygon minElevViewshed used by LOS_Analysis(). For each uwr a table of horizon slopes is made once
+# from observer cells picked like makeViewshed() (uwr vertices and uwr cells higher than the lowest vertex, 1m observer
+# offset like the Viewshed_3d default). For each observer, azimuth bin and distance bin the table keeps the steepest
+# terrain slope (rise/run) seen from the observer before the distance bin. A point at (x, y, AGL) is visible from an
+# observer if the slope to it is at least the table value of its azimuth and distance bins, and it is terrain masked if
+# no observer sees it. Masking a point is then a table lookup and a compare for each observer.
+# Distance bins grow geometrically (binGrowth) from one DEM cell and slopes are float16, so a table takes about
+# maxObservers x azimuthCount x ~50 x 2 bytes (~0.8MB with the defaults) and every uwr fits in memory.
+# Terrain is only read inside the biggest buffer of the uwr, like the clipped DEM of makeViewshed(). Terrain between the
+# start of the distance bin of a point and the point is not checked, so results are validated against the viewshed
+# polygons with compareMasking().
+# Class: HorizonTable - horizon slopes of one uwr
+# Function: buildHorizonTable - makes the table of one uwr from a DEMGrid and UWRZones
+# Function: horizonMaskPoints - same output as flightPathAnalysis_Masking.maskPoints() with horizon tables
+# Function: compareMasking - agreement of horizon masking with the minElevViewshed polygons on a set of points
+
+import datetime
+import json
+import os
+import numpy as np
+
+import flightPathAnalysis_Geometry
+import flightPathAnalysis_Masking
+import flightPathAnalysis_Names
+import flightPathAnalysis_Pipeline
+import flightPathAnalysis_PointTable
+
+
+class HorizonTable:
+    """
+    Purpose: Horizon slopes of one uwr.
+
+    Inputs:
+    uwrID: unique uwr id
+    observerX, observerY, observerZ: Coordinates and elevation (DEM + offset) of the observers
+    slopes: (observers, azimuthCount, distance bins) array of the steepest slope seen before each distance bin. -inf if none
+    edges: Start distance of each distance bin, plus the end of the last bin
+    """
+
+    def __init__(self, uwrID, observerX, observerY, observerZ, slopes, edges):
+        self.uwrID = uwrID
+        self.observerX = np.asarray(observerX, dtype="float64")
+        self.observerY = np.asarray(observerY, dtype="float64")
+        self.observerZ = np.asarray(observerZ, dtype="float64")
+        self.slopes = slopes
+        self.edges = np.asarray(edges, dtype="float64")
+
+    @property
+    def azimuthCount(self):
+        return self.slopes.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.slopes.nbytes + self.edges.nbytes + 3*self.observerX.nbytes
+
+    def visible(self, x, y, z):
+        """
+        Purpose: Boolean array of the points (elevation z) seen by at least one observer. Points past the last distance
+        bin of an observer are outside the viewshed area and count as visible (not masked), like points outside the
+        minElevViewshed polygons.
+        """
+        visible = np.zeros(len(x), dtype=bool)
+        lastBin = len(self.edges) - 2
+        binWidth = 2*np.pi/self.azimuthCount
+        #each observer only checks the points no observer has seen yet
+        pending = np.arange(len(x))
+        for o in range(len(self.observerX)):
+            if len(pending) == 0:
+                break
+            dx = x[pending] - self.observerX[o]
+            dy = y[pending] - self.observerY[o]
+            distance = np.hypot(dx, dy)
+            azimuth = (np.floor(np.mod(np.arctan2(dx, dy), 2*np.pi)/binWidth).astype("int64")) % self.azimuthCount
+            distanceBin = np.searchsorted(self.edges, distance, side="right") - 1
+            inTable = (distance > 0) & (distanceBin <= lastBin)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                slope = (z[pending] - self.observerZ[o])/distance
+            horizon = self.slopes[o, azimuth, np.minimum(distanceBin, lastBin)]
+            seen = ~inTable | (slope >= horizon)
+            visible[pending[seen]] = True
+            pending = pending[~seen]
+        return visible
+
+def distanceEdges(cellSize, maxDistance, binGrowth):
+    #distance bins starting at one cell wide and growing by binGrowth, up to maxDistance
+    edges = [0.0]
+    width = cellSize
+    while edges[-1] < maxDistance:
+        edges.append(edges[-1] + width)
+        width *= binGrowth
+    return np.array(edges)
+
+def uwrCells(dem, zones, zoneIndexes, window):
+    #boolean array of the cells of the window whose center is in any of the zones
+    rowStart, rowEnd, colStart, colEnd = window
+    cols, rows = np.meshgrid(np.arange(colStart, colEnd), np.arange(rowStart, rowEnd))
+    centerX = dem.xMin + (cols.reshape(-1) + 0.5)*dem.cellSize
+    centerY = dem.yMax - (rows.reshape(-1) + 0.5)*dem.cellSize
+    inside = np.zeros(len(centerX), dtype=bool)
+    for i in zoneIndexes:
+        inside |= zones.contains(i, centerX, centerY)
+    return inside.reshape(rows.shape), centerX.reshape(rows.shape), centerY.reshape(rows.shape)
+
+def pickObservers(vertexX, vertexY, cellX, cellY, cellZ, maxObservers):
+    """
+    Purpose: Indexes of the vertices and cells used as observers. Half of maxObservers goes to vertices spread evenly
+    along the boundary, the rest to the highest cells, which see the most terrain.
+    """
+    vertexCount = min(len(vertexX), max(maxObservers//2, maxObservers - len(cellX)))
+    vertices = np.unique(np.linspace(0, len(vertexX) - 1, vertexCount).round().astype("int64")) if vertexCount else np.zeros(0, dtype="int64")
+    cells = np.argsort(-cellZ, kind="stable")[:maxObservers - len(vertices)]
+    return vertices, np.sort(cells)
+
+def uwrWindow(dem, zones, uwrCode):
+    #rows and columns of the DEM cells under the biggest buffer of a uwr
+    zoneIndexes = np.nonzero(zones.zoneUWR == uwrCode)[0]
+    xMin, yMin = zones.bbox[zoneIndexes, 0].min(), zones.bbox[zoneIndexes, 1].min()
+    xMax, yMax = zones.bbox[zoneIndexes, 2].max(), zones.bbox[zoneIndexes, 3].max()
+    nrows, ncols = dem.array.shape
+    return (max(int(np.floor((dem.yMax - yMax)/dem.cellSize)), 0), min(int(np.floor((dem.yMax - yMin)/dem.cellSize)) + 1, nrows),
+            max(int(np.floor((xMin - dem.xMin)/dem.cellSize)), 0), min(int(np.floor((xMax - dem.xMin)/dem.cellSize)) + 1, ncols))
+
+def uwrTerrain(dem, zones, uwrCode):
+    """
+    Purpose: Window of a uwr (see uwrWindow()) and its DEM values inside the biggest buffer, nan outside,
+    like the DEM clipped to the buffer in makeViewshed()
+    """
+    window = uwrWindow(dem, zones, uwrCode)
+    rowStart, rowEnd, colStart, colEnd = window
+    inBuffer = uwrCells(dem, zones, np.nonzero(zones.zoneUWR == uwrCode)[0], window)[0]
+    return window, np.where(inBuffer, dem.array[rowStart:rowEnd, colStart:colEnd], np.nan)
+
+def uwrObservers(dem, zones, uwrCode, maxObservers=None, observerOffset=1.0):
+    """
+    (DEMGrid, UWRZones, int, optional: int, float) -> array, array, array
+
+    Purpose: x, y and elevation (DEM + observerOffset) of the observers of a uwr, picked like makeViewshed():
+    the uwr vertices and the uwr cells higher than the lowest vertex. All of them if maxObservers is None,
+    else thinned with pickObservers()
+    """
+    window = uwrWindow(dem, zones, uwrCode)
+    rowStart, rowEnd, colStart, colEnd = window
+    zoneIndexes = np.nonzero(zones.zoneUWR == uwrCode)[0]
+    innerIndexes = zoneIndexes[zones.buffDist[zoneIndexes] == 0]
+    if len(innerIndexes) == 0:
+        #the observers are on the uwr itself (BUFF_DIST 0), eg. a filtered buffer layer can have only the buffers of a uwr
+        raise ValueError("uwr " + str(zones.uwrKeys[uwrCode]) + " has no BUFF_DIST 0 zone in the buffered uwr, no observers to pick")
+    vertexX = np.concatenate([zones.xs[zones.ringOffsets[j]:zones.ringOffsets[j+1]] for i in innerIndexes for j in range(zones.polygonOffsets[i], zones.polygonOffsets[i+1])])
+    vertexY = np.concatenate([zones.ys[zones.ringOffsets[j]:zones.ringOffsets[j+1]] for i in innerIndexes for j in range(zones.polygonOffsets[i], zones.polygonOffsets[i+1])])
+    vertexZ = dem.sample(vertexX, vertexY)
+    vertexX, vertexY, vertexZ = vertexX[~np.isnan(vertexZ)], vertexY[~np.isnan(vertexZ)], vertexZ[~np.isnan(vertexZ)]
+    inUWR, cellX, cellY = uwrCells(dem, zones, innerIndexes, window)
+    cellZ = dem.array[rowStart:rowEnd, colStart:colEnd]
+    high = inUWR & (cellZ > (np.min(vertexZ) if len(vertexZ) else -np.inf))
+    cellX, cellY, cellZ = cellX[high], cellY[high], cellZ[high].astype("float64")
+    if maxObservers is None:
+        vertices, cells = np.arange(len(vertexX)), np.arange(len(cellX))
+    else:
+        vertices, cells = pickObservers(vertexX, vertexY, cellX, cellY, cellZ, maxObservers)
+    observerX = np.concatenate([vertexX[vertices], cellX[cells]])
+    observerY = np.concatenate([vertexY[vertices], cellY[cells]])
+    observerZ = np.concatenate([vertexZ[vertices], cellZ[cells]]) + observerOffset
+    return observerX, observerY, observerZ
+
+def buildHorizonTable(dem, zones, uwrCode, maxObservers=32, azimuthCount=256, binGrowth=1.05, observerOffset=1.0):
+    """
+    (DEMGrid, UWRZones, int, optional: int, int, float, float) -> HorizonTable
+
+    Inputs:
+    dem: DEMGrid covering the biggest buffer of the uwr
+    zones: UWRZones of the buffered uwr
+    uwrCode: Index of the uwr in zones.uwrKeys
+    maxObservers: Most observers kept for the uwr
+    azimuthCount: Number of azimuth bins
+    binGrowth: Growth of the width of the distance bins
+    observerOffset: Height of the observers above the DEM (Viewshed_3d OFFSETA)
+
+    Purpose: Makes the horizon table of one uwr by marching rays from each observer over the DEM
+    """
+    window, terrain = uwrTerrain(dem, zones, uwrCode)
+    rowStart, rowEnd, colStart, colEnd = window
+    observerX, observerY, observerZ = uwrObservers(dem, zones, uwrCode, maxObservers, observerOffset)
+
+    maxDistance = np.hypot((colEnd - colStart)*dem.cellSize, (rowEnd - rowStart)*dem.cellSize)
+    edges = distanceEdges(dem.cellSize, maxDistance, binGrowth)
+    step = dem.cellSize/2
+    samples = np.arange(step, edges[-1] + step, step)
+    #last sample before the start of each bin
+    binSample = np.searchsorted(samples, edges[:-1], side="left") - 1
+    azimuth = (np.arange(azimuthCount) + 0.5)*2*np.pi/azimuthCount
+    sinAz = np.sin(azimuth)[:, None]
+    cosAz = np.cos(azimuth)[:, None]
+
+    slopes = np.full((len(observerX), azimuthCount, len(edges) - 1), -np.inf, dtype="float16")
+    for o in range(len(observerX)):
+        px = observerX[o] + samples*sinAz
+        py = observerY[o] + samples*cosAz
+        col = np.floor((px - dem.xMin)/dem.cellSize).astype("int64") - colStart
+        row = np.floor((dem.yMax - py)/dem.cellSize).astype("int64") - rowStart
+        inWindow = (col >= 0) & (col < colEnd - colStart) & (row >= 0) & (row < rowEnd - rowStart)
+        z = np.full(px.shape, np.nan)
+        z[inWindow] = terrain[row[inWindow], col[inWindow]]
+        slope = np.where(np.isnan(z), -np.inf, (z - observerZ[o])/samples)
+        steepest = np.maximum.accumulate(slope, axis=1)
+        valid = binSample >= 0
+        slopes[o][:, valid] = steepest[:, binSample[valid]]
+    return HorizonTable(flightPathAnalysis_Names.uwrUniqueID(*zones.uwrKeys[uwrCode]), observerX, observerY, observerZ, slopes, edges)
+
+def horizonMaskPoints(table, horizons):
+    """
+    (PointTable or PointMembership, dictionary) -> array, list
+
+    Purpose: Same output as flightPathAnalysis_Masking.maskPoints() with horizon tables {unique uwr id: HorizonTable}.
+    A point is masked if no observer of its uwr sees it at its AGL.
+    """
+    masked = np.zeros(len(table), dtype=bool)
+    noHorizon = []
+    for code, rows, points in table.uwrPoints():
+        uwr = table.uwrID(code)
+        if uwr not in horizons:
+            noHorizon.append(uwr)
+            continue
+        p = table.points[points]
+        z = p["demElev"].astype("float64") + p["agl"]
+        masked[rows] = ~horizons[uwr].visible(p["x"], p["y"], z)
+    return masked, noHorizon
+
+def benchmarkPoints(dem, zones, count, seed=0):
+    """
+    (DEMGrid, UWRZones, int, optional: int) -> PointTable
+
+    Purpose: Random points in the uwr zones with random AGL from 0 to 500m, to compare masking methods
+    """
+    rng = np.random.default_rng(seed)
+    xMin, yMin, xMax, yMax = zones.extent
+    x = rng.uniform(xMin, xMax, count)
+    y = rng.uniform(yMin, yMax, count)
+    pointIndex, zoneIndex = zones.join(x, y)
+    demElev = dem.sample(x[pointIndex], y[pointIndex])
+    keep = ~np.isnan(demElev)
+    pointIndex, zoneIndex, demElev = pointIndex[keep], zoneIndex[keep], demElev[keep]
+    severities = sorted(set((float(b), str(b)) for b in zones.buffDist))
+    points = np.zeros(len(pointIndex), dtype=flightPathAnalysis_PointTable.pointDtype)
+    points["x"] = x[pointIndex]
+    points["y"] = y[pointIndex]
+    points["demElev"] = demElev
+    points["agl"] = rng.integers(0, flightPathAnalysis_Geometry.maxAGL, len(pointIndex))
+    points["elevation"] = demElev + points["agl"]
+    points["severity"] = np.searchsorted([s[0] for s in severities], zones.buffDist[zoneIndex])
+    points["uwr"] = zones.zoneUWR[zoneIndex]
+    return flightPathAnalysis_PointTable.PointTable(points, ["benchmark"], [1.0], [float(len(points))], zones.uwrKeys, severities,
+                                                    flightPathAnalysis_Geometry.heightRangeLabels)
+
+def compareMasking(table, mask, horizons):
+    """
+    (PointTable, MinElevMask, dictionary) -> dictionary
+
+    Purpose: Agreement of horizon masking with the minElevViewshed polygons on the points of uwr that have both.
+    Returns the number of points compared, points where both agree, points only masked by the horizon tables and
+    points only masked by the viewshed polygons, overall and for each uwr.
+    """
+    viewshedMasked, noViewshed = flightPathAnalysis_Masking.maskPoints(table, mask)
+    horizonMasked, noHorizon = horizonMaskPoints(table, horizons)
+    skip = set(noViewshed) | set(noHorizon)
+    uwrIDs = [table.uwrID(code) for code in range(len(table.uwrKeys))]
+    compared = np.array([uwrIDs[code] not in skip for code in table.points["uwr"]], dtype=bool)
+
+    def counts(rows):
+        return {
+            "points": int(np.count_nonzero(rows)),
+            "agree": int(np.count_nonzero(rows & (viewshedMasked == horizonMasked))),
+            "horizonOnly": int(np.count_nonzero(rows & horizonMasked & ~viewshedMasked)),
+            "viewshedOnly": int(np.count_nonzero(rows & viewshedMasked & ~horizonMasked)),
+        }
+
+    report = counts(compared)
+    report["uwr"] = {}
+    for code in np.unique(table.points["uwr"][compared]):
+        report["uwr"][uwrIDs[code]] = counts(compared & (table.points["uwr"] == code))
+    report["skipped"] = sorted(skip)
+    return report
+
+def saveHorizons(horizons, path):
+    #npz file with the tables of all uwr
+    arrays = {}
+    meta = []
+    for n, uwr in enumerate(sorted(horizons)):
+        h = horizons[uwr]
+        meta.append(uwr)
+        arrays["observers_%d" % n] = np.stack([h.observerX, h.observerY, h.observerZ])
+        arrays["slopes_%d" % n] = h.slopes
+        arrays["edges_%d" % n] = h.edges
+    tempPath = path + ".tmp.npz"
+    np.savez(tempPath, meta=np.array(json.dumps(meta)), **arrays)
+    os.replace(tempPath, path)
+
+def loadHorizons(path):
+    horizons = {}
+    with np.load(path) as data:
+        for n, uwr in enumerate(json.loads(str(data["meta"]))):
+            observers = data["observers_%d" % n]
+            horizons[uwr] = HorizonTable(uwr, observers[0], observers[1], observers[2], data["slopes_%d" % n], data["edges_%d" % n])
+    return horizons
+
+def buildHorizons(DEM, uwrBuffered, unit_no, unit_no_id, horizonPath, query=None, maxObservers=32, azimuthCount=256, binGrowth=1.05):
+    """
+    (string, string, string, string, string, optional: string, int, int, float) -> dictionary
+
+    Inputs:
+    DEM: Full path to raster DEM
+    uwrBuffered: Full path to feature class of buffered uwr. output of flightPathAnalysis_Functions.createUWRBuffer()
+    unit_no: field for unit number (eg. u-2-002)
+    unit_no_id: field for unit number id (eg. TO 32)
+    horizonPath: Full path to the npz file for the tables
+    query: Optional where clause to make tables for only some of the uwr
+    maxObservers, azimuthCount, binGrowth: see buildHorizonTable()
+
+    Purpose: Makes the horizon table of every uwr and saves them. Returns {unique uwr id: HorizonTable}
+    """
+    starttime = datetime.datetime.now()
+    zones = flightPathAnalysis_Geometry.loadUWRZones(uwrBuffered, unit_no, unit_no_id, query)
+    dem = flightPathAnalysis_Geometry.loadDEM(DEM, zones.extent)
+    horizons = {}
+    for code in range(len(zones.uwrKeys)):
+        table = buildHorizonTable(dem, zones, code, maxObservers, azimuthCount, binGrowth)
+        horizons[table.uwrID] = table
+        print("made horizon table for", table.uwrID, "with", len(table.observerX), "observers,", round(table.nbytes/1e6, 2), "MB")
+    saveHorizons(horizons, horizonPath)
+    print("Runtime to make horizon tables: ", datetime.datetime.now() - starttime)
+    return horizons
+
+
+def main():
+    #raster DEM input
+    DEM = r"W:\srm\sry\Local\projlib\StewBase\Mountain_Goat\FlightLine_UWR_Analysis\test_May15\Input.gdb\bc_elevation_25m_bcalb_Clip2"
+
+    #feature class of buffered uwr. output of flightPathAnalysis_Functions.createUWRBuffer()
+    uwrBuffered = r"W:\srm\sry\Local\projlib\StewBase\Mountain_Goat\FlightLine_UWR_Analysis\testAllSkeena\testInputAll.gdb\tuwra_u6002_BufferFinal"
+
+    #agl viewshed feature class made by makeViewshed(). Used to validate the tables
+    minElevViewshed = r"W:\srm\sry\Local\projlib\StewBase\Mountain_Goat\FlightLine_UWR_Analysis\20200915\Output_20200915.gdb\minElevViewshed20200515"
+
+    #unit number field eg. u-2-002
+    unit_no = "TUWR_TAG"
+
+    #unit number id field eg. TO 60
+    unit_no_id = "UNIT_NO"
+
+    #uwr uniqud id field - field that combines uwr number and uwr unit number
+    uwr_unique_Field = "uwr_unique_id"
+
+    #file for the horizon tables and the validation report
+    generalFolder = r"W:\srm\sry\Local\projlib\StewBase\Mountain_Goat\FlightLine_UWR_Analysis\20200915"
+    horizonPath = os.path.join(generalFolder, "horizonTables.npz")
+
+    #number of random points of the benchmark set
+    benchmarkCount = 1000000
+
+    horizons = buildHorizons(DEM, uwrBuffered, unit_no, unit_no_id, horizonPath)
+
+    zones = flightPathAnalysis_Geometry.loadUWRZones(uwrBuffered, unit_no, unit_no_id)
+    dem = flightPathAnalysis_Geometry.loadDEM(DEM, zones.extent)
+    mask = flightPathAnalysis_Masking.loadMinElevMask(minElevViewshed, uwr_unique_Field)
+    report = compareMasking(benchmarkPoints(dem, zones, benchmarkCount), mask, horizons)
+    flightPathAnalysis_Pipeline.writeJSON(report, os.path.join(generalFolder, "horizonValidation.json"))
+    print("horizon masking agrees with the viewshed on", report["agree"], "of", report["points"], "points.",
+          report["horizonOnly"], "only masked by horizon,", report["viewshedOnly"], "only masked by viewshed")
+
+if __name__ == "__main__":
+    main()
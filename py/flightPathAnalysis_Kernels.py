@@ -0,0 +1,336 @@
+### compiled inner loops used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# The hot loops of the array path (line of sight sweeps, point in ring tests and bilinear DEM interpolation) written as
+# plain loops and compiled with numba when it is installed. The compiled kernels run in parallel over the cores (prange
+# over the points or cells). Without numba, the same functions are numpy versions that do the same arithmetic in the
+# same order, so the results are identical either way (checked by benchmarkKernels()).
+# Function: pointsInRing - crossing number test of points against one ring
+# Function: bilinearSample - bilinear interpolation of a DEM at points
+# Function: minimumVisibleAGL - minimum AGL for DEM cells to be seen by at least one observer (line of sight sweep)
+# Function: benchmarkKernels - runtime of the compiled and numpy versions of each kernel
+# numba is optional: pip install numba
+# update: Oct. 19, 2026 - minimumVisibleAGL() takes optional cell elevations that aren't their terrain values
+
+import time
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+#numba compiles loops over prange in parallel. Without numba the loop versions are only used to check the numpy versions
+prange = numba.prange if numba is not None else range
+
+
+def pointsInRingNumpy(x, y, ringX, ringY, blockSize=4000000):
+    """
+    Purpose: Crossing number test of points against one ring. The edges are done in blocks so that
+    points x edges stays under blockSize.
+    """
+    inside = np.zeros(len(x), dtype=bool)
+    if len(x) == 0 or len(ringX) < 3:
+        return inside
+    x1 = ringX
+    y1 = ringY
+    x2 = np.roll(ringX, -1)
+    y2 = np.roll(ringY, -1)
+    edgesPerBlock = max(1, blockSize // len(x))
+    px = x[:, None]
+    py = y[:, None]
+    for start in range(0, len(x1), edgesPerBlock):
+        end = start + edgesPerBlock
+        ex1, ey1, ex2, ey2 = x1[start:end], y1[start:end], x2[start:end], y2[start:end]
+        straddle = (ey1 > py) != (ey2 > py)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            xCross = ex1 + (py - ey1) * (ex2 - ex1) / (ey2 - ey1)
+        crossings = straddle & (px < xCross)
+        inside ^= (np.count_nonzero(crossings, axis=1) % 2).astype(bool)
+    return inside
+
+def pointsInRingLoop(x, y, ringX, ringY):
+    #loop version of pointsInRingNumpy(), one point per iteration
+    n = len(ringX)
+    inside = np.zeros(len(x), dtype=np.bool_)
+    if n < 3:
+        return inside
+    for i in prange(len(x)):
+        px = x[i]
+        py = y[i]
+        crossed = False
+        for e in range(n):
+            ex1 = ringX[e]
+            ey1 = ringY[e]
+            ex2 = ringX[(e + 1) % n]
+            ey2 = ringY[(e + 1) % n]
+            if (ey1 > py) != (ey2 > py):
+                if px < ex1 + (py - ey1) * (ex2 - ex1) / (ey2 - ey1):
+                    crossed = not crossed
+        inside[i] = crossed
+    return inside
+
+
+def bilinearSample(array, xMin, yMax, cellSize, x, y):
+    """
+    (array, float, float, float, array, array) -> array
+
+    Purpose: Bilinear interpolation of the DEM between the centers of the 4 nearest cells, like ExtractMultiValuesToPoints
+    with bilinear interpolation. Cells past the edge of the window are replaced by the edge cells. nan for points outside
+    the window or next to NoData cells.
+    """
+    return bilinearSampleKernel(array, float(xMin), float(yMax), float(cellSize), np.asarray(x, dtype="float64"), np.asarray(y, dtype="float64"))
+
+def bilinearSampleNumpy(array, xMin, yMax, cellSize, x, y):
+    nrows, ncols = array.shape
+    fx = (x - xMin)/cellSize - 0.5
+    fy = (yMax - y)/cellSize - 0.5
+    c0 = np.floor(fx)
+    r0 = np.floor(fy)
+    wx = fx - c0
+    wy = fy - r0
+    c0 = c0.astype("int64")
+    r0 = r0.astype("int64")
+    c1 = np.minimum(np.maximum(c0 + 1, 0), ncols - 1)
+    r1 = np.minimum(np.maximum(r0 + 1, 0), nrows - 1)
+    c0 = np.minimum(np.maximum(c0, 0), ncols - 1)
+    r0 = np.minimum(np.maximum(r0, 0), nrows - 1)
+    values = (array[r0, c0]*(1 - wx) + array[r0, c1]*wx)*(1 - wy) + (array[r1, c0]*(1 - wx) + array[r1, c1]*wx)*wy
+    outside = (x < xMin) | (x >= xMin + ncols*cellSize) | (y > yMax) | (y <= yMax - nrows*cellSize)
+    values[outside] = np.nan
+    return values
+
+def bilinearSampleLoop(array, xMin, yMax, cellSize, x, y):
+    #loop version of bilinearSampleNumpy(), one point per iteration
+    nrows, ncols = array.shape
+    values = np.empty(len(x))
+    for i in prange(len(x)):
+        if x[i] < xMin or x[i] >= xMin + ncols*cellSize or y[i] > yMax or y[i] <= yMax - nrows*cellSize:
+            values[i] = np.nan
+            continue
+        fx = (x[i] - xMin)/cellSize - 0.5
+        fy = (yMax - y[i])/cellSize - 0.5
+        c0 = np.floor(fx)
+        r0 = np.floor(fy)
+        wx = fx - c0
+        wy = fy - r0
+        c1 = min(max(int(c0) + 1, 0), ncols - 1)
+        r1 = min(max(int(r0) + 1, 0), nrows - 1)
+        c = min(max(int(c0), 0), ncols - 1)
+        r = min(max(int(r0), 0), nrows - 1)
+        values[i] = (np.float64(array[r, c])*(1 - wx) + np.float64(array[r, c1])*wx)*(1 - wy) + \
+                    (np.float64(array[r1, c])*(1 - wx) + np.float64(array[r1, c1])*wx)*wy
+    return values
+
+
+def minimumVisibleAGL(terrain, window, xMin, yMax, cellSize, row, col, observerX, observerY, observerZ, cellZ=None):
+    """
+    (array, tuple, float, float, float, array, array, array, array, array, optional: array) -> array
+
+    Purpose:
+    Line of sight sweep from the observers to DEM cells (row, col of the full DEM). For an observer, the line to the cell
+    center has to clear the terrain between them (sampled every half cell), so the height needed is observer elevation +
+    distance x steepest terrain slope - cell elevation, at least 0. The minimum over the observers is returned.
+    terrain is the DEM inside window (rowStart, rowEnd, colStart, colEnd), nan where the terrain is not used. nan for the
+    cells that are nan in terrain or outside the window.
+    cellZ is the elevation of the cells if it isn't their terrain value (eg. the lowest terrain of a block of cells,
+    flightPathAnalysis_Pyramid). The cells still don't block their own view.
+    """
+    rowStart, rowEnd, colStart, colEnd = window
+    terrain = np.asarray(terrain, dtype="float64")
+    row = np.asarray(row, dtype="int64")
+    col = np.asarray(col, dtype="int64")
+    if cellZ is None:
+        localRow, localCol = row - rowStart, col - colStart
+        inWindow = (localRow >= 0) & (localRow < terrain.shape[0]) & (localCol >= 0) & (localCol < terrain.shape[1])
+        cellZ = np.full(len(row), np.nan)
+        cellZ[inWindow] = terrain[localRow[inWindow], localCol[inWindow]]
+    return minimumVisibleAGLKernel(terrain, int(rowStart), int(colStart), float(xMin), float(yMax), float(cellSize), row, col,
+                                   np.asarray(observerX, dtype="float64"), np.asarray(observerY, dtype="float64"), np.asarray(observerZ, dtype="float64"),
+                                   np.asarray(cellZ, dtype="float64"))
+
+def minimumVisibleAGLNumpy(terrain, rowStart, colStart, xMin, yMax, cellSize, row, col, observerX, observerY, observerZ, cellZ, blockSize=2000000):
+    windowRows, windowCols = terrain.shape
+    localRow, localCol = row - rowStart, col - colStart
+    inWindow = (localRow >= 0) & (localRow < windowRows) & (localCol >= 0) & (localCol < windowCols)
+    cellZ = np.where(inWindow, cellZ, np.nan)
+    targetX = xMin + (col + 0.5)*cellSize
+    targetY = yMax - (row + 0.5)*cellSize
+
+    minAGL = np.full(len(row), np.inf)
+    minAGL[np.isnan(cellZ)] = np.nan
+    step = cellSize/2
+    for o in range(len(observerX)):
+        pending = np.nonzero(minAGL > 0)[0] #cells already seen at ground level can't get lower
+        if len(pending) == 0:
+            break
+        distance = np.hypot(targetX[pending] - observerX[o], targetY[pending] - observerY[o])
+        sampleCount = np.maximum(np.ceil(distance/step).astype("int64"), 1)
+        cellsPerBlock = max(1, blockSize // int(sampleCount.max()))
+        for start in range(0, len(pending), cellsPerBlock):
+            block = slice(start, start + cellsPerBlock)
+            p = pending[block]
+            k = sampleCount[block]
+            d = distance[block]
+            #samples along the line, not counting the observer and target ends
+            line = np.repeat(np.arange(len(p)), k - 1)
+            t = (np.arange(len(line)) - np.repeat(np.cumsum(k - 1) - (k - 1), k - 1) + 1)/k[line]
+            sx = observerX[o] + t*(targetX[p][line] - observerX[o])
+            sy = observerY[o] + t*(targetY[p][line] - observerY[o])
+            sRow = np.floor((yMax - sy)/cellSize).astype("int64")
+            sCol = np.floor((sx - xMin)/cellSize).astype("int64")
+            #the target cell itself does not block its own view
+            other = (sRow != row[p][line]) | (sCol != col[p][line])
+            sRow, sCol = sRow - rowStart, sCol - colStart
+            ok = other & (sRow >= 0) & (sRow < windowRows) & (sCol >= 0) & (sCol < windowCols)
+            z = np.full(len(line), np.nan)
+            z[ok] = terrain[sRow[ok], sCol[ok]]
+            with np.errstate(invalid="ignore"):
+                slope = np.where(np.isnan(z), -np.inf, (z - observerZ[o])/(t*d[line]))
+            steepest = np.full(len(p), -np.inf)
+            np.maximum.at(steepest, line, slope)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                targetSlope = (cellZ[p] - observerZ[o])/d
+                needed = np.maximum(observerZ[o] + d*np.maximum(steepest, targetSlope) - cellZ[p], 0)
+            needed[d == 0] = 0 #observer on the cell
+            minAGL[p] = np.fmin(minAGL[p], needed)
+    return minAGL
+
+def minimumVisibleAGLLoop(terrain, rowStart, colStart, xMin, yMax, cellSize, row, col, observerX, observerY, observerZ, cellZ):
+    #loop version of minimumVisibleAGLNumpy(), one cell per iteration
+    windowRows, windowCols = terrain.shape
+    step = cellSize/2
+    minAGL = np.empty(len(row))
+    for i in prange(len(row)):
+        localRow = row[i] - rowStart
+        localCol = col[i] - colStart
+        if localRow < 0 or localRow >= windowRows or localCol < 0 or localCol >= windowCols or np.isnan(cellZ[i]):
+            minAGL[i] = np.nan
+            continue
+        targetZ = cellZ[i]
+        targetX = xMin + (col[i] + 0.5)*cellSize
+        targetY = yMax - (row[i] + 0.5)*cellSize
+        best = np.inf
+        for o in range(len(observerX)):
+            if best <= 0:
+                break
+            d = np.hypot(targetX - observerX[o], targetY - observerY[o])
+            if d == 0:
+                best = 0.0
+                break
+            k = max(int(np.ceil(d/step)), 1)
+            steepest = -np.inf
+            for j in range(1, k):
+                t = j/k
+                sx = observerX[o] + t*(targetX - observerX[o])
+                sy = observerY[o] + t*(targetY - observerY[o])
+                sRow = int(np.floor((yMax - sy)/cellSize))
+                sCol = int(np.floor((sx - xMin)/cellSize))
+                if sRow == row[i] and sCol == col[i]:
+                    continue
+                sRow -= rowStart
+                sCol -= colStart
+                if sRow < 0 or sRow >= windowRows or sCol < 0 or sCol >= windowCols:
+                    continue
+                z = terrain[sRow, sCol]
+                if np.isnan(z):
+                    continue
+                slope = (z - observerZ[o])/(t*d)
+                if slope > steepest:
+                    steepest = slope
+            targetSlope = (targetZ - observerZ[o])/d
+            needed = max(observerZ[o] + d*max(steepest, targetSlope) - targetZ, 0.0)
+            if needed < best:
+                best = needed
+        minAGL[i] = best
+    return minAGL
+
+
+if numba is not None:
+    pointsInRingKernel = numba.njit(parallel=True, cache=True)(pointsInRingLoop)
+    bilinearSampleKernel = numba.njit(parallel=True, cache=True)(bilinearSampleLoop)
+    minimumVisibleAGLKernel = numba.njit(parallel=True, cache=True)(minimumVisibleAGLLoop)
+else:
+    pointsInRingKernel = None
+    bilinearSampleKernel = bilinearSampleNumpy
+    minimumVisibleAGLKernel = minimumVisibleAGLNumpy
+
+def pointsInRing(x, y, ringX, ringY, blockSize=4000000):
+    """
+    (array, array, array, array, optional: int) -> array
+
+    Purpose: Crossing number test of points against one ring, compiled when numba is installed. blockSize is only used
+    by the numpy version (see pointsInRingNumpy())
+    """
+    if pointsInRingKernel is None or len(x) == 0:
+        return pointsInRingNumpy(x, y, ringX, ringY, blockSize)
+    return pointsInRingKernel(np.asarray(x, dtype="float64"), np.asarray(y, dtype="float64"), np.asarray(ringX, dtype="float64"), np.asarray(ringY, dtype="float64"))
+
+
+def sameResults(a, b):
+    #identical arrays, nan equal to nan
+    return a.shape == b.shape and bool(np.all((a == b) | (np.isnan(a) & np.isnan(b)) if a.dtype.kind == "f" else a == b))
+
+def benchmarkKernels(pointCount=500000, cellCount=20000, demSize=800, observerCount=32, seed=0):
+    """
+    (optional: int, int, int, int, int) -> list
+
+    Purpose: Runtime of the numpy and compiled (numba) versions of each kernel on a synthetic DEM and ring, with the
+    speedup and whether the results are identical. Without numba, the loop versions run as plain python on a small
+    sample only to check the results, and no speedup is given.
+    """
+    rng = np.random.default_rng(seed)
+    cellSize = 25.0
+    yy, xx = np.mgrid[0:demSize, 0:demSize]
+    array = (300*np.sin(xx/37.0)*np.cos(yy/51.0) + 200*np.sin((xx + yy)/23.0) + 1000).astype("float32")
+    size = demSize*cellSize
+    angles = np.linspace(0, 2*np.pi, 400, endpoint=False)
+    radius = size/3*(1 + 0.2*np.sin(7*angles))
+    ringX = size/2 + radius*np.cos(angles)
+    ringY = size/2 + radius*np.sin(angles)
+    x = rng.uniform(0, size, pointCount)
+    y = rng.uniform(0, size, pointCount)
+    row = rng.integers(demSize//4, 3*demSize//4, cellCount)
+    col = rng.integers(demSize//4, 3*demSize//4, cellCount)
+    observerX = size/2 + rng.uniform(-size/8, size/8, observerCount)
+    observerY = size/2 + rng.uniform(-size/8, size/8, observerCount)
+    observerZ = bilinearSampleNumpy(array, 0.0, size, cellSize, observerX, observerY) + 1
+    terrain = array.astype("float64")
+    cellZ = terrain[row, col]
+
+    kernels = [
+        ("pointsInRing", pointsInRingNumpy, pointsInRingLoop, pointsInRingKernel if numba is not None else None, (x, y, ringX, ringY)),
+        ("bilinearSample", bilinearSampleNumpy, bilinearSampleLoop, bilinearSampleKernel if numba is not None else None, (array, 0.0, size, cellSize, x, y)),
+        ("minimumVisibleAGL", minimumVisibleAGLNumpy, minimumVisibleAGLLoop, minimumVisibleAGLKernel if numba is not None else None,
+         (terrain, 0, 0, 0.0, size, cellSize, row, col, observerX, observerY, observerZ, cellZ)),
+    ]
+    report = []
+    for name, numpyVersion, loopVersion, compiled, args in kernels:
+        starttime = time.perf_counter()
+        expected = numpyVersion(*args)
+        numpySeconds = time.perf_counter() - starttime
+        result = {"kernel": name, "numpySeconds": numpySeconds, "jitSeconds": None, "speedup": None}
+        if compiled is not None:
+            compiled(*args) #the first call compiles
+            starttime = time.perf_counter()
+            actual = compiled(*args)
+            result["jitSeconds"] = time.perf_counter() - starttime
+            result["speedup"] = numpySeconds/result["jitSeconds"]
+            result["identical"] = sameResults(expected, actual)
+        else:
+            #plain python loops on a sample of the points or cells
+            sample = slice(0, 2000 if name != "minimumVisibleAGL" else 200)
+            sampleArgs = list(args)
+            for i in ([0, 1] if name == "pointsInRing" else [4, 5] if name == "bilinearSample" else [6, 7, 11]):
+                sampleArgs[i] = args[i][sample]
+            result["identical"] = sameResults(numpyVersion(*sampleArgs), loopVersion(*sampleArgs))
+        report.append(result)
+        print(name, "numpy:", round(numpySeconds, 3), "s", "jit:", "numba not installed" if result["jitSeconds"] is None else str(round(result["jitSeconds"], 3)) + " s",
+              "speedup:", "-" if result["speedup"] is None else round(result["speedup"], 1), "identical:", result["identical"])
+    return report
+
+
+def main():
+    benchmarkKernels()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+### lazy partial viewsheds used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# makeViewshed() makes the viewshed of the whole biggest buffer of a uwr, even when only a few flight points in one corner
+# of the buffer need masking. LazyViewshed only computes the minimum AGL to be seen from the uwr (the value of the
+# agl raster of Viewshed_3d) for the DEM cells that have flight points, plus an optional neighbourhood of cells around
+# them, and keeps the computed cells in a sparse cache per uwr (one npz file per uwr). Later flights only compute the
+# cells that are not in the cache yet, so the first run costs grow with the cells flown over instead of the buffer area.
+# Observers are picked like makeViewshed() (flightPathAnalysis_Horizon.uwrObservers()) and terrain is read inside the
+# biggest buffer only. A point is terrain masked like in LOS_Analysis(): its AGL is lower than the integer minimum AGL
+# of its cell.
+# The cache file of a uwr is only reused if its key (flightPathAnalysis_ViewshedCache.viewshedKey() of the terrain window,
+# the uwr geometry and the observer settings) still matches, so a DEM or uwr edit only recomputes the uwr it touches.
+# update: Oct. 19, 2026 - optional coarse to fine sweep on a DEM pyramid (flightPathAnalysis_Pyramid), with the minimum
+# AGL capped at the highest AGL of the flight points
+# update: Oct. 19, 2026 - a LazyViewshed can be used from several threads (eg. the requests of flightPathAnalysis_Service):
+# the cache of each uwr is filled under its own lock and the cache files are written through unique temporary files
+# update: Oct. 19, 2026 - the DEM window over all the uwr is checked against maxDEMWindowMB before it is read (loadViewshedDEM())
+# Class: LazyViewshed - sparse minimum AGL cache of each uwr and the masking of point tables
+# Function: loadViewshedDEM - DEM window of a LazyViewshed, or SystemExit when it is over maxDEMWindowMB
+# Function: LOS_AnalysisLazy - LOS_Analysis() output (points that are not terrain masked) with lazy viewsheds
+
+import datetime
+import os
+import threading
+import numpy as np
+
+import flightPathAnalysis_Geometry
+import flightPathAnalysis_Horizon
+import flightPathAnalysis_Kernels
+import flightPathAnalysis_Names
+import flightPathAnalysis_PointTable
+import flightPathAnalysis_Pyramid
+import flightPathAnalysis_ViewshedCache
+
+
+class LazyViewshed:
+    """
+    Purpose: Minimum AGL for a DEM cell to be seen from a uwr, computed on demand and cached per uwr.
+
+    Inputs:
+    dem: DEMGrid covering the buffered uwr
+    zones: UWRZones of the buffered uwr
+    cacheFolder: Folder for the cache files. Nothing is written if None
+    neighbourhood: Cells around each flight cell computed at the same time (0 = only the flight cells)
+    maxObservers: Most observers of a uwr. All the observers of makeViewshed() if None
+    observerOffset: Height of the observers above the DEM (Viewshed_3d OFFSETA)
+    maxCacheBytes: Size limit of the cache folder. The least recently written files of other uwr are deleted when it is
+        over the limit. No limit if None
+    pyramid: Compute the cells with the coarse to fine sweep of flightPathAnalysis_Pyramid, capped at
+        flightPathAnalysis_Pyramid.flightPointMaxAGL (same masking of the flight points)
+    """
+
+    def __init__(self, dem, zones, cacheFolder=None, neighbourhood=1, maxObservers=None, observerOffset=1.0, maxCacheBytes=None, pyramid=False):
+        self.dem = dem
+        self.zones = zones
+        self.cacheFolder = cacheFolder
+        self.neighbourhood = neighbourhood
+        self.maxObservers = maxObservers
+        self.observerOffset = observerOffset
+        self.maxCacheBytes = maxCacheBytes
+        self.pyramid = pyramid
+        self.settings = {"lazy": True, "grid": [dem.xMin, dem.yMax, dem.cellSize], "maxObservers": maxObservers, "observerOffset": observerOffset}
+        if pyramid:
+            #capped values, kept apart from the caches of the full resolution sweep
+            self.settings["maxAGL"] = flightPathAnalysis_Pyramid.flightPointMaxAGL
+        #uwr code -> (sorted global cell ids, minimum AGL of the cells)
+        self.cache = {}
+        self.observers = {}
+        self.terrain = {}
+        self.pyramids = {}
+        #one lock per uwr for its cache, and one for the lock dictionary and the cache folder
+        self.lock = threading.Lock()
+        self.uwrLocks = {}
+        if cacheFolder is not None and not os.path.exists(cacheFolder):
+            os.makedirs(cacheFolder)
+
+    def uwrLock(self, uwrCode):
+        with self.lock:
+            return self.uwrLocks.setdefault(uwrCode, threading.Lock())
+
+    def cachePath(self, uwrCode):
+        return os.path.join(self.cacheFolder, flightPathAnalysis_Names.replaceNonAlphaNum(flightPathAnalysis_Names.uwrUniqueID(*self.zones.uwrKeys[uwrCode]), "_") + ".npz")
+
+    def cacheKey(self, uwrCode):
+        #key of the cache file of a uwr: its terrain window, geometry and the observer settings
+        window, terrain = self.uwrSetup(uwrCode, observers=False)
+        return flightPathAnalysis_ViewshedCache.viewshedKey(flightPathAnalysis_ViewshedCache.demChecksum(terrain), flightPathAnalysis_ViewshedCache.geometryHash(self.zones, uwrCode),
+                                                            dict(self.settings, window=[int(w) for w in window]), None)
+
+    def cached(self, uwrCode):
+        #cells of the cache of a uwr, read from its file the first time. Stale files (other key) are ignored
+        if uwrCode not in self.cache:
+            cells, values = np.zeros(0, dtype="int64"), np.zeros(0, dtype="float32")
+            if self.cacheFolder is not None and os.path.exists(self.cachePath(uwrCode)):
+                with np.load(self.cachePath(uwrCode)) as data:
+                    if "key" in data and str(data["key"]) == self.cacheKey(uwrCode):
+                        cells, values = data["cells"], data["minAGL"]
+            self.cache[uwrCode] = (cells, values)
+        return self.cache[uwrCode]
+
+    def saveCache(self, uwrCode):
+        if self.cacheFolder is None:
+            return
+        cells, values = self.cache[uwrCode]
+        path = self.cachePath(uwrCode)
+        #unique temporary file, other processes can write the same uwr at the same time
+        tempPath = path + "." + str(os.getpid()) + "_" + str(threading.get_ident()) + ".tmp.npz"
+        np.savez(tempPath, cells=cells, minAGL=values, key=self.cacheKey(uwrCode))
+        os.replace(tempPath, path)
+        if self.maxCacheBytes is not None:
+            with self.lock:
+                flightPathAnalysis_ViewshedCache.evictCacheFiles(self.cacheFolder, self.maxCacheBytes, keep=[os.path.basename(path)])
+
+    def uwrSetup(self, uwrCode, observers=True):
+        #observers and clipped terrain of a uwr, made once. Only the terrain if observers is False
+        if uwrCode not in self.terrain:
+            self.terrain[uwrCode] = flightPathAnalysis_Horizon.uwrTerrain(self.dem, self.zones, uwrCode)
+        if not observers:
+            return self.terrain[uwrCode]
+        if uwrCode not in self.observers:
+            self.observers[uwrCode] = flightPathAnalysis_Horizon.uwrObservers(self.dem, self.zones, uwrCode, self.maxObservers, self.observerOffset)
+        return self.observers[uwrCode], self.terrain[uwrCode]
+
+    def computeCells(self, uwrCode, cells):
+        """
+        (int, array) -> array
+
+        Purpose:
+        Minimum AGL for each cell (global cell id row*ncols + col) to be seen by at least one observer of the uwr
+        (flightPathAnalysis_Kernels.minimumVisibleAGL()). nan for cells outside the biggest buffer (not in the viewshed,
+        never masked).
+        """
+        (observerX, observerY, observerZ), (window, terrain) = self.uwrSetup(uwrCode)
+        row, col = np.divmod(cells, self.dem.array.shape[1])
+        if self.pyramid:
+            if uwrCode not in self.pyramids:
+                self.pyramids[uwrCode] = flightPathAnalysis_Pyramid.demPyramid(terrain)
+            minAGL = flightPathAnalysis_Pyramid.pyramidMinimumAGL(terrain, window, self.dem.xMin, self.dem.yMax, self.dem.cellSize, row, col,
+                                                                  observerX, observerY, observerZ, flightPathAnalysis_Pyramid.flightPointMaxAGL,
+                                                                  pyramid=self.pyramids[uwrCode])[0]
+            return minAGL.astype("float32")
+        return flightPathAnalysis_Kernels.minimumVisibleAGL(terrain, window, self.dem.xMin, self.dem.yMax, self.dem.cellSize, row, col,
+                                                            observerX, observerY, observerZ).astype("float32")
+
+    def minimumAGL(self, uwrCode, x, y):
+        """
+        (int, array, array) -> array
+
+        Purpose: Minimum AGL to be seen from the uwr for the cells of the points. The cells missing from the cache (and
+        their neighbourhood) are computed and added to the cache. Calls for the same uwr from several threads wait for
+        each other, so each cell is computed once.
+        """
+        with self.uwrLock(uwrCode):
+            return self.lockedMinimumAGL(uwrCode, x, y)
+
+    def lockedMinimumAGL(self, uwrCode, x, y):
+        #minimumAGL() with the lock of the uwr held
+        dem = self.dem
+        nrows, ncols = dem.array.shape
+        row, col = dem.cellIndex(x, y)
+        pointCells = np.where(row >= 0, row*ncols + col, -1)
+        cachedCells, cachedValues = self.cached(uwrCode)
+
+        wanted = np.unique(pointCells[pointCells >= 0])
+        if self.neighbourhood > 0:
+            offsets = np.arange(-self.neighbourhood, self.neighbourhood + 1)
+            wantedRow, wantedCol = np.divmod(wanted, ncols)
+            nearRow = (wantedRow[:, None, None] + offsets[None, :, None]).repeat(len(offsets), axis=2).reshape(-1)
+            nearCol = (wantedCol[:, None, None] + offsets[None, None, :]).repeat(len(offsets), axis=1).reshape(-1)
+            inside = (nearRow >= 0) & (nearRow < nrows) & (nearCol >= 0) & (nearCol < ncols)
+            wanted = np.unique(nearRow[inside]*ncols + nearCol[inside])
+        missing = wanted[~np.isin(wanted, cachedCells)]
+        if len(missing):
+            starttime = datetime.datetime.now()
+            cells = np.concatenate([cachedCells, missing])
+            values = np.concatenate([cachedValues, self.computeCells(uwrCode, missing)])
+            order = np.argsort(cells)
+            self.cache[uwrCode] = (cells[order], values[order])
+            self.saveCache(uwrCode)
+            cachedCells, cachedValues = self.cache[uwrCode]
+            print("computed viewshed of", len(missing), "cells for", self.zones.uwrKeys[uwrCode], "in", datetime.datetime.now() - starttime)
+
+        result = np.full(len(x), np.nan, dtype="float32")
+        found = pointCells >= 0
+        index = np.searchsorted(cachedCells, pointCells[found])
+        result[found] = cachedValues[np.minimum(index, len(cachedValues) - 1)] if len(cachedValues) else np.nan
+        return result
+
+    def maskPoints(self, table):
+        """
+        (PointTable or PointMembership) -> array, list
+
+        Purpose: Same output as flightPathAnalysis_Masking.maskPoints(). A point is masked if its AGL is lower than the
+        integer minimum AGL of its cell (the gridcode of the minElevViewshed polygons). Every uwr has a viewshed here.
+        """
+        masked = np.zeros(len(table), dtype=bool)
+        for code, rows, points in table.uwrPoints():
+            minAGL = self.minimumAGL(code, table.points["x"][points], table.points["y"][points])
+            with np.errstate(invalid="ignore"):
+                masked[rows] = table.points["agl"][points] < np.floor(minAGL)
+        return masked, []
+
+def loadViewshedDEM(DEM, zones, maxWindowMB=flightPathAnalysis_Geometry.maxDEMWindowMB):
+    """
+    (string, UWRZones, optional: float) -> DEMGrid
+
+    Purpose: DEM window over all the uwr zones for a LazyViewshed, which reads the terrain of each uwr out of one array.
+    The run stops before reading the window if it would take more than maxWindowMB
+    """
+    windowMB = flightPathAnalysis_Geometry.demWindowMB(DEM, zones.extent)
+    if windowMB > maxWindowMB:
+        raise SystemExit("DEM window over all the uwr would take " + str(round(windowMB)) + " MB, more than maxDEMWindowMB (" + str(maxWindowMB) +
+                         " MB). The lazy viewsheds need it in memory: run them on fewer uwr or raise maxDEMWindowMB")
+    return flightPathAnalysis_Geometry.loadDEM(DEM, zones.extent)
+
+def LOS_AnalysisLazy(uwrBuffered, DEM, unit_no_Field, unit_no_id_Field, allFlightPoints, LOS_uwrFlightPointsGDB, LOS_uwrFlightPoints, cacheFolder, neighbourhood=1, maxCacheMB=None,
+                     pyramid=False, maxDEMWindowMB=flightPathAnalysis_Geometry.maxDEMWindowMB):
+    """
+    (string, string, string, string, string, string, string, string, optional: int, optional: int, optional: boolean, float) -> None
+
+    Inputs:
+    uwrBuffered: Feature class of uwr with buffers
+    DEM: Raster DEM
+    unit_no_Field: field for unit number (eg. u-2-002)
+    unit_no_id_Field: field for unit number id (eg. TO 32)
+    allFlightPoints: Feature class of all flight points with uwr distinguished in column unit_no_Field
+    LOS_uwrFlightPointsGDB: Output gdb to store final point feature class after LOS analysis
+    LOS_uwrFlightPoints: Name of final output point feature class after LOS analysis
+    cacheFolder: Folder of the per uwr viewshed caches. Kept between runs
+    neighbourhood: Cells around each flight cell computed at the same time
+    maxCacheMB: Size limit of cacheFolder in MB. No limit if None
+    pyramid: Compute the viewsheds with the coarse to fine sweep on a DEM pyramid (see LazyViewshed)
+    maxDEMWindowMB: Largest DEM window over all the uwr. The run stops before reading a bigger one (see loadViewshedDEM())
+
+    Output: feature class of flight points that are not terrain masked, like LOS_Analysis() without the viewshed layers,
+    the gridcode field and the ViewshedPointCount excel file
+
+    Purpose: Terrain masking with lazy viewsheds. Does not need the 3D and spatial analyst extensions.
+    """
+    import arcpy
+
+    starttime = datetime.datetime.now()
+    zones = flightPathAnalysis_Geometry.loadUWRZones(uwrBuffered, unit_no_Field, unit_no_id_Field)
+    dem = loadViewshedDEM(DEM, zones, maxDEMWindowMB)
+    viewsheds = LazyViewshed(dem, zones, cacheFolder, neighbourhood, maxCacheBytes=None if maxCacheMB is None else maxCacheMB*1024*1024, pyramid=pyramid)
+    uwrCodes = {key: code for code, key in enumerate(zones.uwrKeys)}
+    #zones keep the field types of uwrBuffered, the points may have them as text
+    uwrTextCodes = {(str(key[0]), str(key[1])): code for key, code in uwrCodes.items()}
+
+    objectIDs = []
+    x = []
+    y = []
+    agl = []
+    uwr = []
+    with arcpy.da.SearchCursor(allFlightPoints, ["OID@", "SHAPE@X", "SHAPE@Y", "AGL", unit_no_Field, unit_no_id_Field]) as cursor:
+        for row in cursor:
+            code = uwrCodes.get((row[4], row[5]))
+            if code is None:
+                code = uwrTextCodes.get((str(row[4]), str(row[5])), -1)
+            objectIDs.append(row[0])
+            x.append(row[1])
+            y.append(row[2])
+            agl.append(row[3])
+            uwr.append(code)
+    del cursor
+    objectIDs = np.array(objectIDs, dtype="int64")
+    x = np.array(x, dtype="float64")
+    y = np.array(y, dtype="float64")
+    agl = np.array(agl, dtype="float64")
+    uwr = np.array(uwr, dtype="int64")
+
+    masked = np.zeros(len(objectIDs), dtype=bool)
+    for code, rows in flightPathAnalysis_PointTable.uwrGroups(uwr):
+        if code < 0:
+            continue
+        minAGL = viewsheds.minimumAGL(code, x[rows], y[rows])
+        with np.errstate(invalid="ignore"):
+            masked[rows] = agl[rows] < np.floor(minAGL)
+    print("terrain masked", np.count_nonzero(masked), "of", len(masked), "points")
+
+    #the rows of allFlightPoints whose OID is not masked are copied to the output
+    arcpy.env.overwriteOutput = True
+    output = os.path.join(LOS_uwrFlightPointsGDB, LOS_uwrFlightPoints)
+    desc = arcpy.Describe(allFlightPoints)
+    arcpy.CreateFeatureclass_management(LOS_uwrFlightPointsGDB, LOS_uwrFlightPoints, "POINT", allFlightPoints, has_z="ENABLED" if desc.hasZ else "DISABLED",
+                                        spatial_reference=desc.spatialReference)
+    fields = [f.name for f in arcpy.ListFields(allFlightPoints) if f.type not in ("OID", "Geometry") and f.editable]
+    maskedIDs = set(objectIDs[masked].tolist())
+    with arcpy.da.SearchCursor(allFlightPoints, ["OID@", "SHAPE@"] + fields) as cursor, arcpy.da.InsertCursor(output, ["SHAPE@"] + fields) as outputCursor:
+        for row in cursor:
+            if row[0] not in maskedIDs:
+                outputCursor.insertRow(row[1:])
+    del cursor, outputCursor
+    print("Runtime to terrain mask with lazy viewsheds: ", datetime.datetime.now() - starttime)
@@ -0,0 +1,83 @@
+### terrain masking on arrays used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# Class: MinElevMask - polygons of the minElevViewshed layer made by makeViewshed(), held in memory
+# Function: maskPoints - same rule as LOS_Analysis(): a point is terrain masked if it is in a minElevViewshed polygon of
+# its uwr with gridcode <> 0 and its AGL is lower than the gridcode (minimum height to be seen from the uwr)
+
+import numpy as np
+
+import flightPathAnalysis_Geometry
+
+
+class MinElevMask(flightPathAnalysis_Geometry.PolygonSet):
+    """
+    Purpose: Polygons of the minElevViewshed layer that are not in the direct viewshed (gridcode <> 0)
+
+    Inputs:
+    uwrIDs: List of unique uwr id of each polygon
+    gridcode: Minimum height above ground for a point in the polygon to be seen from the uwr
+    rings: List of lists of rings for each polygon. See flightPathAnalysis_Geometry.PolygonSet
+    """
+
+    def __init__(self, uwrIDs, gridcode, rings):
+        flightPathAnalysis_Geometry.PolygonSet.__init__(self, rings)
+        self.uwrIDs = list(uwrIDs)
+        self.gridcode = np.asarray(gridcode, dtype="float64")
+        self.uwrPolygons = {}
+        for i, uwr in enumerate(self.uwrIDs):
+            self.uwrPolygons.setdefault(uwr, []).append(i)
+
+    def hasViewshed(self, uwr):
+        return uwr in self.uwrPolygons
+
+def loadMinElevMask(minElevViewshed, uwr_unique_Field, uwrIDs=None):
+    """
+    (string, string, optional: list) -> MinElevMask
+
+    Inputs:
+    minElevViewshed: min Elevation viewshed layer made by makeViewshed()
+    uwr_unique_Field: field for unique uwr id that combines unit_no_Field and unit_no_id_Field
+    uwrIDs: Optional list of unique uwr ids to read. All uwr if not given
+
+    Purpose: Reads the polygons of the minElevViewshed layer with gridcode <> 0 into memory
+    """
+    import arcpy
+    import flightPathAnalysis_Names
+
+    query = "gridcode <> 0"
+    if uwrIDs is not None:
+        query += " AND " + flightPathAnalysis_Names.uwrSelectionQuery(uwr_unique_Field, uwrIDs)
+    ids = []
+    gridcode = []
+    rings = []
+    with arcpy.da.SearchCursor(minElevViewshed, ["SHAPE@", uwr_unique_Field, "gridcode"], query) as cursor:
+        for row in cursor:
+            rings.append(flightPathAnalysis_Geometry.polygonToRings(row[0]))
+            ids.append(row[1])
+            gridcode.append(float(row[2]))
+    del cursor
+    return MinElevMask(ids, gridcode, rings)
+
+def maskPoints(table, mask, agl=None):
+    """
+    (PointTable or PointMembership, MinElevMask, optional: array) -> array, list
+
+    Purpose:
+    Boolean array of the rows (members of a PointMembership) of the table that are terrain masked, and the list of
+    unique uwr ids of the table that have no viewshed in the mask (their points are not masked).
+    Points are only checked against the polygons of their own uwr.
+    agl: Optional AGL of table.points to use instead of the agl field of the table
+    """
+    if agl is None:
+        agl = table.points["agl"]
+    masked = np.zeros(len(table), dtype=bool)
+    noViewshed = []
+    for code, rows, points in table.uwrPoints():
+        uwr = table.uwrID(code)
+        if not mask.hasViewshed(uwr):
+            noViewshed.append(uwr)
+            continue
+        pointIndex, polygonIndex = mask.join(table.points["x"][points], table.points["y"][points], mask.uwrPolygons[uwr])
+        #polygons of a uwr are dissolved by gridcode and don't overlap, so a point is in one polygon at most (JOIN_ONE_TO_ONE)
+        masked[rows[pointIndex]] = agl[points[pointIndex]] < mask.gridcode[polygonIndex]
+    return masked, noViewshed
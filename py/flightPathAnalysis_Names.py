@@ -0,0 +1,40 @@
+### uwr names, ids and queries used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# The small name and id helpers of flightPathAnalysis_Functions without arcpy, so the modules that only need them (the track
+# readers, the geometry and masking in numpy) can be imported and run without ArcGIS. flightPathAnalysis_Functions
+# imports them from here, so flightPathAnalysis_Functions.uwrUniqueID() etc. still work.
+# Function: replaceNonAlphaNum - replaces the non alpha numeric characters of a text
+# Function: convert_timedelta - seconds part of a timedelta
+# Function: uwrUniqueID, splitUWRUniqueID - unique uwr id of a uwr number and uwr unit number, and back
+# Function: uwrSelectionQuery - where clause selecting a list of unique uwr ids
+
+
+def replaceNonAlphaNum(myText, newXter):
+    '''
+    Purpose:  to check for non-alpha numeric xters
+    replace them with user defined new character
+    '''
+    # go thru each xter. Check to see if it's alphanumeric.
+    # If not, then replace it with the new character (newXter)
+    for x in range(0, len(myText)):
+        if not myText[x].isalnum():
+            myText = myText.replace(myText[x], newXter)
+    return myText
+
+def convert_timedelta(duration):
+    #convert timedelta to seconds (type: float)
+    seconds = duration.total_seconds()
+    seconds = seconds % 60
+    return seconds
+
+def uwrUniqueID(unit_no, unit_no_id):
+    #unique uwr id that combines uwr number and uwr unit number. Both are converted to str first
+    return str(unit_no) + "__" + str(unit_no_id)
+
+def splitUWRUniqueID(uwr):
+    #uwr number and uwr unit number (as str) of a unique uwr id
+    return uwr[:uwr.find("__")], uwr[uwr.find("__")+2:]
+
+def uwrSelectionQuery(uwr_unique_Field, uwrIDs):
+    #where clause selecting a list of unique uwr ids. Sorted so the same set of uwr always gives the same query
+    return uwr_unique_Field + " in ('" + "','".join(sorted(uwrIDs)) + "')"
@@ -0,0 +1,372 @@
+### memory budgeted out-of-core mode used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# getFlightLinePoints() merges all the flights, then all the points below 500m, into single feature classes, and
+# LOS_Analysis() reads whole layers. A multi-year or province wide run doesn't fit in memory that way. This mode keeps
+# the memory under a budget (memoryBudgetMB):
+# 1. temporal chunks: the flights are read in file order (the gpx file names start with the date) and projected. When the
+#    buffered points reach the chunk size of the budget, they are spilled to one append-only file per spatial tile
+# 2. spatial tiles: the uwr are grouped with flightPathAnalysis_Sharding.partitionUWR() into tiles small enough that the
+#    DEM window and zone label raster of a tile fit the budget. Each tile reads its spill file back as a memory mapped
+#    array, in slices sized to the budget, and classifies, terrain masks and writes the points of each slice
+# 3. the time in zone stats are combined slice by slice (StatisticsAccumulator), so no layer is ever read back whole
+# Class: SpillFile - append-only file of points read back with np.memmap
+# Class: StatisticsAccumulator - incremental sum of PointTable.statistics() results
+# Function: planTiles - uwr tiles that fit the raster share of the budget
+# Function: runOutOfCore - the 3 steps above on arrays, with the DEM reader, masking and writers passed in
+# Function: getFlightPointsOutOfCore - point feature classes and stats tables of main() (before and after terrain masking)
+# update: Oct. 19, 2026 - the slices are classified, masked and summed as PointMembership (each point once, its uwr zones as
+# members). The rows per zone are only made for the writers
+# update: Oct. 19, 2026 - LOS_uwrFlightPoints is written to LOS_uwrFlightPointsGDB. The uwr without a viewshed in the viewshed
+# layers get one from makeViewshed() before the run, like LOS_Analysis(), and the run fails if a uwr is still left unmasked
+# Function: makeMissingViewsheds - makes the viewsheds of the uwr that are not in both viewshed layers yet
+
+import datetime
+import os
+import numpy as np
+
+import flightPathAnalysis_Geometry
+import flightPathAnalysis_PointTable
+import flightPathAnalysis_Sharding
+import flightPathAnalysis_Tracks
+import flightPathAnalysis_Watch
+
+#projected flight point spilled between the two passes: 32 bytes
+rawPointDtype = np.dtype([
+    ("x", "f8"),
+    ("y", "f8"),
+    ("time", "M8[ms]"),
+    ("elevation", "f4"),
+    ("flight", "i4"),
+])
+
+#working memory estimates used to size the chunks (bytes)
+readBytesPerPoint = 160 #buffered raw point, projection temporaries and the parsed flight
+classifyBytesPerPoint = 400 #raw slice, classification temporaries, classified rows (one per zone) and decoded columns for the writers
+rasterBytesPerCell = 12 #DEM (float32), zone labels (int32) and the edge index of the ZoneGrid
+minimumChunkPoints = 10000
+
+
+class SpillFile:
+    """
+    Purpose: Points appended to a binary file on disk and read back in slices through a memory map, so only one slice
+    is in memory at a time.
+
+    Inputs:
+    path: Full path to the file. It is emptied if it exists
+    dtype: numpy dtype of the points
+    """
+
+    def __init__(self, path, dtype=rawPointDtype):
+        self.path = path
+        self.dtype = dtype
+        self.count = 0
+        open(path, "wb").close()
+
+    def append(self, points):
+        if len(points):
+            with open(self.path, "ab") as f:
+                f.write(np.ascontiguousarray(points, dtype=self.dtype).tobytes())
+            self.count += len(points)
+
+    def slices(self, rows):
+        #copies of consecutive slices of at most rows points
+        if self.count == 0:
+            return
+        data = np.memmap(self.path, dtype=self.dtype, mode="r", shape=(self.count,))
+        for start in range(0, self.count, rows):
+            yield np.array(data[start:start + rows])
+        del data
+
+    def remove(self):
+        os.remove(self.path)
+
+class StatisticsAccumulator:
+    """
+    Purpose: Sum of the FREQUENCY and SUM_TimeInterval of PointTable.statistics() results of several chunks, grouped on
+    the same keys. Memory grows with the number of groups, not the number of points.
+    """
+
+    def __init__(self, keys=("flight", "heightRange", "severity", "uwr")):
+        self.keys = keys
+        self.codes = np.zeros((0, len(keys)), dtype="int64")
+        self.sums = np.zeros(0)
+        self.frequency = np.zeros(0, dtype="int64")
+
+    def add(self, stats):
+        codes = np.concatenate([self.codes, np.stack([np.asarray(stats[k], dtype="int64") for k in self.keys], axis=1)])
+        sums = np.concatenate([self.sums, stats["SUM_TimeInterval"]])
+        frequency = np.concatenate([self.frequency, stats["FREQUENCY"]])
+        self.codes, inverse = np.unique(codes, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        self.sums = np.bincount(inverse, weights=sums, minlength=len(self.codes))
+        self.frequency = np.bincount(inverse, weights=frequency, minlength=len(self.codes)).astype("int64")
+
+    def statistics(self):
+        #same dictionary as PointTable.statistics()
+        result = {k: self.codes[:, i] for i, k in enumerate(self.keys)}
+        result["SUM_TimeInterval"] = self.sums
+        result["FREQUENCY"] = self.frequency
+        return result
+
+
+def windowBytes(zones, zoneIndexes, cellSize):
+    #memory of the DEM window and zone label raster of some zones
+    xMin, yMin = zones.bbox[zoneIndexes, 0].min(), zones.bbox[zoneIndexes, 1].min()
+    xMax, yMax = zones.bbox[zoneIndexes, 2].max(), zones.bbox[zoneIndexes, 3].max()
+    return (np.ceil((xMax - xMin)/cellSize) + 2)*(np.ceil((yMax - yMin)/cellSize) + 2)*rasterBytesPerCell
+
+def planTiles(zones, cellSize, rasterBudget):
+    """
+    (UWRZones, float, float) -> list
+
+    Purpose: Groups the uwr (codes of zones) into spatial tiles. The number of tiles is doubled until the DEM window of
+    every tile fits rasterBudget bytes, or every tile has one uwr. Returns a list of lists of uwr codes.
+    """
+    uwrCodes = list(range(len(zones.uwrKeys)))
+    uwrZones = [np.nonzero(zones.zoneUWR == code)[0] for code in uwrCodes]
+    boxes = [(zones.bbox[z, 0].min(), zones.bbox[z, 1].min(), zones.bbox[z, 2].max(), zones.bbox[z, 3].max()) for z in uwrZones]
+    centers = [((b[0] + b[2])/2, (b[1] + b[3])/2) for b in boxes]
+    weights = [(b[2] - b[0])*(b[3] - b[1]) for b in boxes]
+    tileCount = 1
+    while True:
+        tiles = [t for t in flightPathAnalysis_Sharding.partitionUWR(uwrCodes, centers, weights, tileCount) if t]
+        biggest = max(windowBytes(zones, np.concatenate([uwrZones[c] for c in t]), cellSize) for t in tiles)
+        if biggest <= rasterBudget or all(len(t) == 1 for t in tiles):
+            return tiles
+        tileCount *= 2
+
+def runOutOfCore(flights, zones, cellSize, loadTileDEM, IncursionSeverity, spillFolder, memoryBudgetMB, tileMask=None, writeAll=None, writeUnmasked=None):
+    """
+    (iterable, UWRZones, float, function, dictionary, string, float, optional: function, function, function) -> dictionary
+
+    Inputs:
+    flights: (name, data) of the gpx logs in time order, eg. flightPathAnalysis_Tracks.iterFlightData()
+    zones: UWRZones of all the buffered uwr
+    cellSize: DEM cell size
+    loadTileDEM: function(extent) -> DEMGrid of a window of the DEM
+    IncursionSeverity: Dictionary of buffer distance and incursion severity category ie. {500: "High", 1000: "Moderate}
+    spillFolder: Folder for the spill files. They are deleted at the end
+    memoryBudgetMB: Memory budget in MB
+    tileMask: Optional function(dem, tileZones) -> function(PointTable) -> (masked, noViewshed), the terrain masking of a tile
+    writeAll: Optional function(PointTable) called with every slice of classified points
+    writeUnmasked: Optional function(PointTable) called with every slice of points that are not terrain masked
+
+    Output: dictionary with
+    - "table": empty PointTable with the dictionaries of the codes (flights, uwr, severities, height ranges)
+    - "allStats", "unmaskedStats": statistics of all the points and of the points not terrain masked, like PointTable.statistics()
+    - "problemFlights": names of the flights with 0 or 1 points
+    - "noViewshed": unique uwr ids without viewshed (points not masked)
+    """
+    budget = memoryBudgetMB*1024*1024
+    severities = flightPathAnalysis_PointTable.severityTable(IncursionSeverity)
+    if not os.path.exists(spillFolder):
+        os.makedirs(spillFolder)
+
+    tiles = planTiles(zones, cellSize, budget/2)
+    tileZones = [zones.subset(tile) for tile in tiles]
+    tileBoxes = [z.extent for z in tileZones]
+    spills = [SpillFile(os.path.join(spillFolder, "tile%04d.bin" % i)) for i in range(len(tiles))]
+    print("out-of-core:", len(tiles), "tiles for", len(zones.uwrKeys), "uwr with a budget of", memoryBudgetMB, "MB")
+
+    #pass 1: read the flights in order and spill their projected points to the tiles
+    starttime = datetime.datetime.now()
+    chunkPoints = max(minimumChunkPoints, int(budget/2/readBytesPerPoint))
+    flightNames = []
+    flightTimeInterval = []
+    flightTotalTime = []
+    problemFlights = []
+    buffered = []
+    bufferedCount = [0]
+
+    def spill():
+        if not buffered:
+            return
+        points = np.concatenate(buffered)
+        for box, spillFile in zip(tileBoxes, spills):
+            spillFile.append(points[(points["x"] >= box[0]) & (points["y"] >= box[1]) & (points["x"] <= box[2]) & (points["y"] <= box[3])])
+        del buffered[:]
+        bufferedCount[0] = 0
+
+    for name, data in flights:
+        track = flightPathAnalysis_Tracks.readFlight(data, name)
+        timeInterval, totalFlightTime = flightPathAnalysis_Tracks.flightTimeInterval(track)
+        if timeInterval is None:
+            problemFlights.append(name)
+            continue
+        points = np.zeros(len(track["lon"]), dtype=rawPointDtype)
+        points["x"], points["y"] = flightPathAnalysis_Geometry.projectToBCAlbers(track["lon"], track["lat"])
+        points["time"] = track["time"]
+        points["elevation"] = track["ele"]
+        points["flight"] = len(flightNames)
+        flightNames.append(track["name"])
+        flightTimeInterval.append(timeInterval)
+        flightTotalTime.append(totalFlightTime)
+        buffered.append(points)
+        bufferedCount[0] += len(points)
+        if bufferedCount[0] >= chunkPoints:
+            spill()
+    spill()
+    print("Runtime to read and spill", len(flightNames), "flights:", datetime.datetime.now() - starttime, "spilled points:", sum(s.count for s in spills))
+
+    #pass 2: classify, mask and write each tile in slices
+    emptyPoints = np.zeros(0, dtype=flightPathAnalysis_PointTable.pointDtype)
+    table = flightPathAnalysis_PointTable.PointTable(emptyPoints, flightNames, flightTimeInterval, flightTotalTime, zones.uwrKeys,
+                                                     severities, flightPathAnalysis_Geometry.heightRangeLabels)
+    globalCodes = {key: code for code, key in enumerate(zones.uwrKeys)}
+    allStats = StatisticsAccumulator()
+    unmaskedStats = StatisticsAccumulator()
+    noViewshed = set()
+    for i, spillFile in enumerate(spills):
+        if spillFile.count == 0:
+            spillFile.remove()
+            continue
+        tileStart = datetime.datetime.now()
+        dem = loadTileDEM(tileBoxes[i])
+        grid = flightPathAnalysis_Geometry.ZoneGrid(dem, tileZones[i])
+        mask = tileMask(dem, tileZones[i]) if tileMask is not None else None
+        toGlobal = np.array([globalCodes[key] for key in tileZones[i].uwrKeys], dtype="int32")
+        sliceRows = max(minimumChunkPoints, int((budget - dem.array.size*rasterBytesPerCell)/classifyBytesPerPoint))
+        for raw in spillFile.slices(sliceRows):
+            #points stored once with their uwr zones as members. Rows per zone are only made for the writers
+            points, offsets, memberUWR, memberSeverity = flightPathAnalysis_Geometry.classifyMembership(
+                raw["x"], raw["y"], raw["elevation"].astype("float64"), raw["time"], raw["flight"], dem, tileZones[i], severities, grid)
+            sliceTable = flightPathAnalysis_PointTable.PointMembership(points, offsets, memberUWR, memberSeverity, table.flightNames, table.flightTimeInterval,
+                                                                       table.flightTotalTime, tileZones[i].uwrKeys, severities, table.heightRanges)
+            if mask is not None:
+                masked, missing = mask(sliceTable)
+                noViewshed.update(missing)
+            else:
+                masked = np.zeros(len(sliceTable), dtype=bool)
+            sliceTable = flightPathAnalysis_PointTable.PointMembership(points, offsets, toGlobal[memberUWR], memberSeverity, table.flightNames,
+                                                                       table.flightTimeInterval, table.flightTotalTime, table.uwrKeys, severities,
+                                                                       table.heightRanges)
+            unmaskedTable = sliceTable.select(~masked)
+            allStats.add(sliceTable.statistics(allStats.keys))
+            unmaskedStats.add(unmaskedTable.statistics(unmaskedStats.keys))
+            if writeAll is not None:
+                writeAll(sliceTable.table())
+            if writeUnmasked is not None:
+                writeUnmasked(unmaskedTable.table())
+        del dem, grid, mask
+        spillFile.remove()
+        print("Runtime for tile", i, "(" + str(spillFile.count), "spilled points):", datetime.datetime.now() - tileStart)
+
+    return {"table": table, "allStats": allStats.statistics(), "unmaskedStats": unmaskedStats.statistics(),
+            "problemFlights": problemFlights, "noViewshed": sorted(noViewshed)}
+
+
+def makeMissingViewsheds(uwrIDs, uwrBuffered, maxRange, DEM, viewshed, minElevViewshed, unit_no, unit_no_id, uwr_unique_Field):
+    """
+    (list, string, int, string, string, string, string, string, string) -> None
+
+    Purpose: Makes the viewsheds of the uwr of uwrIDs that are not in both viewshed layers yet with
+    flightPathAnalysis_Functions.makeViewshed(), like LOS_Analysis(). Stops the run if the 3D and spatial analyst
+    extensions are not available.
+    """
+    import arcpy
+    import tempfile
+    import flightPathAnalysis_Functions
+
+    viewshedUWRSet = set()
+    if arcpy.Exists(viewshed) and arcpy.Exists(minElevViewshed):
+        with arcpy.da.SearchCursor(viewshed, [uwr_unique_Field]) as cursor:
+            viewshedUWRSet = {row[0] for row in cursor}
+        del cursor
+        with arcpy.da.SearchCursor(minElevViewshed, [uwr_unique_Field]) as cursor:
+            viewshedUWRSet &= {row[0] for row in cursor}
+        del cursor
+    UWRRequireViewshedSet = set(uwrIDs) - viewshedUWRSet
+    if not UWRRequireViewshedSet:
+        print('no need to make viewsheds')
+        return
+
+    for extension in ["3D", "Spatial"]:
+        if arcpy.CheckExtension(extension) != "Available":
+            raise SystemExit("required licenses not available to make the viewsheds of " + str(sorted(UWRRequireViewshedSet)) + ". Use lazyViewshed instead")
+        arcpy.CheckOutExtension(extension)
+    try:
+        with tempfile.TemporaryDirectory() as temp_location:
+            arcpy.CreateFileGDB_management(temp_location, "viewshed.gdb")
+            flightPathAnalysis_Functions.makeViewshed(UWRRequireViewshedSet, uwrBuffered, maxRange, unit_no, unit_no_id, uwr_unique_Field,
+                                                      os.path.join(temp_location, "viewshed.gdb"), DEM, viewshed, minElevViewshed)
+    finally:
+        arcpy.CheckInExtension("3D")
+        arcpy.CheckInExtension("Spatial")
+
+def getFlightPointsOutOfCore(gpxFolder, DEM, uwrBuffered, unit_no, unit_no_id, IncursionSeverity, outputGDB, allFlightPoint, LOS_uwrFlightPoints,
+                             allPointsStats_FullPath, finalPointsStats_FullPath, allPointsStats_Excel, finalPointsStats_Excel, generalFolder,
+                             memoryBudgetMB=4096, minElevViewshed=None, uwr_unique_Field=None, lazyViewshedFolder=None, viewshedPyramid=False,
+                             LOS_uwrFlightPointsGDB=None, viewshed=None, maxRange=None):
+    """
+    (string, string, string, string, string, dictionary, string, string, string, string, string, string, string, string, optional: float, string, string, string, boolean, string, string, int) -> None
+
+    Inputs: Same names as in flightPathAnalysis_uwr.main(), plus
+    memoryBudgetMB: Memory budget of the run in MB (eg. 4096 on an 8 GB worker)
+    minElevViewshed, uwr_unique_Field: min Elevation viewshed layer made by makeViewshed() for the terrain masking.
+        Only the polygons of the uwr of a tile are read
+    LOS_uwrFlightPointsGDB: GDB of LOS_uwrFlightPoints. outputGDB if None
+    viewshed, maxRange: viewshed layer and maximum buffer distance. When given, the uwr that are not in both viewshed
+        layers get their viewsheds made first (makeMissingViewsheds()). The run fails if a uwr with points has no viewshed
+    lazyViewshedFolder: Cache folder of flightPathAnalysis_LazyViewshed. Used for the terrain masking instead of
+        minElevViewshed when given
+    viewshedPyramid: Compute the lazy viewsheds coarse to fine on a DEM pyramid (see flightPathAnalysis_Pyramid)
+
+    Output:
+    - point feature classes allFlightPoint (all flight points in uwr zones below 500m) and LOS_uwrFlightPoints (points
+    that are not terrain masked), with the fields of getFlightLinePoints()
+    - stats gdb tables and excel files of both, with the fields of pointStatistics()
+    - (potential) text file with list of gpx files that have 0 or 1 flight points
+
+    Purpose: Points and stats of main() with memory use kept under memoryBudgetMB (see the top of the module).
+    The flight line feature class is not made.
+    """
+    import arcpy
+    import flightPathAnalysis_LazyViewshed
+    import flightPathAnalysis_Masking
+    import flightPathAnalysis_Names
+    import flightPathAnalysis_Streaming
+
+    starttime = datetime.datetime.now()
+    zones = flightPathAnalysis_Geometry.loadUWRZones(uwrBuffered, unit_no, unit_no_id)
+    cellSize = arcpy.Raster(DEM).meanCellWidth
+    if LOS_uwrFlightPointsGDB is None:
+        LOS_uwrFlightPointsGDB = outputGDB
+    if lazyViewshedFolder is None and minElevViewshed is not None and viewshed is not None:
+        makeMissingViewsheds([flightPathAnalysis_Names.uwrUniqueID(*key) for key in zones.uwrKeys], uwrBuffered, maxRange, DEM, viewshed, minElevViewshed,
+                             unit_no, unit_no_id, uwr_unique_Field)
+
+    def tileMask(dem, tileZones):
+        if lazyViewshedFolder is not None:
+            return flightPathAnalysis_LazyViewshed.LazyViewshed(dem, tileZones, lazyViewshedFolder, pyramid=viewshedPyramid).maskPoints
+        if minElevViewshed is None:
+            return None
+        uwrIDs = [flightPathAnalysis_Names.uwrUniqueID(*key) for key in tileZones.uwrKeys]
+        mask = flightPathAnalysis_Masking.loadMinElevMask(minElevViewshed, uwr_unique_Field, uwrIDs)
+        return lambda table: flightPathAnalysis_Masking.maskPoints(table, mask)
+
+    writeAll = flightPathAnalysis_Streaming.FeatureClassPointWriter(outputGDB, allFlightPoint, unit_no, unit_no_id)
+    writeUnmasked = flightPathAnalysis_Streaming.FeatureClassPointWriter(LOS_uwrFlightPointsGDB, LOS_uwrFlightPoints, unit_no, unit_no_id)
+    result = runOutOfCore(flightPathAnalysis_Tracks.iterFlightData(gpxFolder), zones, cellSize, lambda extent: flightPathAnalysis_Geometry.loadDEM(DEM, extent),
+                          IncursionSeverity, os.path.join(generalFolder, "spill"), memoryBudgetMB, tileMask, writeAll, writeUnmasked)
+    if result["noViewshed"]:
+        raise SystemExit("uwr without viewshed, their points were not terrain masked: " + str(result["noViewshed"]))
+
+    arcpy.env.overwriteOutput = True
+    for stats, statsFullPath, statsExcel in [(result["allStats"], allPointsStats_FullPath, allPointsStats_Excel),
+                                             (result["unmaskedStats"], finalPointsStats_FullPath, finalPointsStats_Excel)]:
+        if arcpy.Exists(statsFullPath):
+            arcpy.Delete_management(statsFullPath)
+        flightPathAnalysis_Watch.insertStatistics(stats, result["table"], statsFullPath, unit_no, unit_no_id)
+        try:
+            os.remove(statsExcel)
+        except:
+            pass
+        arcpy.TableToExcel_conversion(statsFullPath, statsExcel)
+
+    if len(result["problemFlights"]) > 0:
+        problemGPXText = open(os.path.join(generalFolder, "problemGPXFiles.txt"), "w")
+        for i in result["problemFlights"]:
+            problemGPXText.write(i + "\n")
+        problemGPXText.close()
+    print(writeAll.count, "flight points,", writeUnmasked.count, "after terrain masking")
+    print("Runtime for the out-of-core run: ", datetime.datetime.now() - starttime)
@@ -0,0 +1,361 @@
+### single pass partitioned output of the flight points used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# getFlightLinePoints() copied the joined points once per incursion severity (Below500m_<severity>) and once more as the
+# final point feature class, so the same points were written five times. The writers here write each point once:
+# - the point table is the only copy of the points, with its attribute indexes (incursion severity, uwr, flight) and
+#   spatial index made in the same pass
+# - the Below500m_<severity> subsets are views (geodatabase, GeoPackage) or partitions (FlatGeobuf) of it, not copies
+# Output formats:
+# - geodatabase: feature class + database views (layer files with a definition query where the gdb can't have views)
+# - GeoPackage (.gpkg): written with sqlite3, R-tree spatial index filled with the rows, views registered as layers
+# - FlatGeobuf (.fgb folder): one file per severity partition with a packed spatial index. Needs GDAL (osgeo.ogr).
+#   GDAL and sf open the folder as one dataset with a layer per partition
+# - Arrow IPC (.arrow or .feather file): memory-mappable by R, see flightPathAnalysis_Arrow. Needs pyarrow
+# All writers take the PointTable chunks of flightPathAnalysis_Streaming.runStreaming() and finish with close().
+# Class: GeodatabasePointWriter, GeoPackagePointWriter, FlatGeobufPointWriter - point writers of each format
+# Function: openPointWriter - writer of the format of an output path
+# Function: addSeverityViews - attribute index and severity views of a point feature class already in a gdb
+# update: Oct. 19, 2026 - severityWhere() doubles the quotes of the labels for every format. FlatGeobufPointWriter.close() releases
+# each layer and data source explicitly
+
+import datetime
+import os
+import sqlite3
+import numpy as np
+
+#fields of the point output of getFlightLinePoints(), with unit_no and unit_no_id replaced by the uwr fields
+pointFields = [("FlightName", "TEXT"), ("DateTime", "DATETIME"), ("Elevation", "DOUBLE"), ("DEMElev", "DOUBLE"), ("AGL", "INTEGER"),
+               ("TimeInterval", "DOUBLE"), ("TotalTime", "DOUBLE"), ("HeightRange", "TEXT"), ("BUFF_DIST", "DOUBLE"),
+               ("unit_no", "TEXT"), ("unit_no_id", "TEXT"), ("IncursionSeverity", "TEXT")]
+
+#BC albers (EPSG:3005), the spatial reference of the outputs
+albersWKT = ('PROJCS["NAD83 / BC Albers",GEOGCS["NAD83",DATUM["North_American_Datum_1983",SPHEROID["GRS 1980",6378137,298.257222101]],'
+             'PRIMEM["Greenwich",0],UNIT["degree",0.0174532925199433]],PROJECTION["Albers_Conic_Equal_Area"],PARAMETER["latitude_of_center",45],'
+             'PARAMETER["longitude_of_center",-126],PARAMETER["standard_parallel_1",50],PARAMETER["standard_parallel_2",58.5],'
+             'PARAMETER["false_easting",1000000],PARAMETER["false_northing",0],UNIT["metre",1],AUTHORITY["EPSG","3005"]]')
+
+
+def severityName(severity):
+    #name of the subset of the points of an incursion severity (buffer distance), eg. Below500m_500
+    return "Below500m_" + str(int(float(severity)))
+
+def severityWhere(label):
+    #quotes in the label are doubled for the sql string literal
+    return "IncursionSeverity = '" + str(label).replace("'", "''") + "'"
+
+def fieldNames(unit_no, unit_no_id):
+    return [unit_no if f == "unit_no" else unit_no_id if f == "unit_no_id" else f for f, _ in pointFields]
+
+def columnRows(table):
+    #rows (x, y, field values...) of a PointTable chunk in the order of pointFields. DateTime as ISO 8601 text
+    columns = table.toColumns()
+    dateTimes = np.char.add(np.datetime_as_string(columns["DateTime"].astype("datetime64[ms]"), unit="ms"), "Z").tolist()
+    return zip(columns["X"].tolist(), columns["Y"].tolist(), columns["FlightName"].tolist(), dateTimes,
+               columns["Elevation"].tolist(), columns["DEMElev"].tolist(), columns["AGL"].tolist(), columns["TimeInterval"].tolist(),
+               columns["TotalTime"].tolist(), columns["HeightRange"].tolist(), columns["BUFF_DIST"].tolist(),
+               [str(v) for v in columns["unit_no"]], [str(v) for v in columns["unit_no_id"]], columns["IncursionSeverity"].tolist())
+
+
+def addSeverityViews(featureClass, IncursionSeverity):
+    """
+    (string, dictionary) -> list
+
+    Purpose:
+    Adds an attribute index on IncursionSeverity to a point feature class in a gdb and makes a Below500m_<severity> view
+    of it for each incursion severity, in place of the per severity copies. Where the gdb can't have database views, the
+    view is a layer file (Below500m_<severity>.lyrx next to the gdb) with the severity as definition query.
+    The feature class keeps its spatial index, file gdb feature classes update it while the rows are inserted.
+    Returns the paths of the views.
+    """
+    import arcpy
+
+    starttime = datetime.datetime.now()
+    gdb = os.path.dirname(featureClass)
+    indexNames = [index.name for index in arcpy.ListIndexes(featureClass)]
+    if "IncursionSeverity_idx" not in indexNames:
+        arcpy.AddIndex_management(featureClass, ["IncursionSeverity"], "IncursionSeverity_idx")
+
+    views = []
+    for severity, label in IncursionSeverity.items():
+        name = severityName(severity)
+        viewPath = os.path.join(gdb, name)
+        if arcpy.Exists(viewPath): #copy or view of a previous run
+            arcpy.Delete_management(viewPath)
+        try:
+            arcpy.CreateDatabaseView_management(gdb, name, "SELECT * FROM " + os.path.basename(featureClass) + " WHERE " + severityWhere(label))
+        except arcpy.ExecuteError:
+            viewPath = os.path.join(os.path.dirname(gdb), name + ".lyrx")
+            arcpy.MakeFeatureLayer_management(featureClass, name + "_FL", severityWhere(label))
+            arcpy.SaveToLayerFile_management(name + "_FL", viewPath)
+            arcpy.Delete_management(name + "_FL")
+        views.append(viewPath)
+        print("Made view of", label, "incursion points:", viewPath)
+    print("Runtime to index and make the severity views: ", datetime.datetime.now() - starttime)
+    return views
+
+
+class GeodatabasePointWriter:
+    """
+    Purpose: Writes the points into a feature class (flightPathAnalysis_Streaming.FeatureClassPointWriter) and makes the
+    severity views of it on close().
+
+    Inputs:
+    outputGDB: Full path to GDB for the feature class
+    name: Name of the feature class. It is replaced if it exists
+    unit_no: field for unit number (eg. u-2-002)
+    unit_no_id: field for unit number id (eg. TO 32)
+    IncursionSeverity: Dictionary of buffer distance and incursion severity category ie. {500: "High", 1000: "Moderate}
+    """
+
+    def __init__(self, outputGDB, name, unit_no, unit_no_id, IncursionSeverity):
+        import flightPathAnalysis_Streaming
+        self.writer = flightPathAnalysis_Streaming.FeatureClassPointWriter(outputGDB, name, unit_no, unit_no_id)
+        self.path = self.writer.path
+        self.IncursionSeverity = IncursionSeverity
+
+    @property
+    def count(self):
+        return self.writer.count
+
+    def __call__(self, table):
+        self.writer(table)
+
+    def close(self):
+        return addSeverityViews(self.path, self.IncursionSeverity)
+
+
+class GeoPackagePointWriter:
+    """
+    Purpose:
+    Writes the points into a feature table of a GeoPackage with sqlite3 (no GDAL needed). The R-tree spatial index is
+    filled with the rows, the attribute indexes and the Below500m_<severity> views (registered as feature layers) are
+    made on close(). Each chunk is one transaction.
+
+    Inputs:
+    path: Full path of the .gpkg file. Made if it doesn't exist
+    name: Name of the feature table. It is replaced (with its views) if it exists
+    unit_no, unit_no_id, IncursionSeverity: see GeodatabasePointWriter
+    srsID: EPSG code of the coordinates. Only 3005 (BC albers) has its definition here
+    """
+
+    def __init__(self, path, name, unit_no, unit_no_id, IncursionSeverity, srsID=3005):
+        self.path = path
+        self.name = name
+        self.unit_no = unit_no
+        self.unit_no_id = unit_no_id
+        self.IncursionSeverity = IncursionSeverity
+        self.srsID = srsID
+        self.count = 0
+        self.extent = [np.inf, np.inf, -np.inf, -np.inf]
+        self.fields = fieldNames(unit_no, unit_no_id)
+        self.views = [severityName(severity) for severity in IncursionSeverity]
+        self.rtree = "rtree_" + name + "_geom"
+
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA application_id = 1196444487") #GPKG
+        self.connection.execute("PRAGMA user_version = 10200")
+        self.createCoreTables()
+        self.dropTable()
+
+        columns = ", ".join('"' + f + '" ' + sqlType for f, (_, sqlType) in zip(self.fields, pointFields))
+        self.connection.execute('CREATE TABLE "' + name + '" (fid INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL, geom POINT, ' + columns + ')')
+        self.connection.execute('CREATE VIRTUAL TABLE "' + self.rtree + '" USING rtree(id, minx, maxx, miny, maxy)')
+        now = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+        for table in [name] + self.views:
+            self.connection.execute("INSERT INTO gpkg_contents (table_name, data_type, identifier, last_change, srs_id) VALUES (?, 'features', ?, ?, ?)",
+                                    (table, table, now, srsID))
+            self.connection.execute("INSERT INTO gpkg_geometry_columns VALUES (?, 'geom', 'POINT', ?, 0, 0)", (table, srsID))
+        self.connection.execute("INSERT INTO gpkg_extensions VALUES (?, 'geom', 'gpkg_rtree_index', 'http://www.geopackage.org/spec120/#extension_rtree', 'write-only')",
+                                (name,))
+        self.connection.commit()
+        self.insertSQL = ('INSERT INTO "' + name + '" (fid, geom, ' + ", ".join('"' + f + '"' for f in self.fields) + ") VALUES (" +
+                          ", ".join("?"*(len(self.fields) + 2)) + ")")
+
+    def createCoreTables(self):
+        #GeoPackage tables, made once per file
+        c = self.connection
+        c.execute("""CREATE TABLE IF NOT EXISTS gpkg_spatial_ref_sys (srs_name TEXT NOT NULL, srs_id INTEGER PRIMARY KEY, organization TEXT NOT NULL,
+                     organization_coordsys_id INTEGER NOT NULL, definition TEXT NOT NULL, description TEXT)""")
+        c.execute("""CREATE TABLE IF NOT EXISTS gpkg_contents (table_name TEXT NOT NULL PRIMARY KEY, data_type TEXT NOT NULL, identifier TEXT UNIQUE,
+                     description TEXT DEFAULT '', last_change DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')), min_x DOUBLE, min_y DOUBLE,
+                     max_x DOUBLE, max_y DOUBLE, srs_id INTEGER, CONSTRAINT fk_gc_r_srs_id FOREIGN KEY (srs_id) REFERENCES gpkg_spatial_ref_sys(srs_id))""")
+        c.execute("""CREATE TABLE IF NOT EXISTS gpkg_geometry_columns (table_name TEXT NOT NULL, column_name TEXT NOT NULL, geometry_type_name TEXT NOT NULL,
+                     srs_id INTEGER NOT NULL, z TINYINT NOT NULL, m TINYINT NOT NULL, CONSTRAINT pk_geom_cols PRIMARY KEY (table_name, column_name),
+                     CONSTRAINT fk_gc_tn FOREIGN KEY (table_name) REFERENCES gpkg_contents(table_name),
+                     CONSTRAINT fk_gc_srs FOREIGN KEY (srs_id) REFERENCES gpkg_spatial_ref_sys (srs_id))""")
+        c.execute("""CREATE TABLE IF NOT EXISTS gpkg_extensions (table_name TEXT, column_name TEXT, extension_name TEXT NOT NULL, definition TEXT NOT NULL,
+                     scope TEXT NOT NULL, CONSTRAINT ge_tce UNIQUE (table_name, column_name, extension_name))""")
+        c.executemany("INSERT OR IGNORE INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)", [
+            ("Undefined cartesian SRS", -1, "NONE", -1, "undefined", "undefined cartesian coordinate reference system"),
+            ("Undefined geographic SRS", 0, "NONE", 0, "undefined", "undefined geographic coordinate reference system"),
+            ("WGS 84 geodetic", 4326, "EPSG", 4326, 'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563]],PRIMEM["Greenwich",0],'
+             'UNIT["degree",0.0174532925199433],AUTHORITY["EPSG","4326"]]', "longitude/latitude coordinates in decimal degrees on the WGS 84 spheroid"),
+            ("NAD83 / BC Albers", 3005, "EPSG", 3005, albersWKT, "BC albers")])
+
+    def dropTable(self):
+        #removes the feature table, its views and index of a previous run
+        c = self.connection
+        for view in self.views:
+            c.execute('DROP VIEW IF EXISTS "' + view + '"')
+        c.execute('DROP TABLE IF EXISTS "' + self.rtree + '"')
+        c.execute('DROP TABLE IF EXISTS "' + self.name + '"')
+        for table in ["gpkg_extensions", "gpkg_geometry_columns", "gpkg_contents"]:
+            c.execute("DELETE FROM " + table + " WHERE table_name IN (" + ", ".join("?"*(len(self.views) + 1)) + ")", [self.name] + self.views)
+
+    def geometryBlobs(self, x, y):
+        #GeoPackage binary points: header (GP, version 0, little endian, no envelope, srs id) + little endian WKB point
+        blobs = np.zeros(len(x), dtype=[("magic", "S2"), ("version", "u1"), ("flags", "u1"), ("srs", "<i4"),
+                                        ("byteOrder", "u1"), ("type", "<u4"), ("x", "<f8"), ("y", "<f8")])
+        blobs["magic"] = b"GP"
+        blobs["flags"] = 1
+        blobs["srs"] = self.srsID
+        blobs["byteOrder"] = 1
+        blobs["type"] = 1
+        blobs["x"] = x
+        blobs["y"] = y
+        data = blobs.tobytes()
+        size = blobs.dtype.itemsize
+        return [data[i*size:(i+1)*size] for i in range(len(x))]
+
+    def __call__(self, table):
+        if len(table) == 0:
+            return
+        x = table.points["x"]
+        y = table.points["y"]
+        fids = range(self.count + 1, self.count + len(table) + 1)
+        rows = ((fid, blob) + row[2:] for fid, blob, row in zip(fids, self.geometryBlobs(x, y), columnRows(table)))
+        with self.connection:
+            self.connection.executemany(self.insertSQL, rows)
+            self.connection.executemany('INSERT INTO "' + self.rtree + '" VALUES (?, ?, ?, ?, ?)',
+                                        zip(fids, x.tolist(), x.tolist(), y.tolist(), y.tolist()))
+        self.count += len(table)
+        self.extent = [min(self.extent[0], float(x.min())), min(self.extent[1], float(y.min())),
+                       max(self.extent[2], float(x.max())), max(self.extent[3], float(y.max()))]
+
+    def rtreeTriggers(self):
+        #triggers of the rtree extension, so edits made later by GIS software keep the index up to date.
+        #Made after the rows are written: they call the ST_ functions that only GeoPackage readers provide
+        t = '"' + self.name + '"'
+        r = '"' + self.rtree + '"'
+        trigger = '"rtree_' + self.name + '_geom_'
+        box = "(NEW.fid, ST_MinX(NEW.geom), ST_MaxX(NEW.geom), ST_MinY(NEW.geom), ST_MaxY(NEW.geom))"
+        return [
+            "CREATE TRIGGER " + trigger + 'insert" AFTER INSERT ON ' + t + " WHEN (NEW.geom NOT NULL AND NOT ST_IsEmpty(NEW.geom)) "
+            "BEGIN INSERT OR REPLACE INTO " + r + " VALUES " + box + "; END",
+            "CREATE TRIGGER " + trigger + 'update1" AFTER UPDATE OF geom ON ' + t + " WHEN OLD.fid = NEW.fid AND (NEW.geom NOTNULL AND NOT ST_IsEmpty(NEW.geom)) "
+            "BEGIN INSERT OR REPLACE INTO " + r + " VALUES " + box + "; END",
+            "CREATE TRIGGER " + trigger + 'update2" AFTER UPDATE OF geom ON ' + t + " WHEN OLD.fid = NEW.fid AND (NEW.geom ISNULL OR ST_IsEmpty(NEW.geom)) "
+            "BEGIN DELETE FROM " + r + " WHERE id = OLD.fid; END",
+            "CREATE TRIGGER " + trigger + 'update3" AFTER UPDATE OF geom ON ' + t + " WHEN OLD.fid != NEW.fid AND (NEW.geom NOTNULL AND NOT ST_IsEmpty(NEW.geom)) "
+            "BEGIN DELETE FROM " + r + " WHERE id = OLD.fid; INSERT OR REPLACE INTO " + r + " VALUES " + box + "; END",
+            "CREATE TRIGGER " + trigger + 'update4" AFTER UPDATE ON ' + t + " WHEN OLD.fid != NEW.fid AND (NEW.geom ISNULL OR ST_IsEmpty(NEW.geom)) "
+            "BEGIN DELETE FROM " + r + " WHERE id IN (OLD.fid, NEW.fid); END",
+            "CREATE TRIGGER " + trigger + 'delete" AFTER DELETE ON ' + t + " WHEN OLD.geom NOT NULL "
+            "BEGIN DELETE FROM " + r + " WHERE id = OLD.fid; END"]
+
+    def close(self):
+        starttime = datetime.datetime.now()
+        c = self.connection
+        with c:
+            c.execute('CREATE INDEX "' + self.name + '_IncursionSeverity_idx" ON "' + self.name + '" (IncursionSeverity)')
+            c.execute('CREATE INDEX "' + self.name + '_uwr_idx" ON "' + self.name + '" ("' + self.fields[9] + '", "' + self.fields[10] + '")')
+            c.execute('CREATE INDEX "' + self.name + '_FlightName_idx" ON "' + self.name + '" (FlightName)')
+            for statement in self.rtreeTriggers():
+                c.execute(statement)
+            for severity, label in self.IncursionSeverity.items():
+                #sqlite views can't have parameters
+                c.execute('CREATE VIEW "' + severityName(severity) + '" AS SELECT * FROM "' + self.name + '" WHERE ' + severityWhere(label))
+            if self.count:
+                c.execute("UPDATE gpkg_contents SET min_x = ?, min_y = ?, max_x = ?, max_y = ? WHERE table_name IN (" + ", ".join("?"*(len(self.views) + 1)) + ")",
+                          self.extent + [self.name] + self.views)
+        c.close()
+        print("Wrote", self.count, "points to", self.path, "with", len(self.views), "severity views:", datetime.datetime.now() - starttime)
+        return [self.path + "|" + view for view in self.views]
+
+
+class FlatGeobufPointWriter:
+    """
+    Purpose:
+    Writes the points into a folder of FlatGeobuf files, one per incursion severity partition (Below500m_<severity>.fgb),
+    each with a packed Hilbert R-tree spatial index. Every point is in one partition only, the folder is the full point
+    set. Needs GDAL (osgeo.ogr).
+
+    Inputs:
+    folder: Full path of the output folder (eg. ...\\allFlightPoint.fgb). Made if it doesn't exist, old partitions are replaced
+    unit_no, unit_no_id, IncursionSeverity: see GeodatabasePointWriter
+    """
+
+    def __init__(self, folder, unit_no, unit_no_id, IncursionSeverity):
+        from osgeo import ogr, osr
+        self.ogr = ogr
+        self.folder = folder
+        self.unit_no = unit_no
+        self.unit_no_id = unit_no_id
+        self.IncursionSeverity = IncursionSeverity
+        self.fields = fieldNames(unit_no, unit_no_id)
+        self.count = 0
+        self.srs = osr.SpatialReference()
+        self.srs.ImportFromEPSG(3005)
+        self.driver = ogr.GetDriverByName("FlatGeobuf")
+        self.partitions = {}
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+    def partition(self, label):
+        #data source and layer of a severity, made on its first point
+        if label not in self.partitions:
+            severity = next(s for s, l in self.IncursionSeverity.items() if l == label)
+            path = os.path.join(self.folder, severityName(severity) + ".fgb")
+            if os.path.exists(path):
+                self.driver.DeleteDataSource(path)
+            dataSource = self.driver.CreateDataSource(path)
+            layer = dataSource.CreateLayer(severityName(severity), self.srs, self.ogr.wkbPoint, options=["SPATIAL_INDEX=YES"])
+            types = {"TEXT": self.ogr.OFTString, "DATETIME": self.ogr.OFTDateTime, "DOUBLE": self.ogr.OFTReal, "INTEGER": self.ogr.OFTInteger}
+            for f, (_, sqlType) in zip(self.fields, pointFields):
+                layer.CreateField(self.ogr.FieldDefn(f, types[sqlType]))
+            self.partitions[label] = (dataSource, layer)
+        return self.partitions[label][1]
+
+    def __call__(self, table):
+        for row in columnRows(table):
+            layer = self.partition(row[-1])
+            feature = self.ogr.Feature(layer.GetLayerDefn())
+            point = self.ogr.Geometry(self.ogr.wkbPoint)
+            point.AddPoint_2D(row[0], row[1])
+            feature.SetGeometry(point)
+            for i, value in enumerate(row[2:]):
+                feature.SetField(i, value)
+            layer.CreateFeature(feature)
+            self.count += 1
+
+    def close(self):
+        #the spatial index of each file is written when its data source is closed. These are the last references to the
+        #layer and its data source: the layer is released first, then the data source is closed
+        paths = []
+        for label in list(self.partitions):
+            dataSource, layer = self.partitions.pop(label)
+            paths.append(dataSource.GetName())
+            del layer
+            del dataSource
+        print("Wrote", self.count, "points to", len(paths), "severity partitions in", self.folder)
+        return paths
+
+
+def openPointWriter(outputPath, name, unit_no, unit_no_id, IncursionSeverity):
+    """
+    (string, string, string, string, dictionary) -> writer
+
+    Purpose:
+    Point writer of the format of outputPath: GeoPackage if it ends with .gpkg (name is the feature table), FlatGeobuf
+    partition folder if it ends with .fgb (name is not used), Arrow IPC file if it ends with .arrow or .feather (name is
+    not used, see flightPathAnalysis_Arrow), else geodatabase (name is the feature class).
+    Call the writer with PointTable chunks, then close() it to make the indexes and severity views.
+    """
+    if outputPath.lower().endswith(".gpkg"):
+        return GeoPackagePointWriter(outputPath, name, unit_no, unit_no_id, IncursionSeverity)
+    if outputPath.lower().endswith(".fgb"):
+        return FlatGeobufPointWriter(outputPath, unit_no, unit_no_id, IncursionSeverity)
+    if outputPath.lower().endswith((".arrow", ".feather")):
+        import flightPathAnalysis_Arrow
+        return flightPathAnalysis_Arrow.ArrowPointWriter(outputPath, unit_no, unit_no_id, IncursionSeverity)
+    return GeodatabasePointWriter(outputPath, name, unit_no, unit_no_id, IncursionSeverity)
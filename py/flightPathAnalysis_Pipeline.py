@@ -0,0 +1,282 @@
+### pipeline runner used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# Class: PipelineRunner - runs the stages of main() as a dependency graph. Each stage is checkpointed with a
+# fingerprint of its inputs so that a rerun resumes from the first stale or failed stage.
+# Class: UnitCheckpoint - records the units (eg. uwr) already processed inside a stage so that a long
+# stage like LOS_Analysis can resume at the per uwr level.
+
+import datetime
+import hashlib
+import json
+import os
+
+
+def fingerprintPath(path):
+    """
+    (string) -> string
+
+    Purpose:
+    Returns a cheap fingerprint of a file, folder or geodatabase dataset made from the names, sizes and
+    modification times of the files on disk. Datasets inside a gdb (eg. Input.gdb\\DEM) don't exist as files,
+    so the fingerprint of the closest existing folder (the gdb) is used instead.
+    Returns "missing" if nothing on the path exists.
+    """
+    path = os.path.normpath(path)
+    while path and not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            return "missing"
+        path = parent
+    if not path:
+        return "missing"
+
+    sha = hashlib.sha1()
+    if os.path.isfile(path):
+        stat = os.stat(path)
+        sha.update((os.path.basename(path) + str(stat.st_size) + str(stat.st_mtime_ns)).encode())
+    else:
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for f in sorted(files):
+                if f.endswith(".lock"): #gdb lock files come and go while the gdb is read
+                    continue
+                stat = os.stat(os.path.join(root, f))
+                relPath = os.path.relpath(os.path.join(root, f), path)
+                sha.update((relPath + str(stat.st_size) + str(stat.st_mtime_ns)).encode())
+    return sha.hexdigest()
+
+def fingerprintDataset(path):
+    """
+    (string) -> string
+
+    Purpose:
+    Same as fingerprintPath() but datasets inside a gdb are fingerprinted on their own with arcpy (count of rows, extent,
+    fields or cell size) instead of using the whole gdb. Writing another feature class into the same gdb then doesn't make
+    the dataset look changed.
+    """
+    if ".gdb" not in path or os.path.normpath(path).endswith(".gdb"):
+        return fingerprintPath(path)
+
+    import arcpy
+    if not arcpy.Exists(path):
+        return "missing"
+    desc = arcpy.Describe(path)
+    values = [desc.dataType]
+    if hasattr(desc, "extent"):
+        values.append(str(desc.extent))
+    if desc.dataType in ("FeatureClass", "Table"):
+        values.append(int(arcpy.GetCount_management(path)[0]))
+        values.append([f.name + f.type for f in arcpy.ListFields(path)])
+    elif desc.dataType in ("RasterDataset", "RasterBand"):
+        values.append([desc.meanCellWidth, desc.meanCellHeight, desc.bandCount])
+    return fingerprintValues(*values)
+
+def fingerprintValues(*values):
+    """
+    (any) -> string
+
+    Purpose: Returns a fingerprint of parameter values (strings, numbers, lists, dictionaries)
+    """
+    return hashlib.sha1(json.dumps(values, sort_keys=True, default=str).encode()).hexdigest()
+
+def writeJSON(obj, path):
+    """
+    Purpose: Writes obj to a json file. The file is written to a temporary file first and then moved
+    so that a crash never leaves a half written checkpoint.
+    """
+    tempPath = path + ".tmp"
+    with open(tempPath, "w") as f:
+        json.dump(obj, f, indent=2, sort_keys=True, default=str)
+    os.replace(tempPath, path)
+
+def readJSON(path, default=None):
+    """
+    Purpose: Reads a json file. Returns default if the file does not exist or can't be read.
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+class UnitCheckpoint:
+    """
+    Purpose:
+    Keeps track of the units (eg. uwr unique ids) that a stage has already finished. The list is saved
+    to a json file after every unit. The list is thrown away if the fingerprint of the stage changed
+    since it was written, ie. the units have to be done again with the new inputs.
+
+    Inputs:
+    path: Full path of the json file
+    fingerprint: Fingerprint of the stage inputs. See PipelineRunner.stageFingerprint()
+    """
+
+    def __init__(self, path, fingerprint):
+        self.path = path
+        self.fingerprint = fingerprint
+        saved = readJSON(path, {})
+        if saved.get("fingerprint") == fingerprint:
+            self.done = set(saved.get("done", []))
+        else:
+            self.done = set()
+
+    def isDone(self, unit):
+        return unit in self.done
+
+    def markDone(self, unit):
+        self.done.add(unit)
+        writeJSON({"fingerprint": self.fingerprint, "done": sorted(self.done)}, self.path)
+
+    def clear(self):
+        self.done = set()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Stage:
+    """
+    Purpose: One stage of the pipeline.
+
+    Inputs:
+    name: Unique name of the stage
+    func: Function to run. It is called with the keyword arguments in params. If the function has a
+        'checkpoint' argument set to True in params, it is replaced by a UnitCheckpoint for the stage.
+    inputs: List of paths read by the stage that are not made by another stage (gpx folder, DEM, etc.)
+    outputs: List of paths made by the stage
+    deps: List of names of stages that have to be run before this stage
+    params: Dictionary of keyword arguments for func. Part of the fingerprint.
+    """
+
+    def __init__(self, name, func, inputs=None, outputs=None, deps=None, params=None):
+        self.name = name
+        self.func = func
+        self.inputs = inputs or []
+        self.outputs = outputs or []
+        self.deps = deps or []
+        self.params = params or {}
+
+
+class PipelineRunner:
+    """
+    Purpose:
+    Runs a list of stages in dependency order. After each stage finishes, the fingerprint of its inputs
+    is saved in a manifest file in checkpointFolder. On a rerun, a stage is skipped if its fingerprint
+    is unchanged, it finished and all its outputs still exist. The run therefore resumes from the first
+    stale or failed stage. Every stage downstream of a stage that is run again is also run again.
+
+    Inputs:
+    checkpointFolder: Folder to keep the manifest and the per unit checkpoints of the stages
+    exists: Function used to check if the outputs of a stage exist. Use arcpy.Exists for gdb datasets.
+    fingerprint: Function used to fingerprint the inputs of a stage. Use fingerprintDataset for gdb datasets.
+    """
+
+    def __init__(self, checkpointFolder, exists=os.path.exists, fingerprint=fingerprintPath):
+        self.checkpointFolder = checkpointFolder
+        self.exists = exists
+        self.fingerprint = fingerprint
+        self.stages = {}
+        if not os.path.exists(checkpointFolder):
+            os.makedirs(checkpointFolder)
+        self.manifestPath = os.path.join(checkpointFolder, "manifest.json")
+        self.manifest = readJSON(self.manifestPath, {})
+
+    def addStage(self, stage):
+        if stage.name in self.stages:
+            raise ValueError("stage " + stage.name + " is already in the pipeline")
+        self.stages[stage.name] = stage
+        return stage
+
+    def stageOrder(self):
+        """
+        Purpose: Returns the names of the stages sorted so that every stage comes after its dependencies
+        """
+        order = []
+        visiting = set()
+
+        def visit(name):
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError("pipeline has a dependency cycle at stage " + name)
+            if name not in self.stages:
+                raise ValueError("unknown stage " + name)
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def stageFingerprint(self, name):
+        """
+        Purpose: Fingerprint of a stage made from its parameters, its inputs on disk and the fingerprints
+        its dependencies had when they finished.
+        """
+        stage = self.stages[name]
+        inputs = [[path, self.fingerprint(path)] for path in stage.inputs]
+        deps = [[dep, self.manifest.get(dep, {}).get("fingerprint")] for dep in sorted(stage.deps)]
+        params = {k: v for k, v in stage.params.items() if k != "checkpoint"}
+        return fingerprintValues(name, params, inputs, deps)
+
+    def isStale(self, name, rerun):
+        record = self.manifest.get(name)
+        if record is None or record.get("status") != "done":
+            return "never finished"
+        if any(dep in rerun for dep in self.stages[name].deps):
+            return "upstream stage was run again"
+        if record.get("fingerprint") != self.stageFingerprint(name):
+            return "inputs or parameters changed"
+        missing = [path for path in self.stages[name].outputs if not self.exists(path)]
+        if missing:
+            return "missing outputs " + str(missing)
+        return None
+
+    def unitCheckpoint(self, name, fingerprint):
+        return UnitCheckpoint(os.path.join(self.checkpointFolder, name + "_units.json"), fingerprint)
+
+    def run(self, force=None):
+        """
+        Purpose: Runs all stale stages in dependency order.
+
+        Inputs:
+        force: Optional list of stage names to run even if they are up to date
+        """
+        force = set(force or [])
+        rerun = set()
+        for name in self.stageOrder():
+            stage = self.stages[name]
+            reason = "forced" if name in force else self.isStale(name, rerun)
+            if reason is None:
+                print("stage", name, "is up to date. Skipping")
+                continue
+
+            print("running stage", name, "(" + reason + ")")
+            starttime = datetime.datetime.now()
+            fingerprint = self.stageFingerprint(name)
+            kwargs = dict(stage.params)
+            if kwargs.get("checkpoint") is True:
+                kwargs["checkpoint"] = self.unitCheckpoint(name, fingerprint)
+                #the fingerprint is the same as the last run when the stage is forced, an upstream stage ran again or
+                # outputs are missing, so the finished units of the last run must not be skipped
+                if reason not in ("never finished", "inputs or parameters changed"):
+                    kwargs["checkpoint"].clear()
+
+            self.manifest[name] = {"status": "running", "fingerprint": fingerprint, "start": str(starttime)}
+            writeJSON(self.manifest, self.manifestPath)
+            try:
+                stage.func(**kwargs)
+            except BaseException as e:
+                self.manifest[name]["status"] = "failed"
+                self.manifest[name]["error"] = repr(e)
+                writeJSON(self.manifest, self.manifestPath)
+                print("stage", name, "failed. Rerun to resume from this stage")
+                raise
+
+            self.manifest[name] = {"status": "done", "fingerprint": fingerprint, "start": str(starttime), "end": str(datetime.datetime.now())}
+            writeJSON(self.manifest, self.manifestPath)
+            rerun.add(name)
+            print("Runtime for stage", name, ":", datetime.datetime.now() - starttime)
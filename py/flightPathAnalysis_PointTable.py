@@ -0,0 +1,281 @@
+### compact flight point table used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# Class: PointTable - flight points as a numpy structured array of fixed width numeric fields. Flight, uwr, incursion
+# severity and height range are integer codes into side dictionaries instead of text on every point, so a point takes
+# 44 bytes and joins/group bys are done on integers.
+# update: Oct. 19, 2026 - a point in several uwr zones (overlapping uwr) is one row per zone in a PointTable
+# Class: PointMembership - the same points stored once, with the uwr and severity of the zones each point is in as CSR
+# members (the zones of point i are members offsets[i]:offsets[i+1]). A point takes 36 bytes plus 5 bytes per zone.
+# Masking and statistics run on the members, and the rows of a PointTable are only made to write the points out
+
+import numpy as np
+
+import flightPathAnalysis_Names
+
+#fields of a point. Time interval and total time are per flight, buffer distance and severity label are per severity code
+pointDtype = np.dtype([
+    ("x", "f8"),
+    ("y", "f8"),
+    ("time", "M8[ms]"),
+    ("elevation", "f4"),
+    ("demElev", "f4"),
+    ("agl", "i2"),
+    ("heightRange", "i1"),
+    ("severity", "i1"),
+    ("flight", "i4"),
+    ("uwr", "i4"),
+])
+
+#fields of a point of a PointMembership. The severity and uwr are per member
+uniquePointDtype = np.dtype([(name, pointDtype[name]) for name in pointDtype.names if name not in ("severity", "uwr")])
+
+
+class PointTable:
+    """
+    Purpose: Flight points with integer coded flight, uwr, severity and height range.
+
+    Inputs:
+    points: structured array with pointDtype
+    flightNames: List of flight names. points["flight"] indexes it
+    flightTimeInterval: Array of the time interval (seconds) each point of a flight represents
+    flightTotalTime: Array of the total time (seconds) of each flight
+    uwrKeys: List of (unit number, unit number id) of the uwr. points["uwr"] indexes it
+    severities: List of (buffer distance, incursion severity label) sorted by buffer distance. points["severity"] indexes it
+    heightRanges: List of height range labels. points["heightRange"] indexes it
+    """
+
+    def __init__(self, points, flightNames, flightTimeInterval, flightTotalTime, uwrKeys, severities, heightRanges):
+        self.points = points
+        self.flightNames = list(flightNames)
+        self.flightTimeInterval = np.asarray(flightTimeInterval, dtype="float64")
+        self.flightTotalTime = np.asarray(flightTotalTime, dtype="float64")
+        self.uwrKeys = list(uwrKeys)
+        self.severities = list(severities)
+        self.heightRanges = list(heightRanges)
+
+    def __len__(self):
+        return len(self.points)
+
+    @property
+    def nbytes(self):
+        return self.points.nbytes + self.flightTimeInterval.nbytes + self.flightTotalTime.nbytes
+
+    def uwrID(self, code):
+        #unique uwr id text as stored in the gdb layers
+        return flightPathAnalysis_Names.uwrUniqueID(*self.uwrKeys[code])
+
+    def timeInterval(self):
+        return self.flightTimeInterval[self.points["flight"]]
+
+    def select(self, mask):
+        #new table with the points of a boolean mask or index array, same dictionaries
+        return PointTable(self.points[mask], self.flightNames, self.flightTimeInterval, self.flightTotalTime, self.uwrKeys, self.severities, self.heightRanges)
+
+    def uwrPoints(self):
+        #(uwr code, rows, index in points of each row) of each uwr in the table. Each row is its own point here
+        for code, rows in uwrGroups(self.points["uwr"]):
+            yield code, rows, rows
+
+    def membership(self):
+        """
+        () -> PointMembership
+
+        Purpose: The points of the table stored once. Consecutive rows of the same point (same flight, time and
+        position, as made by flightPathAnalysis_Geometry.classifyPoints()) become the members of one point.
+        """
+        p = self.points
+        first = np.ones(len(p), dtype=bool)
+        if len(p):
+            first[1:] = ((p["flight"][1:] != p["flight"][:-1]) | (p["time"][1:] != p["time"][:-1]) | (p["x"][1:] != p["x"][:-1])
+                         | (p["y"][1:] != p["y"][:-1]))
+        points = np.zeros(np.count_nonzero(first), dtype=uniquePointDtype)
+        for name in uniquePointDtype.names:
+            points[name] = p[name][first]
+        offsets = np.append(np.flatnonzero(first), len(p)).astype("int64")
+        return PointMembership(points, offsets, p["uwr"].copy(), p["severity"].copy(), self.flightNames, self.flightTimeInterval,
+                               self.flightTotalTime, self.uwrKeys, self.severities, self.heightRanges)
+
+    def toColumns(self, unit_no="unit_no", unit_no_id="unit_no_id"):
+        """
+        Purpose: Decodes the table into a dictionary of columns named like the fields of the point feature class
+        of getFlightLinePoints(). Used to write the points into a gdb.
+        """
+        p = self.points
+        buffDist = np.array([s[0] for s in self.severities], dtype="float64")
+        labels = np.array([s[1] for s in self.severities] or [""], dtype=object)
+        uwrNo = np.array([k[0] for k in self.uwrKeys] or [""], dtype=object)
+        uwrNoId = np.array([k[1] for k in self.uwrKeys] or [""], dtype=object)
+        return {
+            "X": p["x"],
+            "Y": p["y"],
+            "FlightName": np.array(self.flightNames or [""], dtype=object)[p["flight"]],
+            "DateTime": p["time"],
+            "Elevation": p["elevation"].astype("float64"),
+            "DEMElev": p["demElev"].astype("float64"),
+            "AGL": p["agl"].astype("int64"),
+            "TimeInterval": self.flightTimeInterval[p["flight"]] if len(p) else np.zeros(0),
+            "TotalTime": self.flightTotalTime[p["flight"]] if len(p) else np.zeros(0),
+            "HeightRange": np.array(self.heightRanges, dtype=object)[p["heightRange"]],
+            "BUFF_DIST": buffDist[p["severity"]] if len(p) else np.zeros(0),
+            unit_no: uwrNo[p["uwr"]],
+            unit_no_id: uwrNoId[p["uwr"]],
+            "IncursionSeverity": labels[p["severity"]],
+        }
+
+    def statistics(self, keys=("flight", "heightRange", "severity", "uwr")):
+        """
+        (optional: tuple) -> dictionary
+
+        Purpose:
+        Sum of TimeInterval for each combination of the key fields, like the Statistics_analysis of main() but grouped
+        on the integer codes. Returns a dictionary with the codes of each key field, "SUM_TimeInterval" and "FREQUENCY".
+        """
+        return groupStatistics([self.points[k] for k in keys], keys, self.timeInterval())
+
+
+class PointMembership:
+    """
+    Purpose: Flight points stored once, with the zones (uwr and severity) each point is in as members in CSR form.
+    Same dictionaries and methods as PointTable, where a member is a row of the PointTable: len(), select(),
+    statistics() and the masks of flightPathAnalysis_Masking work on the members.
+
+    Inputs:
+    points: structured array with uniquePointDtype
+    offsets: Array of len(points) + 1 positions. The members of point i are offsets[i]:offsets[i+1]
+    memberUWR: uwr code of each member. Indexes uwrKeys
+    memberSeverity: severity code of each member. Indexes severities
+    flightNames, flightTimeInterval, flightTotalTime, uwrKeys, severities, heightRanges: See PointTable
+    """
+
+    def __init__(self, points, offsets, memberUWR, memberSeverity, flightNames, flightTimeInterval, flightTotalTime, uwrKeys, severities, heightRanges):
+        self.points = points
+        self.offsets = np.asarray(offsets, dtype="int64")
+        self.memberUWR = np.asarray(memberUWR, dtype="int32")
+        self.memberSeverity = np.asarray(memberSeverity, dtype="int8")
+        self.flightNames = list(flightNames)
+        self.flightTimeInterval = np.asarray(flightTimeInterval, dtype="float64")
+        self.flightTotalTime = np.asarray(flightTotalTime, dtype="float64")
+        self.uwrKeys = list(uwrKeys)
+        self.severities = list(severities)
+        self.heightRanges = list(heightRanges)
+
+    def __len__(self):
+        #number of members, ie. rows of the PointTable
+        return len(self.memberUWR)
+
+    @property
+    def pointCount(self):
+        return len(self.points)
+
+    @property
+    def nbytes(self):
+        return (self.points.nbytes + self.offsets.nbytes + self.memberUWR.nbytes + self.memberSeverity.nbytes
+                + self.flightTimeInterval.nbytes + self.flightTotalTime.nbytes)
+
+    def uwrID(self, code):
+        return flightPathAnalysis_Names.uwrUniqueID(*self.uwrKeys[code])
+
+    def memberPoints(self):
+        #index in points of each member
+        return np.repeat(np.arange(len(self.points)), np.diff(self.offsets))
+
+    def memberColumn(self, name, memberPoints=None):
+        #field of each member: a member field, or the field of its point
+        if name == "uwr":
+            return self.memberUWR
+        if name == "severity":
+            return self.memberSeverity
+        return self.points[name][self.memberPoints() if memberPoints is None else memberPoints]
+
+    def timeInterval(self):
+        return self.flightTimeInterval[self.memberColumn("flight")]
+
+    def select(self, mask):
+        #new membership with the members of a boolean mask or index array. Points left without members are dropped
+        keep = np.zeros(len(self), dtype=bool)
+        keep[mask] = True
+        counts = np.bincount(self.memberPoints()[keep], minlength=len(self.points))
+        kept = counts > 0
+        return PointMembership(self.points[kept], np.concatenate([[0], np.cumsum(counts[kept])]), self.memberUWR[keep], self.memberSeverity[keep],
+                               self.flightNames, self.flightTimeInterval, self.flightTotalTime, self.uwrKeys, self.severities, self.heightRanges)
+
+    def uwrPoints(self):
+        #(uwr code, members, index in points of each member) of each uwr
+        memberPoints = self.memberPoints()
+        for code, rows in uwrGroups(self.memberUWR):
+            yield code, rows, memberPoints[rows]
+
+    def table(self):
+        """
+        () -> PointTable
+
+        Purpose: One row per member, like the output of flightPathAnalysis_Geometry.classifyPoints(). Used to write the points
+        """
+        memberPoints = self.memberPoints()
+        rows = np.zeros(len(self), dtype=pointDtype)
+        for name in pointDtype.names:
+            rows[name] = self.memberColumn(name, memberPoints)
+        return PointTable(rows, self.flightNames, self.flightTimeInterval, self.flightTotalTime, self.uwrKeys, self.severities, self.heightRanges)
+
+    def toColumns(self, unit_no="unit_no", unit_no_id="unit_no_id"):
+        #see PointTable.toColumns()
+        return self.table().toColumns(unit_no, unit_no_id)
+
+    def statistics(self, keys=("flight", "heightRange", "severity", "uwr")):
+        """
+        Purpose: Same as PointTable.statistics(), grouped on the members
+        """
+        memberPoints = self.memberPoints()
+        return groupStatistics([self.memberColumn(k, memberPoints) for k in keys], keys, self.flightTimeInterval[self.points["flight"][memberPoints]])
+
+def groupStatistics(columns, keys, timeInterval):
+    #sum of timeInterval and count of the rows of each combination of the integer code columns
+    if len(timeInterval) == 0:
+        result = {k: np.zeros(0, dtype="int64") for k in keys}
+        result["SUM_TimeInterval"] = np.zeros(0)
+        result["FREQUENCY"] = np.zeros(0, dtype="int64")
+        return result
+    codes = np.stack([c.astype("int64") for c in columns], axis=1)
+    groups, inverse = np.unique(codes, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    result = {k: groups[:, i] for i, k in enumerate(keys)}
+    result["SUM_TimeInterval"] = np.bincount(inverse, weights=timeInterval, minlength=len(groups))
+    result["FREQUENCY"] = np.bincount(inverse, minlength=len(groups))
+    return result
+
+def uwrGroups(uwr):
+    #(uwr code, rows) of each uwr code of an array, rows in increasing order. One sort instead of a scan per uwr
+    order = np.argsort(uwr, kind="stable")
+    bounds = np.flatnonzero(np.diff(uwr[order])) + 1
+    for rows in np.split(order, bounds):
+        if len(rows):
+            yield int(uwr[rows[0]]), rows
+
+def severityTable(IncursionSeverity):
+    #(buffer distance, label) sorted by buffer distance. The index is the severity code
+    return sorted((float(k), v) for k, v in IncursionSeverity.items())
+
+def concatenate(tables):
+    """
+    (list) -> PointTable
+
+    Purpose: Joins point tables made with the same uwr zones and severities (eg. the chunks of a streaming run).
+    Flight codes are shifted so they stay unique.
+    """
+    tables = [t for t in tables if t is not None]
+    first = tables[0]
+    points = []
+    flightNames = []
+    timeInterval = []
+    totalTime = []
+    for t in tables:
+        if t.uwrKeys != first.uwrKeys or t.severities != first.severities:
+            raise ValueError("point tables have different uwr or severity dictionaries")
+        p = t.points.copy()
+        p["flight"] += len(flightNames)
+        points.append(p)
+        flightNames += t.flightNames
+        timeInterval.append(t.flightTimeInterval)
+        totalTime.append(t.flightTotalTime)
+    return PointTable(np.concatenate(points), flightNames, np.concatenate(timeInterval), np.concatenate(totalTime),
+                      first.uwrKeys, first.severities, first.heightRanges)
@@ -0,0 +1,322 @@
+### coarse to fine viewsheds on a DEM pyramid used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# The minimum AGL for a DEM cell to be seen from a uwr (flightPathAnalysis_Kernels.minimumVisibleAGL(), the agl raster
+# of Viewshed_3d in makeViewshed()) is found by reading the full resolution DEM every half cell along the line from each
+# observer to the cell. Most of those lines run well above the terrain, so most of the reads don't change the answer.
+# Here the DEM window of the uwr is kept as a pyramid of block maxima (level k has the highest terrain of blocks of
+# 2**k x 2**k cells). A run of samples along a line is first checked against the highest terrain of the blocks under it:
+# if even that terrain can't give a slope steeper than the steepest one found so far (starting from the slope to the cell
+# itself, so a cell in plain view needs no DEM reads at all), the whole run is skipped. Otherwise the run is split in two
+# and each half is checked on a finer level (the half with the higher bound first), down to runs of minRun samples that
+# are read at full resolution, so only the parts of the line near the visibility boundary (the line grazing the terrain)
+# are refined. The observers are gone through twice: first to find one blocker on each line (none if the observer sees
+# the cell from the ground), which gives a lower bound of the height needed for that observer, then to find the steepest
+# slope of the blocked lines in order of their lower bound, until no other observer can lower the best height found.
+# With maxAGL (500m, the flight points are all below 500m AGL) as a starting best, cells hidden to every flight point
+# stop early too.
+# Runs are only skipped when their bound proves they don't matter, so the result is the same as the full resolution
+# sweep (capped at maxAGL): the error bound is 0, and checkPyramid() reports the error and runtime against the full
+# resolution sweep to show it. The pyramid sweep needs numba; without it the full resolution sweep is used.
+# Function: demPyramid - block maxima of every level of a terrain window, in one flat array
+# Function: pyramidMinimumAGL - minimum AGL of DEM cells with the coarse to fine sweep
+# Function: uwrViewshedPyramid - minimum AGL of every cell of the biggest buffer of a uwr
+# Function: checkPyramid - error and runtime of pyramidMinimumAGL() against the full resolution sweep
+
+import time
+import numpy as np
+
+import flightPathAnalysis_Horizon
+import flightPathAnalysis_Kernels
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+prange = numba.prange if numba is not None else range
+
+#highest AGL of the flight points (getFlightLinePoints() keeps the points below 500m AGL). A cell that needs this much
+#or more to be seen masks every flight point
+flightPointMaxAGL = 500
+
+
+def demPyramid(terrain):
+    """
+    (array) -> array, array, array
+
+    Purpose: Block maxima of a terrain window at every level, level 0 being the terrain itself, up to a single block.
+    Returns the levels in one flat array, the offset of each level in it and the number of columns of each level. nan
+    cells are left out of the maxima and a block of only nan cells is nan.
+    """
+    levels = [np.asarray(terrain, dtype="float64")]
+    while levels[-1].shape[0] > 1 or levels[-1].shape[1] > 1:
+        level = levels[-1]
+        rows, cols = level.shape
+        padded = np.full((rows + rows % 2, cols + cols % 2), np.nan)
+        padded[:rows, :cols] = level
+        levels.append(np.fmax(np.fmax(padded[0::2, 0::2], padded[1::2, 0::2]), np.fmax(padded[0::2, 1::2], padded[1::2, 1::2])))
+    offsets = np.cumsum([0] + [level.size for level in levels[:-1]]).astype("int64")
+    return np.concatenate([level.reshape(-1) for level in levels]), offsets, np.array([level.shape[1] for level in levels], dtype="int64")
+
+def runMaximum(maxValues, offsets, levelCols, windowRows, windowCols, rowA, colA, rowB, colB):
+    #highest terrain of the rectangle between two cells (rows and cols of the window), read on the finest level whose
+    #blocks cover it with at most 2 x 2 blocks. nan if the rectangle has no terrain
+    rowMin = max(min(rowA, rowB), 0)
+    rowMax = min(max(rowA, rowB), windowRows - 1)
+    colMin = max(min(colA, colB), 0)
+    colMax = min(max(colA, colB), windowCols - 1)
+    if rowMin > rowMax or colMin > colMax:
+        return np.nan
+    extent = max(rowMax - rowMin, colMax - colMin) + 1
+    level = 0
+    while (1 << level) < extent:
+        level += 1
+    level = min(level, len(offsets) - 1)
+    highest = np.nan
+    for r in range(rowMin >> level, (rowMax >> level) + 1):
+        for c in range(colMin >> level, (colMax >> level) + 1):
+            z = maxValues[offsets[level] + r*levelCols[level] + c]
+            if not np.isnan(z) and (np.isnan(highest) or z > highest):
+                highest = z
+    return highest
+
+def runBound(maxValues, offsets, levelCols, rowStart, colStart, xMin, yMax, cellSize, windowRows, windowCols, targetX, targetY, observerX, observerY,
+             observerZ, d, k, first, last):
+    #steepest slope the samples first to last of a line could have: the highest terrain of the rectangle of the cells of
+    #the first and last samples (the samples in between are in it), at the nearest sample if that terrain is above the
+    #observer, else at the farthest sample. -inf if there is no terrain under the run
+    tFirst = first/k
+    tLast = last/k
+    rowA = int(np.floor((yMax - (observerY + tFirst*(targetY - observerY)))/cellSize)) - rowStart
+    colA = int(np.floor((observerX + tFirst*(targetX - observerX) - xMin)/cellSize)) - colStart
+    rowB = int(np.floor((yMax - (observerY + tLast*(targetY - observerY)))/cellSize)) - rowStart
+    colB = int(np.floor((observerX + tLast*(targetX - observerX) - xMin)/cellSize)) - colStart
+    highest = runMaximum(maxValues, offsets, levelCols, windowRows, windowCols, rowA, colA, rowB, colB)
+    if np.isnan(highest):
+        return -np.inf
+    if highest > observerZ:
+        return (highest - observerZ)/(tFirst*d)
+    return (highest - observerZ)/(tLast*d)
+
+def lineSteepest(terrain, maxValues, offsets, levelCols, rowStart, colStart, xMin, yMax, cellSize, row, col, targetX, targetY, targetZ,
+                 observerX, observerY, observerZ, d, k, steepest, best, firstBlocker, minRun, runs, bounds):
+    """
+    Purpose: Steepest slope from an observer to the samples of the line to a cell (or steepest if higher), skipping the
+    runs of samples whose highest terrain can't be steeper. Runs are split in halves and the half with the higher bound
+    is checked first. Stops at the first sample steeper than steepest if firstBlocker, else as soon as the height needed
+    (observerZ + d x steepest - targetZ) is best or more. Also returns the number of full resolution samples read.
+    """
+    windowRows, windowCols = terrain.shape
+    start = steepest
+    samples = 0
+    waiting = 0
+    if k > 1:
+        runs[0, 0] = 1
+        runs[0, 1] = k - 1
+        bounds[0] = np.inf
+        waiting = 1
+    while waiting > 0:
+        waiting -= 1
+        first = runs[waiting, 0]
+        last = runs[waiting, 1]
+        if bounds[waiting] <= steepest:
+            continue
+        if last - first < minRun:
+            for j in range(first, last + 1):
+                t = j/k
+                sx = observerX + t*(targetX - observerX)
+                sy = observerY + t*(targetY - observerY)
+                sRow = int(np.floor((yMax - sy)/cellSize))
+                sCol = int(np.floor((sx - xMin)/cellSize))
+                if sRow == row and sCol == col:
+                    continue
+                sRow -= rowStart
+                sCol -= colStart
+                if sRow < 0 or sRow >= windowRows or sCol < 0 or sCol >= windowCols:
+                    continue
+                z = terrain[sRow, sCol]
+                if np.isnan(z):
+                    continue
+                samples += 1
+                slope = (z - observerZ)/(t*d)
+                if slope > steepest:
+                    steepest = slope
+            if (firstBlocker and steepest > start) or (not firstBlocker and observerZ + d*steepest - targetZ >= best):
+                break
+            continue
+        middle = (first + last)//2
+        nearBound = runBound(maxValues, offsets, levelCols, rowStart, colStart, xMin, yMax, cellSize, windowRows, windowCols, targetX, targetY,
+                             observerX, observerY, observerZ, d, k, first, middle)
+        farBound = runBound(maxValues, offsets, levelCols, rowStart, colStart, xMin, yMax, cellSize, windowRows, windowCols, targetX, targetY,
+                            observerX, observerY, observerZ, d, k, middle + 1, last)
+        #the half with the higher bound goes on top
+        if nearBound > farBound:
+            runs[waiting, 0], runs[waiting, 1], bounds[waiting] = middle + 1, last, farBound
+            runs[waiting + 1, 0], runs[waiting + 1, 1], bounds[waiting + 1] = first, middle, nearBound
+        else:
+            runs[waiting, 0], runs[waiting, 1], bounds[waiting] = first, middle, nearBound
+            runs[waiting + 1, 0], runs[waiting + 1, 1], bounds[waiting + 1] = middle + 1, last, farBound
+        waiting += 2
+    return steepest, samples
+
+def pyramidMinimumAGLLoop(terrain, maxValues, offsets, levelCols, rowStart, colStart, xMin, yMax, cellSize, row, col, observerX, observerY, observerZ,
+                          cellZ, maxAGL, minRun):
+    #same result as flightPathAnalysis_Kernels.minimumVisibleAGLLoop() capped at maxAGL, in two passes over the
+    #observers: the first finds the first blocker of each line (none if the observer sees the cell from the ground), which
+    #gives a lower bound of the height needed for that observer. The second finds the steepest slope of the blocked lines
+    #in order of their lower bound, until the lower bound is no better than the best height found. Also returns the number
+    #of full resolution samples read for each cell
+    windowRows, windowCols = terrain.shape
+    step = cellSize/2
+    observerCount = len(observerX)
+    minAGL = np.empty(len(row))
+    samplesRead = np.zeros(len(row), dtype=np.int64)
+    for i in prange(len(row)):
+        localRow = row[i] - rowStart
+        localCol = col[i] - colStart
+        if localRow < 0 or localRow >= windowRows or localCol < 0 or localCol >= windowCols or np.isnan(cellZ[i]):
+            minAGL[i] = np.nan
+            continue
+        targetZ = cellZ[i]
+        targetX = xMin + (col[i] + 0.5)*cellSize
+        targetY = yMax - (row[i] + 0.5)*cellSize
+        #runs of samples (first, last) waiting to be checked. Runs are split in halves, so at most 2 per level wait
+        runs = np.empty((128, 2), dtype=np.int64)
+        bounds = np.empty(128)
+        distance = np.empty(observerCount)
+        sampleCount = np.empty(observerCount, dtype=np.int64)
+        blockerSlope = np.empty(observerCount)
+        lowerBound = np.full(observerCount, np.inf)
+        best = maxAGL
+        for o in range(observerCount):
+            d = np.hypot(targetX - observerX[o], targetY - observerY[o])
+            if d == 0:
+                best = 0.0
+                break
+            k = max(int(np.ceil(d/step)), 1)
+            distance[o] = d
+            sampleCount[o] = k
+            targetSlope = (targetZ - observerZ[o])/d
+            steepest, samples = lineSteepest(terrain, maxValues, offsets, levelCols, rowStart, colStart, xMin, yMax, cellSize, row[i], col[i],
+                                             targetX, targetY, targetZ, observerX[o], observerY[o], observerZ[o], d, k, targetSlope, best, True, minRun, runs, bounds)
+            samplesRead[i] += samples
+            blockerSlope[o] = steepest
+            needed = max(observerZ[o] + d*steepest - targetZ, 0.0)
+            if steepest == targetSlope:
+                #not blocked: this is the height needed for the observer
+                if needed < best:
+                    best = needed
+                if best <= 0:
+                    break
+            else:
+                lowerBound[o] = needed
+        if best > 0:
+            for o in np.argsort(lowerBound):
+                if lowerBound[o] >= best:
+                    break
+                steepest, samples = lineSteepest(terrain, maxValues, offsets, levelCols, rowStart, colStart, xMin, yMax, cellSize, row[i], col[i],
+                                                 targetX, targetY, targetZ, observerX[o], observerY[o], observerZ[o], distance[o], sampleCount[o],
+                                                 blockerSlope[o], best, False, minRun, runs, bounds)
+                samplesRead[i] += samples
+                needed = max(observerZ[o] + distance[o]*steepest - targetZ, 0.0)
+                if needed < best:
+                    best = needed
+        minAGL[i] = best
+    return minAGL, samplesRead
+
+if numba is not None:
+    runMaximum = numba.njit(cache=True)(runMaximum)
+    runBound = numba.njit(cache=True)(runBound)
+    lineSteepest = numba.njit(cache=True)(lineSteepest)
+    pyramidMinimumAGLKernel = numba.njit(parallel=True, cache=True)(pyramidMinimumAGLLoop)
+else:
+    pyramidMinimumAGLKernel = None
+
+def pyramidMinimumAGL(terrain, window, xMin, yMax, cellSize, row, col, observerX, observerY, observerZ, maxAGL=None, minRun=8, pyramid=None):
+    """
+    (array, tuple, float, float, float, array, array, array, array, array, optional: float, int, tuple) -> array, dictionary
+
+    Inputs:
+    terrain, window, xMin, yMax, cellSize, row, col, observerX, observerY, observerZ: Same as
+        flightPathAnalysis_Kernels.minimumVisibleAGL()
+    maxAGL: Values are capped at maxAGL (eg. flightPointMaxAGL), so cells hidden to every flight point stop early. No cap
+        if None
+    minRun: Runs of this many samples or fewer are read at full resolution instead of being split again
+    pyramid: demPyramid() of terrain if already made
+
+    Output:
+    - minimum AGL of each cell, the same as minimumVisibleAGL() capped at maxAGL
+    - report: number of cells and of full resolution samples read (None without numba)
+
+    Purpose: Minimum AGL for DEM cells to be seen by at least one observer, with the lines checked coarse to fine on a
+    pyramid of the terrain. Without numba the full resolution sweep is used.
+    """
+    rowStart, rowEnd, colStart, colEnd = window
+    terrain = np.asarray(terrain, dtype="float64")
+    row = np.asarray(row, dtype="int64")
+    col = np.asarray(col, dtype="int64")
+    cap = np.inf if maxAGL is None else float(maxAGL)
+    if pyramidMinimumAGLKernel is None:
+        minAGL = np.minimum(flightPathAnalysis_Kernels.minimumVisibleAGL(terrain, window, xMin, yMax, cellSize, row, col, observerX, observerY, observerZ), cap)
+        return minAGL, {"cells": int(np.count_nonzero(~np.isnan(minAGL))), "samplesRead": None}
+    if pyramid is None:
+        pyramid = demPyramid(terrain)
+    maxValues, offsets, levelCols = pyramid
+    localRow, localCol = row - rowStart, col - colStart
+    inWindow = (localRow >= 0) & (localRow < terrain.shape[0]) & (localCol >= 0) & (localCol < terrain.shape[1])
+    cellZ = np.full(len(row), np.nan)
+    cellZ[inWindow] = terrain[localRow[inWindow], localCol[inWindow]]
+    minAGL, samplesRead = pyramidMinimumAGLKernel(terrain, maxValues, offsets, levelCols, int(rowStart), int(colStart), float(xMin), float(yMax), float(cellSize),
+                                                  row, col, np.asarray(observerX, dtype="float64"), np.asarray(observerY, dtype="float64"),
+                                                  np.asarray(observerZ, dtype="float64"), cellZ, cap, int(minRun))
+    return minAGL, {"cells": int(np.count_nonzero(~np.isnan(minAGL))), "samplesRead": int(samplesRead.sum())}
+
+def uwrViewshedPyramid(dem, zones, uwrCode, maxAGL=None, maxObservers=None, observerOffset=1.0):
+    """
+    (DEMGrid, UWRZones, int, optional: float, int, float) -> tuple, array, dictionary
+
+    Purpose: Window (see flightPathAnalysis_Horizon.uwrWindow()), minimum AGL of every cell of the window (nan outside
+    the biggest buffer, like the agl raster of makeViewshed()) and the report of pyramidMinimumAGL() for a uwr
+    """
+    observerX, observerY, observerZ = flightPathAnalysis_Horizon.uwrObservers(dem, zones, uwrCode, maxObservers, observerOffset)
+    window, terrain = flightPathAnalysis_Horizon.uwrTerrain(dem, zones, uwrCode)
+    rowStart, rowEnd, colStart, colEnd = window
+    cols, rows = np.meshgrid(np.arange(colStart, colEnd), np.arange(rowStart, rowEnd))
+    minAGL, report = pyramidMinimumAGL(terrain, window, dem.xMin, dem.yMax, dem.cellSize, rows.reshape(-1), cols.reshape(-1),
+                                       observerX, observerY, observerZ, maxAGL)
+    return window, minAGL.reshape(rows.shape), report
+
+def checkPyramid(terrain, window, xMin, yMax, cellSize, row, col, observerX, observerY, observerZ, maxAGL=None, minRun=8, sampleSize=None, seed=0):
+    """
+    (array, tuple, float, float, float, array, array, array, array, array, optional: float, int, int, int) -> dictionary
+
+    Inputs:
+    Same as pyramidMinimumAGL()
+    sampleSize: Number of cells checked, picked at random. All of them if None
+
+    Output: report of pyramidMinimumAGL() with, against the full resolution sweep on the checked cells (capped at maxAGL):
+    the runtime of both, the largest absolute error, the number of cells with another gridcode (integer minimum AGL),
+    the number of cells that change between seen from the ground and not, and the cells that are nan in only one of them
+
+    Purpose: Error bounds and speedup of the coarse to fine sweep against the full resolution answer
+    """
+    row = np.asarray(row, dtype="int64")
+    col = np.asarray(col, dtype="int64")
+    if sampleSize is not None and sampleSize < len(row):
+        sample = np.sort(np.random.default_rng(seed).choice(len(row), sampleSize, replace=False))
+        row, col = row[sample], col[sample]
+    starttime = time.perf_counter()
+    pyramidAGL, report = pyramidMinimumAGL(terrain, window, xMin, yMax, cellSize, row, col, observerX, observerY, observerZ, maxAGL, minRun)
+    report["seconds"] = round(time.perf_counter() - starttime, 3)
+    starttime = time.perf_counter()
+    fullAGL = flightPathAnalysis_Kernels.minimumVisibleAGL(terrain, window, xMin, yMax, cellSize, row, col, observerX, observerY, observerZ)
+    report["fullSeconds"] = round(time.perf_counter() - starttime, 3)
+    if maxAGL is not None:
+        fullAGL = np.minimum(fullAGL, maxAGL)
+    both = ~np.isnan(fullAGL) & ~np.isnan(pyramidAGL)
+    report["checked"] = int(np.count_nonzero(both))
+    report["maxError"] = float(np.max(np.abs(fullAGL - pyramidAGL)[both])) if np.any(both) else 0.0
+    report["gridcodeMismatches"] = int(np.count_nonzero(np.floor(fullAGL[both]) != np.floor(pyramidAGL[both])))
+    report["visibilityMismatches"] = int(np.count_nonzero((fullAGL[both] <= 0) != (pyramidAGL[both] <= 0)))
+    report["nanMismatches"] = int(np.count_nonzero(np.isnan(fullAGL) != np.isnan(pyramidAGL)))
+    return report
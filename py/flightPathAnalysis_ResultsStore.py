@@ -0,0 +1,400 @@
+### partitioned season results store used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# The results of each run were excel workbooks and feature classes named by date, so a question like "time in High
+# severity zones for uwr u-6-002 in February over three years" meant reopening and aggregating several runs by hand.
+# The store keeps the points of every season in one place:
+# - storeFolder\season=<season>\<kind>.arrow: the points of a season (Arrow points schema of flightPathAnalysis_Arrow),
+#   sorted so that each partition (date, uwr) is one record batch. kind is "points" (before terrain masking) or
+#   "maskedPoints" (after)
+# - storeFolder\index.sqlite: one row per partition with its row count, sum of TimeInterval and the min/max of DateTime,
+#   AGL and BUFF_DIST
+# Queries filter the partitions in the index first (season, date, month and uwr exactly, the other columns by min/max),
+# then read only the record batches of the partitions left, memory-mapped. Queries that only filter and group on
+# partition keys are answered from the index without reading any point. Needs pyarrow.
+#
+# Example:
+#   store = ResultsStore(storeFolder)
+#   store.query(groupBy=["season"], where={"unit_no": "u-6-002", "month": 2, "IncursionSeverity": "High"})
+#   -> {"season": ["2020-2021", "2021-2022", "2022-2023"], "seconds": [...], "points": [...]}
+# Class: ResultsStore - adds seasons of points and answers aggregate queries
+# Function: seasonOf - winter season label of a date
+# Function: addSeasonFiles - adds the Arrow files of a run (stage of flightPathAnalysis_uwr.runAnalysis())
+
+import datetime
+import os
+import sqlite3
+import numpy as np
+
+#columns that are the same for all the points of a partition
+partitionKeys = ["season", "date", "year", "month", "unit_no", "unit_no_id"]
+
+#point columns that can be filtered and grouped by
+rowKeys = ["FlightName", "IncursionSeverity", "HeightRange", "BUFF_DIST"]
+
+#point columns with their min/max in the index (min<suffix>, max<suffix>)
+rangeColumns = {"DateTime": "Time", "AGL": "AGL", "BUFF_DIST": "BuffDist"}
+
+#first month of a winter season
+seasonStartMonth = 7
+
+#hours added to the UTC time of the points to get their date (Pacific standard time)
+dateOffsetHours = -8
+
+
+def seasonOf(date):
+    #winter season label of a date, eg. 2022-02-01 -> "2021-2022"
+    year = date.year if date.month >= seasonStartMonth else date.year - 1
+    return str(year) + "-" + str(year + 1)
+
+def localDays(dateTime):
+    #day number (days since 1970-01-01) of datetime64 values, in local time
+    return ((dateTime.astype("datetime64[ms]").astype("int64") + dateOffsetHours*3600000)//86400000).astype("int64")
+
+def matches(value, condition):
+    #condition: a value, a list of values or a (low, high) tuple, inclusive
+    if isinstance(condition, tuple):
+        return condition[0] <= value <= condition[1]
+    if isinstance(condition, list):
+        return value in condition
+    return value == condition
+
+def overlaps(low, high, condition):
+    #True if some value in [low, high] can match condition
+    if isinstance(condition, tuple):
+        return high >= condition[0] and low <= condition[1]
+    values = condition if isinstance(condition, list) else [condition]
+    return any(low <= v <= high for v in values)
+
+def timeCondition(condition):
+    #DateTime condition in ms since epoch
+    def ms(value):
+        return int(np.datetime64(value, "ms").astype("int64"))
+    if isinstance(condition, tuple):
+        return (ms(condition[0]), ms(condition[1]))
+    if isinstance(condition, list):
+        return [ms(v) for v in condition]
+    return ms(condition)
+
+def groupCodes(columns):
+    """
+    (list) -> array, array
+
+    Purpose: Groups of the rows of equal length columns. Returns the values of each column for each group (one row per
+    group, sorted) and the group of each row. The columns are combined into one int64 key per row, which is faster to
+    sort than rows of a 2d array.
+    """
+    key = np.zeros(len(columns[0]), dtype="int64")
+    columnValues = []
+    for column in columns:
+        values, inverse = np.unique(column, return_inverse=True)
+        key = key*len(values) + inverse.reshape(-1)
+        columnValues.append(values)
+    groupKeys, inverse = np.unique(key, return_inverse=True)
+    unique = np.empty((len(groupKeys), len(columns)), dtype="float64")
+    for i in range(len(columns) - 1, -1, -1):
+        groupKeys, code = np.divmod(groupKeys, len(columnValues[i]))
+        unique[:, i] = columnValues[i][code]
+    return unique, inverse.reshape(-1)
+
+
+class ResultsStore:
+    """
+    Purpose: Season results partitioned by season, date and uwr, with a query API.
+
+    Inputs:
+    storeFolder: Folder of the store. Made if it doesn't exist
+    """
+
+    def __init__(self, storeFolder):
+        self.storeFolder = storeFolder
+        if not os.path.exists(storeFolder):
+            os.makedirs(storeFolder)
+        self.connection = sqlite3.connect(os.path.join(storeFolder, "index.sqlite"))
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS partitions (season TEXT, kind TEXT, date TEXT, year INTEGER, month INTEGER,
+                                   unit_no TEXT, unit_no_id TEXT, batch INTEGER, rows INTEGER, seconds REAL, minTime INTEGER, maxTime INTEGER,
+                                   minAGL REAL, maxAGL REAL, minBuffDist REAL, maxBuffDist REAL)""")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS seasons (season TEXT, kind TEXT, file TEXT, rows INTEGER, severities TEXT, added TEXT)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS partitions_idx ON partitions (kind, season, unit_no, date)")
+        self.connection.commit()
+        self.readers = {}
+
+    def close(self):
+        self.readers = {}
+        self.connection.close()
+
+    def seasonPath(self, season, kind):
+        return os.path.join(self.storeFolder, "season=" + season, kind + ".arrow")
+
+    def seasons(self, kind="maskedPoints"):
+        return [row[0] for row in self.connection.execute("SELECT season FROM seasons WHERE kind = ? ORDER BY season", (kind,))]
+
+    def addSeason(self, pointsPath, kind="maskedPoints", season=None):
+        """
+        (string, optional: string, string) -> string
+
+        Inputs:
+        pointsPath: Arrow points file (see flightPathAnalysis_Arrow)
+        kind: "points" (before terrain masking) or "maskedPoints" (after)
+        season: Season label. The season of the median point date if not given (see seasonOf())
+
+        Output: the season label. A season already in the store is replaced
+
+        Purpose: Sorts the points by partition and writes them in the store with one record batch per partition, then
+        indexes the partitions.
+        """
+        import pyarrow as pa
+
+        starttime = datetime.datetime.now()
+        with pa.memory_map(pointsPath) as source:
+            table = pa.ipc.open_file(source).read_all().unify_dictionaries().combine_chunks()
+        days = localDays(table.column("DateTime").to_numpy())
+        if season is None:
+            season = seasonOf(datetime.date(1970, 1, 1) + datetime.timedelta(days=int(np.median(days)) if len(days) else 0))
+        unitNo = table.column("unit_no").chunk(0) if table.num_rows else None
+        unitNoId = table.column("unit_no_id").chunk(0) if table.num_rows else None
+
+        rows = []
+        if table.num_rows:
+            #partition key of each point: day, unit_no code, unit_no_id code
+            unitNoCodes = unitNo.indices.to_numpy()
+            unitNoIdCodes = unitNoId.indices.to_numpy()
+            order = np.lexsort((unitNoIdCodes, unitNoCodes, days))
+            table = table.take(pa.array(order))
+            days = days[order]
+            unitNoCodes = unitNoCodes[order]
+            unitNoIdCodes = unitNoIdCodes[order]
+            starts = np.flatnonzero(np.concatenate([[True], (np.diff(days) != 0) | (np.diff(unitNoCodes) != 0) | (np.diff(unitNoIdCodes) != 0)]))
+            ends = np.append(starts[1:], len(days))
+
+            time = table.column("DateTime").to_numpy().astype("datetime64[ms]").astype("int64")
+            agl = table.column("AGL").to_numpy().astype("float64")
+            buffDist = table.column("BUFF_DIST").to_numpy()
+            seconds = np.add.reduceat(np.nan_to_num(table.column("TimeInterval").to_numpy()), starts)
+            ranges = [(np.minimum.reduceat(v, starts).tolist(), np.maximum.reduceat(v, starts).tolist()) for v in (time, agl, buffDist)]
+            unitNoValues = unitNo.dictionary.to_pylist()
+            unitNoIdValues = unitNoId.dictionary.to_pylist()
+            for batch, (s, e) in enumerate(zip(starts.tolist(), ends.tolist())):
+                date = datetime.date(1970, 1, 1) + datetime.timedelta(days=int(days[s]))
+                rows.append((season, kind, date.isoformat(), date.year, date.month, unitNoValues[unitNoCodes[s]], unitNoIdValues[unitNoIdCodes[s]],
+                             batch, e - s, float(seconds[batch]), ranges[0][0][batch], ranges[0][1][batch], ranges[1][0][batch],
+                             ranges[1][1][batch], ranges[2][0][batch], ranges[2][1][batch]))
+        else:
+            starts = np.zeros(0, dtype="int64")
+            ends = starts
+
+        path = self.seasonPath(season, kind)
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        self.readers.pop(path, None)
+        tempPath = path + ".tmp"
+        with pa.OSFile(tempPath, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                for s, e in zip(starts.tolist(), ends.tolist()):
+                    writer.write_table(table.slice(s, e - s), max_chunksize=e - s)
+        os.replace(tempPath, path)
+
+        severity = table.column("IncursionSeverity").chunk(0) if table.num_rows else None
+        severities = []
+        if table.num_rows:
+            codes, first = np.unique(severity.indices.to_numpy(), return_index=True)
+            severities = sorted((float(d), severity.dictionary[int(c)].as_py()) for d, c in zip(table.column("BUFF_DIST").to_numpy()[first], codes))
+        with self.connection:
+            self.connection.execute("DELETE FROM partitions WHERE season = ? AND kind = ?", (season, kind))
+            self.connection.execute("DELETE FROM seasons WHERE season = ? AND kind = ?", (season, kind))
+            self.connection.executemany("INSERT INTO partitions VALUES (" + ",".join("?"*16) + ")", rows)
+            self.connection.execute("INSERT INTO seasons VALUES (?, ?, ?, ?, ?, ?)", (season, kind, os.path.relpath(path, self.storeFolder), table.num_rows,
+                                                                                     repr(severities), str(datetime.datetime.now())))
+        print("Added season", season, kind, ":", table.num_rows, "points in", len(rows), "partitions :", datetime.datetime.now() - starttime)
+        return season
+
+    def partitions(self, where, kind):
+        """
+        Purpose: Partitions (rows of the index as dictionaries) that can have points matching where. Season, date, year,
+        month and uwr are exact, DateTime, AGL, BUFF_DIST and IncursionSeverity are checked against the min/max.
+        """
+        sql = "SELECT * FROM partitions WHERE kind = ?"
+        params = [kind]
+        for key in partitionKeys:
+            if key not in where:
+                continue
+            condition = where[key]
+            if isinstance(condition, tuple):
+                sql += " AND " + key + " BETWEEN ? AND ?"
+                params += [condition[0], condition[1]]
+            elif isinstance(condition, list):
+                sql += " AND " + key + " IN (" + ",".join("?"*len(condition)) + ")"
+                params += condition
+            else:
+                sql += " AND " + key + " = ?"
+                params.append(condition)
+        for column, suffix in rangeColumns.items():
+            #ranges and single values are checked against the min/max in sqlite, lists below
+            if column in where and not isinstance(where[column], list):
+                condition = timeCondition(where[column]) if column == "DateTime" else where[column]
+                low, high = condition if isinstance(condition, tuple) else (condition, condition)
+                sql += " AND max" + suffix + " >= ? AND min" + suffix + " <= ?"
+                params += [low, high]
+        cursor = self.connection.execute(sql + " ORDER BY season, batch", params)
+        names = [d[0] for d in cursor.description]
+        selected = []
+        severityDistances = self.severityDistances(kind)
+        for values in cursor:
+            partition = dict(zip(names, values))
+            if "DateTime" in where and not overlaps(partition["minTime"], partition["maxTime"], timeCondition(where["DateTime"])):
+                continue
+            if "AGL" in where and not overlaps(partition["minAGL"], partition["maxAGL"], where["AGL"]):
+                continue
+            if "BUFF_DIST" in where and not overlaps(partition["minBuffDist"], partition["maxBuffDist"], where["BUFF_DIST"]):
+                continue
+            if "IncursionSeverity" in where:
+                labels = where["IncursionSeverity"] if isinstance(where["IncursionSeverity"], list) else [where["IncursionSeverity"]]
+                distances = [d for d, label in severityDistances.get(partition["season"], []) if label in labels]
+                if not overlaps(partition["minBuffDist"], partition["maxBuffDist"], distances):
+                    continue
+            selected.append(partition)
+        return selected
+
+    def severityDistances(self, kind):
+        #season -> [(buffer distance, severity label)]
+        import ast
+        return {season: ast.literal_eval(severities) for season, severities in
+                self.connection.execute("SELECT season, severities FROM seasons WHERE kind = ?", (kind,))}
+
+    def batch(self, season, kind, index):
+        #record batch of a partition, read from the memory-mapped season file
+        import pyarrow as pa
+
+        path = self.seasonPath(season, kind)
+        if path not in self.readers:
+            self.readers[path] = pa.ipc.open_file(pa.memory_map(path))
+        return self.readers[path].get_batch(index)
+
+    def query(self, groupBy=("season",), where=None, kind="maskedPoints", countFlights=False):
+        """
+        (optional: list, dictionary, string, boolean) -> dictionary
+
+        Inputs:
+        groupBy: Columns to group by: season, date, year, month, unit_no, unit_no_id, FlightName, IncursionSeverity,
+            HeightRange, BUFF_DIST
+        where: Dictionary of column: condition. A condition is a value, a list of values or a (low, high) tuple (inclusive).
+            Columns: the groupBy columns and DateTime (numpy datetime64 or ISO text) and AGL. Dates are ISO text
+        kind: "maskedPoints" (after terrain masking) or "points" (before)
+        countFlights: Also count the distinct flights of each group
+
+        Output: Dictionary of lists: the groupBy columns, "seconds" (sum of TimeInterval), "points" and "flights" if
+        countFlights. Groups are sorted
+
+        Purpose: Time in zone aggregates over the seasons in the store
+        """
+        where = dict(where or {})
+        groupBy = list(groupBy)
+        unknown = [k for k in groupBy + list(where) if k not in partitionKeys + rowKeys + list(rangeColumns)]
+        if unknown:
+            raise ValueError("can't query on " + str(unknown))
+
+        partitions = self.partitions(where, kind)
+        rowColumns = [k for k in groupBy if k not in partitionKeys]
+        groups = {}
+        if not rowColumns and not countFlights and all(k in partitionKeys for k in where):
+            #answered from the index
+            for partition in partitions:
+                key = tuple(partition[k] for k in groupBy)
+                total = groups.setdefault(key, [0.0, 0, set()])
+                total[0] += partition["seconds"]
+                total[1] += partition["rows"]
+            return self.result(groupBy, groups, countFlights)
+
+        bySeason = {}
+        for partition in partitions:
+            bySeason.setdefault(partition["season"], []).append(partition)
+        for season, seasonPartitions in bySeason.items():
+            #the batches of a season file share their dictionaries, so the points of all its partitions are grouped at once
+            batches = [self.batch(season, kind, partition["batch"]) for partition in seasonPartitions]
+            partitionGroups = {}
+            partitionCodes = [partitionGroups.setdefault(tuple(p[k] for k in groupBy if k in partitionKeys), len(partitionGroups))
+                              for p in seasonPartitions]
+            codes = [np.repeat(np.array(partitionCodes, dtype="int64"), [batch.num_rows for batch in batches])]
+            mask = np.ones(len(codes[0]), dtype=bool)
+            for column, condition in where.items():
+                if column not in partitionKeys:
+                    mask &= self.rowMask(batches, column, condition)
+            if not mask.any():
+                continue
+            unique, inverse = groupCodes([c[mask] for c in codes + [self.columnValues(batches, k) for k in rowColumns]])
+            seconds = np.bincount(inverse, weights=np.nan_to_num(self.columnValues(batches, "TimeInterval")[mask]), minlength=len(unique))
+            points = np.bincount(inverse, minlength=len(unique))
+
+            partitionValues = {code: values for values, code in partitionGroups.items()}
+            keys = []
+            for g, codeRow in enumerate(unique):
+                values = iter(partitionValues[int(codeRow[0])])
+                rowValues = iter([self.rowValue(batches[0], k, c) for k, c in zip(rowColumns, codeRow[1:])])
+                key = tuple(next(values) if k in partitionKeys else next(rowValues) for k in groupBy)
+                total = groups.setdefault(key, [0.0, 0, set()])
+                total[0] += seconds[g]
+                total[1] += int(points[g])
+                keys.append(key)
+            if countFlights:
+                flightNames = batches[0].column("FlightName").dictionary.to_pylist()
+                for g, flight in zip(*np.divmod(np.unique(inverse*len(flightNames) + self.columnValues(batches, "FlightName")[mask]), len(flightNames))):
+                    groups[keys[g]][2].add(flightNames[flight])
+        return self.result(groupBy, groups, countFlights)
+
+    def columnValues(self, batches, column):
+        #values of a column of the batches as one array. Dictionary columns give their codes
+        arrays = [batch.column(column) for batch in batches]
+        if hasattr(arrays[0], "dictionary"):
+            return np.concatenate([a.indices.to_numpy() for a in arrays]).astype("int64")
+        return np.concatenate([a.to_numpy() for a in arrays])
+
+    def rowMask(self, batches, column, condition):
+        values = self.columnValues(batches, column)
+        if column == "DateTime":
+            return self.numericMask(values.astype("datetime64[ms]").astype("int64"), timeCondition(condition))
+        first = batches[0].column(column)
+        if hasattr(first, "dictionary"):
+            allowed = [i for i, v in enumerate(first.dictionary.to_pylist()) if matches(v, condition)]
+            return np.isin(values, allowed)
+        return self.numericMask(values, condition)
+
+    def numericMask(self, values, condition):
+        if isinstance(condition, tuple):
+            return (values >= condition[0]) & (values <= condition[1])
+        if isinstance(condition, list):
+            return np.isin(values, condition)
+        return values == condition
+
+    def rowValue(self, batch, column, code):
+        values = batch.column(column)
+        return values.dictionary[int(code)].as_py() if hasattr(values, "dictionary") else float(code)
+
+    def result(self, groupBy, groups, countFlights):
+        keys = sorted(groups)
+        result = {k: [key[i] for key in keys] for i, k in enumerate(groupBy)}
+        result["seconds"] = [float(groups[key][0]) for key in keys]
+        result["points"] = [int(groups[key][1]) for key in keys]
+        if countFlights:
+            result["flights"] = [len(groups[key][2]) for key in keys]
+        return result
+
+
+def addSeasonFiles(storeFolder, arrowFolder, season=None):
+    """
+    (string, string, optional: string) -> string
+
+    Inputs:
+    storeFolder: Folder of the results store
+    arrowFolder: Folder with points.arrow and maskedPoints.arrow of a run (see flightPathAnalysis_Arrow.exportSeason())
+    season: Season label. See ResultsStore.addSeason()
+
+    Output: the season label
+
+    Purpose: Adds the points of a run to the store, before and after terrain masking
+    """
+    store = ResultsStore(storeFolder)
+    try:
+        season = store.addSeason(os.path.join(arrowFolder, "maskedPoints.arrow"), "maskedPoints", season)
+        store.addSeason(os.path.join(arrowFolder, "points.arrow"), "points", season)
+    finally:
+        store.close()
+    return season
@@ -0,0 +1,99 @@
+### locality aware scheduling of the uwr viewsheds used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# makeViewshed() clipped the DEM for each uwr (the biggest buffer and the 0m footprint) in set order. Goat uwr are often
+# small neighbouring units on the same ridge whose 1500m buffer windows mostly overlap, so the same DEM cells were read
+# from the full DEM many times. The uwr are now put in Hilbert curve order of their window centers and neighbours in that
+# order are grouped in clusters as long as the merged window isn't bigger than the windows read one by one. The DEM is
+# read once per cluster window and the clips of each uwr are made from that small window.
+# Function: hilbertIndex - position of points along a Hilbert curve over an extent
+# Function: clusterUWR - clusters of neighbouring uwr and the merged DEM window of each
+# Function: windowCells, readSavings - number of DEM cells read with and without clusters
+
+import numpy as np
+
+
+def hilbertIndex(x, y, extent, order=16):
+    """
+    (array, array, tuple, optional: int) -> array
+
+    Purpose: Index along a Hilbert curve of order `order` (2**order cells a side) covering extent (xMin, yMin, xMax, yMax).
+    Points close on the curve are close in space.
+    """
+    side = 2**order
+    width = max(extent[2] - extent[0], 1e-9)
+    height = max(extent[3] - extent[1], 1e-9)
+    xi = np.clip(((np.asarray(x, dtype="float64") - extent[0])/width*(side - 1)).astype("int64"), 0, side - 1)
+    yi = np.clip(((np.asarray(y, dtype="float64") - extent[1])/height*(side - 1)).astype("int64"), 0, side - 1)
+    index = np.zeros(len(xi), dtype="int64")
+    s = side // 2
+    while s > 0:
+        rx = (xi & s) > 0
+        ry = (yi & s) > 0
+        index += s*s*((3*rx) ^ ry)
+        #rotate the quadrant so the curve stays continuous
+        flip = ~ry & rx
+        xi = np.where(flip, side - 1 - xi, xi)
+        yi = np.where(flip, side - 1 - yi, yi)
+        swap = ~ry
+        xi, yi = np.where(swap, yi, xi), np.where(swap, xi, yi)
+        s //= 2
+    return index
+
+def windowCells(extent, cellSize):
+    #DEM cells of a window, with one cell of padding on each side for the cell snapping
+    return (int(np.ceil((extent[2] - extent[0])/cellSize)) + 2)*(int(np.ceil((extent[3] - extent[1])/cellSize)) + 2)
+
+def mergeExtents(a, b):
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+def clusterUWR(ids, extents, cellSize, maxWindowCells=16000000, slack=1.0):
+    """
+    (list, list, float, optional: int, float) -> list
+
+    Inputs:
+    ids: List of unique uwr ids
+    extents: List of (xMin, yMin, xMax, yMax) of the biggest buffer of each uwr. None if unknown
+    cellSize: DEM cell size
+    maxWindowCells: Most DEM cells of a cluster window
+    slack: A uwr joins the cluster before it in Hilbert order if the merged window has at most slack times the cells of
+        the cluster window and the uwr window read separately. 1 never reads more cells than separate reads
+
+    Output: List of (window extent padded by one cell, [uwr ids]) in Hilbert order. uwr without extent get their own
+    cluster with a None window.
+
+    Purpose: Groups neighbouring uwr whose DEM windows overlap so the DEM is read once per group.
+    """
+    known = [i for i in range(len(ids)) if extents[i] is not None]
+    clusters = [(None, [ids[i]]) for i in range(len(ids)) if extents[i] is None]
+    if not known:
+        return clusters
+
+    boxes = np.array([extents[i] for i in known], dtype="float64")
+    total = (boxes[:, 0].min(), boxes[:, 1].min(), boxes[:, 2].max(), boxes[:, 3].max())
+    order = np.lexsort((np.array([ids[i] for i in known]), hilbertIndex((boxes[:, 0] + boxes[:, 2])/2, (boxes[:, 1] + boxes[:, 3])/2, total)))
+
+    window = None
+    members = []
+    for k in order:
+        box = tuple(boxes[k])
+        if window is not None:
+            merged = mergeExtents(window, box)
+            mergedCells = windowCells(merged, cellSize)
+            if mergedCells <= maxWindowCells and mergedCells <= slack*(windowCells(window, cellSize) + windowCells(box, cellSize)):
+                window = merged
+                members.append(ids[known[k]])
+                continue
+            clusters.append((padExtent(window, cellSize), members))
+        window = box
+        members = [ids[known[k]]]
+    clusters.append((padExtent(window, cellSize), members))
+    return clusters
+
+def padExtent(extent, cellSize):
+    return (extent[0] - cellSize, extent[1] - cellSize, extent[2] + cellSize, extent[3] + cellSize)
+
+def readSavings(extents, clusters, cellSize):
+    #(cells read one window per uwr, cells read one window per cluster)
+    separate = sum(windowCells(e, cellSize) for e in extents if e is not None)
+    clustered = sum(windowCells(window, cellSize) for window, members in clusters if window is not None)
+    return separate, clustered
@@ -0,0 +1,222 @@
+### long running analysis service used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# Loads the DEM, the buffered uwr layer and the minElevViewshed layer once and keeps them in memory. Flights are sent over
+# a local http api and the time in each uwr zone, before and after terrain masking, comes back in seconds without
+# paying again for opening the layers or checking out licences.
+#
+# API (json responses):
+#   GET  /health                   -> {"status": "ok", "uwr": <count>, "zones": <count>}
+#   POST /analyze?name=<flight>    body: the gpx file -> time in zone of the flight
+# The response has one row per flight, uwr, incursion severity and height range with
+#   "seconds": time in the zone (sum of TimeInterval like the stats of main())
+#   "unmaskedSeconds": time in the zone after removing terrain masked points (like the stats after LOS_Analysis())
+# and the lists "problemFlights" (0 or 1 points) and "noViewshed" (uwr that have no viewshed yet, not masked).
+#
+# Example from R: httr::POST("http://127.0.0.1:8765/analyze?name=flight", body = httr::upload_file("flight.gpx"))
+# update: Oct. 19, 2026 - the layers can be opened from a prebuilt analysis bundle (bundlePath, see flightPathAnalysis_Bundle)
+# update: Oct. 19, 2026 - the DEM is read in tiles around the uwr zones when one window over all of them is over maxDEMWindowMB
+# so the service starts in milliseconds instead of reading the layers with arcpy and remaking the zone grid
+
+import datetime
+import http.server
+import json
+import urllib.parse
+
+import flightPathAnalysis_Bundle
+import flightPathAnalysis_Geometry
+import flightPathAnalysis_Horizon
+import flightPathAnalysis_LazyViewshed
+import flightPathAnalysis_Masking
+import flightPathAnalysis_Tracks
+
+
+class AnalysisService:
+    """
+    Purpose: Holds the layers needed to analyse flights in memory.
+
+    Inputs:
+    DEM: Full path to raster DEM
+    uwrBuffered: Full path to feature class of buffered uwr. output of flightPathAnalysis_Functions.createUWRBuffer()
+    minElevViewshed: min Elevation viewshed layer made by makeViewshed()
+    unit_no: field for unit number (eg. u-2-002)
+    unit_no_id: field for unit number id (eg. TO 32)
+    uwr_unique_Field: field for unique uwr id that combines unit_no and unit_no_id
+    IncursionSeverity: Dictionary of buffer distance and incursion severity category ie. {500: "High", 1000: "Moderate}
+    horizonPath: Optional npz file of horizon tables made by flightPathAnalysis_Horizon.buildHorizons(). Used for the
+        terrain masking instead of minElevViewshed when given
+    lazyViewshedFolder: Optional cache folder of flightPathAnalysis_LazyViewshed. The terrain masking computes the
+        viewshed of the flown cells on demand when given (minElevViewshed and horizonPath are not used)
+    viewshedPyramid: Compute the lazy viewsheds coarse to fine on a DEM pyramid (see flightPathAnalysis_Pyramid)
+    bundlePath: Optional analysis bundle made by flightPathAnalysis_Bundle.buildBundle() from the same layers. The zones, DEM,
+        zone grid and the masking layer packed in it are opened from the bundle instead of being read
+    maxDEMWindowMB: Largest DEM window read over all the uwr. Past it the DEM is read in tiles around the uwr zones, without
+        zone grid. The lazy viewsheds need the window, so the service stops instead (see flightPathAnalysis_LazyViewshed.loadViewshedDEM())
+    """
+
+    def __init__(self, DEM, uwrBuffered, minElevViewshed, unit_no, unit_no_id, uwr_unique_Field, IncursionSeverity, horizonPath=None, lazyViewshedFolder=None, viewshedPyramid=False,
+                 bundlePath=None, maxDEMWindowMB=flightPathAnalysis_Geometry.maxDEMWindowMB):
+        starttime = datetime.datetime.now()
+        self.unit_no = unit_no
+        self.unit_no_id = unit_no_id
+        self.IncursionSeverity = IncursionSeverity
+        bundle = None
+        if bundlePath is not None:
+            bundle = flightPathAnalysis_Bundle.openBundle(bundlePath)
+            print("opened analysis bundle", bundlePath, "built", bundle.header["built"])
+            self.zones = bundle.zones
+            self.dem = bundle.dem
+            self.grid = bundle.grid
+        else:
+            self.zones = flightPathAnalysis_Geometry.loadUWRZones(uwrBuffered, unit_no, unit_no_id)
+            if lazyViewshedFolder is not None:
+                self.dem = flightPathAnalysis_LazyViewshed.loadViewshedDEM(DEM, self.zones, maxDEMWindowMB)
+            else:
+                self.dem = flightPathAnalysis_Geometry.loadZonesDEM(DEM, self.zones, maxDEMWindowMB)
+            self.grid = flightPathAnalysis_Geometry.ZoneGrid(self.dem, self.zones) if isinstance(self.dem, flightPathAnalysis_Geometry.DEMGrid) else None
+        self.mask = None
+        self.horizons = None
+        self.lazyViewshed = None
+        if lazyViewshedFolder is not None:
+            self.lazyViewshed = flightPathAnalysis_LazyViewshed.LazyViewshed(self.dem, self.zones, lazyViewshedFolder, pyramid=viewshedPyramid)
+        elif horizonPath is not None:
+            if bundle is not None and bundle.horizons is not None:
+                self.horizons = bundle.horizons
+            else:
+                self.horizons = flightPathAnalysis_Horizon.loadHorizons(horizonPath)
+        elif bundle is not None and bundle.mask is not None:
+            self.mask = bundle.mask
+        else:
+            self.mask = flightPathAnalysis_Masking.loadMinElevMask(minElevViewshed, uwr_unique_Field)
+        print("Runtime to load layers for the service: ", datetime.datetime.now() - starttime)
+
+    def analyze(self, tracks):
+        """
+        (list) -> dictionary
+
+        Purpose: Time in zone before and after terrain masking of a list of flight tracks. See the API at the top of the module
+        """
+        table, problemFlights = flightPathAnalysis_Geometry.classifyTracks(tracks, self.dem, self.zones, self.IncursionSeverity, self.grid,
+                                                                           membership=True)
+        masked, noViewshed = self.maskPoints(table)
+        return {
+            "flights": [t["name"] for t in tracks],
+            "problemFlights": problemFlights,
+            "noViewshed": noViewshed,
+            "timeInZone": timeInZoneRows(table, masked, self.unit_no, self.unit_no_id),
+        }
+
+    def maskPoints(self, table):
+        #terrain masked points of a table and uwr without viewshed, with the lazy viewsheds, the horizon tables or the minElevViewshed polygons
+        if self.lazyViewshed is not None:
+            return self.lazyViewshed.maskPoints(table)
+        if self.horizons is not None:
+            return flightPathAnalysis_Horizon.horizonMaskPoints(table, self.horizons)
+        return flightPathAnalysis_Masking.maskPoints(table, self.mask)
+
+def timeInZoneRows(table, masked, unit_no, unit_no_id):
+    """
+    (PointTable or PointMembership, array, string, string) -> list
+
+    Purpose: Rows of time in zone for each flight, uwr, incursion severity and height range of a point table,
+    before and after removing the masked points.
+    """
+    keys = ("flight", "uwr", "severity", "heightRange")
+    allStats = table.statistics(keys)
+    unmasked = table.select(~masked).statistics(keys)
+    unmaskedSeconds = {tuple(int(unmasked[k][i]) for k in keys): unmasked["SUM_TimeInterval"][i] for i in range(len(unmasked["SUM_TimeInterval"]))}
+    rows = []
+    for i in range(len(allStats["SUM_TimeInterval"])):
+        key = tuple(int(allStats[k][i]) for k in keys)
+        flight, uwr, severity, heightRange = key
+        rows.append({
+            "FlightName": table.flightNames[flight],
+            unit_no: table.uwrKeys[uwr][0],
+            unit_no_id: table.uwrKeys[uwr][1],
+            "BUFF_DIST": table.severities[severity][0],
+            "IncursionSeverity": table.severities[severity][1],
+            "HeightRange": table.heightRanges[heightRange],
+            "seconds": float(allStats["SUM_TimeInterval"][i]),
+            "unmaskedSeconds": float(unmaskedSeconds.get(key, 0.0)),
+        })
+    return rows
+
+
+class ServiceHandler(http.server.BaseHTTPRequestHandler):
+    #the AnalysisService is set on the server by serve()
+
+    def sendJSON(self, status, obj):
+        body = json.dumps(obj, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urllib.parse.urlparse(self.path).path == "/health":
+            service = self.server.service
+            self.sendJSON(200, {"status": "ok", "uwr": len(service.zones.uwrKeys), "zones": len(service.zones)})
+        else:
+            self.sendJSON(404, {"error": "unknown path " + self.path})
+
+    def do_POST(self):
+        url = urllib.parse.urlparse(self.path)
+        if url.path != "/analyze":
+            self.sendJSON(404, {"error": "unknown path " + self.path})
+            return
+        name = urllib.parse.parse_qs(url.query).get("name", ["flight"])[0]
+        starttime = datetime.datetime.now()
+        try:
+            data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            tracks = [flightPathAnalysis_Tracks.readFlight(data, name)]
+            result = self.server.service.analyze(tracks)
+        except Exception as e:
+            self.sendJSON(400, {"error": repr(e)})
+            return
+        result["runtime"] = str(datetime.datetime.now() - starttime)
+        self.sendJSON(200, result)
+
+def serve(service, host="127.0.0.1", port=8765):
+    """
+    (AnalysisService, optional: string, int) -> None
+
+    Purpose: Serves the api until the process is stopped. Requests are handled in threads. The layers are only read,
+    except the lazy viewshed caches, which are filled under a lock per uwr (see flightPathAnalysis_LazyViewshed).
+    Only listens on the local machine by default.
+    """
+    server = http.server.ThreadingHTTPServer((host, port), ServiceHandler)
+    server.service = service
+    print("Flight analysis service listening on http://" + host + ":" + str(port))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def main():
+    #raster DEM input
+    DEM = r"W:\srm\sry\Local\projlib\StewBase\Mountain_Goat\FlightLine_UWR_Analysis\test_May15\Input.gdb\bc_elevation_25m_bcalb_Clip2"
+
+    #feature class of buffered uwr. output of flightPathAnalysis_Functions.createUWRBuffer()
+    uwrBuffered = r"W:\srm\sry\Local\projlib\StewBase\Mountain_Goat\FlightLine_UWR_Analysis\testAllSkeena\testInputAll.gdb\tuwra_u6002_BufferFinal"
+
+    #agl viewshed feature class
+    minElevViewshed = r"W:\srm\sry\Local\projlib\StewBase\Mountain_Goat\FlightLine_UWR_Analysis\20200915\Output_20200915.gdb\minElevViewshed20200515"
+
+    #unit number field eg. u-2-002
+    unit_no = "TUWR_TAG"
+
+    #unit number id field eg. TO 60
+    unit_no_id = "UNIT_NO"
+
+    #uwr uniqud id field - field that combines uwr number and uwr unit number
+    uwr_unique_Field = "uwr_unique_id"
+
+    #buffer distance and incursion severity category
+    IncursionSeverity = {0: "In UWR", 500: "High", 1000: "Moderate", 1500: "Low"}
+
+    service = AnalysisService(DEM, uwrBuffered, minElevViewshed, unit_no, unit_no_id, uwr_unique_Field, IncursionSeverity)
+    serve(service)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+### sharded execution mode used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# Splits the uwr into spatial shards that are processed independently (flight points, viewsheds, LOS analysis)
+# by any number of nodes sharing a folder, then merges the shard outputs into the final point layers and stats.
+# Function: planShards - partitions the uwr and writes the plan and run settings to the shard folder. A plan made from other
+# uwr, settings or inputs is thrown away with the shard outputs and made again
+# Function: runShardWorker - claims and processes shards until none are left. Run it on each node:
+#     python flightPathAnalysis_Sharding.py <shardFolder>
+# Function: runShardedLocal - runs several local worker processes on the same shard folder (one box testing)
+# Function: mergeShards - merges the shard outputs in shard order so the final outputs don't depend on which node ran what
+#
+# A flight point that falls in the buffers of several uwr is already one row per uwr (JOIN_ONE_TO_MANY), so each
+# row belongs to the shard of its uwr and the merge is a plain concatenation.
+# update: Oct. 19, 2026 - the shard viewshed layers are seeded with the viewsheds of their uwr from the main layers, so a
+# sharded run only makes the missing viewsheds
+# update: Oct. 19, 2026 - the plan has a fingerprint of the uwr, the settings and the inputs, and a stale plan is rebuilt. A
+# worker keeps its claim fresh while it works and releases it when its shard fails, so stale claims can be taken over
+# update: Oct. 19, 2026 - mergeShards() writes the masked points to LOS_uwrFlightPointsGDB, and an empty masked layer when
+# every point is terrain masked
+
+import datetime
+import multiprocessing
+import os
+import socket
+import shutil
+import sys
+import threading
+import time
+
+import flightPathAnalysis_Pipeline
+
+#files in the shard folder
+planFileName = "shardPlan.json"
+settingsFileName = "shardSettings.json"
+
+#a worker touches its claim file every claimRefresh seconds. A claim not touched for staleClaimAfter seconds is taken over
+claimRefresh = 60
+staleClaimAfter = 600
+
+
+def partitionUWR(ids, centers, weights, shardCount):
+    """
+    (list, list, list, int) -> list
+
+    Inputs:
+    ids: List of unique uwr ids
+    centers: List of (x, y) centers of the uwr
+    weights: List of cost weights of the uwr (eg. area of the biggest buffer, which drives the viewshed cost)
+    shardCount: Number of shards
+
+    Purpose:
+    Recursive coordinate bisection: the uwr are split along the longest side of their extent so that both halves get a
+    share of the weight proportional to their number of shards. Neighbouring uwr end up in the same shard. Ties are
+    broken with the uwr id so the same input always gives the same shards.
+    Returns a list of lists of uwr ids, one per shard.
+    """
+    items = sorted(zip(ids, centers, weights), key=lambda item: item[0])
+
+    def split(items, count):
+        if count <= 1 or len(items) <= 1:
+            return [[item[0] for item in items]] + [[] for i in range(count - 1)]
+        xs = [item[1][0] for item in items]
+        ys = [item[1][1] for item in items]
+        axis = 0 if (max(xs) - min(xs)) >= (max(ys) - min(ys)) else 1
+        items = sorted(items, key=lambda item: (item[1][axis], item[0]))
+        leftCount = count // 2
+        target = sum(item[2] for item in items) * leftCount / count
+        cumulative = 0
+        cut = 0
+        for item in items[:-1]:
+            if cumulative + item[2] / 2 > target:
+                break
+            cumulative += item[2]
+            cut += 1
+        cut = max(1, min(cut, len(items) - 1))
+        return split(items[:cut], leftCount) + split(items[cut:], count - leftCount)
+
+    return split(items, shardCount)
+
+def planShards(shardFolder, shardCount, settings):
+    """
+    (string, int, dictionary) -> dictionary
+
+    Inputs:
+    shardFolder: Folder shared by all nodes. Gets the plan, the settings and one sub folder per shard
+    shardCount: Number of shards
+    settings: Dictionary of the run settings, same names as the variables in flightPathAnalysis_uwr.main():
+        gpxFolder, DEM, uwrBuffered, unit_no, unit_no_id, uwr_unique_Field, IncursionSeverity, maxRange, and optionally the
+        main viewshed and minElevViewshed layers the shards are seeded from
+
+    Purpose: Partitions the uwr of the buffered uwr layer into shards and writes the plan for the workers.
+    Returns the plan {shard name: [uwr ids]}. The plan file keeps a fingerprint of the uwr (ids and extents), the shard
+    count, the settings and the gpxFolder, DEM and uwrBuffered inputs. If the plan in the folder has the same fingerprint
+    it is kept with the shards already done, otherwise the old plan and shard outputs are deleted first.
+    """
+    import arcpy
+
+    if not os.path.exists(shardFolder):
+        os.makedirs(shardFolder)
+
+    #center and area of the biggest buffer of each uwr
+    boxes = {}
+    with arcpy.da.SearchCursor(settings["uwrBuffered"], ["SHAPE@", settings["uwr_unique_Field"]]) as cursor:
+        for row in cursor:
+            extent = row[0].extent
+            box = boxes.get(row[1], [extent.XMin, extent.YMin, extent.XMax, extent.YMax])
+            boxes[row[1]] = [min(box[0], extent.XMin), min(box[1], extent.YMin), max(box[2], extent.XMax), max(box[3], extent.YMax)]
+    del cursor
+
+    ids = sorted(boxes)
+    fingerprint = flightPathAnalysis_Pipeline.fingerprintValues([[i, boxes[i]] for i in ids], shardCount, settings,
+                                                                [flightPathAnalysis_Pipeline.fingerprintDataset(settings[key]) for key in ("gpxFolder", "DEM", "uwrBuffered")])
+    saved = flightPathAnalysis_Pipeline.readJSON(os.path.join(shardFolder, planFileName), {})
+    if saved.get("fingerprint") == fingerprint:
+        print("shard plan in", shardFolder, "is up to date")
+        return saved["shards"]
+    if saved:
+        print("uwr, settings or inputs changed since the shard plan was made, the old shards are deleted")
+        clearShards(shardFolder)
+
+    centers = [((boxes[i][0] + boxes[i][2]) / 2, (boxes[i][1] + boxes[i][3]) / 2) for i in ids]
+    weights = [(boxes[i][2] - boxes[i][0]) * (boxes[i][3] - boxes[i][1]) for i in ids]
+    shards = partitionUWR(ids, centers, weights, shardCount)
+
+    plan = {}
+    for index, shard in enumerate(shards):
+        if shard:
+            plan["shard%03d" % index] = shard
+    flightPathAnalysis_Pipeline.writeJSON(settings, os.path.join(shardFolder, settingsFileName))
+    flightPathAnalysis_Pipeline.writeJSON({"fingerprint": fingerprint, "shards": plan}, os.path.join(shardFolder, planFileName))
+    print("planned", len(plan), "shards for", len(ids), "uwr in", shardFolder)
+    return plan
+
+def clearShards(shardFolder):
+    #deletes the plan, claims, done files and shard outputs of a shard folder
+    for entry in os.scandir(shardFolder):
+        if entry.is_dir() and entry.name.startswith("shard"):
+            shutil.rmtree(entry.path)
+        elif entry.name == planFileName or entry.name.endswith(".claim") or entry.name.endswith(".done"):
+            os.remove(entry.path)
+
+def readPlan(shardFolder):
+    #{shard name: [uwr ids]} of the plan of a shard folder
+    return flightPathAnalysis_Pipeline.readJSON(os.path.join(shardFolder, planFileName))["shards"]
+
+def claimShard(shardFolder, shardName, reclaimAfter):
+    """
+    Purpose: Claims a shard by creating its claim file. Creating a file with O_EXCL is atomic on a shared filesystem,
+    so only one node gets each shard. A claim older than reclaimAfter seconds with no done file is taken over
+    (eg. the node died). The worker keeps its claim fresh with refreshClaim(). Returns True if the shard was claimed.
+    """
+    claimPath = os.path.join(shardFolder, shardName + ".claim")
+    if reclaimAfter is not None and os.path.exists(claimPath) and time.time() - os.path.getmtime(claimPath) > reclaimAfter:
+        print("reclaiming stale shard", shardName)
+        try:
+            os.remove(claimPath)
+        except OSError:
+            pass
+    try:
+        fd = os.open(claimPath, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    os.write(fd, (socket.gethostname() + " " + str(os.getpid()) + " " + str(datetime.datetime.now())).encode())
+    os.close(fd)
+    return True
+
+def refreshClaim(claimPath, stopEvent):
+    #touches the claim file until stopEvent is set, so the claim of a long shard doesn't look stale
+    while not stopEvent.wait(claimRefresh):
+        try:
+            os.utime(claimPath)
+        except OSError:
+            pass
+
+def releaseClaim(shardFolder, shardName):
+    try:
+        os.remove(os.path.join(shardFolder, shardName + ".claim"))
+    except OSError:
+        pass
+
+def shardPaths(shardFolder, shardName):
+    #folder and gdb of a shard
+    folder = os.path.join(shardFolder, shardName)
+    return folder, os.path.join(folder, shardName + ".gdb")
+
+def runShard(shardFolder, shardName, uwrIDs, settings):
+    """
+    (string, string, list, dictionary) -> None
+
+    Purpose:
+    Processes one shard: makes the buffered uwr layer of its uwr, the flight points in their buffers (streaming mode),
+    the viewsheds and the LOS analysis of its uwr. Everything is written in the shard gdb. The shard viewshed layers start
+    with the viewsheds of its uwr already in the main layers (settings viewshed and minElevViewshed), so only the missing
+    ones are made. LOS_Analysis is checkpointed per uwr, so a reclaimed shard resumes where the failed node stopped.
+    """
+    import arcpy
+    import flightPathAnalysis_Functions
+    import flightPathAnalysis_Streaming
+
+    starttime = datetime.datetime.now()
+    folder, gdb = shardPaths(shardFolder, shardName)
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    if not arcpy.Exists(gdb):
+        arcpy.CreateFileGDB_management(folder, os.path.basename(gdb))
+    arcpy.env.overwriteOutput = True
+
+    uwr_unique_Field = settings["uwr_unique_Field"]
+    IncursionSeverity = {float(k): v for k, v in settings["IncursionSeverity"].items()}
+    shardUWR = os.path.join(gdb, "uwrBuffered")
+    arcpy.FeatureClassToFeatureClass_conversion(settings["uwrBuffered"], gdb, "uwrBuffered", flightPathAnalysis_Functions.uwrSelectionQuery(uwr_unique_Field, uwrIDs))
+
+    #viewsheds of the shard uwr already made in the main layers
+    for name in ["viewshed", "minElevViewshed"]:
+        mainLayer = settings.get(name)
+        if mainLayer and arcpy.Exists(mainLayer) and not arcpy.Exists(os.path.join(gdb, name)):
+            arcpy.FeatureClassToFeatureClass_conversion(mainLayer, gdb, name, flightPathAnalysis_Functions.uwrSelectionQuery(uwr_unique_Field, uwrIDs))
+
+    try:
+        flightPathAnalysis_Streaming.getFlightPointsStreaming(settings["gpxFolder"], gdb, "allFlightPoint", settings["DEM"], settings["unit_no"],
+                                                              settings["unit_no_id"], shardUWR, IncursionSeverity, folder)
+    except SystemExit:
+        print("no flight points in shard", shardName)
+        return
+
+    checkpoint = flightPathAnalysis_Pipeline.UnitCheckpoint(os.path.join(folder, "LOS_units.json"),
+                                                           flightPathAnalysis_Pipeline.fingerprintValues(shardName, uwrIDs, settings))
+    flightPathAnalysis_Functions.LOS_Analysis(shardUWR, settings["maxRange"], settings["DEM"], os.path.join(gdb, "viewshed"),
+                                              os.path.join(gdb, "minElevViewshed"), settings["unit_no"], settings["unit_no_id"], uwr_unique_Field,
+                                              os.path.join(gdb, "allFlightPoint"), gdb, "terrainMasked", folder, "ViewshedPointCount", checkpoint)
+    print("Runtime for shard", shardName, ":", datetime.datetime.now() - starttime)
+
+def runShardWorker(shardFolder, reclaimAfter=staleClaimAfter):
+    """
+    (string, optional: int) -> None
+
+    Inputs:
+    shardFolder: Shard folder made by planShards()
+    reclaimAfter: Seconds after which a claim that wasn't refreshed and has no done file is taken over by this worker
+        (its worker died). None = never
+
+    Purpose: Claims and processes shards of the plan one at a time until none are left. Several workers, on one
+    node or many nodes sharing the folder, can run at the same time. The claim of a shard that fails is released so the
+    shard is run again by the next worker or the next run.
+    """
+    plan = readPlan(shardFolder)
+    settings = flightPathAnalysis_Pipeline.readJSON(os.path.join(shardFolder, settingsFileName))
+    for shardName in sorted(plan):
+        donePath = os.path.join(shardFolder, shardName + ".done")
+        if os.path.exists(donePath) or not claimShard(shardFolder, shardName, reclaimAfter):
+            continue
+        print(socket.gethostname(), os.getpid(), "working on", shardName)
+        stopEvent = threading.Event()
+        heartbeat = threading.Thread(target=refreshClaim, args=(os.path.join(shardFolder, shardName + ".claim"), stopEvent), daemon=True)
+        heartbeat.start()
+        failed = True
+        try:
+            runShard(shardFolder, shardName, plan[shardName], settings)
+            failed = False
+        finally:
+            stopEvent.set()
+            heartbeat.join()
+            if failed:
+                print(shardName, "failed, its claim is released")
+                releaseClaim(shardFolder, shardName)
+        open(donePath, "w").close()
+
+def runShardedLocal(shardFolder, processes, reclaimAfter=staleClaimAfter):
+    """
+    Purpose: Runs runShardWorker() in several local processes on the same shard folder, as if each was a node.
+    """
+    workers = [multiprocessing.Process(target=runShardWorker, args=(shardFolder, reclaimAfter)) for i in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+def mergeShards(shardFolder, outputGDB, allFlightPoint, LOS_uwrFlightPoints, viewshed, minElevViewshed, LOS_uwrFlightPointsGDB=None):
+    """
+    (string, string, string, string, string, string, optional: string) -> None
+
+    Inputs:
+    shardFolder: Shard folder made by planShards(). All shards have to be done
+    outputGDB: GDB for the merged outputs
+    allFlightPoint: Name of the merged feature class of flight points (before terrain masking)
+    LOS_uwrFlightPoints: Name of the merged feature class of flight points after terrain masking
+    viewshed: Viewshed layer the shard viewsheds are added to (uwr already in it are skipped)
+    minElevViewshed: Min elevation viewshed layer the shard viewsheds are added to
+    LOS_uwrFlightPointsGDB: GDB for the merged flight points after terrain masking. outputGDB if not given
+
+    Purpose:
+    Merges the shard outputs in the order of the shard names, which is fixed by the plan, so the merged layers are
+    the same whatever node ran each shard. The per severity layers are made from the merged points like getFlightLinePoints().
+    If every point is terrain masked, the masked output is an empty feature class with the schema of the points.
+    Stats are made from the merged layers with flightPathAnalysis_uwr.pointStatistics().
+    """
+    import arcpy
+    import flightPathAnalysis_Functions
+    import flightPathAnalysis_Output
+
+    plan = readPlan(shardFolder)
+    settings = flightPathAnalysis_Pipeline.readJSON(os.path.join(shardFolder, settingsFileName))
+    notDone = [s for s in sorted(plan) if not os.path.exists(os.path.join(shardFolder, s + ".done"))]
+    if notDone:
+        raise SystemExit("shards not done: " + str(notDone))
+
+    arcpy.env.workspace = outputGDB
+    arcpy.env.overwriteOutput = True
+    starttime = datetime.datetime.now()
+
+    pointLayers = []
+    maskedLayers = []
+    for shardName in sorted(plan):
+        folder, gdb = shardPaths(shardFolder, shardName)
+        if arcpy.Exists(os.path.join(gdb, "allFlightPoint")):
+            pointLayers.append(os.path.join(gdb, "allFlightPoint"))
+        if arcpy.Exists(os.path.join(gdb, "terrainMasked")):
+            maskedLayers.append(os.path.join(gdb, "terrainMasked"))
+
+        #add the viewsheds of the shard uwr that are not in the main viewshed layers yet
+        for shardLayer, mainLayer in ((os.path.join(gdb, "viewshed"), viewshed), (os.path.join(gdb, "minElevViewshed"), minElevViewshed)):
+            if not arcpy.Exists(shardLayer):
+                continue
+            existing = set()
+            if arcpy.Exists(mainLayer):
+                existing = {row[0] for row in arcpy.da.SearchCursor(mainLayer, [settings["uwr_unique_Field"]])}
+            newUWR = sorted({row[0] for row in arcpy.da.SearchCursor(shardLayer, [settings["uwr_unique_Field"]])} - existing)
+            if newUWR:
+                arcpy.MakeFeatureLayer_management(shardLayer, "newViewshed_FL", flightPathAnalysis_Functions.uwrSelectionQuery(settings["uwr_unique_Field"], newUWR))
+                flightPathAnalysis_Functions.appendMergeFeatures(["newViewshed_FL"], mainLayer)
+                arcpy.Delete_management("newViewshed_FL")
+
+    if not pointLayers:
+        raise SystemExit("No flight lines intersect with uwr buffers")
+
+    arcpy.Merge_management(pointLayers, os.path.join(outputGDB, allFlightPoint))
+    maskedPoints = os.path.join(LOS_uwrFlightPointsGDB or outputGDB, LOS_uwrFlightPoints)
+    if maskedLayers:
+        arcpy.Merge_management(maskedLayers, maskedPoints)
+    else:
+        arcpy.CreateFeatureclass_management(os.path.dirname(maskedPoints), LOS_uwrFlightPoints, "POINT", pointLayers[0], spatial_reference=pointLayers[0])
+        print("every flight point is terrain masked,", maskedPoints, "is empty")
+
+    # indexes and a view of the points of each incursion severity
+    flightPathAnalysis_Output.addSeverityViews(os.path.join(outputGDB, allFlightPoint), settings["IncursionSeverity"])
+
+    print("Runtime to merge", len(plan), "shards:", datetime.datetime.now() - starttime)
+
+if __name__ == "__main__":
+    runShardWorker(sys.argv[1])
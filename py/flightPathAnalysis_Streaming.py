@@ -0,0 +1,339 @@
+### streaming execution mode used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# Reading the gpx files, parsing, DEM sampling, projecting, classifying and writing the points run at the same time
+# on chunks of flights connected by bounded queues:
+#   reader thread (disk) -> compute workers (threads or processes) -> writer (main thread, disk)
+# The queues are bounded, so a slow stage makes the stages before it wait (back-pressure). The reader also waits
+# when 2*queueSize + computeWorkers chunks are read but not yet written, which caps memory use even when
+# one slow chunk holds back the chunks written after it. Total run time gets close to the time of the slowest stage.
+# Function: runStreaming - runs the chunks of flights through the stages
+# Function: getFlightPointsStreaming - streaming version of the point output of getFlightLinePoints()
+# update: Oct. 19, 2026 - the dem, zones and zone grid can come from a prebuilt analysis bundle (bundlePath, see
+# flightPathAnalysis_Bundle). Compute processes then open the bundle file instead of each getting a pickled copy of the
+# layers, and share its pages
+# update: Oct. 19, 2026 - when one DEM window over all the uwr would be bigger than maxDEMWindowMB, the DEM is read in tiles
+# around the uwr zones only (flightPathAnalysis_Geometry.TiledDEM), without the zone grid
+
+import concurrent.futures
+import datetime
+import os
+import queue
+import threading
+import time
+
+import flightPathAnalysis_Bundle
+import flightPathAnalysis_Geometry
+import flightPathAnalysis_Output
+import flightPathAnalysis_Tracks
+
+#marks the end of a queue
+STOP = None
+
+#dem and zones of the worker processes. Set once per process by initComputeProcess()
+processState = {}
+
+
+def initComputeProcess(dem, zones, IncursionSeverity, grid=None, bundlePath=None):
+    if bundlePath is not None:
+        #memory map of the bundle file, shared with the other processes instead of a copy of the layers in each one
+        bundle = flightPathAnalysis_Bundle.openBundle(bundlePath)
+        dem, zones, grid = bundle.dem, bundle.zones, (bundle.grid if grid else None)
+    processState["dem"] = dem
+    processState["zones"] = zones
+    processState["IncursionSeverity"] = IncursionSeverity
+    processState["grid"] = grid
+
+def computeChunk(chunk, dem=None, zones=None, IncursionSeverity=None, grid=None):
+    """
+    (list, optional: DEMGrid, UWRZones, dictionary, ZoneGrid) -> PointTable, list
+
+    Purpose: Parses a chunk of raw flight logs [(name, data), ...] from flightPathAnalysis_Tracks.iterFlightData() and
+    classifies their points. Compressed zip members are decompressed here, in parallel across the workers.
+    Uses the dem and zones set by initComputeProcess() when called in a worker process.
+    """
+    if dem is None:
+        dem = processState["dem"]
+        zones = processState["zones"]
+        IncursionSeverity = processState["IncursionSeverity"]
+        grid = processState["grid"]
+    tracks = [flightPathAnalysis_Tracks.readFlight(data, name) for name, data in chunk]
+    return flightPathAnalysis_Geometry.classifyTracks(tracks, dem, zones, IncursionSeverity, grid)
+
+
+class StageTimer:
+    #busy time of each stage, to compare with the wall time of the run
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.busy = {}
+
+    def add(self, stage, seconds):
+        with self.lock:
+            self.busy[stage] = self.busy.get(stage, 0) + seconds
+
+
+def runStreaming(flights, dem, zones, IncursionSeverity, writer, chunkSize=20, queueSize=4, computeWorkers=None, useProcesses=False, grid=None, bundlePath=None):
+    """
+    (iterable, DEMGrid, UWRZones, dictionary, function, optional: int, int, int, boolean, ZoneGrid, string) -> list
+
+    Inputs:
+    flights: (flight name, data) of each gpx log. See flightPathAnalysis_Tracks.iterFlightData()
+    dem: DEMGrid covering the uwr zones, or TiledDEM around them. See flightPathAnalysis_Geometry.loadDEM()
+    zones: UWRZones of the buffered uwr. See flightPathAnalysis_Geometry.loadUWRZones()
+    IncursionSeverity: Dictionary of buffer distance and incursion severity category ie. {500: "High", 1000: "Moderate}
+    writer: Function called with the PointTable of each classified chunk, in the order of flights
+    chunkSize: Number of flights in a chunk
+    queueSize: Maximum number of chunks waiting between two stages
+    computeWorkers: Number of compute workers. Default is the number of cpus - 2 (one for the reader, one for the writer)
+    useProcesses: Run the compute in worker processes instead of threads. Parsing xml holds the GIL, so processes
+        scale better with many cpus. dem and zones are sent once to each process.
+    grid: Optional ZoneGrid of the dem and zones for the fused classification kernel
+    bundlePath: Optional analysis bundle the dem, zones and grid were opened from (see flightPathAnalysis_Bundle). The worker
+        processes open it too instead of getting a copy of the layers
+
+    Output: list of names of the flights with 0 or 1 points
+
+    Purpose: Runs the flights through the stages at the same time with bounded queues between them.
+    """
+    if computeWorkers is None:
+        computeWorkers = max(1, (os.cpu_count() or 1) - 2)
+
+    starttime = datetime.datetime.now()
+    readQueue = queue.Queue(maxsize=queueSize)
+    writeQueue = queue.Queue(maxsize=queueSize)
+    stopEvent = threading.Event()
+    inFlight = threading.Semaphore(2*queueSize + computeWorkers)
+    errors = []
+    timer = StageTimer()
+    flightCount = [0]
+
+    def put(q, item):
+        #put that gives up when another stage failed, so no thread waits forever on a full queue
+        while not stopEvent.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(q):
+        while not stopEvent.is_set():
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                pass
+        return STOP
+
+    def acquire():
+        #wait for room for one more chunk in flight
+        while not stopEvent.is_set():
+            if inFlight.acquire(timeout=0.5):
+                return True
+        return False
+
+    def reader():
+        try:
+            chunk = []
+            sequence = 0
+            flightIter = iter(flights)
+            while True:
+                t = time.perf_counter()
+                flight = next(flightIter, STOP)
+                timer.add("read", time.perf_counter() - t)
+                if flight is STOP:
+                    break
+                flightCount[0] += 1
+                chunk.append(flight)
+                if len(chunk) == chunkSize:
+                    if not acquire() or not put(readQueue, (sequence, chunk)):
+                        return
+                    sequence += 1
+                    chunk = []
+            if chunk and acquire():
+                put(readQueue, (sequence, chunk))
+        except BaseException as e:
+            errors.append(e)
+            stopEvent.set()
+        finally:
+            for i in range(computeWorkers):
+                put(readQueue, STOP)
+
+    pool = None
+    if useProcesses:
+        if bundlePath is not None:
+            initargs = (None, None, IncursionSeverity, grid is not None, bundlePath)
+        else:
+            initargs = (dem, zones, IncursionSeverity, grid)
+        pool = concurrent.futures.ProcessPoolExecutor(computeWorkers, initializer=initComputeProcess, initargs=initargs)
+
+    def compute():
+        try:
+            while True:
+                item = get(readQueue)
+                if item is STOP:
+                    break
+                sequence, chunk = item
+                t = time.perf_counter()
+                if pool is not None:
+                    result = pool.submit(computeChunk, chunk).result()
+                else:
+                    result = computeChunk(chunk, dem, zones, IncursionSeverity, grid)
+                timer.add("compute", time.perf_counter() - t)
+                if not put(writeQueue, (sequence, result)):
+                    break
+        except BaseException as e:
+            errors.append(e)
+            stopEvent.set()
+        finally:
+            put(writeQueue, STOP)
+
+    threads = [threading.Thread(target=reader, daemon=True)]
+    threads += [threading.Thread(target=compute, daemon=True) for i in range(computeWorkers)]
+    for thread in threads:
+        thread.start()
+
+    #writer runs in this thread. Chunks can finish out of order, they are held until the previous chunks are written
+    problemFlights = []
+    pending = {}
+    nextSequence = 0
+    stoppedWorkers = 0
+    try:
+        while stoppedWorkers < computeWorkers:
+            item = get(writeQueue)
+            if item is STOP:
+                stoppedWorkers += 1
+                if stopEvent.is_set():
+                    break
+                continue
+            sequence, result = item
+            pending[sequence] = result
+            while nextSequence in pending:
+                table, problems = pending.pop(nextSequence)
+                t = time.perf_counter()
+                writer(table)
+                timer.add("write", time.perf_counter() - t)
+                problemFlights += problems
+                nextSequence += 1
+                inFlight.release()
+    except BaseException as e:
+        errors.append(e)
+        stopEvent.set()
+    finally:
+        if errors:
+            stopEvent.set()
+        for thread in threads:
+            thread.join()
+        if pool is not None:
+            pool.shutdown()
+
+    if errors:
+        raise errors[0]
+
+    print("Runtime to stream", flightCount[0], "flights:", datetime.datetime.now() - starttime)
+    for stage in timer.busy:
+        print("   busy time of stage", stage, ":", datetime.timedelta(seconds=timer.busy[stage]))
+    return problemFlights
+
+
+class FeatureClassPointWriter:
+    """
+    Purpose:
+    Writes PointTable chunks of classified points (see flightPathAnalysis_Geometry.classifyTracks()) into a point feature class
+    with the same fields as the point output of getFlightLinePoints(). Use as the writer of runStreaming().
+
+    Inputs:
+    outputGDB: Full path to GDB for the feature class
+    name: Name of the feature class. It is replaced if it exists, unless append is True
+    unit_no: field for unit number (eg. u-2-002)
+    unit_no_id: field for unit number id (eg. TO 32)
+    append: Add the points to the feature class if it already exists
+    """
+
+    def __init__(self, outputGDB, name, unit_no, unit_no_id, append=False):
+        import arcpy
+        self.arcpy = arcpy
+        self.path = os.path.join(outputGDB, name)
+        self.unit_no = unit_no
+        self.unit_no_id = unit_no_id
+        self.count = 0
+
+        if not (append and arcpy.Exists(self.path)):
+            arcpy.env.overwriteOutput = True
+            arcpy.CreateFeatureclass_management(outputGDB, name, "POINT", spatial_reference=arcpy.SpatialReference(3005))
+            arcpy.AddFields_management(self.path, [
+                ["FlightName", "TEXT"], ["DateTime", "DATE"], ["Elevation", "DOUBLE"], ["DEMElev", "DOUBLE"], ["AGL", "LONG"],
+                ["TimeInterval", "DOUBLE"], ["TotalTime", "DOUBLE"], ["HeightRange", "TEXT"], ["BUFF_DIST", "DOUBLE"],
+                [unit_no, "TEXT"], [unit_no_id, "TEXT"], ["IncursionSeverity", "TEXT"]])
+        self.fields = ["SHAPE@XY", "FlightName", "DateTime", "Elevation", "DEMElev", "AGL", "TimeInterval", "TotalTime",
+                       "HeightRange", "BUFF_DIST", unit_no, unit_no_id, "IncursionSeverity"]
+
+    def __call__(self, table):
+        columns = table.toColumns()
+        dateTimes = columns["DateTime"].astype("datetime64[ms]").astype(object)
+        with self.arcpy.da.InsertCursor(self.path, self.fields) as cursor:
+            for i in range(len(columns["X"])):
+                cursor.insertRow([
+                    (columns["X"][i], columns["Y"][i]), columns["FlightName"][i], dateTimes[i],
+                    float(columns["Elevation"][i]), float(columns["DEMElev"][i]), int(columns["AGL"][i]),
+                    float(columns["TimeInterval"][i]), float(columns["TotalTime"][i]), columns["HeightRange"][i],
+                    float(columns["BUFF_DIST"][i]), str(columns["unit_no"][i]), str(columns["unit_no_id"][i]),
+                    columns["IncursionSeverity"][i]])
+        del cursor
+        self.count += len(columns["X"])
+
+
+def getFlightPointsStreaming(gpxFolder, outputGDB, finalFlightPointName, DEM, unit_no, unit_no_id, uwrBuffered, IncursionSeverity, generalFolder, chunkSize=20, queueSize=4, computeWorkers=None, useProcesses=False, useZoneGrid=True,
+                             bundlePath=None, maxDEMWindowMB=flightPathAnalysis_Geometry.maxDEMWindowMB):
+    """
+    (string, string, string, string, string, string, string, dictionary, string, optional: int, int, int, boolean, boolean, string, int) -> None
+
+    Inputs: Same as flightPathAnalysis_uwr.getFlightLinePoints() without finalFlightLineName, plus the
+    chunkSize, queueSize, computeWorkers and useProcesses settings of runStreaming(). gpxFolder can also be a
+    tar, tar.gz or zip archive of gpx files (see flightPathAnalysis_Tracks.iterFlightData()). useZoneGrid makes the
+    zone label raster (flightPathAnalysis_Geometry.ZoneGrid) once and classifies with the fused kernel. bundlePath is an
+    optional analysis bundle (flightPathAnalysis_Bundle): the layers are opened from it when it is current with DEM and uwrBuffered.
+    maxDEMWindowMB is the largest DEM window read over all the uwr. Past it the DEM is read in tiles around each uwr zone
+    (flightPathAnalysis_Geometry.TiledDEM) and the zone grid is not made
+
+    Output:
+    - feature class with all flight points in uwr zones below 500m, and one view of it for each incursion severity,
+    like getFlightLinePoints() (flightPathAnalysis_Output). outputGDB can also be a .gpkg file, a .fgb folder or an .arrow file
+    - (potential) text file with list of gpx files that have 0 or 1 flight points
+
+    Purpose: Streaming version of the flight points of getFlightLinePoints(). The flight lines are not made.
+    """
+    starttime = datetime.datetime.now()
+    if bundlePath is not None and not flightPathAnalysis_Bundle.bundleIsCurrent(bundlePath, DEM, uwrBuffered, unit_no, unit_no_id):
+        print("analysis bundle", bundlePath, "is missing or out of date, the layers are read instead")
+        bundlePath = None
+    if bundlePath is not None:
+        bundle = flightPathAnalysis_Bundle.openBundle(bundlePath)
+        zones = bundle.zones
+        dem = bundle.dem
+        grid = bundle.grid if useZoneGrid else None
+    else:
+        zones = flightPathAnalysis_Geometry.loadUWRZones(uwrBuffered, unit_no, unit_no_id)
+        #only the points in the zones are sampled, so past maxDEMWindowMB the DEM is only read around them
+        dem = flightPathAnalysis_Geometry.loadZonesDEM(DEM, zones, maxDEMWindowMB)
+        grid = flightPathAnalysis_Geometry.ZoneGrid(dem, zones) if useZoneGrid and isinstance(dem, flightPathAnalysis_Geometry.DEMGrid) else None
+    print("Runtime to load uwr zones and DEM: ", datetime.datetime.now() - starttime)
+
+    writer = flightPathAnalysis_Output.openPointWriter(outputGDB, finalFlightPointName, unit_no, unit_no_id, IncursionSeverity)
+    flights = flightPathAnalysis_Tracks.iterFlightData(gpxFolder)
+    try:
+        problemFlights = runStreaming(flights, dem, zones, IncursionSeverity, writer, chunkSize, queueSize, computeWorkers, useProcesses, grid, bundlePath)
+    finally:
+        # indexes and a view of the points of each incursion severity. Closed even when the run fails or writes no point,
+        # so the .part and .tmp files of the writer are not left behind
+        writer.close()
+
+    if len(problemFlights) > 0:
+        problemGPXText = open(os.path.join(generalFolder, "problemGPXFiles.txt"), "w")
+        for i in problemFlights:
+            problemGPXText.write(i + "\n")
+        problemGPXText.close()
+
+    if writer.count == 0:
+        raise SystemExit("No flight lines intersect with uwr buffers")
+
+    print("Runtime to get all points: ", datetime.datetime.now() - starttime)
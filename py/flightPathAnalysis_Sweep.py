@@ -0,0 +1,337 @@
+### parameter sweep mode used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# The 500m AGL cutoff, the 400m height range split and the incursion severity buffer bands only decide how points are
+# binned. measureFlights() keeps the continuous AGL of each flight point and its distance to each uwr within
+# maxDistance (and whether it is terrain masked) once. runSweep() then re-bins these stored values for any number of
+# threshold sets (scenarios) in one vectorized pass and writes one stats table per scenario, without redoing the
+# DEM sampling, buffers or joins.
+# A scenario is a dictionary:
+#   {"name": "buffer250",                                   name of the scenario, used for the stats file name
+#    "IncursionSeverity": {0: "In UWR", 250: "High", ...},  buffer distance and incursion severity category
+#    "heightRangeSplits": [400],                            AGL splits of the height ranges (optional, default [400])
+#    "maxAGL": 500}                                         AGL cutoff (optional, default 500)
+# The default scenario gives the same bins as getFlightLinePoints(): AGL is rounded like the AGL LONG field, a point at
+# distance d > 0 falls in the smallest buffer distance >= d, and in the "In UWR" band (buffer distance 0) when inside.
+# Distances are exact distances to the uwr polygons, so points right on a buffer edge can fall in the other band than
+# with the arcpy buffer polygons.
+
+import datetime
+import json
+import os
+import numpy as np
+
+import flightPathAnalysis_Geometry
+import flightPathAnalysis_Masking
+import flightPathAnalysis_Names
+import flightPathAnalysis_PointTable
+import flightPathAnalysis_Tracks
+
+#fields of a measured point. There is one row per point and uwr within maxDistance
+measureDtype = np.dtype([
+    ("x", "f8"),
+    ("y", "f8"),
+    ("agl", "f4"),
+    ("distance", "f4"),
+    ("flight", "i4"),
+    ("uwr", "i4"),
+    ("masked", "?"),
+])
+
+
+class MeasuredPoints:
+    """
+    Purpose: Continuous AGL and distance to uwr of the flight points, with integer coded flight and uwr like PointTable
+
+    Inputs:
+    points: structured array with measureDtype
+    flightNames: List of flight names. points["flight"] indexes it
+    flightTimeInterval: Array of the time interval (seconds) each point of a flight represents
+    flightTotalTime: Array of the total time (seconds) of each flight
+    uwrKeys: List of (unit number, unit number id) of the uwr. points["uwr"] indexes it
+    maxDistance: Distance to uwr up to which points were kept
+    """
+
+    def __init__(self, points, flightNames, flightTimeInterval, flightTotalTime, uwrKeys, maxDistance):
+        self.points = points
+        self.flightNames = list(flightNames)
+        self.flightTimeInterval = np.asarray(flightTimeInterval, dtype="float64")
+        self.flightTotalTime = np.asarray(flightTotalTime, dtype="float64")
+        self.uwrKeys = [tuple(k) for k in uwrKeys]
+        self.maxDistance = float(maxDistance)
+
+    def __len__(self):
+        return len(self.points)
+
+    def uwrID(self, code):
+        return flightPathAnalysis_Names.uwrUniqueID(*self.uwrKeys[code])
+
+    def uwrPoints(self):
+        #(uwr code, rows, index in points of each row) of each uwr, for flightPathAnalysis_Masking.maskPoints()
+        for code, rows in flightPathAnalysis_PointTable.uwrGroups(self.points["uwr"]):
+            yield code, rows, rows
+
+    def save(self, path):
+        #npz file with the points and the dictionaries. Written to a temp file first so a failed save leaves no partial file
+        meta = {"flightNames": self.flightNames, "uwrKeys": [[str(k[0]), str(k[1])] for k in self.uwrKeys], "maxDistance": self.maxDistance}
+        tempPath = path + ".tmp.npz"
+        np.savez(tempPath, points=self.points, flightTimeInterval=self.flightTimeInterval, flightTotalTime=self.flightTotalTime,
+                 meta=np.array(json.dumps(meta)))
+        os.replace(tempPath, path)
+
+def loadMeasuredPoints(path):
+    with np.load(path) as data:
+        meta = json.loads(str(data["meta"]))
+        return MeasuredPoints(data["points"], meta["flightNames"], data["flightTimeInterval"], data["flightTotalTime"],
+                              meta["uwrKeys"], meta["maxDistance"])
+
+def measureTracks(tracks, dem, zones, maxDistance, mask=None):
+    """
+    (list, DEMGrid, UWRZones, float, optional: MinElevMask) -> MeasuredPoints, list
+
+    Inputs:
+    tracks: List of flight tracks. See flightPathAnalysis_Tracks.readGPX()
+    dem: DEMGrid covering the uwr zones
+    zones: UWRZones of the buffered uwr. Only the uwr polygons (BUFF_DIST 0) are used
+    maxDistance: Largest buffer distance any scenario will use
+    mask: Optional MinElevMask to flag the terrain masked points
+
+    Output: MeasuredPoints of the points within maxDistance of a uwr, and the names of the flights with 0 or 1 points
+
+    Purpose: Measures AGL and the distance to every uwr within maxDistance of the points of the tracks. No AGL cutoff.
+    """
+    names = []
+    timeIntervals = []
+    totalTimes = []
+    parts = {"lon": [], "lat": [], "ele": [], "flight": []}
+    problemFlights = []
+    for track in tracks:
+        timeInterval, totalFlightTime = flightPathAnalysis_Tracks.flightTimeInterval(track)
+        if timeInterval is None:
+            problemFlights.append(track["name"])
+            continue
+        parts["lon"].append(track["lon"])
+        parts["lat"].append(track["lat"])
+        parts["ele"].append(track["ele"])
+        parts["flight"].append(np.full(len(track["lon"]), len(names), dtype="int32"))
+        names.append(track["name"])
+        timeIntervals.append(timeInterval)
+        totalTimes.append(totalFlightTime)
+
+    if not names:
+        return MeasuredPoints(np.zeros(0, dtype=measureDtype), [], [], [], zones.uwrKeys, maxDistance), problemFlights
+
+    x, y = flightPathAnalysis_Geometry.projectToBCAlbers(np.concatenate(parts["lon"]), np.concatenate(parts["lat"]))
+
+    #distance to each uwr polygon whose box grown by maxDistance has the point
+    pointIndex = []
+    uwrCode = []
+    distance = []
+    for i in np.nonzero(zones.buffDist == 0)[0]:
+        xMin, yMin, xMax, yMax = zones.bbox[i]
+        candidates = np.nonzero((x >= xMin - maxDistance) & (x <= xMax + maxDistance) & (y >= yMin - maxDistance) & (y <= yMax + maxDistance))[0]
+        if len(candidates) == 0:
+            continue
+        d = zones.distance(i, x[candidates], y[candidates])
+        near = d <= maxDistance
+        pointIndex.append(candidates[near])
+        uwrCode.append(np.full(np.count_nonzero(near), zones.zoneUWR[i], dtype="int32"))
+        distance.append(d[near])
+
+    if pointIndex:
+        pointIndex = np.concatenate(pointIndex)
+        uwrCode = np.concatenate(uwrCode)
+        distance = np.concatenate(distance)
+        #a uwr can have more than one polygon. Keep the nearest one for each point and uwr
+        order = np.lexsort((distance, uwrCode, pointIndex))
+        pointIndex, uwrCode, distance = pointIndex[order], uwrCode[order], distance[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = (pointIndex[1:] != pointIndex[:-1]) | (uwrCode[1:] != uwrCode[:-1])
+        pointIndex, uwrCode, distance = pointIndex[first], uwrCode[first], distance[first]
+    else:
+        pointIndex = np.zeros(0, dtype="int64")
+        uwrCode = np.zeros(0, dtype="int32")
+        distance = np.zeros(0)
+
+    uniquePoints, inverse = np.unique(pointIndex, return_inverse=True)
+    demElev = dem.sample(x[uniquePoints], y[uniquePoints])
+    agl = np.maximum(np.concatenate(parts["ele"])[uniquePoints] - demElev, 0)
+    keep = ~np.isnan(agl)[inverse]
+
+    points = np.zeros(np.count_nonzero(keep), dtype=measureDtype)
+    points["x"] = x[pointIndex[keep]]
+    points["y"] = y[pointIndex[keep]]
+    points["agl"] = agl[inverse[keep]]
+    points["distance"] = distance[keep]
+    points["flight"] = np.concatenate(parts["flight"])[pointIndex[keep]]
+    points["uwr"] = uwrCode[keep]
+    measured = MeasuredPoints(points, names, timeIntervals, totalTimes, zones.uwrKeys, maxDistance)
+    if mask is not None:
+        #same rule as LOS_Analysis(), on the AGL rounded like the AGL LONG field. Points of uwr without viewshed are not masked
+        points["masked"] = flightPathAnalysis_Masking.maskPoints(measured, mask, np.rint(points["agl"]))[0]
+    return measured, problemFlights
+
+def concatenateMeasured(parts):
+    #joins measured points of the same uwr zones. Flight codes are shifted so they stay unique
+    first = parts[0]
+    points = []
+    flightNames = []
+    for part in parts:
+        p = part.points.copy()
+        p["flight"] += len(flightNames)
+        points.append(p)
+        flightNames += part.flightNames
+    return MeasuredPoints(np.concatenate(points), flightNames, np.concatenate([p.flightTimeInterval for p in parts]),
+                          np.concatenate([p.flightTotalTime for p in parts]), first.uwrKeys, first.maxDistance)
+
+def measureFlights(gpxFolder, DEM, uwrBuffered, unit_no, unit_no_id, maxDistance, measuredPath, minElevViewshed=None, uwr_unique_Field=None, chunkSize=200):
+    """
+    (string, string, string, string, string, float, string, optional: string, string, int) -> None
+
+    Inputs:
+    gpxFolder: Full path to folder (or tar/zip archive) of gpx files
+    DEM: Full path to raster DEM
+    uwrBuffered: Full path to feature class of buffered uwr. output of flightPathAnalysis_Functions.createUWRBuffer()
+    unit_no: field for unit number (eg. u-2-002)
+    unit_no_id: field for unit number id (eg. TO 32)
+    maxDistance: Largest buffer distance any scenario will use
+    measuredPath: Full path to the npz file for the measured points
+    minElevViewshed: Optional min Elevation viewshed layer made by makeViewshed() to flag the terrain masked points
+    uwr_unique_Field: field for unique uwr id. Needed with minElevViewshed
+    chunkSize: Number of flights measured at a time
+
+    Purpose: Measures the flights once for runSweep()
+    """
+    starttime = datetime.datetime.now()
+    zones = flightPathAnalysis_Geometry.loadUWRZones(uwrBuffered, unit_no, unit_no_id, "BUFF_DIST = 0")
+    left, bottom, right, top = zones.extent
+    dem = flightPathAnalysis_Geometry.loadDEM(DEM, (left - maxDistance, bottom - maxDistance, right + maxDistance, top + maxDistance))
+    mask = None
+    if minElevViewshed is not None:
+        mask = flightPathAnalysis_Masking.loadMinElevMask(minElevViewshed, uwr_unique_Field)
+
+    parts = []
+    problemFlights = []
+    tracks = []
+    for name, data in flightPathAnalysis_Tracks.iterFlightData(gpxFolder):
+        tracks.append(flightPathAnalysis_Tracks.readFlight(data, name))
+        if len(tracks) == chunkSize:
+            measured, problems = measureTracks(tracks, dem, zones, maxDistance, mask)
+            parts.append(measured)
+            problemFlights += problems
+            tracks = []
+    if tracks or not parts:
+        measured, problems = measureTracks(tracks, dem, zones, maxDistance, mask)
+        parts.append(measured)
+        problemFlights += problems
+
+    measured = concatenateMeasured(parts)
+    measured.save(measuredPath)
+    print("measured", len(measured), "points of", len(measured.flightNames), "flights. flights with 0 or 1 points:", problemFlights)
+    print("Runtime to measure flights: ", datetime.datetime.now() - starttime)
+
+def heightRangeLabels(splits, maxAGL):
+    #ie. [400], 500 -> ["0 to 400m", "400 to 500m"]
+    edges = [0] + list(splits) + [maxAGL]
+    return [str(edges[i]) + " to " + str(edges[i+1]) + "m" for i in range(len(edges) - 1)]
+
+def sweepStatistics(measured, scenarios, blockSize=50000000):
+    """
+    (MeasuredPoints, list, optional: int) -> dictionary
+
+    Inputs:
+    measured: MeasuredPoints made by measureTracks() or loaded with loadMeasuredPoints()
+    scenarios: List of scenario dictionaries. See the top of the module
+    blockSize: Maximum number of scenarios x points binned at once
+
+    Output: {scenario name: dictionary of columns} with the fields of the stats of main(): FlightName, HeightRange,
+    BUFF_DIST, unit_no, unit_no_id, TotalTime, IncursionSeverity, FREQUENCY, SUM_TimeInterval, plus
+    SUM_TimeInterval_TerrainMasked (time of the points left after terrain masking)
+
+    Purpose: Bins the measured points for all scenarios. The bins of every scenario are coded into one integer key
+    (scenario, flight, uwr, severity, height range) so all scenarios are grouped with one unique and bincount.
+    """
+    p = measured.points
+    agl = np.rint(p["agl"])
+    timeInterval = measured.flightTimeInterval[p["flight"]] if len(p) else np.zeros(0)
+    notMasked = ~p["masked"]
+
+    specs = []
+    for scenario in scenarios:
+        severities = flightPathAnalysis_PointTable.severityTable(scenario["IncursionSeverity"])
+        if severities[-1][0] > measured.maxDistance:
+            raise ValueError("scenario " + scenario["name"] + " has buffers past the measured distance " + str(measured.maxDistance))
+        splits = np.array(scenario.get("heightRangeSplits", [flightPathAnalysis_Geometry.heightRangeSplit]), dtype="float64")
+        maxAGL = scenario.get("maxAGL", flightPathAnalysis_Geometry.maxAGL)
+        specs.append((scenario["name"], severities, splits, maxAGL, heightRangeLabels(splits.astype("int64").tolist(), maxAGL)))
+
+    uwrCount = max(len(measured.uwrKeys), 1)
+    severityCount = max(len(s[1]) for s in specs)
+    heightCount = max(len(s[4]) for s in specs)
+    scenarioKey = len(measured.flightNames) * uwrCount * severityCount * heightCount
+
+    results = {}
+    scenariosPerBlock = max(1, blockSize // max(len(p), 1))
+    for start in range(0, len(specs), scenariosPerBlock):
+        block = specs[start:start + scenariosPerBlock]
+        keys = []
+        rows = []
+        for s, (name, severities, splits, maxAGL, labels) in enumerate(block):
+            buffDist = np.array([sev[0] for sev in severities])
+            severity = np.searchsorted(buffDist, p["distance"], side="left")
+            heightRange = np.searchsorted(splits, agl, side="left")
+            keep = (severity < len(buffDist)) & (agl < maxAGL)
+            key = ((p["flight"][keep].astype("int64") * uwrCount + p["uwr"][keep]) * severityCount + severity[keep]) * heightCount + heightRange[keep]
+            keys.append(key + s * scenarioKey)
+            rows.append(keep)
+        keys = np.concatenate(keys)
+        rows = np.concatenate([np.nonzero(keep)[0] for keep in rows])
+        groups, inverse = np.unique(keys, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        total = np.bincount(inverse, weights=timeInterval[rows], minlength=len(groups))
+        unmasked = np.bincount(inverse, weights=timeInterval[rows] * notMasked[rows], minlength=len(groups))
+        frequency = np.bincount(inverse, minlength=len(groups))
+
+        scenarioIndex, rest = np.divmod(groups, scenarioKey)
+        rest, heightRange = np.divmod(rest, heightCount)
+        rest, severity = np.divmod(rest, severityCount)
+        flight, uwr = np.divmod(rest, uwrCount)
+        for s, (name, severities, splits, maxAGL, labels) in enumerate(block):
+            g = np.nonzero(scenarioIndex == s)[0]
+            results[name] = {
+                "FlightName": [measured.flightNames[i] for i in flight[g]],
+                "HeightRange": [labels[i] for i in heightRange[g]],
+                "BUFF_DIST": [severities[i][0] for i in severity[g]],
+                "unit_no": [measured.uwrKeys[i][0] for i in uwr[g]],
+                "unit_no_id": [measured.uwrKeys[i][1] for i in uwr[g]],
+                "TotalTime": measured.flightTotalTime[flight[g]] if len(g) else np.zeros(0),
+                "IncursionSeverity": [severities[i][1] for i in severity[g]],
+                "FREQUENCY": frequency[g],
+                "SUM_TimeInterval": total[g],
+                "SUM_TimeInterval_TerrainMasked": unmasked[g],
+            }
+    return results
+
+def runSweep(measuredPath, scenarios, outputFolder, unit_no, unit_no_id):
+    """
+    (string, list, string, string, string) -> None
+
+    Inputs:
+    measuredPath: Full path to the npz file made by measureFlights()
+    scenarios: List of scenario dictionaries. See the top of the module
+    outputFolder: Folder for the stats tables. One csv file <scenario name>_Stats.csv per scenario
+    unit_no: field name for unit number in the stats tables (eg. TUWR_TAG)
+    unit_no_id: field name for unit number id in the stats tables (eg. UNIT_NO)
+
+    Purpose: Stats table of every scenario from the measured points
+    """
+    import pandas as pd
+
+    starttime = datetime.datetime.now()
+    if not os.path.exists(outputFolder):
+        os.makedirs(outputFolder)
+    measured = loadMeasuredPoints(measuredPath)
+    results = sweepStatistics(measured, scenarios)
+    for name in results:
+        table = pd.DataFrame(results[name]).rename(columns={"unit_no": unit_no, "unit_no_id": unit_no_id})
+        table.to_csv(os.path.join(outputFolder, flightPathAnalysis_Names.replaceNonAlphaNum(name, "_") + "_Stats.csv"), index=False)
+    print("Runtime to sweep", len(scenarios), "scenarios over", len(measured), "points:", datetime.datetime.now() - starttime)
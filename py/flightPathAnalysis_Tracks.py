@@ -0,0 +1,600 @@
+### flight track readers used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# Reads flight logs straight into numpy arrays (one dictionary of arrays per flight) instead of going through
+# arcpy.GPXtoFeatures_conversion and a feature class per flight.
+# Function: readGPX - parses a gpx file (path or file object) into a track
+# Function: flightTimeInterval - time interval and total time of a track, same rules as getFlightLinePoints()
+# Function: iterFlightData - raw gpx logs of a folder, a gpx file or a tar/tar.gz/zip archive, read in one sequential
+# pass. Archive members are never extracted to disk. Zip members are handed out still compressed so the compute workers
+# decompress them in parallel (flightData()); tar.gz is one compressed stream and is decompressed by the reader.
+# update: Oct. 19, 2026 - kml, igc and csv flight logs are read into the same track arrays as gpx. The format is sniffed
+# from the content (flightFormat()), so folders and archives can mix formats and no log has to be converted first
+# Function: readKML, readIGC, readCSV - parse a kml, igc or csv flight log into a track
+# Function: readFlight - track of a flight log of any format
+# Function: readFlights - tracks of all the flight logs of a source, parsed in parallel worker processes
+# Function: writeTrackPoints - writes the points of tracks into a WGS 84 point feature class with one insert cursor
+# update: Oct. 19, 2026 - the tracks of readFlights() keep the name of their log file (track["file"])
+# update: Oct. 19, 2026 - times with a utc offset are converted to UTC instead of dropping the offset
+
+import bz2
+import collections
+import concurrent.futures
+import csv
+import io
+import os
+import re
+import struct
+import tarfile
+import xml.etree.ElementTree as ET
+import zipfile
+import zlib
+import numpy as np
+
+import flightPathAnalysis_Names
+
+#extensions of the flight logs read from folders and archives
+flightExtensions = (".gpx", ".kml", ".igc", ".csv")
+
+#csv header names (lower case, letters and digits only) of the track columns
+csvColumns = {
+    "lat": ["lat", "latitude", "gpslat", "gpslatitude"],
+    "lon": ["lon", "lng", "long", "longitude", "gpslon", "gpslong", "gpslongitude"],
+    "ele": ["ele", "elevation", "alt", "altitude", "gpsalt", "gpsaltitude", "altitudemsl", "elevationm", "altitudem", "altm",
+            "elevationft", "altitudeft", "altft", "altitudefeet"],
+    "time": ["time", "datetime", "timestamp", "utc", "timeutc", "datetimeutc", "gpstime", "fixtime"],
+    "date": ["date", "dateutc"],
+}
+
+
+def localName(tag):
+    #strip the xml namespace ie. {http://www.topografix.com/GPX/1/1}trkpt -> trkpt
+    return tag[tag.rfind("}")+1:]
+
+def gpxTime(text):
+    #date, time and milliseconds of an ISO time in UTC. A utc offset is applied ie. 2022-01-01T08:35:49.120-08:00 -> 2022-01-01T16:35:49.120
+    text = text.strip()
+    end = 19
+    if len(text) > 19 and text[19] == ".":
+        end = 20
+        while end < len(text) and text[end].isdigit():
+            end += 1
+    localTime = text[:min(end, 23)]
+    #Z, +hh:mm, +hhmm or +hh after the time. No offset is read as UTC
+    offset = text[end:].strip()
+    digits = offset[1:].replace(":", "")
+    if not offset or offset[0] not in "+-" or not digits.isdigit() or len(digits) not in (2, 4):
+        return localTime
+    minutes = int(digits[:2])*60 + int(digits[2:] or 0)
+    if offset[0] == "-":
+        minutes = -minutes
+    return str(np.datetime64(localTime) - np.timedelta64(minutes, "m"))
+
+def flightNameFromFile(fileName):
+    """
+    Purpose: Flight name used in the FlightName field. Same as the fcRawName in getFlightLinePoints()
+    ie. 20220101-163549-0014267-139533.gpx -> 20220101_163549_0014267_139533
+    """
+    formattedName = flightPathAnalysis_Names.replaceNonAlphaNum(os.path.basename(fileName), "_")
+    ext = formattedName.rfind("_")
+    if ext > 0:
+        formattedName = formattedName[:ext]
+    return formattedName
+
+def trackArrays(name, lon, lat, ele, times):
+    #track dictionary of readGPX() from lists or arrays
+    return {
+        "name": name,
+        "lon": np.asarray(lon, dtype="float64"),
+        "lat": np.asarray(lat, dtype="float64"),
+        "ele": np.asarray(ele, dtype="float64"),
+        "time": np.asarray(times, dtype="datetime64[ms]"),
+    }
+
+def sourceName(source, name):
+    #flight name given, or made from the path or file object name
+    if name is not None:
+        return name
+    return flightNameFromFile(source if isinstance(source, str) else getattr(source, "name", "flight"))
+
+def sourceBytes(source):
+    #bytes of a path or a file object
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return f.read()
+    return source.read()
+
+def readGPX(source, name=None):
+    """
+    (string or file object, optional: string) -> dictionary
+
+    Inputs:
+    source: Full path to a gpx file or a file object opened in binary mode
+    name: Flight name. Made from the file name if not given
+
+    Output: dictionary of the flight track with
+        "name": flight name
+        "lon", "lat", "ele": float64 arrays of the track points
+        "time": datetime64[ms] array of the track points
+
+    Purpose: Parses the track points of a gpx file in one pass with iterparse. Waypoints and routes are ignored
+    like in GPXtoFeatures_conversion output used for the flight points.
+    """
+    name = sourceName(source, name)
+
+    lon = []
+    lat = []
+    ele = []
+    times = []
+    for event, elem in ET.iterparse(source, events=("end",)):
+        tag = localName(elem.tag)
+        if tag == "trkpt":
+            lon.append(float(elem.get("lon")))
+            lat.append(float(elem.get("lat")))
+            e = None
+            t = None
+            for child in elem:
+                childTag = localName(child.tag)
+                if childTag == "ele":
+                    e = float(child.text)
+                elif childTag == "time":
+                    t = gpxTime(child.text)
+            ele.append(np.nan if e is None else e)
+            times.append("NaT" if t is None else t)
+            elem.clear()
+
+    return trackArrays(name, lon, lat, ele, times)
+
+def kmlCoordinates(text, separator=","):
+    #lon, lat and altitude of kml coordinates "lon,lat[,alt] lon,lat[,alt] ..." (gx:coord is "lon lat alt")
+    points = text.split() if separator == "," else [text.strip()]
+    lon = []
+    lat = []
+    ele = []
+    for point in points:
+        values = point.split(separator)
+        if len(values) < 2:
+            continue
+        lon.append(float(values[0]))
+        lat.append(float(values[1]))
+        ele.append(float(values[2]) if len(values) > 2 and values[2] else np.nan)
+    return lon, lat, ele
+
+def readKML(source, name=None):
+    """
+    (string or file object, optional: string) -> dictionary
+
+    Inputs:
+    source: Full path to a kml file or a file object opened in binary mode
+    name: Flight name. Made from the file name if not given
+
+    Output: dictionary of the flight track. See readGPX()
+
+    Purpose: Parses the track points of a kml file in one pass with iterparse. The points are taken from, in order of
+    preference: the gx:Track elements (when and gx:coord pairs, like the R read_KML), placemarks with a Point and a
+    TimeStamp (one placemark per fix), or the LineString coordinates. LineString points have no time (NaT).
+    Altitudes are taken as absolute.
+    """
+    name = sourceName(source, name)
+
+    tracked = ([], [], [], [])
+    placemarks = ([], [], [], [])
+    lines = ([], [], [], [])
+    for event, elem in ET.iterparse(source, events=("end",)):
+        tag = localName(elem.tag)
+        if tag == "Track":
+            whens = []
+            for child in elem:
+                childTag = localName(child.tag)
+                if childTag == "when":
+                    whens.append(gpxTime(child.text))
+                elif childTag == "coord":
+                    lon, lat, ele = kmlCoordinates(child.text, " ")
+                    tracked[0].extend(lon)
+                    tracked[1].extend(lat)
+                    tracked[2].extend(ele)
+            #a track can have fewer whens than coords (or none). The missing times are NaT
+            count = len(tracked[0]) - len(tracked[3])
+            tracked[3].extend((whens + ["NaT"]*count)[:count])
+            elem.clear()
+        elif tag == "Placemark":
+            point = None
+            when = None
+            for child in elem.iter():
+                childTag = localName(child.tag)
+                if childTag == "Point":
+                    point = child.find("{*}coordinates")
+                elif childTag == "TimeStamp":
+                    when = child.find("{*}when")
+            if point is not None and point.text and when is not None and when.text:
+                lon, lat, ele = kmlCoordinates(point.text)
+                placemarks[0].extend(lon[:1])
+                placemarks[1].extend(lat[:1])
+                placemarks[2].extend(ele[:1])
+                placemarks[3].extend([gpxTime(when.text)]*len(lon[:1]))
+            elem.clear()
+        elif tag == "LineString":
+            coordinates = elem.find("{*}coordinates")
+            if coordinates is not None and coordinates.text:
+                lon, lat, ele = kmlCoordinates(coordinates.text)
+                lines[0].extend(lon)
+                lines[1].extend(lat)
+                lines[2].extend(ele)
+                lines[3].extend(["NaT"]*len(lon))
+
+    for lon, lat, ele, times in (tracked, placemarks, lines):
+        if lon:
+            return trackArrays(name, lon, lat, ele, times)
+    return trackArrays(name, [], [], [], [])
+
+def fixedColumn(records, start, end):
+    #column of fixed width records (uint8 array, one row per record) as a bytes array ie. the time of igc B records
+    return np.ascontiguousarray(records[:, start:end]).view("S" + str(end - start)).ravel()
+
+def readIGC(source, name=None):
+    """
+    (string or file object, optional: string) -> dictionary
+
+    Inputs:
+    source: Full path to an igc file or a file object opened in binary mode
+    name: Flight name. Made from the file name if not given
+
+    Output: dictionary of the flight track. See readGPX()
+
+    Purpose: Parses the B (fix) records of an igc file. The date is from the HFDTE header record and the B record times
+    are UTC. The day goes up by one when the time of a fix is before the time of the fix before it (flight past
+    midnight UTC). The elevation is the GNSS altitude, or the pressure altitude when there is no GNSS altitude (0).
+    The fixed width B records are decoded as columns with numpy, not one line at a time.
+    """
+    name = sourceName(source, name)
+    data = sourceBytes(source)
+
+    date = re.search(rb"^HFDTE\D*(\d{2})(\d{2})(\d{2})", data, re.MULTILINE)
+    if date is None:
+        day = np.datetime64("NaT", "D")
+    else:
+        day = np.datetime64("20%s-%s-%s" % (date.group(3).decode(), date.group(2).decode(), date.group(1).decode()), "D")
+
+    records = [line[:35] for line in data.splitlines() if line[:1] == b"B" and len(line) >= 35]
+    if not records:
+        return trackArrays(name, [], [], [], [])
+    records = np.frombuffer(b"".join(records), dtype="uint8").reshape(-1, 35)
+
+    seconds = (fixedColumn(records, 1, 3).astype("int64")*3600 + fixedColumn(records, 3, 5).astype("int64")*60
+               + fixedColumn(records, 5, 7).astype("int64"))
+    days = np.concatenate([[0], np.cumsum(np.diff(seconds) < 0)])
+    times = day.astype("datetime64[ms]") + ((days*86400 + seconds)*1000).astype("timedelta64[ms]")
+
+    lat = fixedColumn(records, 7, 9).astype("float64") + fixedColumn(records, 9, 14).astype("float64")/60000
+    lat[records[:, 14] == ord("S")] *= -1
+    lon = fixedColumn(records, 15, 18).astype("float64") + fixedColumn(records, 18, 23).astype("float64")/60000
+    lon[records[:, 23] == ord("W")] *= -1
+    pressureAltitude = fixedColumn(records, 25, 30).astype("float64")
+    gnssAltitude = fixedColumn(records, 30, 35).astype("float64")
+    ele = np.where(gnssAltitude != 0, gnssAltitude, pressureAltitude)
+    return trackArrays(name, lon, lat, ele, times)
+
+def csvHeaderKey(text):
+    #lower case letters and digits of a header name ie. "Altitude (m)" -> altitudem
+    return re.sub(r"[^a-z0-9]", "", text.lower())
+
+def csvTime(values):
+    #datetime64[ms] of csv times: ISO text (a utc offset is applied, see gpxTime()) or unix epoch seconds or milliseconds
+    values = [v.strip() for v in values]
+    if values and all(re.fullmatch(r"\d+(\.\d*)?", v) for v in values):
+        epoch = np.array(values, dtype="float64")
+        if len(epoch) and epoch.max() > 1e11:
+            epoch = epoch/1000
+        return (epoch*1000).astype("int64").astype("datetime64[ms]")
+    return np.array([gpxTime(v.replace(" ", "T", 1)) if v else "NaT" for v in values], dtype="datetime64[ms]")
+
+def readCSV(source, name=None):
+    """
+    (string or file object, optional: string) -> dictionary
+
+    Inputs:
+    source: Full path to a csv file or a file object opened in binary mode
+    name: Flight name. Made from the file name if not given
+
+    Output: dictionary of the flight track. See readGPX()
+
+    Purpose: Parses a csv export of track points with a header row. The delimiter (comma, semicolon or tab) and the
+    latitude, longitude, altitude and time columns are found from the header (see csvColumns). Times are ISO text, a
+    date and a time column, or unix epoch seconds. Altitudes with ft or feet in their header are converted to meters.
+    Raises ValueError if there are no latitude and longitude columns.
+    """
+    name = sourceName(source, name)
+    text = sourceBytes(source).decode("utf-8-sig", errors="replace")
+    lines = text.splitlines()
+    if not lines:
+        return trackArrays(name, [], [], [], [])
+
+    header = lines[0]
+    delimiter = max([",", ";", "\t"], key=header.count)
+    rows = [row for row in csv.reader(lines, delimiter=delimiter) if row]
+    keys = [csvHeaderKey(h) for h in rows[0]]
+    columns = {}
+    for column, names in csvColumns.items():
+        for key in names:
+            if key in keys:
+                columns[column] = keys.index(key)
+                break
+    if "lat" not in columns or "lon" not in columns:
+        raise ValueError("no latitude and longitude columns in csv header: " + header)
+
+    rows = [row for row in rows[1:] if len(row) == len(keys)]
+
+    def numbers(column):
+        if column not in columns:
+            return np.full(len(rows), np.nan)
+        return np.array([row[columns[column]].strip() or "nan" for row in rows], dtype="float64")
+
+    lon = numbers("lon")
+    lat = numbers("lat")
+    ele = numbers("ele")
+    if "ele" in columns and ("ft" in keys[columns["ele"]] or "feet" in keys[columns["ele"]]):
+        ele = ele*0.3048
+    if "time" in columns:
+        values = [row[columns["time"]] for row in rows]
+        if "date" in columns and not any("-" in v or "/" in v for v in values[:1]):
+            values = [row[columns["date"]].strip().replace("/", "-") + "T" + v.strip() for row, v in zip(rows, values)]
+        times = csvTime(values)
+    else:
+        times = np.full(len(rows), np.datetime64("NaT"), dtype="datetime64[ms]")
+    return trackArrays(name, lon, lat, ele, times)
+
+#parser of each format
+flightReaders = {"gpx": readGPX, "kml": readKML, "igc": readIGC, "csv": readCSV}
+
+def flightFormat(data):
+    """
+    (bytes) -> string
+
+    Purpose: Format of a flight log sniffed from its first bytes: "gpx", "kml", "igc", "csv", or None if unknown.
+    The content is used, not the file extension, so logs in archives and uploads don't need a file name.
+    """
+    head = data[:4096].lstrip(b"\xef\xbb\xbf \t\r\n")
+    if head.startswith(b"<"):
+        if re.search(rb"<(\w+:)?gpx[\s>]", head):
+            return "gpx"
+        if re.search(rb"<(\w+:)?kml[\s>]", head):
+            return "kml"
+        return None
+    if head[:1] == b"A" and re.search(rb"^[HB]", head, re.MULTILINE):
+        return "igc"
+    header = head.split(b"\n", 1)[0].decode("utf-8", errors="replace")
+    keys = {csvHeaderKey(h) for h in re.split(r"[,;\t]", header)}
+    if keys & set(csvColumns["lat"]) and keys & set(csvColumns["lon"]):
+        return "csv"
+    return None
+
+def readFlight(data, name=None):
+    """
+    (bytes, CompressedMember or string, optional: string) -> dictionary
+
+    Inputs:
+    data: Flight log bytes or CompressedMember from iterFlightData(), or a full path to a flight log
+    name: Flight name. Made from the file name if not given (path only)
+
+    Output: dictionary of the flight track. See readGPX(). The track has no points if the format is unknown
+
+    Purpose: Sniffs the format of a flight log (gpx, kml, igc or csv) and parses it into a track
+    """
+    if isinstance(data, str):
+        if name is None:
+            name = flightNameFromFile(data)
+        with open(data, "rb") as f:
+            data = f.read()
+    else:
+        data = flightData(data)
+    if name is None:
+        name = "flight"
+
+    fmt = flightFormat(data)
+    if fmt is None:
+        print("unknown flight log format:", name)
+        return trackArrays(name, [], [], [], [])
+    return flightReaders[fmt](io.BytesIO(data), name)
+
+def readFlightChunk(chunk):
+    #tracks of a chunk of (name, data) in a worker process
+    return [readFlight(data, name) for name, data in chunk]
+
+def readFlights(source, processes=None, chunkSize=20):
+    """
+    (string, optional: int, int) -> generator
+
+    Inputs:
+    source: Full path to a folder of flight logs, a flight log, or a tar/zip archive of them. See iterFlightData()
+    processes: Number of worker processes parsing the logs. os.cpu_count() if not given, 1 parses in this process
+    chunkSize: Number of flights sent to a worker at once
+
+    Output: track of each flight log, in the order of iterFlightData(). The track "file" is the name of its log file
+    (eg. for the list of problem files)
+
+    Purpose: Reads the logs of a source in one sequential pass and parses them, whatever their format, in parallel
+    worker processes. At most 2 chunks per worker are read and not yet parsed, so memory stays bounded on big seasons.
+    """
+    processes = (os.cpu_count() or 1) if processes is None else processes
+    chunks = chunked(iterFlightFiles(source), chunkSize)
+    if processes <= 1:
+        for chunk in chunks:
+            yield from withFileNames([fileName for fileName, name, data in chunk], readFlightChunk([(name, data) for fileName, name, data in chunk]))
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(processes) as pool:
+        pending = collections.deque()
+        for chunk in chunks:
+            #only the file names are kept here, the data goes to the worker
+            pending.append(([fileName for fileName, name, data in chunk], pool.submit(readFlightChunk, [(name, data) for fileName, name, data in chunk])))
+            if len(pending) >= 2*processes:
+                fileNames, result = pending.popleft()
+                yield from withFileNames(fileNames, result.result())
+        while pending:
+            fileNames, result = pending.popleft()
+            yield from withFileNames(fileNames, result.result())
+
+def withFileNames(fileNames, tracks):
+    #tracks of a chunk with the file name of each log
+    for fileName, track in zip(fileNames, tracks):
+        track["file"] = fileName
+        yield track
+
+def chunked(items, size):
+    #lists of size items
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def flightTimeInterval(track):
+    """
+    (dictionary) -> float, float
+
+    Purpose:
+    Returns the time interval between points and the total flight time in seconds, or (None, None) if the
+    track has 0 or 1 points. Same rules as getFlightLinePoints(): the interval is taken from the points recorded
+    halfway through the flight (points 2 and 3 when there are only 2 points) and converted with convert_timedelta.
+    """
+    count = len(track["time"])
+    if count > 2:
+        half = round(count/2)
+        first, second = half - 2, half - 1
+    elif count == 2:
+        first, second = 0, 1
+    else:
+        return None, None
+    if np.isnat(track["time"][first]) or np.isnat(track["time"][second]):
+        #logs without times ie. a kml LineString
+        return None, None
+
+    delta = (track["time"][second] - track["time"][first]).astype("timedelta64[ms]").astype(object)
+    timeInterval = flightPathAnalysis_Names.convert_timedelta(delta)
+    totalFlightTime = (float(count) - 1) * timeInterval
+    return timeInterval, totalFlightTime
+
+def listFlightFiles(gpxFolder):
+    """
+    Purpose: Sorted list of full paths of the flight logs (gpx, kml, igc and csv files) in a folder
+    """
+    return [os.path.join(gpxFolder, f) for f in sorted(os.listdir(gpxFolder)) if f.lower().endswith(flightExtensions)]
+
+def isFlightMember(name):
+    #flight log members of an archive. Skips folders and mac resource files ie. __MACOSX/._flight.gpx
+    base = os.path.basename(name)
+    return name.lower().endswith(flightExtensions) and not base.startswith("._") and not name.startswith("__MACOSX")
+
+
+class CompressedMember:
+    """
+    Purpose: Compressed bytes of a zip member, decompressed by flightData() in the compute worker that parses it.
+
+    Inputs:
+    compressType: zipfile compression constant (ZIP_STORED, ZIP_DEFLATED or ZIP_BZIP2)
+    data: compressed bytes
+    """
+
+    def __init__(self, compressType, data):
+        self.compressType = compressType
+        self.data = data
+
+    def read(self):
+        if self.compressType == zipfile.ZIP_DEFLATED:
+            return zlib.decompress(self.data, -15)
+        if self.compressType == zipfile.ZIP_BZIP2:
+            return bz2.decompress(self.data)
+        return self.data
+
+def flightData(data):
+    #bytes of a flight log from iterFlightData()
+    return data.read() if isinstance(data, CompressedMember) else data
+
+def iterTarMembers(archive):
+    #stream mode: the tar (and its gzip, bz2 or xz stream) is read once from start to end
+    with tarfile.open(archive, "r|*") as tar:
+        for member in tar:
+            if member.isfile() and isFlightMember(member.name):
+                yield member.name, flightNameFromFile(member.name), tar.extractfile(member).read()
+
+def iterZipMembers(archive):
+    #members are read in the order they are stored, so the file is read once from start to end
+    with zipfile.ZipFile(archive) as zf, open(archive, "rb") as f:
+        for info in sorted(zf.infolist(), key=lambda i: i.header_offset):
+            if info.is_dir() or not isFlightMember(info.filename):
+                continue
+            name = flightNameFromFile(info.filename)
+            if info.flag_bits & 0x1 or info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2):
+                #encrypted or lzma members are decompressed here by zipfile
+                yield info.filename, name, zf.read(info)
+                continue
+            #local file header: 30 bytes, then the file name and extra field, then the compressed data
+            f.seek(info.header_offset)
+            header = f.read(30)
+            nameLength, extraLength = struct.unpack("<HH", header[26:30])
+            f.seek(nameLength + extraLength, os.SEEK_CUR)
+            yield info.filename, name, CompressedMember(info.compress_type, f.read(info.compress_size))
+
+def iterFlightData(source):
+    """
+    (string) -> generator
+
+    Inputs:
+    source: Full path to a folder of flight logs, a flight log, or a tar, tar.gz, tgz, tar.bz2 or zip archive of them
+
+    Output: (flight name, data) of each flight log (gpx, kml, igc or csv). data is bytes, or a CompressedMember for zip archives. Use flightData()
+    to get the bytes.
+
+    Purpose: Reads the flight logs of a source without extracting archives to disk. The logs are parsed by readFlight()
+    """
+    for fileName, name, data in iterFlightFiles(source):
+        yield name, data
+
+def iterFlightFiles(source):
+    #(file name, flight name, data) of each flight log of iterFlightData(). The file name is the name in the folder or the archive
+    if os.path.isdir(source):
+        for path in listFlightFiles(source):
+            with open(path, "rb") as f:
+                yield os.path.basename(path), flightNameFromFile(path), f.read()
+    elif zipfile.is_zipfile(source):
+        yield from iterZipMembers(source)
+    elif tarfile.is_tarfile(source):
+        yield from iterTarMembers(source)
+    else:
+        with open(source, "rb") as f:
+            yield os.path.basename(source), flightNameFromFile(source), f.read()
+
+def writeTrackPoints(tracks, totalTimes, outputGDB, name):
+    """
+    (list, list, string, string) -> None
+
+    Inputs:
+    tracks: List of flight tracks. See readGPX()
+    totalTimes: Total flight time (seconds) of each track
+    outputGDB: Full path to the gdb of the feature class
+    name: Name of the point feature class
+
+    Output: WGS 84 point feature class with the Name, Type, DateTimeS, Elevation and DateTime fields of
+    GPXtoFeatures_conversion and the FlightName and TotalTime of each point
+
+    Purpose: Writes the track points of flight logs of any format with one insert cursor, in place of a
+    GPXtoFeatures_conversion per gpx file
+    """
+    import arcpy
+
+    arcpy.env.overwriteOutput = True
+    path = os.path.join(outputGDB, name)
+    arcpy.CreateFeatureclass_management(outputGDB, name, "POINT", has_z="ENABLED", spatial_reference=arcpy.SpatialReference(4326))
+    arcpy.AddFields_management(path, [["Name", "TEXT"], ["Type", "TEXT"], ["DateTimeS", "TEXT"], ["Elevation", "DOUBLE"], ["DateTime", "DATE"],
+                                      ["FlightName", "TEXT"], ["TotalTime", "DOUBLE"]])
+    fields = ["SHAPE@XYZ", "Name", "Type", "DateTimeS", "Elevation", "DateTime", "FlightName", "TotalTime"]
+    with arcpy.da.InsertCursor(path, fields) as cursor:
+        for track, totalTime in zip(tracks, totalTimes):
+            times = track["time"].astype(object).tolist()
+            timeText = np.datetime_as_string(track["time"], unit="s").tolist()
+            for lon, lat, ele, t, text in zip(track["lon"].tolist(), track["lat"].tolist(), track["ele"].tolist(), times, timeText):
+                z = None if ele != ele else ele
+                cursor.insertRow([(lon, lat, z), track["name"], "TRKPT", None if t is None else text + "Z", z, t, track["name"], totalTime])
+    del cursor
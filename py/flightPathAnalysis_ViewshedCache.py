@@ -0,0 +1,278 @@
+### persistent viewshed cache used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# LOS_Analysis() used to reuse the viewshed of a uwr as soon as the uwr id was in the viewshed layer, so a uwr boundary
+# edit, a DEM update or a new maxRange left stale viewsheds. Each cached viewshed now has a key made of:
+# - a checksum of the DEM window it read (window of the biggest buffer of the uwr)
+# - a hash of the uwr geometry (rings and buffer distances of all its zones)
+# - the observer settings and the range (maxRange)
+# A uwr whose key changed is made again, the others are reused. Each entry keeps the fingerprint of the DEM its window
+# checksum was read from, and the window is only read again when that fingerprint differs from the current DEM. Only the
+# uwr whose window checksum changed get a new key, so updating one DEM tile only invalidates the uwr overlapping it
+# (invalidateExtent() does the same without reading).
+# The cache is kept under a size limit by evicting the least recently used uwr that the current run doesn't need.
+# Class: ViewshedCache - json index of the cached viewsheds (keys, windows, sizes, last use)
+# Function: demChecksum, geometryHash, viewshedKey - parts of the key
+# Function: uwrCacheKeys - keys of the uwr of the buffered uwr layer (reads the DEM windows with arcpy)
+# Function: refreshViewshedLayers - deletes the stale uwr from the viewshed layers so makeViewshed() remakes them
+# Function: recordViewshedLayers - adds the new viewsheds to the index and evicts the least recently used ones
+# Function: evictCacheFiles - same size limit for a folder of cache files (lazy viewsheds)
+# update: Oct. 19, 2026 - the DEM fingerprint is kept per entry instead of once for the index, so the uwr left out of a run
+# are checked against a DEM that changed in between
+
+import datetime
+import hashlib
+import os
+import time
+import numpy as np
+
+import flightPathAnalysis_Names
+import flightPathAnalysis_Pipeline
+
+#observer settings of makeViewshed(). Change the version when makeViewshed() changes how the viewsheds are made
+viewshedSettings = {"observers": "generalized uwr vertices and uwr cells higher than the lowest vertex", "observerOffset": 1.0, "version": 1}
+
+
+def demChecksum(array):
+    #checksum of the values of a DEM window. NoData (nan) cells all hash the same
+    array = np.ascontiguousarray(array, dtype="float32")
+    sha = hashlib.sha1(str(array.shape).encode())
+    sha.update(np.where(np.isnan(array), np.float32(-9999), array).tobytes())
+    return sha.hexdigest()
+
+def geometryHash(zones, uwrCode):
+    #hash of the rings and buffer distances of the zones of a uwr, coordinates rounded to the cm
+    sha = hashlib.sha1()
+    for i in np.nonzero(zones.zoneUWR == uwrCode)[0]:
+        sha.update(np.float64(zones.buffDist[i]).tobytes())
+        for ringX, ringY in zones.polygonRings(i):
+            sha.update(np.round(np.column_stack([ringX, ringY]), 2).tobytes())
+    return sha.hexdigest()
+
+def viewshedKey(demSum, geometrySum, settings, maxRange):
+    return flightPathAnalysis_Pipeline.fingerprintValues(demSum, geometrySum, settings, maxRange)
+
+def uwrExtent(zones, uwrCode):
+    #extent of the biggest buffer of a uwr
+    zoneIndexes = np.nonzero(zones.zoneUWR == uwrCode)[0]
+    return [float(zones.bbox[zoneIndexes, 0].min()), float(zones.bbox[zoneIndexes, 1].min()),
+            float(zones.bbox[zoneIndexes, 2].max()), float(zones.bbox[zoneIndexes, 3].max())]
+
+
+class ViewshedCache:
+    """
+    Purpose: Index of the viewsheds kept in the viewshed layers (or in the cache files of flightPathAnalysis_LazyViewshed),
+    saved to a json file.
+
+    Inputs:
+    indexPath: Full path of the json index
+    maxBytes: Size limit of the cache in bytes. No limit if None
+
+    Each entry (one per unique uwr id) has "key", "window" (extent of the DEM window), "demChecksum", "demFingerprint"
+    (fingerprint of the DEM the checksum was read from), "geometryHash", "bytes" (size of the cached viewshed) and
+    "lastUsed" (time.time() of the last run that used it).
+    """
+
+    def __init__(self, indexPath, maxBytes=None):
+        self.indexPath = indexPath
+        self.maxBytes = maxBytes
+        saved = flightPathAnalysis_Pipeline.readJSON(indexPath, {})
+        self.entries = saved.get("entries", {})
+        self.demFingerprint = saved.get("demFingerprint")
+
+    def save(self):
+        flightPathAnalysis_Pipeline.writeJSON({"entries": self.entries, "demFingerprint": self.demFingerprint}, self.indexPath)
+
+    def isValid(self, uwr, key):
+        entry = self.entries.get(uwr)
+        return entry is not None and entry["key"] == key
+
+    def record(self, uwr, key, window, demSum, geometrySum, size):
+        #demFingerprint is the DEM of the last currentKeys(), the keys are recorded from
+        self.entries[uwr] = {"key": key, "window": list(window), "demChecksum": demSum, "demFingerprint": self.demFingerprint,
+                             "geometryHash": geometrySum, "bytes": int(size), "lastUsed": time.time()}
+
+    def touch(self, uwrs):
+        now = time.time()
+        for uwr in uwrs:
+            if uwr in self.entries:
+                self.entries[uwr]["lastUsed"] = now
+
+    def remove(self, uwrs):
+        for uwr in uwrs:
+            self.entries.pop(uwr, None)
+
+    def totalBytes(self):
+        return sum(entry["bytes"] for entry in self.entries.values())
+
+    def invalidateExtent(self, extent):
+        """
+        Purpose: Removes the uwr whose DEM window overlaps extent (xMin, yMin, xMax, yMax), eg. a DEM tile that was
+        replaced. Returns the removed uwr.
+        """
+        removed = [uwr for uwr, entry in self.entries.items()
+                   if entry["window"][0] <= extent[2] and entry["window"][2] >= extent[0] and entry["window"][1] <= extent[3] and entry["window"][3] >= extent[1]]
+        self.remove(removed)
+        return sorted(removed)
+
+    def evict(self, keep=()):
+        """
+        Purpose: Removes the least recently used uwr until the cache is under maxBytes. uwr in keep (needed by the
+        current run) are never evicted. Returns the evicted uwr.
+        """
+        if self.maxBytes is None:
+            return []
+        total = self.totalBytes()
+        evicted = []
+        for uwr in sorted(self.entries, key=lambda u: (self.entries[u]["lastUsed"], u)):
+            if total <= self.maxBytes:
+                break
+            if uwr in keep:
+                continue
+            total -= self.entries[uwr]["bytes"]
+            evicted.append(uwr)
+        self.remove(evicted)
+        return evicted
+
+    def currentKeys(self, zones, demFingerprint, readWindow, maxRange, settings=viewshedSettings):
+        """
+        (UWRZones, string, function, int, optional: dictionary) -> dictionary
+
+        Purpose:
+        Keys of the uwr of zones: {unique uwr id: (key, window, demChecksum, geometryHash)}. readWindow(extent) -> DEM
+        values of a window. DEM windows are only read for uwr that are not in the index, whose geometry changed, or whose
+        entry was checked against another DEM fingerprint. An entry whose window checksum is unchanged is moved to the
+        current fingerprint, so it isn't read again on the next run.
+        """
+        keys = {}
+        for code, uwrKey in enumerate(zones.uwrKeys):
+            uwr = flightPathAnalysis_Names.uwrUniqueID(*uwrKey)
+            window = uwrExtent(zones, code)
+            geometrySum = geometryHash(zones, code)
+            entry = self.entries.get(uwr)
+            if entry is not None and entry.get("demFingerprint") == demFingerprint and entry["geometryHash"] == geometrySum and entry["window"] == window:
+                demSum = entry["demChecksum"]
+            else:
+                demSum = demChecksum(readWindow(window))
+                if entry is not None and entry["demChecksum"] == demSum and entry["window"] == window:
+                    entry["demFingerprint"] = demFingerprint
+            keys[uwr] = (viewshedKey(demSum, geometrySum, settings, maxRange), window, demSum, geometrySum)
+        self.demFingerprint = demFingerprint
+        return keys
+
+
+def uwrCacheKeys(cache, uwrBuffered, DEM, unit_no_Field, unit_no_id_Field, uwr_unique_Field, maxRange, uwrIDs=None):
+    """
+    (ViewshedCache, string, string, string, string, string, int, optional: iterable) -> dictionary
+
+    Purpose: ViewshedCache.currentKeys() of the uwr of the buffered uwr layer (only the uwr in uwrIDs if given), with the
+    DEM windows read with arcpy.
+    """
+    import flightPathAnalysis_Geometry
+
+    query = flightPathAnalysis_Names.uwrSelectionQuery(uwr_unique_Field, uwrIDs) if uwrIDs is not None else None
+    zones = flightPathAnalysis_Geometry.loadUWRZones(uwrBuffered, unit_no_Field, unit_no_id_Field, query)
+    if len(zones) == 0:
+        return {}
+    return cache.currentKeys(zones, flightPathAnalysis_Pipeline.fingerprintDataset(DEM),
+                             lambda extent: flightPathAnalysis_Geometry.loadDEM(DEM, extent).array, maxRange)
+
+def layerBytes(layers, uwr_unique_Field, uwr):
+    #approximate size of the rows of a uwr in the viewshed layers (16 bytes per vertex + 100 per row)
+    import arcpy
+    size = 0
+    for layer in layers:
+        if arcpy.Exists(layer):
+            with arcpy.da.SearchCursor(layer, ["SHAPE@"], flightPathAnalysis_Names.uwrSelectionQuery(uwr_unique_Field, [uwr])) as cursor:
+                for row in cursor:
+                    size += 100 + (16*row[0].pointCount if row[0] is not None else 0)
+            del cursor
+    return size
+
+def deleteUWRRows(layers, uwr_unique_Field, uwrs):
+    #deletes the rows of some uwr from the viewshed layers
+    import arcpy
+    if not uwrs:
+        return
+    for layer in layers:
+        if arcpy.Exists(layer):
+            with arcpy.da.UpdateCursor(layer, [uwr_unique_Field], flightPathAnalysis_Names.uwrSelectionQuery(uwr_unique_Field, sorted(uwrs))) as cursor:
+                for row in cursor:
+                    cursor.deleteRow()
+            del cursor
+
+def refreshViewshedLayers(cache, keys, uwrSet, viewshed, minElevViewshed, uwr_unique_Field):
+    """
+    (ViewshedCache, dictionary, set, string, string, string) -> list
+
+    Purpose:
+    Deletes the uwr of uwrSet whose cached viewshed is stale (key changed) from the viewshed layers, so makeViewshed()
+    makes them again. Returns the stale uwr.
+    Viewsheds made before the cache existed have no entry: they are added to the cache with their current key instead of
+    being made again (use ViewshedCache.invalidateExtent() or delete their rows to remake them).
+    """
+    import arcpy
+
+    inLayers = None
+    for layer in [viewshed, minElevViewshed]:
+        layerUWR = set()
+        if arcpy.Exists(layer):
+            with arcpy.da.SearchCursor(layer, [uwr_unique_Field]) as cursor:
+                layerUWR = {row[0] for row in cursor}
+            del cursor
+        inLayers = layerUWR if inLayers is None else inLayers & layerUWR
+
+    adopted = sorted(uwr for uwr in uwrSet if uwr in keys and uwr in inLayers and uwr not in cache.entries)
+    for uwr in adopted:
+        key, window, demSum, geometrySum = keys[uwr]
+        cache.record(uwr, key, window, demSum, geometrySum, layerBytes([viewshed, minElevViewshed], uwr_unique_Field, uwr))
+    if adopted:
+        print("existing viewsheds added to the cache:", adopted)
+
+    stale = sorted(uwr for uwr in uwrSet if uwr in keys and uwr in cache.entries and not cache.isValid(uwr, keys[uwr][0]))
+    if stale:
+        print("stale viewsheds made again (DEM window, uwr geometry, observer settings or range changed):", stale)
+    deleteUWRRows([viewshed, minElevViewshed], uwr_unique_Field, stale)
+    cache.remove(stale)
+    return stale
+
+def recordViewshedLayers(cache, keys, madeUWR, usedUWR, viewshed, minElevViewshed, uwr_unique_Field):
+    """
+    (ViewshedCache, dictionary, iterable, iterable, string, string, string) -> list
+
+    Purpose: Adds the viewsheds just made to the cache, marks the used ones and evicts the least recently used uwr
+    over the size limit from the viewshed layers. Saves the index. Returns the evicted uwr.
+    """
+    starttime = datetime.datetime.now()
+    for uwr in madeUWR:
+        if uwr in keys:
+            key, window, demSum, geometrySum = keys[uwr]
+            cache.record(uwr, key, window, demSum, geometrySum, layerBytes([viewshed, minElevViewshed], uwr_unique_Field, uwr))
+    cache.touch(usedUWR)
+    evicted = cache.evict(keep=set(usedUWR))
+    deleteUWRRows([viewshed, minElevViewshed], uwr_unique_Field, evicted)
+    cache.save()
+    if evicted:
+        print("evicted viewsheds of", evicted, "to keep the cache under", cache.maxBytes, "bytes")
+    print("Runtime to update the viewshed cache: ", datetime.datetime.now() - starttime)
+    return evicted
+
+def evictCacheFiles(folder, maxBytes, keep=()):
+    """
+    (string, int, optional: iterable) -> list
+
+    Purpose: Deletes the least recently modified files of a cache folder (eg. the per uwr files of
+    flightPathAnalysis_LazyViewshed) until the folder is under maxBytes. Files named in keep are not deleted.
+    Returns the deleted file names.
+    """
+    files = [entry for entry in os.scandir(folder) if entry.is_file()]
+    total = sum(entry.stat().st_size for entry in files)
+    deleted = []
+    for entry in sorted(files, key=lambda e: (e.stat().st_mtime, e.name)):
+        if total <= maxBytes:
+            break
+        if entry.name in keep:
+            continue
+        total -= entry.stat().st_size
+        os.remove(entry.path)
+        deleted.append(entry.name)
+    return deleted
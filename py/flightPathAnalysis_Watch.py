@@ -0,0 +1,276 @@
+### watch folder ingestion mode used in flight path analysis on ungulate winter ranges
+# date: Oct. 19, 2026
+# Watches the folder operators upload gpx logs to. New or modified gpx files are processed as soon as their upload is
+# finished (size and modification time unchanged for settleSeconds) and only those flights go through DEM sampling,
+# uwr zone classification and terrain masking, with the layers kept in memory (flightPathAnalysis_Service.AnalysisService).
+# The season outputs are updated in place: the rows of a processed flight are deleted and written again in the point
+# feature classes and the stats tables. The folder is polled with os.scandir, which costs next to no cpu between uploads.
+# update: Oct. 19, 2026 - kml, igc and csv flight logs are picked up like gpx files (see flightPathAnalysis_Tracks.readFlight())
+# update: Oct. 19, 2026 - the excel files of the stats tables are written again after each update. Flight logs that can't be read
+# are listed in problemGPXFiles.txt and skipped until they change
+# Class: FolderWatcher - watches the folder and updates the season outputs
+
+import datetime
+import numbers
+import os
+import time
+
+import flightPathAnalysis_Geometry
+import flightPathAnalysis_Pipeline
+import flightPathAnalysis_Streaming
+import flightPathAnalysis_Tracks
+
+
+class FolderWatcher:
+    """
+    Purpose: Processes new or modified gpx files of a folder and updates the season outputs of each flight.
+
+    Inputs:
+    gpxFolder: Full path to the folder operators upload gpx files to
+    service: flightPathAnalysis_Service.AnalysisService with the DEM, uwr zones and minElevViewshed loaded
+    outputGDB: GDB of the season outputs
+    allFlightPoint: Name of feature class of all flight points in uwr zones (before terrain masking)
+    LOS_uwrFlightPoints: Name of feature class of the flight points after terrain masking
+    allPointsStats_Name: Name of gdb table of stats of all flight points
+    finalPointsStats_Name: Name of gdb table of stats of the flight points after terrain masking
+    stateFile: json file keeping the size and modification time of the files already processed
+    pollSeconds: Seconds between two scans of the folder
+    settleSeconds: Seconds a file must stay unchanged before it is processed (partial uploads are skipped until then)
+    allPointsStats_Excel, finalPointsStats_Excel: Excel files of the two stats tables, written again after each update. Not
+        written if None
+    problemFile: Text file the names of the files that can't be read or have 0 or 1 points are added to. problemGPXFiles.txt
+        in the folder of stateFile if None
+    LOS_uwrFlightPointsGDB: GDB of the flight points after terrain masking, like the batch run. outputGDB if None
+    """
+
+    def __init__(self, gpxFolder, service, outputGDB, allFlightPoint, LOS_uwrFlightPoints, allPointsStats_Name, finalPointsStats_Name, stateFile, pollSeconds=5, settleSeconds=20,
+                 allPointsStats_Excel=None, finalPointsStats_Excel=None, problemFile=None, LOS_uwrFlightPointsGDB=None):
+        self.gpxFolder = gpxFolder
+        self.service = service
+        self.outputGDB = outputGDB
+        self.allFlightPoint = allFlightPoint
+        self.LOS_uwrFlightPoints = LOS_uwrFlightPoints
+        self.LOS_uwrFlightPointsGDB = LOS_uwrFlightPointsGDB if LOS_uwrFlightPointsGDB is not None else outputGDB
+        self.allPointsStats_Name = allPointsStats_Name
+        self.finalPointsStats_Name = finalPointsStats_Name
+        self.stateFile = stateFile
+        self.pollSeconds = pollSeconds
+        self.settleSeconds = settleSeconds
+        self.allPointsStats_Excel = allPointsStats_Excel
+        self.finalPointsStats_Excel = finalPointsStats_Excel
+        self.problemFile = problemFile if problemFile is not None else os.path.join(os.path.dirname(stateFile), "problemGPXFiles.txt")
+        #file name -> [size, modification time] when it was processed. Files that could not be read are in it too, so
+        #they are skipped until they change
+        self.processed = flightPathAnalysis_Pipeline.readJSON(stateFile, {})
+        #file name -> [size, modification time, time first seen with this size and modification time]
+        self.seen = {}
+
+    def readyFiles(self, now=None):
+        """
+        Purpose: Names of the flight logs (gpx, kml, igc or csv) that are new or modified since they were processed and have not changed for settleSeconds
+        """
+        now = time.time() if now is None else now
+        ready = []
+        current = set()
+        for entry in os.scandir(self.gpxFolder):
+            if not entry.is_file() or not entry.name.lower().endswith(flightPathAnalysis_Tracks.flightExtensions):
+                continue
+            current.add(entry.name)
+            stat = entry.stat()
+            signature = [stat.st_size, stat.st_mtime]
+            if self.processed.get(entry.name) == signature:
+                continue
+            seen = self.seen.get(entry.name)
+            if seen is None or seen[:2] != signature:
+                self.seen[entry.name] = signature + [now]
+            elif now - seen[2] >= self.settleSeconds:
+                ready.append(entry.name)
+        for name in set(self.seen) - current:
+            del self.seen[name]
+        return sorted(ready)
+
+    def processFiles(self, fileNames):
+        """
+        Purpose: Classifies and masks the points of the flights and replaces their rows in the season outputs
+        """
+        starttime = datetime.datetime.now()
+        tracks = []
+        signatures = {}
+        #flight name -> file name
+        flightFiles = {}
+        problemFiles = []
+        for fileName in fileNames:
+            path = os.path.join(self.gpxFolder, fileName)
+            stat = os.stat(path)
+            signatures[fileName] = [stat.st_size, stat.st_mtime]
+            try:
+                track = flightPathAnalysis_Tracks.readFlight(path)
+            except Exception as e: #not a valid flight log. Skipped until it changes
+                print("could not read", fileName, ":", e)
+                problemFiles.append(fileName)
+                continue
+            tracks.append(track)
+            flightFiles[track["name"]] = fileName
+
+        if not tracks:
+            self.saveState(signatures, problemFiles)
+            return
+        service = self.service
+        table, problemFlights = flightPathAnalysis_Geometry.classifyTracks(tracks, service.dem, service.zones, service.IncursionSeverity, service.grid,
+                                                                              membership=True)
+        masked, noViewshed = service.maskPoints(table)
+        flightNames = [t["name"] for t in tracks]
+
+        replaceFlightRows(os.path.join(self.outputGDB, self.allFlightPoint), flightNames)
+        replaceFlightRows(os.path.join(self.LOS_uwrFlightPointsGDB, self.LOS_uwrFlightPoints), flightNames)
+        flightPathAnalysis_Streaming.FeatureClassPointWriter(self.outputGDB, self.allFlightPoint, service.unit_no, service.unit_no_id, append=True)(table.table())
+        flightPathAnalysis_Streaming.FeatureClassPointWriter(self.LOS_uwrFlightPointsGDB, self.LOS_uwrFlightPoints, service.unit_no, service.unit_no_id, append=True)(table.select(~masked).table())
+
+        replaceFlightRows(os.path.join(self.outputGDB, self.allPointsStats_Name), flightNames)
+        replaceFlightRows(os.path.join(self.outputGDB, self.finalPointsStats_Name), flightNames)
+        writeStatistics(table, os.path.join(self.outputGDB, self.allPointsStats_Name), service.unit_no, service.unit_no_id)
+        writeStatistics(table.select(~masked), os.path.join(self.outputGDB, self.finalPointsStats_Name), service.unit_no, service.unit_no_id)
+        for statsName, statsExcel in [(self.allPointsStats_Name, self.allPointsStats_Excel), (self.finalPointsStats_Name, self.finalPointsStats_Excel)]:
+            if statsExcel is not None:
+                writeExcel(os.path.join(self.outputGDB, statsName), statsExcel)
+
+        self.saveState(signatures, problemFiles + [flightFiles[name] for name in problemFlights])
+        if problemFlights:
+            print("flights with 0 or 1 points:", problemFlights)
+        if noViewshed:
+            print("uwr without viewshed, points not masked:", noViewshed)
+        print("Runtime to update season outputs for", flightNames, ":", datetime.datetime.now() - starttime)
+
+    def saveState(self, signatures, problemFiles):
+        #files processed (or unreadable) with their signature, and the problem files added to problemFile
+        self.processed.update(signatures)
+        flightPathAnalysis_Pipeline.writeJSON(self.processed, self.stateFile)
+        if problemFiles:
+            with open(self.problemFile, "a") as problemGPXText:
+                for fileName in problemFiles:
+                    problemGPXText.write(fileName + "\n")
+
+    def watch(self, maxPolls=None):
+        """
+        Purpose: Polls the folder and processes the ready files until the process is stopped (or maxPolls scans are done)
+        """
+        print("watching", self.gpxFolder, "for flight logs")
+        polls = 0
+        while maxPolls is None or polls < maxPolls:
+            ready = self.readyFiles()
+            if ready:
+                self.processFiles(ready)
+                for name in ready:
+                    self.seen.pop(name, None)
+            polls += 1
+            time.sleep(self.pollSeconds)
+
+def replaceFlightRows(path, flightNames):
+    """
+    Purpose: Deletes the rows of the flights from a feature class or table, if it exists, so the flights can be written again
+    """
+    import arcpy
+    if not arcpy.Exists(path) or not flightNames:
+        return
+    #quotes in the flight names are doubled for the sql string literals
+    query = "FlightName in ('" + "','".join(name.replace("'", "''") for name in flightNames) + "')"
+    with arcpy.da.UpdateCursor(path, ["FlightName"], query) as cursor:
+        for row in cursor:
+            cursor.deleteRow()
+    del cursor
+
+def writeExcel(statsFullPath, statsExcel):
+    #replaces the excel file of a stats table
+    import arcpy
+    try:
+        os.remove(statsExcel)
+    except:
+        pass
+    arcpy.TableToExcel_conversion(statsFullPath, statsExcel)
+
+def writeStatistics(table, statsFullPath, unit_no, unit_no_id):
+    """
+    (PointTable, string, string, string) -> None
+
+    Purpose: Adds the time in zone stats of the points of a table to a gdb table with the same fields as the
+    Statistics_analysis table of flightPathAnalysis_uwr.pointStatistics(). The table is made if it doesn't exist.
+    """
+    insertStatistics(table.statistics(("flight", "heightRange", "severity", "uwr")), table, statsFullPath, unit_no, unit_no_id)
+
+def uwrFieldType(value):
+    #field type of a uwr field made from one of its values
+    if isinstance(value, bool) or not isinstance(value, numbers.Real):
+        return "TEXT"
+    return "LONG" if isinstance(value, numbers.Integral) else "DOUBLE"
+
+def insertStatistics(stats, table, statsFullPath, unit_no, unit_no_id):
+    """
+    (dictionary, PointTable, string, string, string) -> None
+
+    Purpose: Adds stats grouped by flight, height range, severity and uwr (see PointTable.statistics()) to the gdb table.
+    table gives the dictionaries of the codes. The table is made if it doesn't exist. The uwr values are inserted as they
+    are in the buffered uwr, like the pointStatistics() tables
+    """
+    import arcpy
+
+    statsFields = ["FlightName", "HeightRange", "BUFF_DIST", unit_no, unit_no_id, "TotalTime", "IncursionSeverity", "FREQUENCY", "SUM_TimeInterval"]
+    if not arcpy.Exists(statsFullPath):
+        arcpy.CreateTable_management(os.path.dirname(statsFullPath), os.path.basename(statsFullPath))
+        uwrKey = table.uwrKeys[0] if table.uwrKeys else ("", "")
+        arcpy.AddFields_management(statsFullPath, [
+            ["FlightName", "TEXT"], ["HeightRange", "TEXT"], ["BUFF_DIST", "DOUBLE"], [unit_no, uwrFieldType(uwrKey[0])], [unit_no_id, uwrFieldType(uwrKey[1])],
+            ["TotalTime", "DOUBLE"], ["IncursionSeverity", "TEXT"], ["FREQUENCY", "LONG"], ["SUM_TimeInterval", "DOUBLE"]])
+
+    with arcpy.da.InsertCursor(statsFullPath, statsFields) as cursor:
+        for i in range(len(stats["FREQUENCY"])):
+            flight = stats["flight"][i]
+            severity = table.severities[stats["severity"][i]]
+            uwrKey = table.uwrKeys[stats["uwr"][i]]
+            cursor.insertRow([table.flightNames[flight], table.heightRanges[stats["heightRange"][i]], severity[0],
+                              uwrKey[0], uwrKey[1], float(table.flightTotalTime[flight]), severity[1],
+                              int(stats["FREQUENCY"][i]), float(stats["SUM_TimeInterval"][i])])
+    del cursor
+
+
+def main():
+    import flightPathAnalysis_Service
+
+    #folder operators upload the gpx files to
+    gpxFolder = r"W:\srm\sry\Local\projlib\StewBase\Mountain_Goat\data\work\gpxSample"
+
+    #raster DEM input
+    DEM = r"W:\srm\sry\Local\projlib\StewBase\Mountain_Goat\FlightLine_UWR_Analysis\test_May15\Input.gdb\bc_elevation_25m_bcalb_Clip2"
+
+    #feature class of buffered uwr. output of flightPathAnalysis_Functions.createUWRBuffer()
+    uwrBuffered = r"W:\srm\sry\Local\projlib\StewBase\Mountain_Goat\FlightLine_UWR_Analysis\testAllSkeena\testInputAll.gdb\tuwra_u6002_BufferFinal"
+
+    #agl viewshed feature class
+    minElevViewshed = r"W:\srm\sry\Local\projlib\StewBase\Mountain_Goat\FlightLine_UWR_Analysis\20200915\Output_20200915.gdb\minElevViewshed20200515"
+
+    #unit number field eg. u-2-002
+    unit_no = "TUWR_TAG"
+
+    #unit number id field eg. TO 60
+    unit_no_id = "UNIT_NO"
+
+    #uwr uniqud id field - field that combines uwr number and uwr unit number
+    uwr_unique_Field = "uwr_unique_id"
+
+    #buffer distance and incursion severity category
+    IncursionSeverity = {0: "In UWR", 500: "High", 1000: "Moderate", 1500: "Low"}
+
+    #GDB of the season outputs
+    outputGDB = r"W:\srm\sry\Local\projlib\StewBase\Mountain_Goat\FlightLine_UWR_Analysis\20200915\Output_20200915.gdb"
+
+    #folder to put the state of the watcher
+    generalFolder = r"W:\srm\sry\Local\projlib\StewBase\Mountain_Goat\FlightLine_UWR_Analysis\20200915"
+
+    service = flightPathAnalysis_Service.AnalysisService(DEM, uwrBuffered, minElevViewshed, unit_no, unit_no_id, uwr_unique_Field, IncursionSeverity)
+    watcher = FolderWatcher(gpxFolder, service, outputGDB, "allFlightPoint", "FlightPoint_TerrainMasked", "PointsGeneralStat_Stats",
+                            "PointsGeneralStat_TerrainMasked_Stats", os.path.join(generalFolder, "watchState.json"),
+                            allPointsStats_Excel=os.path.join(generalFolder, "PointsGeneralStat_Stats.xlsx"),
+                            finalPointsStats_Excel=os.path.join(generalFolder, "PointsGeneralStat_TerrainMasked_Stats.xlsx"))
+    watcher.watch()
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,28 @@
 # - gdb table and excel table with time stats of points after terrain masking (LOS analysis)
 # update: March 2, 2020 - added additional field for uwr number 
 # udpate: June 15, 2020 - added new variable bufferDistList
+# update: Oct. 19, 2026 - main() runs the stages through flightPathAnalysis_Pipeline.PipelineRunner. Each stage is checkpointed
+# in checkpointFolder and a rerun resumes from the first stale or failed stage
+# update: Oct. 19, 2026 - the point output is written once. The Below500m_<severity> feature classes are now views of it
+# (see flightPathAnalysis_Output)
+# update: Oct. 19, 2026 - the flight lines are built from the track arrays and written once, already projected, instead of
+# PointsToLine for each flight, a merge and a projection (see flightPathAnalysis_FlightLines)
+# update: Oct. 19, 2026 - the stages of main() are run by runAnalysis(config) so runs can also be described by config files
+# (see flightPathAnalysis_CLI and flightPathAnalysis_Config). Removed the unused pandas import
+# update: Oct. 19, 2026 - the points, segments and stats can also be published as Arrow IPC files for the R package and the
+# Shiny app (arrowFolder, see flightPathAnalysis_Arrow)
+# update: Oct. 19, 2026 - the Arrow points of a run can be added to a results store of all seasons (resultsStoreFolder, see
+# flightPathAnalysis_ResultsStore)
+# update: Oct. 19, 2026 - the lazy viewsheds can be computed coarse to fine on a DEM pyramid (viewshedPyramid, see
+# flightPathAnalysis_Pyramid)
+# update: Oct. 19, 2026 - gpxFolder can mix gpx, kml, igc and csv flight logs. Each log is parsed once into track arrays (in
+# parallel, see flightPathAnalysis_Tracks.readFlights()) and the points are written per time interval, instead of a
+# GPXtoFeatures_conversion, a feature class and two cursors per gpx file
+# update: Oct. 19, 2026 - getFlightLinePoints reads the flight logs a chunk of flights at a time (chunkSize) and writes the
+# points and flight lines of each chunk, so the tracks of the whole season are never in memory. problemGPXFiles.txt lists
+# the flight log files again, not the flight names
+# update: Oct. 19, 2026 - the uwr zones, DEM window, zone grid and minElevViewshed can be packed into an analysis bundle that
+# workers memory-map (analysisBundle, see flightPathAnalysis_Bundle). The streaming mode opens it when it is current
 
 import arcpy
 import os
@@ -19,17 +41,94 @@ import datetime
 import time
 #from statistics import median
 import tempfile
-import pandas as pd
-from arcpy.sa import *
+import arcpy.sa
 
+import flightPathAnalysis_Arrow
+import flightPathAnalysis_Bundle
+import flightPathAnalysis_FlightLines
 import flightPathAnalysis_Functions
+import flightPathAnalysis_LazyViewshed
+import flightPathAnalysis_OutOfCore
+import flightPathAnalysis_Output
+import flightPathAnalysis_Pipeline
+import flightPathAnalysis_ResultsStore
+import flightPathAnalysis_Sharding
+import flightPathAnalysis_Streaming
+import flightPathAnalysis_Sweep
+import flightPathAnalysis_Tracks
+
+def lowFlightPoints(tracks, totalTimes, timeInterval, DEM, tempgdbUnprojectedPath, name):
+    """
+    (list, list, float, string, string, string) -> string
+
+    Inputs:
+    tracks: Flight tracks with the same time interval. See flightPathAnalysis_Tracks.readFlights()
+    totalTimes: Total flight time (seconds) of each track
+    timeInterval: Time interval (seconds) between the points of the tracks
+    DEM: Full path to raster DEM input
+    tempgdbUnprojectedPath: Full path to the temp gdb for the unprojected points
+    name: Name prefix of the feature classes
+
+    Output: Full path to the WGS 84 feature class of the points below 500m AGL with their AGL and TimeInterval. None if
+    no point is below 500m
+
+    Purpose: Points of getFlightLinePoints() below 500m AGL for the tracks of one time interval
+    """
+    arcpy.env.workspace = tempgdbUnprojectedPath
+    arcpy.env.overwriteOutput = True
+
+    #write all points with same time interval together - WGS 84
+    fcAllUnprojected = tempgdbUnprojectedPath + "\\" + name + "_All_Unprojected"
+    flightPathAnalysis_Tracks.writeTrackPoints(tracks, totalTimes, tempgdbUnprojectedPath, name + "_All_Unprojected")
+    print("wrote all points for", name)
+
+    #add fields
+    arcpy.AddField_management(fcAllUnprojected, "AGL", "LONG")
+
+    #turn on spatial analyst extension
+    arcpy.CheckOutExtension("Spatial")
+
+    #extract DEM
+    arcpy.sa.ExtractMultiValuesToPoints(fcAllUnprojected, [[DEM, "DEMElev"]])
+
+    #turn off spatial analyst extension
+    arcpy.CheckInExtension("Spatial")
 
-def getFlightLinePoints(gpxFolder, outputGDB, finalFlightLineName, finalFlightPointName, DEM, unit_no, unit_no_id, uwrBuffered, IncursionSeverity, generalFolder):
+    #calculate AGL
+    with arcpy.da.UpdateCursor(fcAllUnprojected, ["Elevation", "DEMElev", "AGL"]) as cursor:
+        for row in cursor:
+            row[2] = row[0] - row[1]
+            if row[2] < 0:
+                row[2] = 0
+            cursor.updateRow(row)
+    del cursor
+
+    #made fc with only points less than 500m
+    Points_lessthan500Height_Unprojected = "Points_lessthan500Height_Unprojected_" + name
+    arcpy.FeatureClassToFeatureClass_conversion (fcAllUnprojected, tempgdbUnprojectedPath, Points_lessthan500Height_Unprojected, "AGL < 500")
+
+    #if table is empty ie. no points less than 500m elevation, nothing to add
+    rowCount = arcpy.GetCount_management(os.path.join(tempgdbUnprojectedPath, Points_lessthan500Height_Unprojected))
+    if int(rowCount[0]) == 0:
+        return None
+
+    #add time interval field
+    arcpy.AddField_management (os.path.join(tempgdbUnprojectedPath, Points_lessthan500Height_Unprojected), "TimeInterval", "DOUBLE")
+    with arcpy.da.UpdateCursor(os.path.join(tempgdbUnprojectedPath, Points_lessthan500Height_Unprojected), "TimeInterval") as cursor:
+        for row in cursor:
+            row[0] = timeInterval
+            cursor.updateRow(row)
+    del cursor
+
+    return os.path.join(tempgdbUnprojectedPath, Points_lessthan500Height_Unprojected)
+
+
+def getFlightLinePoints(gpxFolder, outputGDB, finalFlightLineName, finalFlightPointName, DEM, unit_no, unit_no_id, uwrBuffered, IncursionSeverity, generalFolder, flightLineSegments=False, arrowFolder=None, chunkSize=500):
     """
-    (string, string, string, string, string, string, dictionary, string) -> None
+    (string, string, string, string, string, string, dictionary, string, optional: boolean, string, int) -> None
 
     Inputs:
-    gpxFolder: Full path to folder with the gpx files input
+    gpxFolder: Full path to folder with the flight logs input (gpx, kml, igc or csv, can be mixed), or a tar/zip archive of them
     outputGDB: Full path to GDB to put all the output feature classes
     finalFlightLineName: Name of output feature class for all flight lines
     finalFlightPointName: Name of output feature class for allflight points
@@ -39,11 +138,15 @@ def getFlightLinePoints(gpxFolder, outputGDB, finalFlightLineName, finalFlightPo
     uwrBuffered: Full path to feature class of buffered uwr. output of flightPathAnalysis_Functions.createUWRBuffer()
     IncursionSeverity: Dictionary of buffer distance and incursion severity category ie. {500: "High", 1000: "Moderate}
     generalFolder: Full path to folder for error handling documents ie. excel/text files
+    flightLineSegments: Make the flight lines one feature per segment with its start time, duration and AGL
+        (see flightPathAnalysis_FlightLines.writeFlightLines()) instead of one feature per flight
+    arrowFolder: Optional folder to also write the flight segments to segments.arrow (see flightPathAnalysis_Arrow)
+    chunkSize: Number of flights read and processed at once. Only the tracks of one chunk are kept in memory
 
     Output:
     - feature class with all flight paths
     - feature class with all flight points with corresponding uwr, incursion severity, time in seconds it represents, and total time for that flight
-    - (potential) text file with list of gpx files that have 0 or 1 flight points
+    - (potential) text file with list of flight log files that have 0 or 1 flight points (or no times)
 
     Purpose: 
     > Make a single feature class with all flight paths in the folder of gpx flight path files.
@@ -67,24 +170,13 @@ def getFlightLinePoints(gpxFolder, outputGDB, finalFlightLineName, finalFlightPo
         print(tempgdbUnprojectedPath)
         arcpy.CreateFileGDB_management (temp_location, tempgdbName)
 
-        # tmpdrive = 'T:'
-        tempgdbRawPointsName = str(gdbName) + "_Raw.gdb"
-        tempgdbRawPointsPath = os.path.join(temp_location, tempgdbRawPointsName)
-        if not arcpy.Exists(tempgdbRawPointsPath):
-            arcpy.CreateFileGDB_management (temp_location, tempgdbRawPointsName)
-
-        # make tempgdb for individual flight lines
-        tempgdbFlightLineName = str(gdbName) + "_FlightLine.gdb"
-        tempgdbFlightLinePath = os.path.join(temp_location, tempgdbFlightLineName)
-
-        if not arcpy.Exists(tempgdbFlightLinePath):
-            arcpy.CreateFileGDB_management (temp_location, tempgdbFlightLineName)
-
-        #dictionary of different time intervals and the flight points in each
-        timeIntervalDict = {}
+        tempgdbUnprojectedName = str(gdbName) + "_Unprojected.gdb"
+        tempgdbUnprojectedPath = temp_location + "\\" + tempgdbUnprojectedName
+        if not arcpy.Exists(tempgdbUnprojectedPath):
+            arcpy.CreateFileGDB_management (temp_location, tempgdbUnprojectedName)
 
-        #list of flight lines
-        flightLines = []
+        #time interval and number of flights of each time interval
+        timeIntervalCounts = {}
 
         #count of flight lines
         flightCount = 0
@@ -92,69 +184,45 @@ def getFlightLinePoints(gpxFolder, outputGDB, finalFlightLineName, finalFlightPo
         #total flight time in the season
         totalSeasonTime = 0
 
-        #list of fc to check
+        #list of flight log files to check
         checkFilesList = []
 
-        #converts all gpx files into fc
-        for gpx in os.listdir(gpxFolder):
-            if gpx.endswith(".gpx"):
-                flightCount += 1
-                #getting rid of non alphanumeric
-                gpxFormattedName = flightPathAnalysis_Functions.replaceNonAlphaNum(gpx, "_")
-                fcRawName = gpxFormattedName[:gpxFormattedName.find("_gpx")]
-
-                fc = tempgdbRawPointsPath + "\\fc" + fcRawName
-                print(fc)
-            
-                arcpy.env.workspace = tempgdbRawPointsPath
-                arcpy.env.overwriteOutput = True
-
-                arcpy.GPXtoFeatures_conversion(gpxFolder + "\\" + gpx, fc)
-
-                #checks for files with consistent time intervals. All fc with same time intervals are grouped together in the dictionary
-                # if there are more than 2 rows, find time between point recorded halfway through the flight and the point recorded right before it. else,time for objectid 3 - objectid 2 because there was an instance where there were 4 minutes between id 1 and 2.
-                # assume only seconds between them the two points
-                rowCount = arcpy.GetCount_management (fc)
-
-                if int(rowCount[0]) > 2:
-
-                    half = round(int(rowCount[0])/2)
-                    sel = (half-1, half)
-
-                    query = "OBJECTID in " + str(sel)
-                    values = [f[0] for f in arcpy.da.SearchCursor(fc, "DateTime", query)]
-                    timeInterval = flightPathAnalysis_Functions.convert_timedelta(values[1] - values[0])
+        unprojectedFC = []
 
-                elif int(rowCount[0]) == 2:
-                    query = "OBJECTID in (1,2)"
-                    values = [f[0] for f in arcpy.da.SearchCursor(fc, "DateTime", query)]
-                    timeInterval = flightPathAnalysis_Functions.convert_timedelta(values[1] - values[0])
-                
-                else:
-                    checkFilesList.append(gpx)
+        #the flight lines are written a chunk at a time, the first chunk makes the feature class
+        linesWritten = False
+        segmentWriter = None
+        if arrowFolder is not None:
+            if not os.path.exists(arrowFolder):
+                os.makedirs(arrowFolder)
+            segmentWriter = flightPathAnalysis_Arrow.ArrowSegmentWriter(os.path.join(arrowFolder, "segments.arrow"))
+
+        #reads all flight logs (gpx, kml, igc or csv, see flightPathAnalysis_Tracks.readFlight()) in one pass, parsed in parallel.
+        # Only the tracks of one chunk of flights are kept in memory
+        for chunkNumber, chunk in enumerate(flightPathAnalysis_Tracks.chunked(flightPathAnalysis_Tracks.readFlights(gpxFolder), chunkSize)):
+            #dictionary of different time intervals and the flight tracks of the chunk in each
+            timeIntervalDict = {}
+
+            #tracks of the flight lines (see flightPathAnalysis_FlightLines) and their total time
+            flightTracks = []
+            flightTotalTimes = []
+
+            for track in chunk:
+                flightCount += 1
+                fcRawName = track["name"]
+                print(fcRawName)
+
+                #checks for flights with consistent time intervals. All flights with same time intervals are grouped together in the dictionary
+                # if there are more than 2 points, find time between point recorded halfway through the flight and the point recorded right before it. else,time for point 2 - point 1
+                # assume only seconds between them the two points (see flightPathAnalysis_Tracks.flightTimeInterval())
+                timeInterval, totalFlightTime = flightPathAnalysis_Tracks.flightTimeInterval(track)
+                if timeInterval is None:
+                    checkFilesList.append(track["file"])
                     continue
 
-                #count number of points
-                rowCount = arcpy.GetCount_management (fc)
-                totalFlightTime = (float(rowCount[0])-1) * timeInterval
-
-                #add unique flight ID and total time
-                arcpy.AddField_management (fc, "FlightName", "TEXT")
-                arcpy.AddField_management (fc, "TotalTime", "DOUBLE")
-                with arcpy.da.UpdateCursor(fc, ["FlightName", "TotalTime"]) as cursor:
-                    for row in cursor:
-                        row[0] = fcRawName
-                        row[1] = totalFlightTime
-                        cursor.updateRow(row)
-                del cursor
-
-                arcpy.env.workspace = tempgdbFlightLinePath
-                arcpy.env.overwriteOutput = True
-
-                #make flight line
-                indFlightLinePath = tempgdbFlightLinePath + "\\Line_" + fcRawName
-                arcpy.PointsToLine_management (fc, indFlightLinePath)
-                flightLines.append(indFlightLinePath)
+                #keep the track for the flight points and the flight line
+                flightTracks.append(track)
+                flightTotalTimes.append(totalFlightTime)
 
                 #get season time sum
                 totalSeasonTime += totalFlightTime
@@ -162,9 +230,39 @@ def getFlightLinePoints(gpxFolder, outputGDB, finalFlightLineName, finalFlightPo
                 timeIntervalStr = "T" + flightPathAnalysis_Functions.replaceNonAlphaNum(str(timeInterval), "_")
 
                 if timeIntervalStr not in timeIntervalDict:
-                    timeIntervalDict[timeIntervalStr] = [timeInterval, [fc]]
+                    timeIntervalDict[timeIntervalStr] = [timeInterval, [track], [totalFlightTime]]
                 else:
-                    timeIntervalDict[timeIntervalStr][1].append(fc)
+                    timeIntervalDict[timeIntervalStr][1].append(track)
+                    timeIntervalDict[timeIntervalStr][2].append(totalFlightTime)
+                timeIntervalCounts[timeIntervalStr] = [timeInterval, timeIntervalCounts.get(timeIntervalStr, [None, 0])[1] + 1]
+
+            currenttime = datetime.datetime.now()
+            for interval in timeIntervalDict:
+                lowPoints = lowFlightPoints(timeIntervalDict[interval][1], timeIntervalDict[interval][2], timeIntervalDict[interval][0], DEM,
+                                            tempgdbUnprojectedPath, interval + "_C" + str(chunkNumber))
+                if lowPoints is not None:
+                    #add to list of unprojected flight points
+                    unprojectedFC.append(lowPoints)
+            print("Runtime find points lower than 500m for chunk", chunkNumber, ":", datetime.datetime.now() - currenttime)
+
+            currenttime = datetime.datetime.now()
+            #flight lines made from the track arrays and added to the feature class in outputgdb, already projected
+            flightLines = flightPathAnalysis_FlightLines.buildFlightLines(flightTracks)[0]
+            if (flightLineSegments or arrowFolder is not None) and len(flightLines):
+                #one DEM tile at a time, the flights can spread far past the uwr
+                flightLines.sampleAGL(DEM)
+            flightPathAnalysis_FlightLines.writeFlightLines(flightLines, outputGDB, finalFlightLineName, flightLineSegments, flightTotalTimes, linesWritten)
+            linesWritten = True
+            if segmentWriter is not None:
+                segmentWriter(flightLines)
+            print("Runtime to make flight lines for chunk", chunkNumber, ":", datetime.datetime.now() - currenttime)
+
+        if not linesWritten:
+            #no flight logs, the flight line feature class is still made
+            flightPathAnalysis_FlightLines.writeFlightLines(flightPathAnalysis_FlightLines.buildFlightLines([])[0], outputGDB, finalFlightLineName, flightLineSegments)
+        if segmentWriter is not None:
+            segmentCount = segmentWriter.close()
+            flightPathAnalysis_Arrow.writeSeasonIndex(arrowFolder, {"segments.arrow": ("segments", segmentCount)})
 
         if len(checkFilesList) > 0:
             problemGPXText = open(os.path.join(generalFolder, "problemGPXFiles.txt"), "w")
@@ -172,73 +270,12 @@ def getFlightLinePoints(gpxFolder, outputGDB, finalFlightLineName, finalFlightPo
                 problemGPXText.write(i + "\n")
             problemGPXText.close()
 
-        print("Runtime to convert gpx to features: ", datetime.datetime.now() - starttime)
+        print("Runtime to read flight logs, find points lower than 500m and make flight lines: ", datetime.datetime.now() - starttime)
         print("total season time in seconds:", totalSeasonTime)
         print("Total flight lines:", flightCount)
 
-        print(flightLines)
-        print(timeIntervalDict)
-        print("number of different time intervals:" , len(timeIntervalDict))
-
-        tempgdbUnprojectedName = str(gdbName) + "_Unprojected.gdb"
-        tempgdbUnprojectedPath = temp_location + "\\" + tempgdbUnprojectedName
-        if not arcpy.Exists(tempgdbUnprojectedPath):
-            arcpy.CreateFileGDB_management (temp_location, tempgdbUnprojectedName)
-
-        unprojectedFC = []
-
-        currenttime = datetime.datetime.now()
-        for interval in timeIntervalDict:
-            arcpy.env.workspace = tempgdbUnprojectedPath
-            arcpy.env.overwriteOutput = True
-
-            #merge all points with same time interval together - WGS 84
-            fcAllUnprojected = tempgdbUnprojectedPath + "\\" + interval + "_All_Unprojected"
-            arcpy.Merge_management(timeIntervalDict[interval][1], fcAllUnprojected)
-            print("merged all fc for", interval)
-            
-            #add fields
-            arcpy.AddField_management(fcAllUnprojected, "AGL", "LONG")
-
-            #turn on spatial analyst extension
-            arcpy.CheckOutExtension("Spatial")
-
-            #extract DEM
-            arcpy.sa.ExtractMultiValuesToPoints(fcAllUnprojected, [[DEM, "DEMElev"]])
-
-            #turn off spatial analyst extension
-            arcpy.CheckInExtension("Spatial")
-
-            #calculate AGL
-            with arcpy.da.UpdateCursor(fcAllUnprojected, ["Elevation", "DEMElev", "AGL"]) as cursor:
-                for row in cursor:
-                    row[2] = row[0] - row[1]
-                    if row[2] < 0:
-                        row[2] = 0
-                    cursor.updateRow(row)
-            del cursor
-
-            #made fc with only points less than 500m
-            Points_lessthan500Height_Unprojected = "Points_lessthan500Height_Unprojected_" + interval
-            arcpy.FeatureClassToFeatureClass_conversion (fcAllUnprojected, tempgdbUnprojectedPath, Points_lessthan500Height_Unprojected, "AGL < 500")
-
-            #if table is empty ie. no points less than 500m elevation, move to the next flight
-            rowCount = arcpy.GetCount_management(os.path.join(tempgdbUnprojectedPath, Points_lessthan500Height_Unprojected))
-            if int(rowCount[0]) == 0:
-                continue
-
-            #add time interval field
-            arcpy.AddField_management (os.path.join(tempgdbUnprojectedPath, Points_lessthan500Height_Unprojected), "TimeInterval", "DOUBLE")
-            with arcpy.da.UpdateCursor(os.path.join(tempgdbUnprojectedPath, Points_lessthan500Height_Unprojected), "TimeInterval") as cursor:
-                for row in cursor:
-                    row[0] = timeIntervalDict[interval][0]
-                    cursor.updateRow(row)
-            del cursor
-
-            #add to list of unprojected flight points
-            unprojectedFC.append(os.path.join(tempgdbUnprojectedPath, Points_lessthan500Height_Unprojected))
-
-        print("Runtime find points lower than 500m for each flight line: ", datetime.datetime.now() - currenttime)
+        print(timeIntervalCounts)
+        print("number of different time intervals:" , len(timeIntervalCounts))
         print(unprojectedFC)
 
         #merge unprojected flight points <500m AGL
@@ -247,10 +284,6 @@ def getFlightLinePoints(gpxFolder, outputGDB, finalFlightLineName, finalFlightPo
         arcpy.Merge_management(unprojectedFC, Points_lessthan500Height_Unprojected_Final)
         print("Runtime to merge all points: ", datetime.datetime.now() - currenttime)
 
-        #merge all unprojected flight lines
-        allFlightLinesUnprojected = os.path.join(tempgdbUnprojectedPath, "allFlightLinesUnprojected")
-        arcpy.Merge_management(flightLines, allFlightLinesUnprojected)
-
         tempgdbProjectedName = str(gdbName) + "_Projected.gdb"
         tempgdbProjectedPath = temp_location + "\\" + tempgdbProjectedName
         if not arcpy.Exists(tempgdbProjectedPath):
@@ -321,17 +354,6 @@ def getFlightLinePoints(gpxFolder, outputGDB, finalFlightLineName, finalFlightPo
         arcpy.env.workspace = outputGDB
         arcpy.env.overwriteOutput = True
 
-        currenttime = datetime.datetime.now()
-        #project flight lines to outputgdb
-        allFlightLinesProjected = os.path.join(outputGDB, finalFlightLineName)
-        arcpy.Project_management(
-            allFlightLinesUnprojected,
-            allFlightLinesProjected,
-            sr,
-            "WGS_1984_(ITRF00)_To_NAD_1983"
-        )
-        print("Runtime to project flight lines to bc albers: ", datetime.datetime.now() - currenttime)
-
         #if table is empty ie. no points within uwr buffer zones, no need to get a table
         print(Points_lessthan500Height_uwrbuffer)
         rowCount = arcpy.GetCount_management(Points_lessthan500Height_uwrbuffer)
@@ -346,24 +368,47 @@ def getFlightLinePoints(gpxFolder, outputGDB, finalFlightLineName, finalFlightPo
                 cursor.updateRow(row)
         del cursor
 
-        # split points of each incursion severity into different feature classes
-        for severity in IncursionSeverity:
-            name = "Below500m_" + str(severity)
-            arcpy.FeatureClassToFeatureClass_conversion(Points_lessthan500Height_uwrbuffer, outputGDB, name, "IncursionSeverity = '" + str(IncursionSeverity[severity]) + "'")
-            print("Made separate feature class for", IncursionSeverity[severity], "incursion points")
-
-        #copy final fc to outputgdb
+        #write final fc to outputgdb once, sorted so the points of each incursion severity are together
         currenttime = datetime.datetime.now()
-        arcpy.FeatureClassToFeatureClass_conversion(Points_lessthan500Height_uwrbuffer, outputGDB, finalFlightPointName)
+        arcpy.Sort_management(Points_lessthan500Height_uwrbuffer, os.path.join(outputGDB, finalFlightPointName), [["IncursionSeverity", "ASCENDING"]])
         print("Runtime to copy Points_lessthan500Height_uwrbuffer: ", datetime.datetime.now() - currenttime)
 
+        # indexes and a view of the points of each incursion severity instead of a copy of each
+        flightPathAnalysis_Output.addSeverityViews(os.path.join(outputGDB, finalFlightPointName), IncursionSeverity)
+
         print("Final point file saved at", Points_lessthan500Height_uwrbuffer)
         print("Runtime to get all points: ", datetime.datetime.now() - starttime)
         time.sleep(10)
 
 
+def pointStatistics(flightPoints, statsFullPath, statsExcel, unit_no, unit_no_id):
+    """
+    (string, string, string, string, string) -> None
+
+    Inputs:
+    flightPoints: Full path to feature class of flight points. output of getFlightLinePoints() or LOS_Analysis()
+    statsFullPath: Full path to gdb table for the stats
+    statsExcel: Full path to excel file for the stats
+    unit_no: field for unit number (eg. u-2-002)
+    unit_no_id: field for unit number id (eg. TO 32)
+
+    Purpose: Sum of the time of the flight points for each flight, height range, buffer distance and uwr
+    Note: frequency table cannot be made in datasets
+    """
+    arcpy.env.workspace = os.path.dirname(statsFullPath)
+    arcpy.env.overwriteOutput = True
+
+    currenttime = datetime.datetime.now()
+    arcpy.Statistics_analysis (flightPoints, statsFullPath, [["TimeInterval", "SUM"]], ["FlightName", "HeightRange", "BUFF_DIST", unit_no, unit_no_id, "TotalTime", "IncursionSeverity"])
+    try:
+        os.remove(statsExcel)
+    except:
+        pass
+    arcpy.TableToExcel_conversion(statsFullPath, statsExcel)
+    print("Runtime to calculate stats for", flightPoints, ":", datetime.datetime.now() - currenttime)
+
 def main():
-    #folder with the gpx files input
+    #folder with the flight logs input (gpx, kml, igc or csv, can be mixed)
     #gpxFolder = r"W:\srm\sry\Local\projlib\StewBase\Mountain_Goat\FlightLine_UWR_Analysis\test_20200225\sampleGPXFlights"
     gpxFolder = r"W:\srm\sry\Local\projlib\StewBase\Mountain_Goat\data\work\gpxSample"
 
@@ -415,6 +460,9 @@ def main():
     #name of feature class for the output flight line of getFlightLinePoints()
     outputFlightLineName = "FlightLineSkeenaAll_20200915"
 
+    #make the flight lines one feature per segment (two consecutive points) with its start time, duration and AGL
+    flightLineSegments = False
+
     #name of feature class for the output flight points of getFlightLinePoints() (before terrain masking)
     allFlightPoint = "allFlightPoint"
 
@@ -432,51 +480,284 @@ def main():
     # stats for final ouput flight points (after terrain masking)
     finalPointsStats_Name = "PointsGeneralStatSkeenaAll_TerrainMasked_Stats_20200915"
 
-    #########don't change the stuff here:
-    allPointsStats_Excel = os.path.join(generalFolder, allPointsStats_Name) + ".xlsx" #don't need to change
-    finalPointsStats_Excel = os.path.join(generalFolder, finalPointsStats_Name) + ".xlsx" #don't need to change
-
-    ######################################
-
-    # Create the buffered uwr feature class. If the final fc exists, only uwr units that aren't in the final fc will be made and appended to it
-    flightPathAnalysis_Functions.createUWRBuffer(origUWRGDB, origUWRName, outputGDB, unit_no, unit_no_id, uwr_unique_Field, uwrBuffered, bufferDistList)
+    #streaming mode: read, classify and write the flight points in chunks with overlapped I/O and compute.
+    #The flight line feature class is not made in streaming mode. See flightPathAnalysis_Streaming
+    #gpxFolder can also be a tar, tar.gz or zip archive of flight logs in streaming (and sharded) mode
+    streaming = False
+
+    #sharded mode: number of spatial shards of uwr (0 = not sharded) and number of local worker processes.
+    #Other nodes can work on the same shards with: python flightPathAnalysis_Sharding.py <generalFolder>\shards
+    shardCount = 0
+    shardProcesses = 2
+
+    #parameter sweep: threshold sets to compare (see flightPathAnalysis_Sweep). The flights are measured once up to
+    #sweepMaxDistance from the uwr, and changing the scenarios only reruns the re-binning. Empty list = no sweep
+    sweepScenarios = []
+    #eg. sweepScenarios = [{"name": "current", "IncursionSeverity": IncursionSeverity},
+    #                      {"name": "buffer250", "IncursionSeverity": {0: "In UWR", 250: "High", 500: "Moderate", 750: "Low"}, "heightRangeSplits": [300]}]
+    sweepMaxDistance = 3000
+
+    #lazy viewsheds: terrain mask with the minimum AGL of only the DEM cells that have flight points, cached per uwr in
+    #generalFolder\lazyViewshed (see flightPathAnalysis_LazyViewshed). The viewshed and minElevViewshed layers are not made
+    #or updated in this mode, so the parameter sweep still masks with the existing minElevViewshed
+    lazyViewshed = False
+
+    #lazy viewsheds computed coarse to fine on a pyramid of the DEM (see flightPathAnalysis_Pyramid): the lines from the uwr
+    #are only read at full resolution where they graze the terrain. Same masking as the full resolution sweep. Needs numba
+    viewshedPyramid = False
+
+    #viewshed cache size limit in MB (None = no cache). Viewsheds in the viewshed layers are keyed by their DEM window, uwr
+    #geometry and maxRange, so a DEM or uwr edit remakes only the affected viewsheds (see flightPathAnalysis_ViewshedCache).
+    #The lazy viewshed files are kept under the same limit
+    viewshedCacheMB = 2048
+
+    #out-of-core mode: memory budget in MB (0 = off). Flights are processed in chunks and spatial tiles sized to the budget,
+    #with intermediates spilled to generalFolder\spill (see flightPathAnalysis_OutOfCore). Replaces the flight points, LOS and
+    #stats stages; the terrain masking uses the lazy viewsheds if lazyViewshed is True, else the existing minElevViewshed
+    outOfCoreBudgetMB = 0
+
+    #folder for the Arrow IPC files of the results, memory-mappable by the R package and the Shiny app (None = not written).
+    #Needs pyarrow. See flightPathAnalysis_Arrow for the schema
+    arrowFolder = None
+
+    #results store of all seasons (None = not used): the Arrow points of the run are added to it as season resultsSeason
+    #(eg. "2021-2022", None = the winter season of the flight dates). Needs arrowFolder. See flightPathAnalysis_ResultsStore
+    resultsStoreFolder = None
+    resultsSeason = None
+
+    #prebuilt analysis bundle file (None = not made): the uwr zones, DEM window, zone label raster and minElevViewshed polygons
+    #packed into one file that workers (streaming compute processes, the service and the watch folder of flightPathAnalysis_CLI)
+    #open with a memory map instead of reading the layers. Made after the terrain masking. See flightPathAnalysis_Bundle
+    analysisBundle = None
+
+    #folder to keep the checkpoints of each stage. Rerunning main() resumes from the first stage that is stale or failed
+    checkpointFolder = os.path.join(generalFolder, "checkpoints")
+
+    runAnalysis(dict(gpxFolder=gpxFolder, DEM=DEM, origUWRGDB=origUWRGDB, origUWRName=origUWRName, unit_no=unit_no, unit_no_id=unit_no_id,
+                     uwr_unique_Field=uwr_unique_Field, bufferDistList=bufferDistList, outputGDB=outputGDB, uwrBuffered=uwrBuffered,
+                     IncursionSeverity=IncursionSeverity, generalFolder=generalFolder, viewshed=viewshed, minElevViewshed=minElevViewshed,
+                     ViewshedPointCount=ViewshedPointCount, outputFlightLineName=outputFlightLineName,
+                     flightLineSegments=flightLineSegments, allFlightPoint=allFlightPoint, maxRange=maxRange,
+                     allPointsStats_Name=allPointsStats_Name, LOS_uwrFlightPoints=LOS_uwrFlightPoints,
+                     LOS_uwrFlightPointsGDB=LOS_uwrFlightPointsGDB, finalPointsStats_Name=finalPointsStats_Name, streaming=streaming,
+                     shardCount=shardCount, shardProcesses=shardProcesses, sweepScenarios=sweepScenarios,
+                     sweepMaxDistance=sweepMaxDistance, lazyViewshed=lazyViewshed, viewshedPyramid=viewshedPyramid, viewshedCacheMB=viewshedCacheMB,
+                     outOfCoreBudgetMB=outOfCoreBudgetMB, arrowFolder=arrowFolder,
+                     resultsStoreFolder=resultsStoreFolder, resultsSeason=resultsSeason, analysisBundle=analysisBundle,
+                     checkpointFolder=checkpointFolder))
+
+
+def runAnalysis(config, force=None):
+    """
+    (dictionary, optional: list) -> None
 
-    #no need to filter uwrBuffered with required uwr
-    getFlightLinePoints(gpxFolder, outputGDB, outputFlightLineName, allFlightPoint, DEM, unit_no, unit_no_id, uwrBuffered, IncursionSeverity, generalFolder)
+    Inputs:
+    config: Settings of the run, keyed by the variable names of main(). See flightPathAnalysis_Config.loadConfig()
+    force: Optional list of stage names to run even if they are up to date
 
-    #summary stats
-    #Note:frequency table cannot be made in datasets
-    arcpy.env.workspace = outputGDB
-    arcpy.env.overwriteOutput = True
+    Purpose: Runs the stages of the analysis. Used by main() and by the run command of flightPathAnalysis_CLI
+    """
+    gpxFolder = config["gpxFolder"]
+    DEM = config["DEM"]
+    origUWRGDB = config["origUWRGDB"]
+    origUWRName = config["origUWRName"]
+    unit_no = config["unit_no"]
+    unit_no_id = config["unit_no_id"]
+    uwr_unique_Field = config["uwr_unique_Field"]
+    bufferDistList = config["bufferDistList"]
+    outputGDB = config["outputGDB"]
+    uwrBuffered = config["uwrBuffered"]
+    IncursionSeverity = config["IncursionSeverity"]
+    generalFolder = config["generalFolder"]
+    viewshed = config["viewshed"]
+    minElevViewshed = config["minElevViewshed"]
+    ViewshedPointCount = config["ViewshedPointCount"]
+    outputFlightLineName = config["outputFlightLineName"]
+    flightLineSegments = config["flightLineSegments"]
+    allFlightPoint = config["allFlightPoint"]
+    maxRange = config["maxRange"]
+    allPointsStats_Name = config["allPointsStats_Name"]
+    LOS_uwrFlightPoints = config["LOS_uwrFlightPoints"]
+    LOS_uwrFlightPointsGDB = config["LOS_uwrFlightPointsGDB"]
+    finalPointsStats_Name = config["finalPointsStats_Name"]
+    streaming = config["streaming"]
+    shardCount = config["shardCount"]
+    shardProcesses = config["shardProcesses"]
+    sweepScenarios = config["sweepScenarios"]
+    sweepMaxDistance = config["sweepMaxDistance"]
+    lazyViewshed = config["lazyViewshed"]
+    viewshedPyramid = config["viewshedPyramid"]
+    viewshedCacheMB = config["viewshedCacheMB"]
+    outOfCoreBudgetMB = config["outOfCoreBudgetMB"]
+    arrowFolder = config["arrowFolder"]
+    resultsStoreFolder = config["resultsStoreFolder"]
+    resultsSeason = config["resultsSeason"]
+    analysisBundle = config["analysisBundle"]
+    checkpointFolder = config["checkpointFolder"]
 
+    #########don't change the stuff here:
+    allPointsStats_Excel = os.path.join(generalFolder, allPointsStats_Name) + ".xlsx" #don't need to change
+    finalPointsStats_Excel = os.path.join(generalFolder, finalPointsStats_Name) + ".xlsx" #don't need to change
     allPointsStats_FullPath = os.path.join(outputGDB, allPointsStats_Name) #don't change!!
-
-    currenttime = datetime.datetime.now()
-    arcpy.Statistics_analysis (os.path.join(outputGDB, allFlightPoint), allPointsStats_FullPath, [["TimeInterval", "SUM"]], ["FlightName", "HeightRange", "BUFF_DIST", unit_no, unit_no_id, "TotalTime", "IncursionSeverity"])
-    try:
-        os.remove(allPointsStats_Excel)
-    except:
-        pass
-    arcpy.TableToExcel_conversion(allPointsStats_FullPath, allPointsStats_Excel)
-    print("Runtime to calculate general stats: ", datetime.datetime.now() - currenttime)
-
-    flightPathAnalysis_Functions.LOS_Analysis(uwrBuffered, maxRange, DEM, viewshed, minElevViewshed, unit_no, unit_no_id, uwr_unique_Field, os.path.join(outputGDB, allFlightPoint), LOS_uwrFlightPointsGDB, LOS_uwrFlightPoints, generalFolder, ViewshedPointCount)
-
     # name of feature class for the output final flight points (after terrain masking)
     finalPoints_Masked = os.path.join(LOS_uwrFlightPointsGDB, LOS_uwrFlightPoints) ##don't change!!
     # full path to gdb table of stats of output final flight points (after terrain masking)
     finalPointsStats_FullPath = os.path.join(outputGDB, finalPointsStats_Name) ##don't change!!
+    ######################################
+
+    if shardCount > 0:
+        flightPathAnalysis_Functions.createUWRBuffer(origUWRGDB, origUWRName, outputGDB, unit_no, unit_no_id, uwr_unique_Field, uwrBuffered, bufferDistList)
+        shardFolder = os.path.join(generalFolder, "shards")
+        #the plan is kept if it was made from the same uwr, settings and inputs, so a rerun only does the shards not done
+        settings = dict(gpxFolder=gpxFolder, DEM=DEM, uwrBuffered=uwrBuffered, unit_no=unit_no, unit_no_id=unit_no_id,
+                        uwr_unique_Field=uwr_unique_Field, IncursionSeverity=IncursionSeverity, maxRange=maxRange, viewshed=viewshed,
+                        minElevViewshed=minElevViewshed)
+        flightPathAnalysis_Sharding.planShards(shardFolder, shardCount, settings)
+        flightPathAnalysis_Sharding.runShardedLocal(shardFolder, shardProcesses)
+        flightPathAnalysis_Sharding.mergeShards(shardFolder, outputGDB, allFlightPoint, LOS_uwrFlightPoints, viewshed, minElevViewshed,
+                                                LOS_uwrFlightPointsGDB)
+        pointStatistics(os.path.join(outputGDB, allFlightPoint), allPointsStats_FullPath, allPointsStats_Excel, unit_no, unit_no_id)
+        pointStatistics(finalPoints_Masked, finalPointsStats_FullPath, finalPointsStats_Excel, unit_no, unit_no_id)
+        if arrowFolder is not None:
+            flightPathAnalysis_Arrow.exportSeason(arrowFolder, os.path.join(outputGDB, allFlightPoint), finalPoints_Masked, allPointsStats_FullPath,
+                                                  finalPointsStats_FullPath, unit_no, unit_no_id)
+            if resultsStoreFolder is not None:
+                flightPathAnalysis_ResultsStore.addSeasonFiles(resultsStoreFolder, arrowFolder, resultsSeason)
+        print("Script completed!!")
+        return
+
+    runner = flightPathAnalysis_Pipeline.PipelineRunner(checkpointFolder, exists=arcpy.Exists, fingerprint=flightPathAnalysis_Pipeline.fingerprintDataset)
+
+    # Create the buffered uwr feature class. If the final fc exists, only uwr units that aren't in the final fc will be made and appended to it
+    runner.addStage(flightPathAnalysis_Pipeline.Stage(
+        "uwrBuffer", flightPathAnalysis_Functions.createUWRBuffer,
+        inputs=[os.path.join(origUWRGDB, origUWRName)],
+        outputs=[uwrBuffered],
+        params=dict(origUWRGDB=origUWRGDB, origUWRName=origUWRName, outputGDB=outputGDB, unit_no_Field=unit_no, unit_no_id_Field=unit_no_id,
+                    uwr_unique_Field=uwr_unique_Field, finalFC=uwrBuffered, bufferDistList=bufferDistList)))
+
+    if outOfCoreBudgetMB > 0:
+        runner.addStage(flightPathAnalysis_Pipeline.Stage(
+            "outOfCore", flightPathAnalysis_OutOfCore.getFlightPointsOutOfCore,
+            inputs=[gpxFolder, DEM],
+            outputs=[os.path.join(outputGDB, allFlightPoint), finalPoints_Masked, allPointsStats_FullPath, allPointsStats_Excel, finalPointsStats_FullPath,
+                     finalPointsStats_Excel],
+            deps=["uwrBuffer"],
+            params=dict(gpxFolder=gpxFolder, DEM=DEM, uwrBuffered=uwrBuffered, unit_no=unit_no, unit_no_id=unit_no_id, IncursionSeverity=IncursionSeverity,
+                        outputGDB=outputGDB, allFlightPoint=allFlightPoint, LOS_uwrFlightPoints=LOS_uwrFlightPoints,
+                        allPointsStats_FullPath=allPointsStats_FullPath, finalPointsStats_FullPath=finalPointsStats_FullPath,
+                        allPointsStats_Excel=allPointsStats_Excel, finalPointsStats_Excel=finalPointsStats_Excel, generalFolder=generalFolder,
+                        memoryBudgetMB=outOfCoreBudgetMB, minElevViewshed=minElevViewshed, uwr_unique_Field=uwr_unique_Field,
+                        lazyViewshedFolder=os.path.join(generalFolder, "lazyViewshed") if lazyViewshed else None, viewshedPyramid=viewshedPyramid,
+                        LOS_uwrFlightPointsGDB=LOS_uwrFlightPointsGDB, viewshed=viewshed, maxRange=maxRange)))
+        maskingStage = "outOfCore"
+    else:
+        #no need to filter uwrBuffered with required uwr
+        if streaming:
+            runner.addStage(flightPathAnalysis_Pipeline.Stage(
+                "flightPoints", flightPathAnalysis_Streaming.getFlightPointsStreaming,
+                inputs=[gpxFolder, DEM],
+                outputs=[os.path.join(outputGDB, allFlightPoint)],
+                deps=["uwrBuffer"],
+                params=dict(gpxFolder=gpxFolder, outputGDB=outputGDB, finalFlightPointName=allFlightPoint, DEM=DEM, unit_no=unit_no, unit_no_id=unit_no_id,
+                            uwrBuffered=uwrBuffered, IncursionSeverity=IncursionSeverity, generalFolder=generalFolder, bundlePath=analysisBundle)))
+        else:
+            runner.addStage(flightPathAnalysis_Pipeline.Stage(
+                "flightPoints", getFlightLinePoints,
+                inputs=[gpxFolder, DEM],
+                outputs=[os.path.join(outputGDB, outputFlightLineName), os.path.join(outputGDB, allFlightPoint)],
+                deps=["uwrBuffer"],
+                params=dict(gpxFolder=gpxFolder, outputGDB=outputGDB, finalFlightLineName=outputFlightLineName, finalFlightPointName=allFlightPoint, DEM=DEM,
+                            unit_no=unit_no, unit_no_id=unit_no_id, uwrBuffered=uwrBuffered, IncursionSeverity=IncursionSeverity, generalFolder=generalFolder,
+                            flightLineSegments=flightLineSegments, arrowFolder=arrowFolder)))
+
+        #summary stats
+        runner.addStage(flightPathAnalysis_Pipeline.Stage(
+            "allPointsStats", pointStatistics,
+            outputs=[allPointsStats_FullPath, allPointsStats_Excel],
+            deps=["flightPoints"],
+            params=dict(flightPoints=os.path.join(outputGDB, allFlightPoint), statsFullPath=allPointsStats_FullPath, statsExcel=allPointsStats_Excel,
+                        unit_no=unit_no, unit_no_id=unit_no_id)))
+
+        #terrain masking. checkpoint=True lets LOS_Analysis resume at the per uwr level
+        if lazyViewshed:
+            runner.addStage(flightPathAnalysis_Pipeline.Stage(
+                "LOS", flightPathAnalysis_LazyViewshed.LOS_AnalysisLazy,
+                inputs=[DEM],
+                outputs=[finalPoints_Masked],
+                deps=["uwrBuffer", "flightPoints"],
+                params=dict(uwrBuffered=uwrBuffered, DEM=DEM, unit_no_Field=unit_no, unit_no_id_Field=unit_no_id,
+                            allFlightPoints=os.path.join(outputGDB, allFlightPoint), LOS_uwrFlightPointsGDB=LOS_uwrFlightPointsGDB,
+                            LOS_uwrFlightPoints=LOS_uwrFlightPoints, cacheFolder=os.path.join(generalFolder, "lazyViewshed"),
+                            maxCacheMB=viewshedCacheMB, pyramid=viewshedPyramid)))
+        else:
+            runner.addStage(flightPathAnalysis_Pipeline.Stage(
+                "LOS", flightPathAnalysis_Functions.LOS_Analysis,
+                inputs=[DEM],
+                outputs=[finalPoints_Masked],
+                deps=["uwrBuffer", "flightPoints"],
+                params=dict(uwrBuffered=uwrBuffered, maxRange=maxRange, DEM=DEM, viewshed=viewshed, minElevViewshed=minElevViewshed, unit_no_Field=unit_no,
+                            unit_no_id_Field=unit_no_id, uwr_unique_Field=uwr_unique_Field, allFlightPoints=os.path.join(outputGDB, allFlightPoint),
+                            LOS_uwrFlightPointsGDB=LOS_uwrFlightPointsGDB, LOS_uwrFlightPoints=LOS_uwrFlightPoints, generalFolder=generalFolder,
+                            ViewshedPointCount=ViewshedPointCount, checkpoint=True, viewshedCacheMB=viewshedCacheMB)))
+
+        #stats for final points after terrain masking
+        runner.addStage(flightPathAnalysis_Pipeline.Stage(
+            "finalPointsStats", pointStatistics,
+            outputs=[finalPointsStats_FullPath, finalPointsStats_Excel],
+            deps=["LOS"],
+            params=dict(flightPoints=finalPoints_Masked, statsFullPath=finalPointsStats_FullPath, statsExcel=finalPointsStats_Excel,
+                        unit_no=unit_no, unit_no_id=unit_no_id)))
+
+        maskingStage = "LOS"
+
+    #analysis bundle for the workers. The lazy viewsheds stay in their cache folder, so no masking layer is packed with them
+    if analysisBundle is not None:
+        bundleMask = None if lazyViewshed else minElevViewshed
+        runner.addStage(flightPathAnalysis_Pipeline.Stage(
+            "analysisBundle", flightPathAnalysis_Bundle.buildBundle,
+            inputs=[DEM] + ([bundleMask] if bundleMask is not None else []),
+            outputs=[analysisBundle],
+            deps=["uwrBuffer", maskingStage],
+            params=dict(bundlePath=analysisBundle, DEM=DEM, uwrBuffered=uwrBuffered, unit_no=unit_no, unit_no_id=unit_no_id,
+                        minElevViewshed=bundleMask, uwr_unique_Field=uwr_unique_Field)))
+
+    #Arrow files of the points and stats for the R package and the Shiny app
+    if arrowFolder is not None:
+        runner.addStage(flightPathAnalysis_Pipeline.Stage(
+            "arrowExport", flightPathAnalysis_Arrow.exportSeason,
+            outputs=[os.path.join(arrowFolder, name) for name in ["points.arrow", "maskedPoints.arrow", "pointStats.arrow", "maskedPointStats.arrow"]],
+            deps=["outOfCore"] if outOfCoreBudgetMB > 0 else ["allPointsStats", "finalPointsStats"],
+            params=dict(arrowFolder=arrowFolder, allFlightPoints=os.path.join(outputGDB, allFlightPoint), maskedFlightPoints=finalPoints_Masked,
+                        allPointsStats=allPointsStats_FullPath, maskedPointsStats=finalPointsStats_FullPath, unit_no=unit_no, unit_no_id=unit_no_id)))
+
+        #season added to the results store of all seasons
+        if resultsStoreFolder is not None:
+            runner.addStage(flightPathAnalysis_Pipeline.Stage(
+                "resultsStore", flightPathAnalysis_ResultsStore.addSeasonFiles,
+                outputs=[os.path.join(resultsStoreFolder, "index.sqlite")],
+                deps=["arrowExport"],
+                params=dict(storeFolder=resultsStoreFolder, arrowFolder=arrowFolder, season=resultsSeason)))
+
+    #parameter sweep
+    if sweepScenarios:
+        measuredPath = os.path.join(generalFolder, "measuredPoints.npz")
+        runner.addStage(flightPathAnalysis_Pipeline.Stage(
+            "measure", flightPathAnalysis_Sweep.measureFlights,
+            inputs=[gpxFolder, DEM, minElevViewshed],
+            outputs=[measuredPath],
+            deps=["uwrBuffer", maskingStage], #LOS makes the missing viewsheds used to flag the terrain masked points
+            params=dict(gpxFolder=gpxFolder, DEM=DEM, uwrBuffered=uwrBuffered, unit_no=unit_no, unit_no_id=unit_no_id, maxDistance=sweepMaxDistance,
+                        measuredPath=measuredPath, minElevViewshed=minElevViewshed, uwr_unique_Field=uwr_unique_Field)))
+        runner.addStage(flightPathAnalysis_Pipeline.Stage(
+            "sweep", flightPathAnalysis_Sweep.runSweep,
+            outputs=[os.path.join(generalFolder, "sweep")],
+            deps=["measure"],
+            params=dict(measuredPath=measuredPath, scenarios=sweepScenarios, outputFolder=os.path.join(generalFolder, "sweep"),
+                        unit_no=unit_no, unit_no_id=unit_no_id)))
+
+    runner.run(force)
 
-    #stats for final points after terrain masking
-    currenttime = datetime.datetime.now()
-    arcpy.Statistics_analysis (finalPoints_Masked, finalPointsStats_FullPath, [["TimeInterval", "SUM"]], ["FlightName", "HeightRange", "BUFF_DIST", unit_no, unit_no_id, "TotalTime", "IncursionSeverity"])
-    try:
-        os.remove(finalPointsStats_Excel)
-    except:
-        pass
-    arcpy.TableToExcel_conversion(finalPointsStats_FullPath, finalPointsStats_Excel)
-    print("Runtime to calculate stats for terrain masked pts: ", datetime.datetime.now() - currenttime)
-    
     print("Script completed!!")
 
 if __name__ == "__main__":